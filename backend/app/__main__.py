@@ -0,0 +1,45 @@
+"""
+    python -m app serve [--host HOST] [--port PORT] [--workers N]
+    python -m app shards {init,pin,rebalance} [--dry-run] [--batch-size N] [--wait SECONDS]
+
+Production server, see app.core.serve - the defaults come from app.core.config.
+Shard maintenance, see app.db.rebalance.
+"""
+import argparse
+import logging
+
+from app.core.config import SHARD_PLACEMENT_REFRESH_INTERVAL
+from app.core.serve import serve
+from app.db import rebalance
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Run the API on uvicorn workers.")
+    serve_parser.add_argument("--host", help="Defaults to SERVER_HOST.")
+    serve_parser.add_argument("--port", type=int, help="Defaults to SERVER_PORT.")
+    serve_parser.add_argument("--workers", type=int, help="Defaults to SERVER_WORKERS, or one per available CPU.")
+
+    shards_parser = commands.add_parser("shards", help="Add shards and move workspaces between them.")
+    shards_parser.add_argument("action", choices=("init", "pin", "rebalance"))
+    shards_parser.add_argument("--dry-run", action="store_true", help="Only log what would be pinned or moved.")
+    shards_parser.add_argument("--batch-size", type=int, default=rebalance.REBALANCE_BATCH_SIZE,
+                               help="Rows copied or deleted per statement.")
+    shards_parser.add_argument("--wait", type=float, default=2 * SHARD_PLACEMENT_REFRESH_INTERVAL,
+                               help="Seconds for every worker to reload a workspace's placement, "
+                                    "defaults to twice SHARD_PLACEMENT_REFRESH_INTERVAL.")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:     %(message)s")
+
+    if args.command == "serve":
+        serve(host=args.host, port=args.port, workers=args.workers)
+    elif args.command == "shards":
+        rebalance.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.status import HTTP_429_TOO_MANY_REQUESTS, HTTP_503_SERVICE_UNAVAILABLE
+
+from app.core.timings import current_timings
+
+# Rate limit buckets kept per worker, the least recently seen clients are forgotten past that
+RATE_LIMIT_MAX_CLIENTS = 10_000
+
+
+class RouteKind(str, Enum):
+    """
+    Admission class of a route - reads and writes have their own limits, cheap reads (one row by primary key)
+    go ahead of the other reads when they queue
+    """
+    cheap_read = "cheap_read"
+    read = "read"
+    write = "write"
+
+
+# Order in which the waiting reads get the free slots, lowest first
+READ_PRIORITIES = {RouteKind.cheap_read: 0, RouteKind.read: 1}
+
+
+def route_kind(name: str, methods: Sequence[str], *, cheap_reads: Sequence[str]) -> RouteKind:
+    if name in cheap_reads:
+        return RouteKind.cheap_read
+    if set(methods) <= {"GET", "HEAD"}:
+        return RouteKind.read
+
+    return RouteKind.write
+
+
+def rejected(status_code: int, detail: str, *, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status_code,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def overloaded(retry_after: float) -> HTTPException:
+    return rejected(HTTP_503_SERVICE_UNAVAILABLE, "The server is overloaded, retry later.", retry_after=retry_after)
+
+
+class ConcurrencyLimiter:
+    """
+    Up to limit requests at once (0 for no limit), and up to queue_size more waiting at most timeout seconds
+    for a free slot - the requests beyond that are rejected at once, so that the queue (and the latency of what
+    it admits) stays bounded under overload. A freed slot goes to the waiter of the lowest priority, then the oldest.
+    """
+
+    def __init__(self, *, limit: int, queue_size: int, timeout: float) -> None:
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._waiters: List[list] = []
+        self._order = itertools.count()
+
+    async def acquire(self, priority: int = 0) -> None:
+        """
+        Raises a 503 when the queue is full, or when no slot freed up within timeout
+        """
+        if self.limit <= 0 or (self.active < self.limit and not self.waiting):
+            self.active += 1
+            self.admitted += 1
+            return
+
+        if self.waiting >= self.queue_size:
+            self.rejected += 1
+            raise overloaded(self.timeout)
+
+        slot = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [priority, next(self._order), slot])
+        self.waiting += 1
+        self.queued += 1
+        try:
+            # asyncio.wait doesn't cancel the slot on timeout, release() may hand it over until the last moment
+            await asyncio.wait({slot}, timeout=self.timeout)
+        except asyncio.CancelledError:
+            # The client went away while queued
+            if slot.done():
+                self.release()
+            slot.cancel()
+            raise
+        finally:
+            self.waiting -= 1
+
+        if not slot.done():
+            slot.cancel()
+            self.timed_out += 1
+            raise overloaded(self.timeout)
+
+        self.admitted += 1
+
+    def release(self) -> None:
+        if self.limit <= 0:
+            self.active -= 1
+            return
+
+        # Handed over to the next waiter still there, the slot stays taken
+        while self._waiters:
+            _, _, slot = heapq.heappop(self._waiters)
+            if not slot.done():
+                slot.set_result(None)
+                return
+
+        self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "queue_size": self.queue_size,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+class TokenBucket:
+    """
+    rate tokens a second, up to burst saved - each request takes one
+    """
+
+    def __init__(self, *, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """
+        :return: 0 when a token was taken, else the seconds until the next one
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    A token bucket per client, identified by the client_header header (e.g. an API key) or else the client's address.
+    Buckets are per worker process, a client spread over the workers gets up to workers * rate.
+    """
+
+    def __init__(self, *, rate: float, burst: int, client_header: str = "") -> None:
+        self.rate = rate
+        self.burst = burst
+        self.client_header = client_header.lower()
+        self.limited = 0
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def check(self, request: Request) -> None:
+        """
+        Raises a 429 when the client is over its rate
+        """
+        client = self._client(request)
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(rate=self.rate, burst=self.burst)
+            if len(self._buckets) > RATE_LIMIT_MAX_CLIENTS:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(client)
+
+        wait = bucket.take()
+        if wait:
+            self.limited += 1
+            raise rejected(HTTP_429_TOO_MANY_REQUESTS, "Too many requests, retry later.", retry_after=wait)
+
+    def _client(self, request: Request) -> str:
+        if self.client_header and self.client_header in request.headers:
+            return f"header:{request.headers[self.client_header]}"
+
+        return f"address:{request.client.host if request.client else 'unknown'}"
+
+    def stats(self) -> Dict[str, Any]:
+        return {"rate": self.rate, "burst": self.burst, "clients": len(self._buckets), "limited": self.limited}
+
+
+class AdmissionController:
+    """
+    Admission of the requests of one worker: the rate limit of their client first (when enabled), then a slot
+    among the reads or the writes - cheap reads overtake the other queued reads. Rejected requests get a 429
+    (rate) or 503 (overload) with a Retry-After at once, rather than waiting on the saturated pool.
+    """
+
+    def __init__(
+            self,
+            *,
+            reads: ConcurrencyLimiter,
+            writes: ConcurrencyLimiter,
+            rate_limiter: Optional[RateLimiter] = None,
+    ) -> None:
+        self.reads = reads
+        self.writes = writes
+        self.rate_limiter = rate_limiter
+
+    def limiter(self, kind: RouteKind) -> ConcurrencyLimiter:
+        return self.writes if kind == RouteKind.write else self.reads
+
+    async def admit(self, request: Request, kind: RouteKind) -> ConcurrencyLimiter:
+        """
+        :return: The limiter whose slot the request holds, to release once it is handled
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.check(request)
+
+        limiter = self.limiter(kind)
+        await limiter.acquire(READ_PRIORITIES.get(kind, 0))
+
+        return limiter
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "reads": self.reads.stats(),
+            "writes": self.writes.stats(),
+            "rate_limit": self.rate_limiter.stats() if self.rate_limiter is not None else None,
+        }
+
+
+Handler = Callable[[Request], Coroutine[Any, Any, Response]]
+
+
+def admitted_handler(handler: Handler, *, name: str, kind: RouteKind) -> Handler:
+    """
+    Runs the route's handler (dependencies included, which is where connections are checked out) once the request
+    is admitted by the app's AdmissionController, if it has one. The time spent queued is the queue phase.
+    """
+
+    async def admitted(request: Request) -> Response:
+        admission: Optional[AdmissionController] = getattr(request.app.state, "_admission", None)
+        if admission is None:
+            return await handler(request)
+
+        timings = current_timings.get()
+        if timings is not None:
+            timings.route = name
+
+        started = time.perf_counter()
+        try:
+            limiter = await admission.admit(request, kind)
+        finally:
+            if timings is not None:
+                timings.add_queue(time.perf_counter() - started)
+
+        try:
+            return await handler(request)
+        finally:
+            limiter.release()
+
+    return admitted
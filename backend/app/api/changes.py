@@ -0,0 +1,113 @@
+import contextlib
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from starlette.status import HTTP_410_GONE
+
+from app.db.changes import ChangeCursor, ChangeEvent, ChangeFeed, format_change_cursor
+
+SSE_HEARTBEAT = b": heartbeat\n\n"
+WEBSOCKET_HEARTBEAT = '{"heartbeat": true}'
+
+
+async def check_resumable(
+        feed: ChangeFeed, *, after: Optional[ChangeCursor], since: Optional[datetime],
+) -> None:
+    """
+    Raises 410 when the changes to resume from may not all be logged anymore - the client has to refetch
+    what it keeps, then follow the changes from now on
+    """
+    # after holds the resume seq of each shard, if a shard's log doesn't reach back to it it was pruned
+    if after and not feed.remembers(after=after):
+        for shard, seq in zip(feed.shards, after):
+            if seq and not await shard.changes_repo.changes_reach_back(seq=seq):
+                raise HTTPException(
+                    status_code=HTTP_410_GONE, detail="The change log doesn't reach back to after anymore.",
+                )
+
+    if since is not None:
+        since = since if since.tzinfo else since.replace(tzinfo=timezone.utc)
+        if since < datetime.now(timezone.utc) - timedelta(seconds=feed.retention):
+            raise HTTPException(status_code=HTTP_410_GONE, detail="The change log doesn't reach back to since.")
+
+
+async def backlog(
+        feed: ChangeFeed,
+        *,
+        after: Optional[ChangeCursor],
+        since: Optional[datetime],
+        project_id: Optional[int],
+) -> AsyncIterator[List[ChangeEvent]]:
+    """
+    The logged changes from after or since on, page by page and shard by shard - from memory when the feed
+    still has them all.
+
+    A change read from a shard's log resumes that shard at most after its resume_seq as of the read: the changes
+    below it were committed by then, so read too - or, when they are lower than the change, in an earlier page.
+    The shards read already resume after their resume_seq, those still to read from after.
+    """
+    if after is None and since is None:
+        return
+
+    if since is None:
+        recent = feed.recent(after=after, project_id=project_id)
+        if recent is not None:
+            yield recent
+            return
+
+    cursor = list(after or (0,) * len(feed.shards))
+    for shard in feed.shards:
+        shard_after = cursor[shard.index]
+        while True:
+            resume_seq = shard.resume_seq
+            events = await shard.get_changes(after=shard_after, since=since, project_id=project_id)
+            for event in events:
+                cursor[shard.index] = max(cursor[shard.index], min(event.seq, resume_seq))
+                event.cursor = format_change_cursor(cursor)
+            if events:
+                yield events
+            if len(events) < feed.page_size:
+                break
+            shard_after = events[-1].seq
+        cursor[shard.index] = max(cursor[shard.index], resume_seq)
+
+
+async def change_events(
+        feed: ChangeFeed,
+        *,
+        after: Optional[ChangeCursor],
+        since: Optional[datetime],
+        project_id: Optional[int],
+        follow: bool,
+) -> AsyncIterator[Optional[ChangeEvent]]:
+    """
+    The logged changes from after or since on, then the live ones as long as follow - None on the feed's heartbeats,
+    when nothing happened. Ends when the client falls too far behind, to resume from the last change it got.
+
+    Subscribes before reading the log, so that no change falls in between. The changes both read and received
+    live are sent once, but the logs and the notifications are ordered by shard and seq and by commit
+    respectively - around the switch, and after a late commit, a client may receive a lower seq than the one before.
+    Clients resume after the cursor of the last change they got, see ChangeEvent.
+    """
+    with contextlib.ExitStack() as stack:
+        subscription = stack.enter_context(feed.subscribe(project_id=project_id)) if follow else None
+
+        sent: Set[Tuple[int, int]] = set()
+        async for events in backlog(feed, after=after, since=since, project_id=project_id):
+            for event in events:
+                sent.add((event.shard, event.seq))
+                yield event
+
+        if subscription is None:
+            return
+
+        while not subscription.finished:
+            event = await subscription.get()
+            if event is None or (event.shard, event.seq) not in sent:
+                yield event
+
+
+async def sse_stream(events: AsyncIterator[Optional[ChangeEvent]]) -> AsyncIterator[bytes]:
+    async for event in events:
+        yield SSE_HEARTBEAT if event is None else event.sse
@@ -1,18 +1,138 @@
-from typing import Callable, Type
-from databases import Database
+import re
+from typing import Callable, Dict, Optional, Type
 
-from fastapi import Depends
-from starlette.requests import Request
+from fastapi import Depends, HTTPException
+from starlette.requests import HTTPConnection
+from starlette.status import HTTP_400_BAD_REQUEST, HTTP_503_SERVICE_UNAVAILABLE
 
-from app.db.repositories.base import BaseRepository
+from app.api.admission import rejected
+from app.core.config import DB_READ_YOUR_WRITES, DEFAULT_WORKSPACE, WORKSPACE_HEADER
+from app.db.cache import BaseCache, NullCache
+from app.db.changes import ChangeFeed
+from app.db.jobs import JobRunner
+from app.db.replicas import DatabaseRouter
+from app.db.repositories.base import BaseRepository, workspace_required
+from app.db.repositories.scatter import SCATTER_REPOSITORIES
+from app.db.shards import ShardSet
 
+# The WORKSPACE_HEADER value of the reads across every workspace
+ALL_WORKSPACES = "*"
 
-def get_database(request: Request) -> Database:
-    return request.app.state._db
+WORKSPACE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+SAFE_METHODS = ("GET", "HEAD")
+
+
+# HTTPConnection rather than Request, so that WebSocket routes get repositories too
+def get_database(connection: HTTPConnection) -> DatabaseRouter:
+    # One router per request (dependencies are cached within a request), shared by its repositories -
+    # a write through any of them pins the reads of all the others to the primary
+    return DatabaseRouter(
+        connection.app.state._db,
+        getattr(connection.app.state, "_replicas", None),
+        read_your_writes=DB_READ_YOUR_WRITES,
+    )
+
+
+def get_shards(connection: HTTPConnection) -> Optional[ShardSet]:
+    return getattr(connection.app.state, "_shards", None)
+
+
+def get_shard_routers(
+        connection: HTTPConnection, db: DatabaseRouter = Depends(get_database),
+) -> Dict[str, DatabaseRouter]:
+    # Like get_database's, one router per shard and request - the first shard's is get_database's own
+    shards = get_shards(connection)
+    if shards is None:
+        return {}
+
+    return {
+        shard.name: db if shard is shards.directory else DatabaseRouter(
+            shard.database, read_your_writes=DB_READ_YOUR_WRITES,
+        )
+        for shard in shards.shards
+    }
+
+
+def get_workspace(connection: HTTPConnection) -> Optional[str]:
+    """
+    The workspace of the request, from its WORKSPACE_HEADER - None for ALL_WORKSPACES
+    """
+    workspace = connection.headers.get(WORKSPACE_HEADER, DEFAULT_WORKSPACE)
+    if workspace == ALL_WORKSPACES:
+        return None
+
+    if not WORKSPACE_ID_PATTERN.match(workspace):
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=f"Invalid {WORKSPACE_HEADER}.",
+        )
+
+    return workspace
+
+
+def get_cache(connection: HTTPConnection) -> BaseCache:
+    return getattr(connection.app.state, "_cache", None) or NullCache()
+
+
+def get_change_feed(connection: HTTPConnection) -> ChangeFeed:
+    feed = getattr(connection.app.state, "_change_feed", None)
+    if feed is None:
+        raise HTTPException(status_code=HTTP_503_SERVICE_UNAVAILABLE, detail="The change feed is disabled.")
+
+    return feed
+
+
+def get_job_runner(connection: HTTPConnection) -> Optional[JobRunner]:
+    return getattr(connection.app.state, "_job_runner", None)
 
 
 def get_repository(Repo_type: Type[BaseRepository]) -> Callable:
-    def get_repo(db: Database = Depends(get_database)) -> Type[BaseRepository]:
-        return Repo_type(db)
+    """
+    Sharded repositories are bound to the request's workspace, on its shard - to every shard for ALL_WORKSPACES,
+    which only reads. The writes to a workspace being moved get a 503, until it is on its new shard.
+    """
+    def get_repo(
+            connection: HTTPConnection,
+            db: DatabaseRouter = Depends(get_database),
+            routers: Dict[str, DatabaseRouter] = Depends(get_shard_routers),
+            cache: BaseCache = Depends(get_cache),
+            workspace: Optional[str] = Depends(get_workspace),
+    ) -> Type[BaseRepository]:
+        if not Repo_type.sharded:
+            return Repo_type(db, cache=cache)
+
+        writes = connection.scope.get("method", "GET") not in SAFE_METHODS
+        if workspace is None:
+            if writes:
+                raise workspace_required()
+            return SCATTER_REPOSITORIES[Repo_type](list(routers.values()) or [db], cache=cache)
+
+        shards = get_shards(connection)
+        if shards is None:
+            return Repo_type(db, cache=cache, workspace=workspace)
+
+        if writes and shards.is_moving(workspace):
+            raise rejected(
+                HTTP_503_SERVICE_UNAVAILABLE,
+                "The workspace is being moved to another shard, retry later.",
+                retry_after=shards.refresh_interval,
+            )
+
+        return Repo_type(routers[shards.shard_for(workspace).name], cache=cache, workspace=workspace)
+
+    return get_repo
+
+
+def get_scatter_repository(Repo_type: Type[BaseRepository]) -> Callable:
+    """
+    The repository over every shard at once, whatever the request's workspace - see SCATTER_REPOSITORIES
+    """
+    def get_repo(
+            db: DatabaseRouter = Depends(get_database),
+            routers: Dict[str, DatabaseRouter] = Depends(get_shard_routers),
+            cache: BaseCache = Depends(get_cache),
+    ) -> Type[BaseRepository]:
+        return SCATTER_REPOSITORIES[Repo_type](list(routers.values()) or [db], cache=cache)
 
     return get_repo
@@ -0,0 +1,53 @@
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import HTTPException, Query
+from starlette.status import HTTP_400_BAD_REQUEST
+
+from app.core.config import BULK_MAX_BATCH_SIZE
+from app.models.project import ProjectFilter, ProjectStatus
+
+
+def parse_ids(ids: Optional[str]) -> Optional[List[int]]:
+    """
+    :param ids: Comma separated ids, up to BULK_MAX_BATCH_SIZE
+    """
+    if ids is None:
+        return None
+
+    try:
+        parsed = [int(id) for id in ids.split(",") if id.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail="ids must be comma separated integers.",
+        )
+
+    if len(parsed) > BULK_MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=f"At most {BULK_MAX_BATCH_SIZE} ids can be listed.",
+        )
+
+    return parsed
+
+
+def get_project_filters(
+        ids: Optional[str] = Query(None, description="Comma separated ids, e.g. 1,2,3 - only these projects."),
+        status: Optional[List[ProjectStatus]] = Query(None, description="Repeat to match any of several statuses."),
+        due_date_from: Optional[datetime] = Query(None, description="Due on or after this date."),
+        due_date_to: Optional[datetime] = Query(None, description="Due strictly before this date."),
+        created_date_from: Optional[datetime] = Query(None, description="Created on or after this date."),
+        created_date_to: Optional[datetime] = Query(None, description="Created strictly before this date."),
+) -> ProjectFilter:
+    """
+    Collects the list filters from the query string - List query params can't be declared on a model directly
+    """
+    return ProjectFilter(
+        ids=parse_ids(ids),
+        status=status,
+        due_date_from=due_date_from,
+        due_date_to=due_date_to,
+        created_date_from=created_date_from,
+        created_date_to=created_date_to,
+    )
@@ -0,0 +1,128 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.status import HTTP_304_NOT_MODIFIED, HTTP_412_PRECONDITION_FAILED
+
+# Ref - https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/ETag
+# Ref - https://developer.mozilla.org/en-US/docs/Web/HTTP/Conditional_requests
+
+# The Content-Encoding tokens of the compressed responses, which get an ETag of their own - see encoded_etag
+CONTENT_CODINGS = ("gzip", "br", "zstd")
+
+
+def resource_etag(id: int, version: int, *, variant: Optional[str] = None) -> str:
+    """
+    Strong ETag of a versioned resource - it changes whenever the row's version is bumped
+    :param variant: Tells apart representations that hold more than the row (e.g. embedded task counts)
+    """
+    return f'"{id}-{version}-{variant}"' if variant else f'"{id}-{version}"'
+
+
+def if_match_version(if_match: Optional[str], *, id: int) -> Optional[int]:
+    """
+    The version a conditional update must apply to, taken from an If-Match header holding an ETag of the resource.
+    :return: None when there is no precondition ("*" or no header)
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+
+    # If-Match uses the strong comparison, weak ETags never match - the version is the same whatever the
+    # content-coding of the representation the ETag came with, see encoded_etag
+    for etag in if_match.split(","):
+        etag_id, _, version = etag.strip().strip('"').partition("-")
+        version = version.partition("-")[0]
+        if etag_id == str(id) and version.isdigit():
+            return int(version)
+
+    # None of the ETags can ever match this resource
+    raise HTTPException(
+        status_code=HTTP_412_PRECONDITION_FAILED,
+        detail="If-Match doesn't match the project.",
+    )
+
+
+def listing_etag(query: str, last_modified: Optional[datetime], count: int) -> str:
+    """
+    Strong ETag of a page of a listing - the query string picks the page, last_modified and count
+    change with any write to the listed rows
+    """
+    state = f"{query}|{last_modified.isoformat() if last_modified else ''}|{count}"
+    return f'"{hashlib.sha1(state.encode()).hexdigest()}"'
+
+
+def body_etag(body: bytes) -> str:
+    """
+    Strong ETag of a response body, for responses without a cheaper version to derive one from
+    """
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """
+    Strong ETag of the representation content-coded with encoding, e.g. "1-2-gzip" - its bytes differ from the
+    identity one's, so must its strong ETag. The comparisons below see through the suffix.
+    """
+    return f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else etag
+
+
+def decoded_etag(etag: str) -> str:
+    """
+    The ETag encoded_etag was given, etag itself if it has no content-coding suffix
+    """
+    for encoding in CONTENT_CODINGS:
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return f'{etag[:-len(suffix)]}"'
+
+    return etag
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def conditional_headers(etag: str, cache_control: str, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+
+    return headers
+
+
+def is_not_modified(request: Request, *, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    Whether the client's copy is current, from If-None-Match or, only when it is absent, If-Modified-Since
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match uses the weak comparison, W/ prefixes are ignored - and so are content-codings
+        if if_none_match.strip() == "*":
+            return True
+        return etag in (decoded_etag(candidate.strip().removeprefix("W/")) for candidate in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        # An invalid date is ignored, as if the header wasn't sent
+        return False
+    if since.tzinfo is None:
+        return False
+
+    # HTTP dates have a one second resolution
+    return last_modified.replace(microsecond=0) <= since
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    """
+    304 without a body - the headers must be the ones the 200 would have carried
+    """
+    return Response(status_code=HTTP_304_NOT_MODIFIED, headers=headers)
@@ -0,0 +1,45 @@
+import csv
+import io
+from typing import AsyncIterator, Type
+
+from pydantic import BaseModel
+
+# Rows are buffered into chunks of roughly this size, one ASGI message per row would dominate the export time
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+async def stream_ndjson(rows: AsyncIterator[BaseModel], model: Type[BaseModel]) -> AsyncIterator[bytes]:
+    """
+    Encode rows as newline delimited JSON, limited to the fields of the public model
+    """
+    fields = set(model.model_fields)
+    chunk = bytearray()
+    async for row in rows:
+        chunk += row.model_dump_json(include=fields).encode()
+        chunk += b"\n"
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield bytes(chunk)
+            chunk.clear()
+
+    if chunk:
+        yield bytes(chunk)
+
+
+async def stream_csv(rows: AsyncIterator[BaseModel], model: Type[BaseModel]) -> AsyncIterator[bytes]:
+    """
+    Encode rows as CSV, with a header row made of the public model's fields
+    """
+    fields = list(model.model_fields)
+    include = set(fields)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+
+    async for row in rows:
+        writer.writerow(row.model_dump(mode="json", include=include))
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue().encode()
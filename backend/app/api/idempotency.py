@@ -0,0 +1,71 @@
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.responses import Response
+from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY
+
+from app.core.config import IDEMPOTENCY_KEY_TTL
+from app.db.repositories.idempotency import IdempotencyRepository
+from app.models.core import CoreModel
+
+IDEMPOTENCY_KEY_DESCRIPTION = "Unique per operation - retries sent with the same key get the first response back."
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# Set on the responses that were not produced by the request itself
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# The executions of this worker still running, by (route, key), along with the fingerprint of their request
+_inflight: Dict[Tuple[str, str], Tuple[bytes, asyncio.Task]] = {}
+
+
+def request_fingerprint(payload: CoreModel) -> bytes:
+    # Of the validated payload rather than of the raw body, so that formatting differences don't count
+    return hashlib.sha256(payload.model_dump_json().encode()).digest()
+
+
+async def idempotent(
+        idempotency_repo: IdempotencyRepository,
+        *,
+        route: str,
+        key: Optional[str],
+        payload: CoreModel,
+        execute: Callable[[], Awaitable[Response]],
+) -> Response:
+    """
+    The response of execute, run at most once per key within IDEMPOTENCY_KEY_TTL. A request whose key was used
+    already gets the stored response back, one sent while it runs waits for it - within a worker, on the running
+    execution, across workers, on the lock of the key. Without a key, execute just runs.
+
+    :return: 422 when the key was used for a different request
+    """
+    if key is None:
+        return await execute()
+
+    fingerprint = request_fingerprint(payload)
+
+    async def execute_and_render() -> Tuple[int, bytes]:
+        response = await execute()
+        return response.status_code, response.body
+
+    inflight = _inflight.get((route, key))
+    if inflight is None:
+        task = asyncio.ensure_future(idempotency_repo.execute_once(
+            route=route, key=key, fingerprint=fingerprint, ttl=IDEMPOTENCY_KEY_TTL, execute=execute_and_render,
+        ))
+        _inflight[(route, key)] = (fingerprint, task)
+        task.add_done_callback(lambda _: _inflight.pop((route, key), None))
+        replayed = False
+    else:
+        task, replayed = inflight[1], True
+
+    # Shielded, so that a client going away doesn't cancel the execution for those waiting on it, or half way
+    (stored_fingerprint, status_code, body), stored = await asyncio.shield(task)
+    if stored_fingerprint != fingerprint:
+        raise HTTPException(
+            status_code=HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="This Idempotency-Key was used for a different request.",
+        )
+
+    headers = {REPLAYED_HEADER: "true"} if replayed or stored else None
+    return Response(body, status_code=status_code, media_type="application/json", headers=headers)
@@ -0,0 +1,40 @@
+from typing import Any, Dict, Optional
+
+from starlette.requests import Request
+from starlette.status import HTTP_202_ACCEPTED
+
+from app.core.config import JOB_MAX_ATTEMPTS
+from app.db.jobs import JobRunner
+from app.db.repositories.jobs import JobsRepository
+from app.models.job import JobKind, JobPublic
+from app.api.responses import ModelResponse
+
+
+async def enqueue_job(
+        request: Request,
+        jobs_repo: JobsRepository,
+        runner: Optional[JobRunner],
+        *,
+        kind: JobKind,
+        payload: Dict[str, Any],
+        result: Optional[dict] = None,
+        total: Optional[int] = None,
+        coalesce: bool = False,
+) -> ModelResponse:
+    """
+    Queues a background job, started at once by an idle worker of this process if there is one.
+    With coalesce, a job of that kind still queued is returned instead, see JobsRepository.create_job.
+    :return: 202 with the queued job, whose status is polled at its Location
+    """
+    job = await jobs_repo.create_job(
+        kind=kind, payload=payload, result=result, total=total, max_attempts=JOB_MAX_ATTEMPTS, coalesce=coalesce,
+    )
+    if runner is not None:
+        runner.wake()
+
+    # Without the payload, which can be large
+    return ModelResponse(
+        JobPublic.model_validate(job.model_dump(exclude={"payload"})),
+        status_code=HTTP_202_ACCEPTED,
+        headers={"Location": str(request.url_for("jobs:get-job-by-id", id=job.id))},
+    )
@@ -0,0 +1,65 @@
+import random
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import PROFILING_DIR, PROFILING_ENABLED, PROFILING_INTERVAL, PROFILING_SAMPLE_RATE
+from app.core.metrics import REQUEST_DURATION, REQUEST_PHASE_DURATION
+from app.core.profiler import SamplingProfiler
+from app.core.timings import RequestTimings, current_timings
+
+# Requests that reached no route are labelled alike, so unknown paths can't blow up the number of series
+UNMATCHED_ROUTE = "unmatched"
+
+
+class TimingMiddleware:
+    """
+    Times each request and its phases (see app.core.timings), sends them in a Server-Timing header
+    and records them in the /metrics histograms. Profiles the request when asked to.
+
+    A plain ASGI middleware rather than a BaseHTTPMiddleware, so that streamed responses aren't buffered
+    and the routes see the timings through the context variable.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        profiler = self._profiler(scope)
+        status = 500
+
+        async def send_with_timings(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message).append("Server-Timing", timings.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            current_timings.reset(token)
+            route = timings.route or UNMATCHED_ROUTE
+            REQUEST_DURATION.observe(timings.elapsed(), route, scope["method"], str(status))
+            for phase, duration in timings.durations.items():
+                REQUEST_PHASE_DURATION.observe(duration, route, phase)
+
+            if profiler is not None:
+                profiler.stop()
+                await run_in_threadpool(profiler.dump, PROFILING_DIR, f"{scope['method']}-{route}")
+
+    @staticmethod
+    def _profiler(scope: Scope) -> Optional[SamplingProfiler]:
+        requested = PROFILING_ENABLED and Headers(scope=scope).get("x-profile") == "1"
+        if not requested and random.random() >= PROFILING_SAMPLE_RATE:
+            return None
+
+        return SamplingProfiler(interval=PROFILING_INTERVAL).start()
@@ -0,0 +1,26 @@
+import time
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+from app.core.timings import current_timings
+
+
+class ModelResponse(JSONResponse):
+    """
+    JSON response encoded straight from pydantic models by pydantic-core.
+    Routes returning it skip FastAPI's response_model validation and jsonable_encoder - the models must already
+    have the public shape, response_model is then only used for the OpenAPI schema.
+    """
+
+    def render(self, content: Any) -> bytes:
+        timings = current_timings.get()
+        if timings is None:
+            return to_json(content)
+
+        started = time.perf_counter()
+        body = to_json(content)
+        timings.add_serialization(time.perf_counter() - started)
+
+        return body
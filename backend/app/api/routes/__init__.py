@@ -1,9 +1,17 @@
 from fastapi import APIRouter
 
+from app.api.routes.changes import router as changes_router
+from app.api.routes.jobs import router as jobs_router
 from app.api.routes.tasks import router as tasks_router
 from app.api.routes.projects import router as projects_router
+from app.api.routes.reports import router as reports_router
+from app.api.routes.system import router as system_router
 
 router = APIRouter()
 
+router.include_router(changes_router, prefix="/projects/changes", tags=["projects"])
 router.include_router(projects_router, prefix="/projects", tags=["projects"])
 router.include_router(tasks_router, prefix="/tasks", tags=["tasks"])
+router.include_router(reports_router, prefix="/reports", tags=["reports"])
+router.include_router(jobs_router, prefix="/jobs", tags=["jobs"])
+router.include_router(system_router, prefix="/system", tags=["system"])
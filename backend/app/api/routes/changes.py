@@ -0,0 +1,128 @@
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.exceptions import WebSocketException
+from starlette.status import WS_1013_TRY_AGAIN_LATER
+
+from app.db.changes import CHANGE_CURSOR_PATTERN, ChangeEvent, ChangeFeed
+from app.api.changes import WEBSOCKET_HEARTBEAT, change_events, check_resumable, sse_stream
+from app.api.dependencies.database import get_change_feed
+from app.api.routing import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+AFTER_DESCRIPTION = "Event id (resume_after) of the last change received, a seq per shard - resumes from it."
+SINCE_DESCRIPTION = "Resumes from the changes made at or after this time."
+PROJECT_ID_DESCRIPTION = "Only the changes of this project and of its tasks."
+
+
+@router.get(
+    "",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+    name="projects:stream-changes",
+)
+async def stream_changes(
+        after: Optional[str] = Query(None, pattern=CHANGE_CURSOR_PATTERN, description=AFTER_DESCRIPTION),
+        since: Optional[datetime] = Query(None, description=SINCE_DESCRIPTION),
+        project_id: Optional[int] = Query(None, description=PROJECT_ID_DESCRIPTION),
+        follow: bool = Query(True, description="Keep streaming the live changes, or end once caught up."),
+        last_event_id: Optional[str] = Header(
+            None, pattern=CHANGE_CURSOR_PATTERN, description="Sent by EventSource on reconnection.",
+        ),
+        feed: ChangeFeed = Depends(get_change_feed),
+) -> StreamingResponse:
+    """
+    Server-sent events of the project and task changes - one "change" event per insert, update or delete,
+    with {seq, entity, op, project_id, task_id, version, changed_at} as data. Comment lines are sent as heartbeat
+    when idle.
+
+    The event id is the cursor to resume after, the seq below which every change of each shard was sent - it may be
+    below the change's own seq: changes don't always commit in seq order, so a resumed stream may send a few changes
+    again - skip the seqs already seen.
+
+    Without after or since, only the changes from now on are sent. EventSource clients resume by themselves,
+    the Last-Event-ID they send takes precedence over after.
+
+    :return: 410 when the change log doesn't reach back to after or since anymore - refetch, then follow without them.
+     503 when this worker has too many subscribers.
+    """
+    after = feed.parse_cursor(last_event_id if last_event_id is not None else after)
+    await check_resumable(feed, after=after, since=since)
+    feed.check_capacity()
+
+    events = change_events(
+        feed,
+        after=after, since=since, project_id=project_id, follow=follow,
+    )
+
+    # no-transform and X-Accel-Buffering keep proxies from holding the events back
+    return StreamingResponse(
+        sse_stream(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache, no-transform", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws", name="projects:stream-changes-ws")
+async def stream_changes_ws(
+        websocket: WebSocket,
+        after: Optional[str] = Query(None, pattern=CHANGE_CURSOR_PATTERN, description=AFTER_DESCRIPTION),
+        since: Optional[datetime] = Query(None, description=SINCE_DESCRIPTION),
+        project_id: Optional[int] = Query(None, description=PROJECT_ID_DESCRIPTION),
+) -> None:
+    """
+    The changes of stream_changes over a WebSocket, one text message per change holding its data
+    and resume_after (the event id of stream_changes), and {"heartbeat": true} when idle.
+    Refusals close the socket with 4000 + the HTTP status (4410, 4503), a client too far behind gets 1013
+    and resumes after the last resume_after it received.
+    """
+    try:
+        feed = get_change_feed(websocket)
+        after = feed.parse_cursor(after)
+        await check_resumable(feed, after=after, since=since)
+        feed.check_capacity()
+    except HTTPException as e:
+        raise WebSocketException(code=4000 + e.status_code, reason=e.detail)
+
+    await websocket.accept()
+    events = change_events(
+        feed,
+        after=after, since=since, project_id=project_id, follow=True,
+    )
+    # Waits on the client too, to let go of the subscription as soon as it leaves rather than at the next send
+    sending = asyncio.ensure_future(send_changes(websocket, events))
+    receiving = asyncio.ensure_future(wait_for_disconnect(websocket))
+    try:
+        await asyncio.wait((sending, receiving), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        sending.cancel()
+        receiving.cancel()
+        await asyncio.gather(sending, receiving, return_exceptions=True)
+        await events.aclose()
+
+    if sending.done() and not sending.cancelled() and sending.result():
+        await websocket.close(code=WS_1013_TRY_AGAIN_LATER, reason="Too far behind, resume from the last resume_after.")
+
+
+async def send_changes(websocket: WebSocket, events: AsyncIterator[Optional[ChangeEvent]]) -> bool:
+    """
+    :return: True once the events ran out (the client fell too far behind), False if the client left
+    """
+    try:
+        async for event in events:
+            await websocket.send_text(WEBSOCKET_HEARTBEAT if event is None else event.text)
+    except (WebSocketDisconnect, OSError):
+        # Servers report a send to a closed socket as an OSError (uvicorn's ClientDisconnected)
+        return False
+
+    return True
+
+
+async def wait_for_disconnect(websocket: WebSocket) -> None:
+    # Clients have nothing to say on this socket, their messages are ignored
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
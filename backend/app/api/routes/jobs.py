@@ -0,0 +1,46 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from starlette.status import HTTP_404_NOT_FOUND
+
+from app.core.config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.models.job import JobPage, JobPublic, JobStatus
+from app.db.repositories.jobs import JobsRepository
+from app.api.dependencies.database import get_repository
+from app.api.routing import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get("/", response_model=JobPage, name="jobs:get-all-jobs")
+async def get_all_jobs(
+        status: Optional[JobStatus] = Query(None),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None, description="next_cursor of the previous page."),
+        jobs_repo: JobsRepository = Depends(get_repository(JobsRepository)),
+) -> JobPage:
+    """
+    :param status: Only the jobs in this status
+    :param limit: Max number of jobs on the page
+    :param cursor: Opaque cursor returned as next_cursor by the previous page, omit it for the first page
+    :return: One page of the jobs, most recent first - finished ones are kept JOB_RETENTION seconds
+    """
+    jobs, next_cursor = await jobs_repo.get_all_jobs(status=status, limit=limit, cursor=cursor)
+
+    return JobPage(items=jobs, next_cursor=next_cursor)
+
+
+@router.get("/{id}/", response_model=JobPublic, name="jobs:get-job-by-id")
+async def get_job_by_id(
+        id: int = Path(..., ge=1, title="The ID of the job to get."),
+        jobs_repo: JobsRepository = Depends(get_repository(JobsRepository)),
+) -> JobPublic:
+    """
+    :return: The job's status, progress, and once it succeeded its result - poll it until it is succeeded or failed
+    """
+    job = await jobs_repo.get_job_by_id(id=id)
+
+    if not job:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="No job found with that id.")
+
+    return job
@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.api.routing import TimedRoute
+from app.core.metrics import REGISTRY
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get("/metrics", response_class=PlainTextResponse, name="metrics:get-metrics", include_in_schema=False)
+async def get_metrics() -> PlainTextResponse:
+    """
+    :return: Request, phase and query latency histograms of this worker, in the Prometheus text format
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -1,21 +1,78 @@
-from typing import List, Annotated
+from typing import Annotated, Any, List, Optional, Tuple, Type
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Path
-from starlette.status import HTTP_201_CREATED, HTTP_404_NOT_FOUND
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Path, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.status import HTTP_201_CREATED, HTTP_202_ACCEPTED, HTTP_404_NOT_FOUND, HTTP_413_REQUEST_ENTITY_TOO_LARGE
 
-from app.models.project import ProjectCreate, ProjectPublic, ProjectUpdate
+from app.core.config import (
+    BULK_MAX_BATCH_SIZE, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, PROJECT_CACHE_CONTROL, PROJECT_IMPORT_MAX_SIZE,
+    PROJECT_LIST_CACHE_CONTROL,
+)
+from app.models.core import BulkItemResult, BulkResult
+from app.models.job import JobKind, JobPublic
+from app.models.project import (
+    ProjectBatch, ProjectBulkUpdate, ProjectCreate, ProjectExportFormat, ProjectFilter, ProjectInclude, ProjectInDB,
+    ProjectPage, ProjectPublic, ProjectSearchPage, ProjectSortField, ProjectUpdate,
+)
+from app.db.jobs import JobRunner
+from app.db.repositories.base import workspace_required
+from app.db.repositories.idempotency import IdempotencyRepository
+from app.db.repositories.jobs import JobsRepository
 from app.db.repositories.projects import ProjectsRepository
-from app.api.dependencies.database import get_repository
+from app.db.repositories.tasks import TasksRepository
+from app.api.dependencies.database import get_job_runner, get_repository, get_workspace
+from app.api.dependencies.projects import get_project_filters
+from app.api.etags import (
+    body_etag, conditional_headers, if_match_version, is_not_modified, listing_etag, not_modified, resource_etag,
+)
+from app.api.export import stream_csv, stream_ndjson
+from app.api.jobs import enqueue_job
+from app.api.idempotency import IDEMPOTENCY_KEY_DESCRIPTION, IDEMPOTENCY_KEY_MAX_LENGTH, idempotent
+from app.api.responses import ModelResponse
+from app.api.routing import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+
+async def embed_includes(
+        projects: List[ProjectInDB], include: List[ProjectInclude], tasks_repo: TasksRepository,
+) -> List[ProjectInDB]:
+    """
+    Adds the requested optional data to the projects - one query per include for the whole list, never one per project
+    """
+    if ProjectInclude.task_stats not in include or not projects:
+        return projects
+
+    task_stats = await tasks_repo.get_task_stats(project_ids=[project.id for project in projects])
 
-router = APIRouter()
+    # Copies, the projects may be shared with the cache
+    return [project.model_copy(update={"task_stats": task_stats[project.id]}) for project in projects]
 
 
-@router.get("/", response_model=List[ProjectPublic], name="projects:get-all-projects")
-async def get_all_projects(projects_repo: ProjectsRepository = Depends(get_repository(ProjectsRepository))) -> List[
-    dict]:
+@router.get("/", response_model=ProjectPage, response_class=ModelResponse, name="projects:get-all-projects")
+async def get_all_projects(
+        request: Request,
+        filters: ProjectFilter = Depends(get_project_filters),
+        sort: ProjectSortField = Query(ProjectSortField.id),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None, description="next_cursor of the previous page."),
+        include: List[ProjectInclude] = Query([], description="Optional data to embed in each project."),
+        projects_repo: ProjectsRepository = Depends(get_repository(ProjectsRepository)),
+        tasks_repo: TasksRepository = Depends(get_repository(TasksRepository)),
+) -> Response:
     """
+    :param filters: Optional status, due date and created date filters
+    :param sort: Order of the pages - by id or by due date
+    :param limit: Max number of projects on the page
+    :param cursor: Opaque cursor returned as next_cursor by the previous page, omit it for the first page
+    :param include: task_stats embeds the number of tasks per status of each project
     :param projects_repo: The DB interface
-    :return: List of all projects
+    :param tasks_repo: The DB interface for the included task data
+    :return: One page of projects and the cursor of the next page, or 304 when the client's copy
+     (If-None-Match) is still current
     """
     # projects = [
     #     {"id": 1, "title": "Project 1", "description": "This is a web app project",
@@ -26,50 +83,344 @@ async def get_all_projects(projects_repo: ProjectsRepository = Depends(get_repos
     #      "status": "not_started"},
     # ]
 
-    return await projects_repo.get_all_projects()
+    if not include:
+        # Read before the page, so that a write landing in between can only make the ETag older than the body,
+        # which costs the client a full response on its next poll rather than a stale 304
+        last_modified, count = await projects_repo.get_projects_list_state(filters=filters)
+        etag = listing_etag(request.url.query, last_modified, count)
+        if is_not_modified(request, etag=etag):
+            return not_modified(conditional_headers(etag, PROJECT_LIST_CACHE_CONTROL))
+
+    projects, next_cursor = await projects_repo.get_all_projects(
+        filters=filters, sort=sort, limit=limit, cursor=cursor,
+    )
+    response = ModelResponse({"items": await embed_includes(projects, include, tasks_repo), "next_cursor": next_cursor})
+
+    # Task counts change without touching the projects, the ETag of an embedding page hashes the body instead
+    if include:
+        etag = body_etag(response.body)
+        if is_not_modified(request, etag=etag):
+            return not_modified(conditional_headers(etag, PROJECT_LIST_CACHE_CONTROL))
+
+    response.headers.update(conditional_headers(etag, PROJECT_LIST_CACHE_CONTROL))
+    return response
+
+
+@router.get("/search", response_model=ProjectSearchPage, response_class=ModelResponse, name="projects:search-projects")
+async def search_projects(
+        q: str = Query(..., min_length=1, max_length=200, description="Words to look for in titles and descriptions."),
+        filters: ProjectFilter = Depends(get_project_filters),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None, description="next_cursor of the previous page."),
+        projects_repo: ProjectsRepository = Depends(get_repository(ProjectsRepository)),
+) -> ModelResponse:
+    """
+    :param q: Every word must start a word of the title or description - or q must fuzzily match a word of the title
+    :param filters: Same filters as the project listing
+    :param limit: Max number of results on the page
+    :param cursor: Opaque cursor returned as next_cursor by the previous page of the same search
+    :param projects_repo: The DB interface
+    :return: One page of matching projects, most relevant first, with the matches highlighted
+    """
+    results, next_cursor = await projects_repo.search_projects(q=q, filters=filters, limit=limit, cursor=cursor)
+
+    return ModelResponse({"items": results, "next_cursor": next_cursor})
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    name="projects:export-projects",
+    responses={200: {"content": {"application/x-ndjson": {}, "text/csv": {}}}},
+)
+async def export_projects(
+        format: ProjectExportFormat = Query(ProjectExportFormat.ndjson),
+        filters: ProjectFilter = Depends(get_project_filters),
+        projects_repo: ProjectsRepository = Depends(get_repository(ProjectsRepository)),
+) -> StreamingResponse:
+    """
+    :param format: ndjson (one JSON project per line) or csv
+    :param filters: Same filters as the project listing
+    :param projects_repo: The DB interface
+    :return: Every matching project, streamed from a server side cursor as rows are read
+    """
+    projects = projects_repo.iterate_projects(filters=filters)
+
+    if format == ProjectExportFormat.csv:
+        body, media_type = stream_csv(projects, ProjectPublic), "text/csv"
+    else:
+        body, media_type = stream_ndjson(projects, ProjectPublic), "application/x-ndjson"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="projects.{format.value}"'},
+    )
+
+
+def check_batch_size(items: List[Any], max_size: int = BULK_MAX_BATCH_SIZE) -> None:
+    if len(items) > max_size:
+        raise HTTPException(
+            status_code=HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A batch can hold at most {max_size} items.",
+        )
+
+
+def validate_items(
+        items: List[Any], model: Type[BaseModel],
+) -> Tuple[List[Tuple[int, BaseModel]], List[BulkItemResult]]:
+    """
+    Validates each item on its own, so that one invalid item is reported instead of rejecting the whole batch
+    :return: The (index, model) of the valid items and an error result for each invalid one
+    """
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, model.model_validate(item)))
+        except ValidationError as e:
+            detail = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+            errors.append(BulkItemResult(index=index, ok=False, detail=detail))
+
+    return valid, errors
+
+
+@router.post(
+    "/bulk", response_model=BulkResult, response_class=ModelResponse, name="projects:bulk-create-projects",
+)
+async def bulk_create_projects(
+        new_projects: List[Any] = Body(..., embed=True),
+        projects_repo: ProjectsRepository = Depends(get_repository(ProjectsRepository)),
+) -> ModelResponse:
+    """
+    :param new_projects: Up to BULK_MAX_BATCH_SIZE projects, each shaped like the body of projects:create-project
+    :param projects_repo: The DB interface
+    :return: The id of each created project, or why it was rejected
+    """
+    check_batch_size(new_projects)
+    valid, results = validate_items(new_projects, ProjectCreate)
+
+    created_projects = await projects_repo.bulk_create_projects(new_projects=[project for _, project in valid])
+    results += [
+        BulkItemResult(index=index, id=project.id, ok=True)
+        for (index, _), project in zip(valid, created_projects)
+    ]
 
+    return ModelResponse(BulkResult.from_results(results))
 
-@router.post("/", response_model=ProjectPublic, name="projects:create-project", status_code=HTTP_201_CREATED)
+
+@router.patch(
+    "/bulk", response_model=BulkResult, response_class=ModelResponse, name="projects:bulk-update-projects",
+)
+async def bulk_update_projects(
+        project_updates: List[Any] = Body(..., embed=True),
+        projects_repo: ProjectsRepository = Depends(get_repository(ProjectsRepository)),
+) -> ModelResponse:
+    """
+    :param project_updates: Up to BULK_MAX_BATCH_SIZE partial updates, each one with the id of the project to update
+    :param projects_repo: The DB interface
+    :return: Whether each project was updated, or why it wasn't
+    """
+    check_batch_size(project_updates)
+    valid, results = validate_items(project_updates, ProjectBulkUpdate)
+
+    # An id can only be updated once per statement, later duplicates are rejected
+    seen_ids, updates = set(), []
+    for index, project_update in valid:
+        if project_update.id in seen_ids:
+            results.append(BulkItemResult(index=index, id=project_update.id, ok=False, detail="Duplicate id in batch."))
+        else:
+            seen_ids.add(project_update.id)
+            updates.append((index, project_update))
+
+    updated_ids = set(await projects_repo.bulk_update_projects(project_updates=[update for _, update in updates]))
+    results += [
+        BulkItemResult(index=index, id=project_update.id, ok=True)
+        if project_update.id in updated_ids else
+        BulkItemResult(index=index, id=project_update.id, ok=False, detail="No project found with that id.")
+        for index, project_update in updates
+    ]
+
+    return ModelResponse(BulkResult.from_results(results))
+
+
+@router.delete(
+    "/bulk", response_model=BulkResult, response_class=ModelResponse, name="projects:bulk-delete-projects",
+)
+async def bulk_delete_projects(
+        ids: List[int] = Body(..., embed=True),
+        projects_repo: ProjectsRepository = Depends(get_repository(ProjectsRepository)),
+) -> ModelResponse:
+    """
+    :param ids: Up to BULK_MAX_BATCH_SIZE ids of projects to delete
+    :param projects_repo: The DB interface
+    :return: Whether each project was deleted, or why it wasn't
+    """
+    check_batch_size(ids)
+    deleted_ids = set(await projects_repo.bulk_delete_projects(ids=ids))
+
+    return ModelResponse(BulkResult.from_results([
+        BulkItemResult(index=index, id=id, ok=True)
+        if id in deleted_ids else
+        BulkItemResult(index=index, id=id, ok=False, detail="No project found with that id.")
+        for index, id in enumerate(ids)
+    ]))
+
+
+@router.post(
+    "/batch-get", response_model=ProjectBatch, response_class=ModelResponse, name="projects:batch-get-projects",
+)
+async def batch_get_projects(
+        ids: List[int] = Body(..., embed=True),
+        projects_repo: ProjectsRepository = Depends(get_repository(ProjectsRepository)),
+) -> ModelResponse:
+    """
+    Resolves many project references in one request, rather than one projects:get-project-by-id per id
+    :param ids: Up to BULK_MAX_BATCH_SIZE ids, duplicates are only returned once
+    :param projects_repo: The DB interface
+    :return: The projects found, in the order of their ids, and the ids of the projects not found
+    """
+    check_batch_size(ids)
+    ids = list(dict.fromkeys(ids))
+    projects = await projects_repo.get_projects_by_ids(ids=ids)
+
+    return ModelResponse(ProjectBatch(
+        items=[projects[id] for id in ids if id in projects],
+        missing=[id for id in ids if id not in projects],
+    ))
+
+
+@router.post(
+    "/import",
+    response_model=JobPublic,
+    response_class=ModelResponse,
+    name="projects:import-projects",
+    status_code=HTTP_202_ACCEPTED,
+)
+async def import_projects(
+        request: Request,
+        new_projects: List[Any] = Body(..., embed=True),
+        jobs_repo: JobsRepository = Depends(get_repository(JobsRepository)),
+        runner: Optional[JobRunner] = Depends(get_job_runner),
+        workspace: Optional[str] = Depends(get_workspace),
+) -> ModelResponse:
+    """
+    Creates the projects in the background, BULK_MAX_BATCH_SIZE at a time, rather than while the request waits -
+    in the request's workspace
+
+    :param new_projects: Up to PROJECT_IMPORT_MAX_SIZE projects, each shaped like the body of projects:create-project
+    :param jobs_repo: The DB interface
+    :return: 202 with the projects:import job, to poll at its Location. Once it succeeded, its result holds the number
+     of projects created, and the rejected ones - invalid items are rejected here already, the others are imported.
+    """
+    if workspace is None:
+        raise workspace_required()
+
+    check_batch_size(new_projects, max_size=PROJECT_IMPORT_MAX_SIZE)
+    valid, rejected = validate_items(new_projects, ProjectCreate)
+
+    return await enqueue_job(
+        request, jobs_repo, runner,
+        kind=JobKind.import_projects,
+        payload={"workspace_id": workspace, "new_projects": [
+            {"index": index, "project": project.model_dump(mode="json")} for index, project in valid
+        ]},
+        result=BulkResult.from_results(rejected).model_dump(mode="json"),
+        total=len(valid),
+    )
+
+
+@router.post(
+    "/",
+    response_model=ProjectPublic,
+    response_class=ModelResponse,
+    name="projects:create-project",
+    status_code=HTTP_201_CREATED,
+)
 async def create_new_project(
         new_project: ProjectCreate = Body(..., embed=True),
+        idempotency_key: Optional[str] = Header(
+            None, min_length=1, max_length=IDEMPOTENCY_KEY_MAX_LENGTH, description=IDEMPOTENCY_KEY_DESCRIPTION,
+        ),
         projects_repo: ProjectsRepository = Depends(get_repository(ProjectsRepository)),
-) -> ProjectPublic:
+        idempotency_repo: IdempotencyRepository = Depends(get_repository(IdempotencyRepository)),
+) -> Response:
     """
     :param new_project: If you want it to expect a JSON with a key new_project and inside of it the model contents, as it does when you declare extra body parameters, you can use the special Body parameter embed
 
+    :param idempotency_key: Retries sent with the same key get the response of the first request back
+     (with an Idempotent-Replayed header), rather than creating the project again. 422 if it came with another project.
+
     :param projects_repo: The DB interface
 
-    :return: FastAPI automatically validates and converts the created_project to an instance of ProjectPublic model, and sends the appropriate JSON as a response.
+    :return: The created project, already in the shape of ProjectPublic, so it is sent without being validated again
     """
-    created_project = await projects_repo.create_project(new_project=new_project)
+    async def create() -> ModelResponse:
+        created_project = await projects_repo.create_project(new_project=new_project)
+        return ModelResponse(created_project, status_code=HTTP_201_CREATED)
 
-    return created_project
+    # Keys are the client's, each workspace has its own
+    return await idempotent(
+        idempotency_repo,
+        route=f"projects:create-project:{projects_repo.workspace_id}",
+        key=idempotency_key,
+        payload=new_project,
+        execute=create,
+    )
 
 
-@router.get("/{id}/", response_model=ProjectPublic, name="projects:get-project-by-id")
+@router.get("/{id}/", response_model=ProjectPublic, response_class=ModelResponse, name="projects:get-project-by-id")
 async def get_project_by_id(
-        id: int, projects_repo: ProjectsRepository = Depends(get_repository(ProjectsRepository))
-) -> ProjectPublic:
+        id: int,
+        request: Request,
+        include: List[ProjectInclude] = Query([], description="Optional data to embed in the project."),
+        projects_repo: ProjectsRepository = Depends(get_repository(ProjectsRepository)),
+        tasks_repo: TasksRepository = Depends(get_repository(TasksRepository)),
+) -> Response:
+    """
+    :return: The project, with its ETag and Last-Modified, or 304 when the client's copy
+     (If-None-Match, or else If-Modified-Since) is still current
+    """
     project = await projects_repo.get_project_by_id(id=id)
 
     if not project:
         raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="No project found with that id.")
 
-    return project
+    if not include:
+        headers = conditional_headers(
+            resource_etag(project.id, project.version), PROJECT_CACHE_CONTROL, last_modified=project.updated_at,
+        )
+        if is_not_modified(request, etag=headers["ETag"], last_modified=project.updated_at):
+            return not_modified(headers)
+
+        return ModelResponse(project, headers=headers)
+
+    # Task counts change without the project's version or updated_at, so the ETag also hashes the body,
+    # and there is no Last-Modified to answer If-Modified-Since with
+    project, = await embed_includes([project], include, tasks_repo)
+    response = ModelResponse(project)
+    etag = resource_etag(project.id, project.version, variant=body_etag(response.body).strip('"')[:16])
+    headers = conditional_headers(etag, PROJECT_CACHE_CONTROL)
+    if is_not_modified(request, etag=etag):
+        return not_modified(headers)
+
+    response.headers.update(headers)
+    return response
 
 
 @router.put(
     "/{id}/",
     response_model=ProjectPublic,
+    response_class=ModelResponse,
     name="projects:update-project-by-id",
 )
 async def update_project_by_id(
         id: int = Path(..., ge=1, title="The ID of the project to update."),
         project_update: ProjectUpdate = Body(..., embed=True),
+        if_match: Optional[str] = Header(None, description="ETag of the project, fails with 412 if it changed since."),
         projects_repo: ProjectsRepository = Depends(get_repository(ProjectsRepository)),
-) -> ProjectPublic:
+) -> ModelResponse:
     updated_project = await projects_repo.update_project(
-        id=id, project_update=project_update,
+        id=id, project_update=project_update, version=if_match_version(if_match, id=id),
     )
 
     if not updated_project:
@@ -78,14 +429,16 @@ async def update_project_by_id(
             detail="No project found with that id.",
         )
 
-    return updated_project
+    etag = resource_etag(updated_project.id, updated_project.version)
+
+    return ModelResponse(updated_project, headers={"ETag": etag})
 
 
-@router.delete("/{id}/", response_model=int, name="projects:delete-project-by-id")
+@router.delete("/{id}/", response_model=int, response_class=ModelResponse, name="projects:delete-project-by-id")
 async def delete_project_by_id(
         id: int = Path(..., ge=1, title="The ID of the project to delete."),
         projects_repo: ProjectsRepository = Depends(get_repository(ProjectsRepository)),
-) -> int:
+) -> ModelResponse:
     deleted_id = await projects_repo.delete_project_by_id(id=id)
 
     if not deleted_id:
@@ -94,4 +447,4 @@ async def delete_project_by_id(
             detail="No project found with that id.",
         )
 
-    return deleted_id
+    return ModelResponse(deleted_id)
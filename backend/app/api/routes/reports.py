@@ -0,0 +1,107 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from starlette.requests import Request
+from starlette.status import HTTP_202_ACCEPTED
+
+from app.core.config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, REPORT_MAX_BUCKETS
+from app.models.job import JobKind, JobPublic
+from app.models.report import DueDateHistogram, OverdueReport, ReportBucket, StatusReport, ThroughputReport
+from app.db.jobs import JobRunner
+from app.db.repositories.jobs import JobsRepository
+from app.db.repositories.reports import BUCKET_DAYS, ReportsRepository
+from app.api.dependencies.database import get_job_runner, get_repository, get_scatter_repository
+from app.api.jobs import enqueue_job
+from app.api.responses import ModelResponse
+from app.api.routing import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get("/status", response_model=StatusReport, name="reports:get-status-report")
+async def get_status_report(
+        reports_repo: ReportsRepository = Depends(get_scatter_repository(ReportsRepository)),
+) -> StatusReport:
+    """
+    :return: The number of projects and of tasks in each status
+    """
+    return await reports_repo.get_status_counts()
+
+
+@router.get("/overdue", response_model=OverdueReport, name="reports:get-overdue-projects")
+async def get_overdue_projects(
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None, description="next_cursor of the previous page."),
+        reports_repo: ReportsRepository = Depends(get_scatter_repository(ReportsRepository)),
+) -> OverdueReport:
+    """
+    :param limit: Max number of projects on the page
+    :param cursor: Opaque cursor returned as next_cursor by the previous page, omit it for the first page
+    :return: The number of projects past their due date and not done, and one page of them, most overdue first
+    """
+    return await reports_repo.get_overdue_projects(limit=limit, cursor=cursor)
+
+
+@router.get("/due-dates", response_model=DueDateHistogram, name="reports:get-due-date-histogram")
+async def get_due_date_histogram(
+        bucket: ReportBucket = Query(ReportBucket.week),
+        start: Optional[date] = Query(None, description="A day of the first bucket, today by default."),
+        buckets: int = Query(12, ge=1, le=REPORT_MAX_BUCKETS),
+        reports_repo: ReportsRepository = Depends(get_scatter_repository(ReportsRepository)),
+) -> DueDateHistogram:
+    """
+    :param bucket: Counts the projects due per day or per week
+    :param start: A day of the first bucket, today by default
+    :param buckets: Number of buckets
+    :return: The number of projects due in each bucket, by status - burndown charts plot the ones not done
+    """
+    start = start or today()
+    items = await reports_repo.get_due_date_histogram(bucket=bucket, start=start, buckets=buckets)
+
+    return DueDateHistogram(bucket=bucket, items=items)
+
+
+@router.get("/throughput", response_model=ThroughputReport, name="reports:get-throughput")
+async def get_throughput(
+        bucket: ReportBucket = Query(ReportBucket.week),
+        start: Optional[date] = Query(None, description="A day of the first bucket, to end with this one by default."),
+        buckets: int = Query(12, ge=1, le=REPORT_MAX_BUCKETS),
+        reports_repo: ReportsRepository = Depends(get_scatter_repository(ReportsRepository)),
+) -> ThroughputReport:
+    """
+    :param bucket: Counts the completions per day or per week
+    :param start: A day of the first bucket, by default the buckets end with the current one
+    :param buckets: Number of buckets
+    :return: The number of projects and of tasks completed in each bucket
+    """
+    start = start or today() - timedelta(days=BUCKET_DAYS[bucket] * (buckets - 1))
+    items = await reports_repo.get_throughput(bucket=bucket, start=start, buckets=buckets)
+
+    return ThroughputReport(bucket=bucket, items=items)
+
+
+@router.post(
+    "/recompute",
+    response_model=JobPublic,
+    response_class=ModelResponse,
+    name="reports:recompute-counts",
+    status_code=HTTP_202_ACCEPTED,
+)
+async def recompute_counts(
+        request: Request,
+        jobs_repo: JobsRepository = Depends(get_repository(JobsRepository)),
+        runner: Optional[JobRunner] = Depends(get_job_runner),
+) -> ModelResponse:
+    """
+    Recomputes the counters REPORTS_SOURCE=summary and TASK_STATS_SOURCE=counters read from, in the background -
+    should they have drifted from the tables (e.g. after a manual fix or a restore)
+
+    :return: 202 with the reports:recompute-counts job, to poll at its Location - the one already queued, if any
+    """
+    return await enqueue_job(request, jobs_repo, runner, kind=JobKind.recompute_counts, payload={}, coalesce=True)
+
+
+def today() -> date:
+    # Buckets are UTC days
+    return datetime.now(timezone.utc).date()
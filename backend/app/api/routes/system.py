@@ -0,0 +1,83 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends
+from starlette.requests import Request
+
+from app.api.dependencies.database import get_cache, get_change_feed, get_job_runner, get_shards
+from app.db.cache import BaseCache
+from app.db.changes import ChangeFeed
+from app.db.jobs import JobRunner
+from app.db.pool import pool_stats
+from app.db.shards import ShardSet
+from app.models.system import (
+    AdmissionStats, CacheStats, ChangeFeedStats, JobRunnerStats, PoolStats, ReplicaStats, ShardStats,
+)
+from app.api.routing import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get("/cache", response_model=CacheStats, name="system:get-cache-stats")
+async def get_cache_stats(cache: BaseCache = Depends(get_cache)) -> CacheStats:
+    """
+    :param cache: The cache shared by the repositories of this worker
+    :return: Hit, miss, coalesced miss and eviction counters - counters are per worker process
+    """
+    return CacheStats(**await cache.stats())
+
+
+@router.get("/pool", response_model=PoolStats, name="system:get-pool-stats")
+async def get_pool_stats(request: Request) -> PoolStats:
+    """
+    :return: Current usage of this worker's DB connection pool, and the time queries waited to check out a connection
+    """
+    return PoolStats(**pool_stats(request.app.state._db, request.app.state._db_pool_stats))
+
+
+@router.get("/changes", response_model=ChangeFeedStats, name="system:get-change-feed-stats")
+async def get_change_feed_stats(feed: ChangeFeed = Depends(get_change_feed)) -> ChangeFeedStats:
+    """
+    :return: Subscribers and event counters of this worker's change feed, 503 when the feed is disabled
+    """
+    return ChangeFeedStats(**feed.stats())
+
+
+@router.get("/replicas", response_model=List[ReplicaStats], name="system:get-replica-stats")
+async def get_replica_stats(request: Request) -> List[ReplicaStats]:
+    """
+    :return: Health and replay lag of this worker's read replicas, none when DATABASE_REPLICA_URLS is empty
+    """
+    replicas = getattr(request.app.state, "_replicas", None)
+
+    return [ReplicaStats(**stats) for stats in replicas.stats()] if replicas is not None else []
+
+
+@router.get("/shards", response_model=List[ShardStats], name="system:get-shard-stats")
+async def get_shard_stats(shards: Optional[ShardSet] = Depends(get_shards)) -> List[ShardStats]:
+    """
+    :return: This worker's database shards, with the workspaces pinned to each one as of the last placement reload
+    """
+    return [ShardStats(**stats) for stats in shards.stats()] if shards is not None else []
+
+
+@router.get("/jobs", response_model=JobRunnerStats, name="system:get-job-stats")
+async def get_job_stats(runner: Optional[JobRunner] = Depends(get_job_runner)) -> JobRunnerStats:
+    """
+    :return: The jobs this worker is running, and how those it ran ended
+    """
+    if runner is None:
+        return JobRunnerStats(workers=0, running=0, succeeded=0, failed=0, retried=0)
+
+    return JobRunnerStats(**runner.stats())
+
+
+@router.get("/admission", response_model=AdmissionStats, name="system:get-admission-stats")
+async def get_admission_stats(request: Request) -> AdmissionStats:
+    """
+    :return: Requests running and queued in this worker, and those turned away - with ADMISSION_ENABLED
+    """
+    admission = getattr(request.app.state, "_admission", None)
+    if admission is None:
+        return AdmissionStats(enabled=False)
+
+    return AdmissionStats(enabled=True, **admission.stats())
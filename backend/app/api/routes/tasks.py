@@ -1,18 +1,114 @@
-from typing import List
+from typing import Optional
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Body, Depends, HTTPException, Path, Query
+from starlette.status import HTTP_201_CREATED, HTTP_404_NOT_FOUND
 
-router = APIRouter()
+from app.core.config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.models.task import TaskCreate, TaskPage, TaskPublic, TaskSearchPage, TaskStatus, TaskUpdate
+from app.db.repositories.tasks import TasksRepository
+from app.api.dependencies.database import get_repository
+from app.api.routing import TimedRoute
 
+router = APIRouter(route_class=TimedRoute)
 
-@router.get("/")
-async def get_all_tasks() -> List[dict]:
+
+@router.get("/", response_model=TaskPage, name="tasks:get-all-tasks")
+async def get_all_tasks(
+        project_id: int = Query(..., ge=1, description="The project whose tasks are listed."),
+        status: Optional[TaskStatus] = Query(None),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None, description="next_cursor of the previous page."),
+        tasks_repo: TasksRepository = Depends(get_repository(TasksRepository)),
+) -> dict:
+    """
+    :param project_id: The project whose tasks are listed
+    :param status: Only list the tasks with this status
+    :param limit: Max number of tasks on the page
+    :param cursor: Opaque cursor returned as next_cursor by the previous page, omit it for the first page
+    :param tasks_repo: The DB interface
+    :return: One page of the project's tasks, ordered by status then due date
+    """
+    tasks, next_cursor = await tasks_repo.get_project_tasks(
+        project_id=project_id, status=status, limit=limit, cursor=cursor,
+    )
+
+    return {"items": tasks, "next_cursor": next_cursor}
+
+
+@router.get("/search", response_model=TaskSearchPage, name="tasks:search-tasks")
+async def search_tasks(
+        q: str = Query(..., min_length=1, max_length=200, description="Words to look for in titles and descriptions."),
+        project_id: Optional[int] = Query(None, ge=1, description="Only search the tasks of this project."),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None, description="next_cursor of the previous page."),
+        tasks_repo: TasksRepository = Depends(get_repository(TasksRepository)),
+) -> dict:
+    """
+    :param q: Every word must start a word of the title or description - or q must fuzzily match a word of the title
+    :param project_id: Only search the tasks of this project
+    :param limit: Max number of results on the page
+    :param cursor: Opaque cursor returned as next_cursor by the previous page of the same search
+    :param tasks_repo: The DB interface
+    :return: One page of matching tasks, most relevant first, with the matches highlighted
+    """
+    results, next_cursor = await tasks_repo.search_tasks(q=q, project_id=project_id, limit=limit, cursor=cursor)
+
+    return {"items": results, "next_cursor": next_cursor}
+
+
+@router.post("/", response_model=TaskPublic, name="tasks:create-task", status_code=HTTP_201_CREATED)
+async def create_new_task(
+        new_task: TaskCreate = Body(..., embed=True),
+        tasks_repo: TasksRepository = Depends(get_repository(TasksRepository)),
+) -> TaskPublic:
     """
-        :return: Mock response till the route has been implemented
+    :param new_task: The task, with the id of the project it belongs to
+    :param tasks_repo: The DB interface
+    :return: The created task
     """
-    tasks = [
-        {"id": 1, "title": "Work on a FastAPI project", "status": "in_progress", "due_date": "2023-08-30T10:05:06.944969"},
-        {"id": 2, "title": "Write unit tests for FastAPI project", "status": "not_started", "due_date": "2023-08-30T10:05:06.944969"}
-    ]
+    return await tasks_repo.create_task(new_task=new_task)
+
+
+@router.get("/{id}/", response_model=TaskPublic, name="tasks:get-task-by-id")
+async def get_task_by_id(
+        id: int, tasks_repo: TasksRepository = Depends(get_repository(TasksRepository))
+) -> TaskPublic:
+    task = await tasks_repo.get_task_by_id(id=id)
+
+    if not task:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="No task found with that id.")
+
+    return task
+
+
+@router.put("/{id}/", response_model=TaskPublic, name="tasks:update-task-by-id")
+async def update_task_by_id(
+        id: int = Path(..., ge=1, title="The ID of the task to update."),
+        task_update: TaskUpdate = Body(..., embed=True),
+        tasks_repo: TasksRepository = Depends(get_repository(TasksRepository)),
+) -> TaskPublic:
+    updated_task = await tasks_repo.update_task(id=id, task_update=task_update)
+
+    if not updated_task:
+        raise HTTPException(
+            status_code=HTTP_404_NOT_FOUND,
+            detail="No task found with that id.",
+        )
+
+    return updated_task
+
+
+@router.delete("/{id}/", response_model=int, name="tasks:delete-task-by-id")
+async def delete_task_by_id(
+        id: int = Path(..., ge=1, title="The ID of the task to delete."),
+        tasks_repo: TasksRepository = Depends(get_repository(TasksRepository)),
+) -> int:
+    deleted_id = await tasks_repo.delete_task_by_id(id=id)
+
+    if not deleted_id:
+        raise HTTPException(
+            status_code=HTTP_404_NOT_FOUND,
+            detail="No task found with that id.",
+        )
 
-    return tasks
+    return deleted_id
@@ -0,0 +1,78 @@
+import functools
+import inspect
+from typing import Any, Callable, Coroutine
+
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.api.admission import admitted_handler, route_kind
+from app.core.config import ADMISSION_CHEAP_READS
+from app.core.timings import current_timings
+
+
+class TimedRoute(APIRoute):
+    """
+    Route that splits its time into phases for the timing middleware: the handler runs from the request
+    reaching the route to the response being built, the endpoint only runs once the dependencies are resolved.
+    The handler only runs once the request is admitted, see app.api.admission.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        # The request handler built by super().__init__ reads dependant.call on each request
+        self.dependant.call = timed_endpoint(self.dependant.call)
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = admitted_handler(
+            super().get_route_handler(),
+            name=self.name,
+            kind=route_kind(self.name, self.methods, cheap_reads=ADMISSION_CHEAP_READS),
+        )
+        name = self.name
+
+        async def timed_handler(request: Request) -> Response:
+            timings = current_timings.get()
+            if timings is None:
+                return await handler(request)
+
+            timings.route = name
+            timings.handler_started()
+            try:
+                return await handler(request)
+            finally:
+                timings.handler_finished()
+
+        return timed_handler
+
+
+def timed_endpoint(endpoint: Callable) -> Callable:
+    """
+    Wraps the endpoint without changing whether it is a coroutine function, FastAPI runs sync endpoints in a thread
+    """
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def timed(**values: Any) -> Any:
+            timings = current_timings.get()
+            if timings is None:
+                return await endpoint(**values)
+
+            timings.endpoint_started()
+            try:
+                return await endpoint(**values)
+            finally:
+                timings.endpoint_finished()
+    else:
+        @functools.wraps(endpoint)
+        def timed(**values: Any) -> Any:
+            timings = current_timings.get()
+            if timings is None:
+                return endpoint(**values)
+
+            timings.endpoint_started()
+            try:
+                return endpoint(**values)
+            finally:
+                timings.endpoint_finished()
+
+    return timed
@@ -3,11 +3,15 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.core import config, core_tasks
 
+from app.api.admission import AdmissionController, ConcurrencyLimiter, RateLimiter
+from app.api.middleware.compression import CompressionMiddleware, available_encodings
+from app.api.middleware.timing import TimingMiddleware
 from app.api.routes import router as api_router
+from app.api.routes.metrics import router as metrics_router
 
 
 def get_application():
-    tm_app = FastAPI(title=config.PROJECT_NAME, version=config.VERSION)
+    tm_app = FastAPI(title=config.PROJECT_NAME, version=config.VERSION, lifespan=core_tasks.lifespan)
 
     tm_app.add_middleware(
         CORSMiddleware,
@@ -17,14 +21,54 @@ def get_application():
         allow_headers=["*"],
     )
 
-    # Ref - https://fastapi.tiangolo.com/advanced/events/
-    # TODO: startup and down events are deprecated, replace with lifespan
-    tm_app.add_event_handler("startup", core_tasks.create_start_app_handler(tm_app))
-    tm_app.add_event_handler("shutdown", core_tasks.create_stop_app_handler(tm_app))
+    # Outside CORS, so that the headers it adds are part of the compressed response
+    if config.COMPRESSION_ENABLED:
+        tm_app.add_middleware(
+            CompressionMiddleware,
+            encodings=available_encodings(config.COMPRESSION_ENCODINGS),
+            levels={
+                "gzip": config.COMPRESSION_GZIP_LEVEL,
+                "br": config.COMPRESSION_BROTLI_LEVEL,
+                "zstd": config.COMPRESSION_ZSTD_LEVEL,
+            },
+            minimum_size=config.COMPRESSION_MINIMUM_SIZE,
+        )
+
+    # Added last, so that it is the outermost middleware and its timings cover the whole request
+    if config.INSTRUMENTATION_ENABLED:
+        tm_app.add_middleware(TimingMiddleware)
+
+    if config.ADMISSION_ENABLED:
+        tm_app.state._admission = create_admission_controller()
 
     tm_app.include_router(api_router, prefix="/api")
+    tm_app.include_router(metrics_router)
 
     return tm_app
 
 
-app = get_application()
\ No newline at end of file
+def create_admission_controller() -> AdmissionController:
+    rate_limiter = None
+    if config.ADMISSION_RATE_LIMIT > 0:
+        rate_limiter = RateLimiter(
+            rate=config.ADMISSION_RATE_LIMIT,
+            burst=config.ADMISSION_RATE_BURST,
+            client_header=config.ADMISSION_CLIENT_HEADER,
+        )
+
+    return AdmissionController(
+        reads=ConcurrencyLimiter(
+            limit=config.ADMISSION_READ_CONCURRENCY,
+            queue_size=config.ADMISSION_READ_QUEUE_SIZE,
+            timeout=config.ADMISSION_QUEUE_TIMEOUT,
+        ),
+        writes=ConcurrencyLimiter(
+            limit=config.ADMISSION_WRITE_CONCURRENCY,
+            queue_size=config.ADMISSION_WRITE_QUEUE_SIZE,
+            timeout=config.ADMISSION_QUEUE_TIMEOUT,
+        ),
+        rate_limiter=rate_limiter,
+    )
+
+
+app = get_application()
@@ -1,6 +1,6 @@
 from databases import DatabaseURL
 from starlette.config import Config
-from starlette.datastructures import Secret
+from starlette.datastructures import CommaSeparatedStrings, Secret
 
 config = Config(".env")
 
@@ -20,4 +20,176 @@ DATABASE_URL = config(
     "DATABASE_URL",
     cast=DatabaseURL,
     default=f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}"
-)
\ No newline at end of file
+)
+
+# Pagination - page sizes accepted by list endpoints
+DEFAULT_PAGE_SIZE = config("DEFAULT_PAGE_SIZE", cast=int, default=50)
+MAX_PAGE_SIZE = config("MAX_PAGE_SIZE", cast=int, default=500)
+
+# Bulk endpoints - max number of items accepted in one batch
+BULK_MAX_BATCH_SIZE = config("BULK_MAX_BATCH_SIZE", cast=int, default=1000)
+
+# Read-through cache in front of the repositories - memory (per worker), redis (shared) or none
+CACHE_BACKEND = config("CACHE_BACKEND", cast=str, default="memory")
+CACHE_TTL_SECONDS = config("CACHE_TTL_SECONDS", cast=float, default=5.0)
+CACHE_MAX_ENTRIES = config("CACHE_MAX_ENTRIES", cast=int, default=10_000)
+CACHE_REDIS_URL = config("CACHE_REDIS_URL", cast=str, default="redis://localhost:6379/0")
+
+# Where include=task_stats reads task counts from - aggregate (GROUP BY over the tasks index)
+# or counters (project_task_counts, maintained by triggers, constant time for huge projects)
+TASK_STATS_SOURCE = config("TASK_STATS_SOURCE", cast=str, default="aggregate")
+# Where /api/reports/ status counts and due date histograms are computed from - aggregate (index only scans
+# of projects and tasks) or summary (per due day and per project counters, maintained by triggers)
+REPORTS_SOURCE = config("REPORTS_SOURCE", cast=str, default="aggregate")
+REPORT_MAX_BUCKETS = config("REPORT_MAX_BUCKETS", cast=int, default=366)
+
+# Connection pool of each worker - size it so that workers * DB_POOL_MAX_SIZE stays under Postgres max_connections
+DB_POOL_MIN_SIZE = config("DB_POOL_MIN_SIZE", cast=int, default=2)
+DB_POOL_MAX_SIZE = config("DB_POOL_MAX_SIZE", cast=int, default=10)
+DB_CONNECT_TIMEOUT = config("DB_CONNECT_TIMEOUT", cast=float, default=10.0)
+DB_COMMAND_TIMEOUT = config("DB_COMMAND_TIMEOUT", cast=float, default=30.0)
+DB_STATEMENT_CACHE_SIZE = config("DB_STATEMENT_CACHE_SIZE", cast=int, default=100)
+# asyncpg has no absolute connection lifetime - connections are recycled after this many queries or idle seconds
+DB_MAX_QUERIES_PER_CONNECTION = config("DB_MAX_QUERIES_PER_CONNECTION", cast=int, default=50_000)
+DB_MAX_INACTIVE_CONNECTION_LIFETIME = config("DB_MAX_INACTIVE_CONNECTION_LIFETIME", cast=float, default=300.0)
+# Startup retries with exponential backoff, then the app refuses to start
+DB_CONNECT_RETRIES = config("DB_CONNECT_RETRIES", cast=int, default=5)
+DB_CONNECT_RETRY_BACKOFF = config("DB_CONNECT_RETRY_BACKOFF", cast=float, default=0.5)
+# What the repositories run their statements through - databases, or asyncpg (the same pool, used directly:
+# no per call compiling of the queries nor wrapping of the records, see app.db.asyncpg_backend and benchmarks.backends)
+DB_BACKEND = config("DB_BACKEND", cast=str, default="databases")
+
+# Request instrumentation - Server-Timing header, per route and per query histograms served at /metrics
+INSTRUMENTATION_ENABLED = config("INSTRUMENTATION_ENABLED", cast=bool, default=True)
+# Sampling profiler - requests sent with an X-Profile: 1 header, plus a random PROFILING_SAMPLE_RATE fraction
+# of all requests, get their stacks sampled every PROFILING_INTERVAL seconds and written to PROFILING_DIR
+# as collapsed stacks (flamegraph.pl, speedscope). The header is ignored unless PROFILING_ENABLED.
+PROFILING_ENABLED = config("PROFILING_ENABLED", cast=bool, default=False)
+PROFILING_SAMPLE_RATE = config("PROFILING_SAMPLE_RATE", cast=float, default=0.0)
+PROFILING_INTERVAL = config("PROFILING_INTERVAL", cast=float, default=0.005)
+PROFILING_DIR = config("PROFILING_DIR", cast=str, default="profiles")
+
+# Response compression, negotiated from Accept-Encoding among COMPRESSION_ENCODINGS (most preferred first) - gzip,
+# br (needs the brotli package) and zstd (needs zstandard), those whose package isn't installed are left out.
+# Bodies under COMPRESSION_MINIMUM_SIZE bytes are sent as is. Levels trade CPU for bytes, see benchmarks.compression.
+COMPRESSION_ENABLED = config("COMPRESSION_ENABLED", cast=bool, default=True)
+COMPRESSION_ENCODINGS = config("COMPRESSION_ENCODINGS", cast=CommaSeparatedStrings, default="zstd,br,gzip")
+COMPRESSION_MINIMUM_SIZE = config("COMPRESSION_MINIMUM_SIZE", cast=int, default=1024)
+COMPRESSION_GZIP_LEVEL = config("COMPRESSION_GZIP_LEVEL", cast=int, default=6)
+COMPRESSION_BROTLI_LEVEL = config("COMPRESSION_BROTLI_LEVEL", cast=int, default=4)
+COMPRESSION_ZSTD_LEVEL = config("COMPRESSION_ZSTD_LEVEL", cast=int, default=3)
+
+# Admission control of each worker - at most ADMISSION_READ_CONCURRENCY reads and ADMISSION_WRITE_CONCURRENCY writes
+# are handled at once (0 for no limit), up to ADMISSION_*_QUEUE_SIZE more wait for a slot, at most
+# ADMISSION_QUEUE_TIMEOUT seconds. Beyond that requests get a 503 with a Retry-After at once, so that the latency of
+# what is admitted stays bounded when the DB pool is saturated. The reads of ADMISSION_CHEAP_READS (one row by primary
+# key) get the free slots before the other reads. With ADMISSION_RATE_LIMIT > 0, each client (its
+# ADMISSION_CLIENT_HEADER, e.g. X-API-Key, or else its address) gets that many requests a second per worker,
+# in bursts of up to ADMISSION_RATE_BURST, and a 429 beyond.
+ADMISSION_ENABLED = config("ADMISSION_ENABLED", cast=bool, default=True)
+ADMISSION_READ_CONCURRENCY = config("ADMISSION_READ_CONCURRENCY", cast=int, default=20)
+ADMISSION_READ_QUEUE_SIZE = config("ADMISSION_READ_QUEUE_SIZE", cast=int, default=100)
+ADMISSION_WRITE_CONCURRENCY = config("ADMISSION_WRITE_CONCURRENCY", cast=int, default=10)
+ADMISSION_WRITE_QUEUE_SIZE = config("ADMISSION_WRITE_QUEUE_SIZE", cast=int, default=50)
+ADMISSION_QUEUE_TIMEOUT = config("ADMISSION_QUEUE_TIMEOUT", cast=float, default=1.0)
+ADMISSION_CHEAP_READS = config(
+    "ADMISSION_CHEAP_READS",
+    cast=CommaSeparatedStrings,
+    default="projects:get-project-by-id,tasks:get-task-by-id,jobs:get-job-by-id",
+)
+ADMISSION_RATE_LIMIT = config("ADMISSION_RATE_LIMIT", cast=float, default=0.0)
+ADMISSION_RATE_BURST = config("ADMISSION_RATE_BURST", cast=int, default=20)
+ADMISSION_CLIENT_HEADER = config("ADMISSION_CLIENT_HEADER", cast=str, default="")
+
+# Cache-Control of the project reads. With no-cache, browsers and CDNs keep the response but revalidate it
+# with If-None-Match on each use, which costs a 304 without a body while the project is unchanged.
+PROJECT_CACHE_CONTROL = config("PROJECT_CACHE_CONTROL", cast=str, default="no-cache")
+PROJECT_LIST_CACHE_CONTROL = config("PROJECT_LIST_CACHE_CONTROL", cast=str, default="no-cache")
+
+# Change feed (/api/projects/changes) - one LISTEN connection per worker and shard, fanned out to its subscribers.
+# A subscriber more than CHANGE_FEED_QUEUE_SIZE events behind is disconnected and resumes from the change log,
+# which keeps CHANGE_FEED_RETENTION seconds of changes. The last CHANGE_FEED_RECENT_SIZE events are also kept
+# in memory, to serve resumes without reading the log. Idle streams get a heartbeat every CHANGE_FEED_HEARTBEAT seconds.
+# Changes commit out of seq order - clients resume below the seqs of transactions running for less than
+# CHANGE_FEED_GAP_TIMEOUT seconds, the changes of longer ones may be missed by a client resuming meanwhile.
+CHANGE_FEED_ENABLED = config("CHANGE_FEED_ENABLED", cast=bool, default=True)
+CHANGE_FEED_QUEUE_SIZE = config("CHANGE_FEED_QUEUE_SIZE", cast=int, default=1000)
+CHANGE_FEED_MAX_SUBSCRIBERS = config("CHANGE_FEED_MAX_SUBSCRIBERS", cast=int, default=10_000)
+CHANGE_FEED_RECENT_SIZE = config("CHANGE_FEED_RECENT_SIZE", cast=int, default=10_000)
+CHANGE_FEED_PAGE_SIZE = config("CHANGE_FEED_PAGE_SIZE", cast=int, default=500)
+CHANGE_FEED_RETENTION = config("CHANGE_FEED_RETENTION", cast=float, default=86_400.0)
+CHANGE_FEED_PRUNE_INTERVAL = config("CHANGE_FEED_PRUNE_INTERVAL", cast=float, default=300.0)
+CHANGE_FEED_HEARTBEAT = config("CHANGE_FEED_HEARTBEAT", cast=float, default=15.0)
+CHANGE_FEED_GAP_TIMEOUT = config("CHANGE_FEED_GAP_TIMEOUT", cast=float, default=30.0)
+
+# Production server (python -m app serve). SERVER_WORKERS 0 starts one worker per CPU available to the process.
+# Above SERVER_LIMIT_CONCURRENCY connections (0 for no limit) a worker answers 503. On shutdown, workers stop
+# accepting connections and wait up to SERVER_GRACEFUL_SHUTDOWN_TIMEOUT seconds for in-flight requests,
+# then cancel what is left (e.g. change feed streams, which resume on another worker).
+SERVER_HOST = config("SERVER_HOST", cast=str, default="0.0.0.0")
+SERVER_PORT = config("SERVER_PORT", cast=int, default=8000)
+SERVER_WORKERS = config("SERVER_WORKERS", cast=int, default=0)
+SERVER_BACKLOG = config("SERVER_BACKLOG", cast=int, default=2048)
+SERVER_KEEP_ALIVE = config("SERVER_KEEP_ALIVE", cast=int, default=5)
+SERVER_LIMIT_CONCURRENCY = config("SERVER_LIMIT_CONCURRENCY", cast=int, default=0)
+SERVER_GRACEFUL_SHUTDOWN_TIMEOUT = config("SERVER_GRACEFUL_SHUTDOWN_TIMEOUT", cast=int, default=30)
+# Postgres connections the server may hold in total, across its workers - each worker's pool is shrunk to fit.
+# Keep it under Postgres max_connections, minus what other clients (migrations, psql, pgadmin) need.
+DB_MAX_CONNECTIONS = config("DB_MAX_CONNECTIONS", cast=int, default=90)
+
+# Read replicas, comma separated URLs (POSTGRES_* credentials are not applied to them). Repository reads go
+# round robin to the replicas at most DB_REPLICA_MAX_LAG seconds behind, as checked every DB_REPLICA_CHECK_INTERVAL
+# seconds, and to the primary when none is. With DB_READ_YOUR_WRITES, a request that wrote reads from the primary.
+# Each worker opens a pool of DB_POOL_MAX_SIZE on every replica - their max_connections are budgeted like the primary's.
+DATABASE_REPLICA_URLS = config("DATABASE_REPLICA_URLS", cast=CommaSeparatedStrings, default="")
+DB_REPLICA_MAX_LAG = config("DB_REPLICA_MAX_LAG", cast=float, default=5.0)
+DB_REPLICA_CHECK_INTERVAL = config("DB_REPLICA_CHECK_INTERVAL", cast=float, default=1.0)
+DB_READ_YOUR_WRITES = config("DB_READ_YOUR_WRITES", cast=bool, default=True)
+
+# Workspaces (tenants), sent in the WORKSPACE_HEADER of each request - DEFAULT_WORKSPACE without one, * for the project
+# reads across every workspace. Projects and tasks are sharded by workspace: DATABASE_URL is the first shard,
+# DATABASE_SHARD_URLS the next ones - only ever append to it, shard i hands out the ids from i * SHARD_ID_SPACE
+# (python -m app shards init). Workspaces are spread over the shards by consistent hashing, SHARD_VIRTUAL_NODES points
+# per shard, except those pinned in workspace_placements (python -m app shards pin / rebalance), reloaded every
+# SHARD_PLACEMENT_REFRESH_INTERVAL seconds. Idempotency keys live with their workspace, the change feed and the reports
+# cover every shard. Jobs stay on the first shard. Each worker opens a pool of DB_POOL_MAX_SIZE on every shard.
+WORKSPACE_HEADER = config("WORKSPACE_HEADER", cast=str, default="X-Workspace-ID")
+DEFAULT_WORKSPACE = config("DEFAULT_WORKSPACE", cast=str, default="default")
+DATABASE_SHARD_URLS = config("DATABASE_SHARD_URLS", cast=CommaSeparatedStrings, default="")
+SHARD_VIRTUAL_NODES = config("SHARD_VIRTUAL_NODES", cast=int, default=128)
+SHARD_ID_SPACE = config("SHARD_ID_SPACE", cast=int, default=100_000_000)
+SHARD_PLACEMENT_REFRESH_INTERVAL = config("SHARD_PLACEMENT_REFRESH_INTERVAL", cast=float, default=5.0)
+
+# Idempotency-Key (POST /api/projects/) - responses are kept IDEMPOTENCY_KEY_TTL seconds, for the retries to get
+# them back. Expired keys are pruned every IDEMPOTENCY_PRUNE_INTERVAL seconds.
+IDEMPOTENCY_KEY_TTL = config("IDEMPOTENCY_KEY_TTL", cast=float, default=86_400.0)
+IDEMPOTENCY_PRUNE_INTERVAL = config("IDEMPOTENCY_PRUNE_INTERVAL", cast=float, default=3600.0)
+
+# Project maintenance, by a job of each worker every PROJECT_MAINTENANCE_INTERVAL seconds, in statements of
+# PROJECT_MAINTENANCE_BATCH_SIZE projects. Deleted projects are out of the API at once, and purged (with their tasks)
+# PROJECT_PURGE_AFTER seconds later. With PROJECT_ARCHIVE_ENABLED, the projects done for PROJECT_ARCHIVE_COMPLETED_AFTER
+# seconds, and those created PROJECT_ARCHIVE_CREATED_AFTER seconds ago (0 disables either), move to the monthly
+# partitions of projects_archive. Partitions older than PROJECT_ARCHIVE_RETENTION seconds are dropped, 0 keeps them.
+PROJECT_MAINTENANCE_INTERVAL = config("PROJECT_MAINTENANCE_INTERVAL", cast=float, default=60.0)
+PROJECT_MAINTENANCE_BATCH_SIZE = config("PROJECT_MAINTENANCE_BATCH_SIZE", cast=int, default=100)
+PROJECT_PURGE_AFTER = config("PROJECT_PURGE_AFTER", cast=float, default=2_592_000.0)
+PROJECT_ARCHIVE_ENABLED = config("PROJECT_ARCHIVE_ENABLED", cast=bool, default=False)
+PROJECT_ARCHIVE_COMPLETED_AFTER = config("PROJECT_ARCHIVE_COMPLETED_AFTER", cast=float, default=2_592_000.0)
+PROJECT_ARCHIVE_CREATED_AFTER = config("PROJECT_ARCHIVE_CREATED_AFTER", cast=float, default=0.0)
+PROJECT_ARCHIVE_RETENTION = config("PROJECT_ARCHIVE_RETENTION", cast=float, default=0.0)
+
+# Background jobs (/api/jobs/), queued in the jobs table. Each worker runs up to JOB_WORKERS of them at once (0 leaves
+# them to the other workers), idle ones poll the queue every JOB_POLL_INTERVAL seconds. A running job's lease of
+# JOB_LEASE seconds is renewed as it runs - when it expires (its worker died), the job is retried. Failed attempts are
+# retried after JOB_RETRY_BACKOFF * 2^(attempt - 1) seconds (at most JOB_RETRY_MAX_BACKOFF), JOB_MAX_ATTEMPTS at most.
+# On shutdown, running jobs get JOB_SHUTDOWN_TIMEOUT seconds to finish before going back to the queue.
+# Finished jobs are kept JOB_RETENTION seconds. POST /api/projects/import takes up to PROJECT_IMPORT_MAX_SIZE projects.
+JOB_WORKERS = config("JOB_WORKERS", cast=int, default=2)
+JOB_POLL_INTERVAL = config("JOB_POLL_INTERVAL", cast=float, default=1.0)
+JOB_LEASE = config("JOB_LEASE", cast=float, default=60.0)
+JOB_MAX_ATTEMPTS = config("JOB_MAX_ATTEMPTS", cast=int, default=5)
+JOB_RETRY_BACKOFF = config("JOB_RETRY_BACKOFF", cast=float, default=1.0)
+JOB_RETRY_MAX_BACKOFF = config("JOB_RETRY_MAX_BACKOFF", cast=float, default=300.0)
+JOB_SHUTDOWN_TIMEOUT = config("JOB_SHUTDOWN_TIMEOUT", cast=float, default=10.0)
+JOB_RETENTION = config("JOB_RETENTION", cast=float, default=604_800.0)
+PROJECT_IMPORT_MAX_SIZE = config("PROJECT_IMPORT_MAX_SIZE", cast=int, default=100_000)
@@ -1,18 +1,37 @@
-from typing import Callable
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 from fastapi import FastAPI
 
-from app.db.db_tasks import connect_to_db, close_db_connection
+from app.db.db_tasks import (
+    close_db_connection, close_replicas, close_repository_cache, close_shards, connect_to_db, connect_to_replicas,
+    connect_to_shards, create_repository_cache, start_change_feed, start_idempotency_pruner, start_job_runner,
+    start_project_maintenance, stop_change_feed, stop_idempotency_pruner, stop_job_runner, stop_project_maintenance,
+)
 
 
-def create_start_app_handler(app: FastAPI) -> Callable:
-    async def start_app() -> None:
-        await connect_to_db(app)
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Everything before the yield runs before the app accepts requests, a failure there stops the app from starting.
+    Ref - https://fastapi.tiangolo.com/advanced/events/
+    """
+    await connect_to_db(app)
+    await connect_to_replicas(app)
+    await connect_to_shards(app)
+    await create_repository_cache(app)
+    await start_change_feed(app)
+    await start_idempotency_pruner(app)
+    await start_project_maintenance(app)
+    await start_job_runner(app)
 
-    return start_app
-
-
-def create_stop_app_handler(app: FastAPI) -> Callable:
-    async def stop_app() -> None:
+    try:
+        yield
+    finally:
+        await stop_job_runner(app)
+        await stop_project_maintenance(app)
+        await stop_idempotency_pruner(app)
+        await stop_change_feed(app)
+        await close_repository_cache(app)
+        await close_shards(app)
+        await close_replicas(app)
         await close_db_connection(app)
-
-    return stop_app
@@ -0,0 +1,98 @@
+import bisect
+from typing import Dict, List, Sequence, Tuple
+
+# Ref - https://prometheus.io/docs/instrumenting/exposition_formats/
+# Metrics are kept per worker process, Prometheus adds up the workers when it aggregates the scraped series.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10_000, 100_000)
+
+
+class Histogram:
+    """
+    Prometheus histogram - per label set, the count of observations in each bucket, their sum and their count
+    """
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], buckets: Sequence[float]) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> (observations per bucket, with a last +Inf bucket, sum of the observations)
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series[labelvalues] = ([0] * (len(self.buckets) + 1), [0.0])
+
+        counts, total = series
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labelvalues, (counts, total) in sorted(self._series.items()):
+            labels = ",".join(f'{name}="{escape(value)}"' for name, value in zip(self.labelnames, labelvalues))
+            separator = "," if labels else ""
+
+            cumulative = 0
+            for bound, count in zip((*map(format_bound, self.buckets), "+Inf"), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels}{separator}le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total[0]}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self.metrics: Dict[str, Histogram] = {}
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str], buckets: Sequence[float]) -> Histogram:
+        histogram = self.metrics[name] = Histogram(name, help, labelnames, buckets)
+        return histogram
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self.metrics.values() for line in metric.render()) + "\n"
+
+
+def escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_bound(bound: float) -> str:
+    return str(float(bound))
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending the end of its response.",
+    ("route", "method", "status"),
+    LATENCY_BUCKETS,
+)
+
+REQUEST_PHASE_DURATION = REGISTRY.histogram(
+    "http_request_phase_duration_seconds",
+    "Time spent in each phase of a request - dependencies, app, db and serialization.",
+    ("route", "phase"),
+    LATENCY_BUCKETS,
+)
+
+QUERY_DURATION = REGISTRY.histogram(
+    "db_query_duration_seconds",
+    "Latency of the SQL statements, by statement kind and table.",
+    ("query",),
+    LATENCY_BUCKETS,
+)
+
+QUERY_ROWS = REGISTRY.histogram(
+    "db_query_rows",
+    "Rows returned by the SQL statements, by statement kind and table.",
+    ("query",),
+    ROW_BUCKETS,
+)
@@ -0,0 +1,79 @@
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread (the event loop's) from a background thread, every interval seconds,
+    and writes the samples as collapsed stacks - one "frame;frame;frame count" line per distinct stack,
+    the input of flamegraph.pl, speedscope and most flamegraph viewers.
+
+    The event loop runs every request of the worker, so the samples of a profiled request also hold
+    whatever the concurrent requests did in the meantime - profile on an otherwise idle worker for a clean picture.
+    """
+
+    def __init__(self, *, interval: float, thread_id: Optional[int] = None) -> None:
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.samples: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self) -> "SamplingProfiler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[collapse(frame)] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def dump(self, directory: str, name: str) -> str:
+        os.makedirs(directory, exist_ok=True)
+        name = re.sub(r"[^\w.-]+", "_", name)
+        path = os.path.join(directory, f"{time.strftime('%Y%m%dT%H%M%S')}-{name}.folded")
+        with open(path, "w") as f:
+            f.write(self.collapsed())
+
+        logger.info(f"Wrote {sum(self.samples.values())} profile samples to {path}")
+        return path
+
+
+def collapse(frame: FrameType) -> str:
+    """
+    The stack of the frame, outermost call first - functions rather than lines, so that samples of a function merge
+    """
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+
+    return ";".join(reversed(stack))
+
+
+def short_path(filename: str) -> str:
+    # Keeps stacks readable and identical across machines - site-packages/fastapi/routing.py -> fastapi/routing.py
+    for marker in ("site-packages" + os.sep, os.getcwd() + os.sep):
+        index = filename.rfind(marker)
+        if index != -1:
+            return filename[index + len(marker):]
+
+    return filename
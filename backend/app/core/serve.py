@@ -0,0 +1,97 @@
+import importlib.util
+import logging
+import math
+import os
+from typing import Optional, Tuple
+
+import uvicorn
+
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+APP = "app.api.server:app"
+
+CGROUP_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+
+
+def available_cpus() -> int:
+    """
+    CPUs this process may run on - its affinity, further capped by a cgroup (v2) CPU quota,
+    which is how containers are usually limited while os.cpu_count() still reports every core of the host
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+
+    try:
+        with open(CGROUP_CPU_MAX) as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+
+    return cpus
+
+
+def pool_sizes(*, workers: int, max_connections: int, min_size: int, max_size: int, listeners: int) -> Tuple[int, int]:
+    """
+    Pool (min, max) size of each worker, so that all of them together stay within max_connections.
+    listeners are the connections a worker holds outside its pool (the change feed's).
+    Raises if the workers can't get a connection each.
+    """
+    per_worker = max_connections // workers - listeners
+    if per_worker < 1:
+        raise SystemExit(
+            f"DB_MAX_CONNECTIONS={max_connections} can't serve {workers} workers, which need {listeners + 1}"
+            f" connections each at least - lower SERVER_WORKERS or raise DB_MAX_CONNECTIONS"
+        )
+
+    pool_max = min(max_size, per_worker)
+
+    return min(min_size, pool_max), pool_max
+
+
+def installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def serve(*, host: Optional[str] = None, port: Optional[int] = None, workers: Optional[int] = None) -> None:
+    """
+    Runs the app on uvicorn, with workers processes (one per available CPU by default), uvloop and httptools
+    when installed. Stopping (SIGINT/SIGTERM) drains the in-flight requests before the app shuts down.
+    """
+    workers = workers or config.SERVER_WORKERS or available_cpus()
+    pool_min, pool_max = pool_sizes(
+        workers=workers,
+        max_connections=config.DB_MAX_CONNECTIONS,
+        min_size=config.DB_POOL_MIN_SIZE,
+        max_size=config.DB_POOL_MAX_SIZE,
+        listeners=1 if config.CHANGE_FEED_ENABLED else 0,
+    )
+    if pool_max < config.DB_POOL_MAX_SIZE:
+        logger.warning(
+            f"DB pools shrunk from {config.DB_POOL_MAX_SIZE} to {pool_max} connections per worker,"
+            f" to keep {workers} workers within DB_MAX_CONNECTIONS={config.DB_MAX_CONNECTIONS}"
+        )
+
+    # Worker processes import the config anew, from the environment. A single worker runs in this process,
+    # where the config is already imported - it is updated as well, before the app's modules read it.
+    os.environ["DB_POOL_MIN_SIZE"], os.environ["DB_POOL_MAX_SIZE"] = str(pool_min), str(pool_max)
+    config.DB_POOL_MIN_SIZE, config.DB_POOL_MAX_SIZE = pool_min, pool_max
+
+    loop = "uvloop" if installed("uvloop") else "asyncio"
+    http = "httptools" if installed("httptools") else "h11"
+    logger.info(f"Serving {APP} with {workers} workers ({loop}, {http}), DB pools of {pool_min}-{pool_max}")
+
+    uvicorn.run(
+        APP,
+        host=host or config.SERVER_HOST,
+        port=port or config.SERVER_PORT,
+        workers=workers,
+        loop=loop,
+        http=http,
+        backlog=config.SERVER_BACKLOG,
+        timeout_keep_alive=config.SERVER_KEEP_ALIVE,
+        limit_concurrency=config.SERVER_LIMIT_CONCURRENCY or None,
+        timeout_graceful_shutdown=config.SERVER_GRACEFUL_SHUTDOWN_TIMEOUT,
+    )
@@ -0,0 +1,77 @@
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# Phases reported in Server-Timing and in http_request_phase_duration_seconds:
+# queue - waiting for admission, see app.api.admission
+# dependencies - body parsing, validation and dependency resolution (get_database, get_repository, ...)
+# app - the endpoint itself, less its queries and the responses it serialized
+# db - SQL statements, as recorded by app.db.recorder.QueryRecorder
+# serialization - response_model validation and encoding of the response body
+PHASES = ("queue", "dependencies", "app", "db", "serialization")
+
+
+class RequestTimings:
+    """
+    Where the time of one request went. Filled by the timing middleware, the instrumented routes,
+    the query recorder and ModelResponse, all through current_timings.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.route: Optional[str] = None
+        self.queries = 0
+        self.durations: Dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self._handler_started = self._endpoint_started = self._endpoint_finished = None
+        self._endpoint_serialization = 0.0
+
+    def handler_started(self) -> None:
+        self._handler_started = time.perf_counter()
+
+    def endpoint_started(self) -> None:
+        self._endpoint_started = time.perf_counter()
+        self.durations["dependencies"] += self._endpoint_started - self._handler_started
+
+    def endpoint_finished(self) -> None:
+        self._endpoint_finished = time.perf_counter()
+        # Queries and ModelResponse encoding happen inside the endpoint, they are reported in their own phase
+        # Concurrent queries can add up to more than the endpoint's own duration
+        self.durations["app"] += max(
+            0.0, self._endpoint_finished - self._endpoint_started - self.durations["db"] - self._endpoint_serialization,
+        )
+
+    def handler_finished(self) -> None:
+        if self._endpoint_finished is not None:
+            self.durations["serialization"] += time.perf_counter() - self._endpoint_finished
+
+    def add_queue(self, duration: float) -> None:
+        self.durations["queue"] += duration
+
+    def add_query(self, duration: float) -> None:
+        self.queries += 1
+        self.durations["db"] += duration
+
+    def add_serialization(self, duration: float) -> None:
+        self.durations["serialization"] += duration
+        if self._endpoint_started is not None and self._endpoint_finished is None:
+            self._endpoint_serialization += duration
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """
+        Value of the Server-Timing header, durations in milliseconds
+        Ref - https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/Server-Timing
+        """
+        metrics = [
+            f'db;dur={duration * 1000:.2f};desc="{self.queries} queries"' if phase == "db" else
+            f"{phase};dur={duration * 1000:.2f}"
+            for phase, duration in self.durations.items()
+        ]
+        metrics.append(f"total;dur={self.elapsed() * 1000:.2f}")
+
+        return ", ".join(metrics)
+
+
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("current_timings", default=None)
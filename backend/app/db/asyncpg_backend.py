@@ -0,0 +1,186 @@
+import asyncio
+import functools
+import re
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+import asyncpg
+
+from databases import DatabaseURL
+
+# :name parameters, as sqlalchemy's text() finds them - not the casts (::jsonb) nor times in literals ('12:00')
+PARAMETER_PATTERN = re.compile(r"(?<![:\w\\]):(\w+)(?!:)")
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_query(query: str) -> Tuple[str, Tuple[str, ...]]:
+    """
+    The query with its :name parameters turned into asyncpg's $n, and the names in the order of n.
+    The queries are module constants (or built from them), so each one is only compiled once.
+    """
+    names: Dict[str, int] = {}
+
+    def placeholder(match: re.Match) -> str:
+        return f"${names.setdefault(match.group(1), len(names) + 1)}"
+
+    return PARAMETER_PATTERN.sub(placeholder, query), tuple(names)
+
+
+def query_args(query: str, values: Optional[dict]) -> Tuple[str, List[Any]]:
+    compiled, names = compile_query(query)
+    values = values or {}
+
+    return compiled, [values[name] for name in names]
+
+
+class Record(asyncpg.Record):
+    """
+    asyncpg's record, as the pool returns it - already a mapping of the columns, _mapping is only there for
+    the repositories' dict(record._mapping), written against the records of databases
+    """
+
+    @property
+    def _mapping(self) -> "Record":
+        return self
+
+
+class Transaction:
+    """
+    A transaction on the connection of the current task, a savepoint when one is already open
+    """
+
+    def __init__(self, database: "AsyncpgDatabase") -> None:
+        self._database = database
+        self._transaction: Optional[asyncpg.transaction.Transaction] = None
+
+    async def __aenter__(self) -> "Transaction":
+        connection = await self._database._enter_transaction()
+        self._transaction = connection.transaction()
+        try:
+            await self._transaction.start()
+        except BaseException:
+            await self._database._exit_transaction()
+            raise
+
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc: Any, traceback: Any) -> None:
+        try:
+            if exc_type is None:
+                await self._transaction.commit()
+            else:
+                await self._transaction.rollback()
+        finally:
+            await self._database._exit_transaction()
+
+
+class AsyncpgDatabase:
+    """
+    The subset of databases.Database the app uses (fetch_*, execute*, iterate, transaction), straight on an asyncpg
+    pool: no query compiling through sqlalchemy nor record wrapping on each call. Queries are prepared once per
+    connection and kept in asyncpg's statement cache (statement_cache_size), keyed by their text - which is fixed
+    for the module constants. Outside transactions, every statement checks a connection out of the pool on its own.
+
+    Like databases, a transaction belongs to the task that opened it: the statements of that task run on the
+    transaction's connection, those of other tasks (e.g. the batch loaders) on connections of their own.
+    """
+
+    def __init__(self, url: str, **options: Any) -> None:
+        """
+        :param options: Passed on to asyncpg.create_pool (min_size, max_size, statement_cache_size, ...)
+        """
+        self.url = DatabaseURL(url)
+        self.options = options
+        self._pool: Optional[asyncpg.Pool] = None
+        # Task -> [connection, open transactions], while the task is in a transaction
+        self._connections: "WeakKeyDictionary[asyncio.Task, list]" = WeakKeyDictionary()
+
+    @property
+    def is_connected(self) -> bool:
+        return self._pool is not None
+
+    async def connect(self) -> None:
+        if self._pool is not None:
+            return
+
+        self._pool = await asyncpg.create_pool(
+            str(self.url.replace(driver=None)), record_class=Record, **self.options,
+        )
+
+    async def disconnect(self) -> None:
+        if self._pool is None:
+            return
+
+        pool, self._pool = self._pool, None
+        await pool.close()
+
+    def transaction(self) -> Transaction:
+        return Transaction(self)
+
+    async def fetch_all(self, query: str, values: Optional[dict] = None) -> List[Record]:
+        return await self._run("fetch", *query_args(query, values))
+
+    async def fetch_one(self, query: str, values: Optional[dict] = None) -> Optional[Record]:
+        return await self._run("fetchrow", *query_args(query, values))
+
+    async def fetch_val(self, query: str, values: Optional[dict] = None, column: Any = 0) -> Any:
+        record = await self.fetch_one(query=query, values=values)
+
+        return None if record is None else record[column]
+
+    async def execute(self, query: str, values: Optional[dict] = None) -> Any:
+        """
+        :return: The first column of the first row, e.g. the id of a RETURNING id - as databases does
+        """
+        return await self._run("fetchval", *query_args(query, values))
+
+    async def execute_many(self, query: str, values: List[dict]) -> None:
+        compiled, names = compile_query(query)
+        await self._run("executemany", compiled, [[item[name] for name in names] for item in values])
+
+    async def iterate(self, query: str, values: Optional[dict] = None) -> AsyncIterator[Record]:
+        """
+        Server side cursor, which needs a transaction - as databases does
+        """
+        query, args = query_args(query, values)
+        async with self.transaction():
+            async for record in self._transaction_connection().cursor(query, *args):
+                yield record
+
+    async def _run(self, method: str, query: str, args: list) -> Any:
+        """
+        Runs a statement on the task's transaction connection, else on one checked out for it alone
+        """
+        connection = self._transaction_connection()
+        if connection is not None:
+            return await getattr(connection, method)(query, *args)
+
+        # Checked out explicitly rather than with the pool's own fetch*, so that an InstrumentedPool times it
+        connection = await self._pool.acquire()
+        try:
+            return await getattr(connection, method)(query, *args)
+        finally:
+            await self._pool.release(connection)
+
+    def _transaction_connection(self) -> Optional[asyncpg.Connection]:
+        task = asyncio.current_task()
+        held = self._connections.get(task) if task is not None else None
+
+        return held[0] if held is not None else None
+
+    async def _enter_transaction(self) -> asyncpg.Connection:
+        task = asyncio.current_task()
+        held = self._connections.get(task)
+        if held is None:
+            held = self._connections[task] = [await self._pool.acquire(), 0]
+        held[1] += 1
+
+        return held[0]
+
+    async def _exit_transaction(self) -> None:
+        task = asyncio.current_task()
+        held = self._connections[task]
+        held[1] -= 1
+        if held[1] == 0:
+            del self._connections[task]
+            await self._pool.release(held[0])
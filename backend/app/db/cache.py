@@ -0,0 +1,237 @@
+import asyncio
+import pickle
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# Ref - https://docs.aws.amazon.com/whitepapers/latest/database-caching-strategies-using-redis/caching-patterns.html
+
+# Returned by backends on a miss, so that None (e.g. "no project with that id") can be cached too
+MISSING = object()
+
+
+class BaseCache(ABC):
+    """
+    Read-through cache shared by the repositories.
+    Backends implement _get/_set/_delete and the generation counters, this class adds the hit/miss
+    accounting and coalesces concurrent misses of a key into a single load.
+    """
+    backend = "base"
+
+    def __init__(self, *, ttl: float) -> None:
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._invalidated_while_loading = set()
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = await self._get(key)
+        if value is not MISSING:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        # Shielded, so that a caller going away doesn't cancel the load for everybody waiting on it
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        self._invalidated_while_loading.discard(key)
+        value = await loader()
+
+        # A write that lands while the query runs makes its result stale, don't keep it around
+        if key not in self._invalidated_while_loading:
+            await self._set(key, value, self.ttl)
+        self._invalidated_while_loading.discard(key)
+
+        return value
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            if key in self._inflight:
+                self._invalidated_while_loading.add(key)
+        await self._delete(*keys)
+
+    async def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+
+        return {
+            "backend": self.backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    @abstractmethod
+    async def get_generation(self, name: str) -> int:
+        """
+        Generations namespace keys that can't be listed for deletion (e.g. every page of a listing),
+        bumping the generation makes all keys built with the previous one unreachable.
+        """
+        ...
+
+    @abstractmethod
+    async def bump_generation(self, name: str) -> None:
+        ...
+
+    @abstractmethod
+    async def _get(self, key: str) -> Any:
+        ...
+
+    @abstractmethod
+    async def _set(self, key: str, value: Any, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    async def _delete(self, *keys: str) -> None:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class NullCache(BaseCache):
+    """
+    Caching disabled - every read goes to the database, concurrent identical reads are still coalesced
+    """
+    backend = "none"
+
+    def __init__(self) -> None:
+        super().__init__(ttl=0)
+
+    async def get_generation(self, name: str) -> int:
+        return 0
+
+    async def bump_generation(self, name: str) -> None:
+        pass
+
+    async def _get(self, key: str) -> Any:
+        return MISSING
+
+    async def _set(self, key: str, value: Any, ttl: float) -> None:
+        pass
+
+    async def _delete(self, *keys: str) -> None:
+        pass
+
+
+class MemoryCache(BaseCache):
+    """
+    In-process TTL + LRU cache, holding at most max_entries values. Each worker process has its own.
+    """
+    backend = "memory"
+
+    def __init__(self, *, ttl: float, max_entries: int) -> None:
+        super().__init__(ttl=ttl)
+        self.max_entries = max_entries
+        self.evictions = 0
+        self.expirations = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+
+    async def get_generation(self, name: str) -> int:
+        return self._generations.get(name, 0)
+
+    async def bump_generation(self, name: str) -> None:
+        self._generations[name] = self._generations.get(name, 0) + 1
+
+    async def _get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return MISSING
+
+        self._entries.move_to_end(key)
+        return value
+
+    async def _set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def _delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            **await super().stats(),
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class RedisCache(BaseCache):
+    """
+    Redis backed cache shared by every worker, so that a write in one worker invalidates the others.
+    Values are pickled - the Redis instance must only be reachable by the app.
+    """
+    backend = "redis"
+
+    def __init__(self, url: str, *, ttl: float, prefix: str = "task_manager:") -> None:
+        super().__init__(ttl=ttl)
+        try:
+            from redis import asyncio as aioredis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis needs the redis package, pip install redis") from e
+
+        self.prefix = prefix
+        self._redis = aioredis.from_url(url)
+
+    async def get_generation(self, name: str) -> int:
+        return int(await self._redis.get(f"{self.prefix}generation:{name}") or 0)
+
+    async def bump_generation(self, name: str) -> None:
+        await self._redis.incr(f"{self.prefix}generation:{name}")
+
+    async def _get(self, key: str) -> Any:
+        value = await self._redis.get(self.prefix + key)
+
+        return MISSING if value is None else pickle.loads(value)
+
+    async def _set(self, key: str, value: Any, ttl: float) -> None:
+        await self._redis.set(self.prefix + key, pickle.dumps(value), px=int(ttl * 1000))
+
+    async def _delete(self, *keys: str) -> None:
+        if keys:
+            await self._redis.delete(*(self.prefix + key for key in keys))
+
+    async def stats(self) -> Dict[str, Any]:
+        info = await self._redis.info("stats")
+
+        return {**await super().stats(), "evictions": info.get("evicted_keys", 0)}
+
+    async def close(self) -> None:
+        await self._redis.close()
+
+
+def create_cache(backend: str, *, ttl: float, max_entries: int, redis_url: Optional[str] = None) -> BaseCache:
+    if backend == "memory":
+        return MemoryCache(ttl=ttl, max_entries=max_entries)
+    if backend == "redis":
+        return RedisCache(redis_url, ttl=ttl)
+    if backend == "none":
+        return NullCache()
+
+    raise ValueError(f"Unknown CACHE_BACKEND {backend!r}, expected one of memory, redis, none")
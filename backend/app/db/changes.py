@@ -0,0 +1,537 @@
+import asyncio
+import contextlib
+import heapq
+import json
+import logging
+import re
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import asyncpg
+from fastapi import HTTPException
+from starlette.status import HTTP_400_BAD_REQUEST, HTTP_503_SERVICE_UNAVAILABLE
+
+from app.db.shards import shard_name
+
+if TYPE_CHECKING:
+    from app.db.repositories.changes import ChangesRepository
+
+logger = logging.getLogger(__name__)
+
+# Notified by the record_project_change trigger
+CHANGES_CHANNEL = "project_changes"
+
+# One seq per shard, dot separated - a single seq with a single shard
+CHANGE_CURSOR_PATTERN = r"^[0-9]{1,19}(\.[0-9]{1,19})*$"
+
+ChangeCursor = Tuple[int, ...]
+
+
+def format_change_cursor(seqs: Iterable[int]) -> str:
+    return ".".join(str(seq) for seq in seqs)
+
+
+class ChangeEvent:
+    """
+    One change of a project or of one of its tasks, on one shard. payload is the JSON built by the database
+    (project_change_payload), passed on to the clients as is - every subscriber shares the same encoded event.
+    seqs are unique across the shards, each one hands out its own range (python -m app shards init).
+
+    cursor is where a client that got this event resumes from: a seq per shard, below which it got every change
+    of the shard. Seqs are taken before commit, so a change may commit after one with a higher seq - cursors stay
+    below the changes possibly still in flight, and a client resuming from one may get a few changes again
+    (same seq). Set it before the event is encoded.
+    """
+    __slots__ = ("seq", "project_id", "payload", "shard", "cursor", "_sse", "_text")
+
+    def __init__(self, seq: int, project_id: int, payload: str, shard: int = 0) -> None:
+        self.seq = seq
+        self.project_id = project_id
+        self.payload = payload
+        self.shard = shard
+        self.cursor: Optional[str] = None
+        self._sse: Optional[bytes] = None
+        self._text: Optional[str] = None
+
+    @classmethod
+    def from_payload(cls, payload: str, shard: int = 0) -> "ChangeEvent":
+        change = json.loads(payload)
+
+        return cls(change["seq"], change["project_id"], payload, shard)
+
+    @property
+    def sse(self) -> bytes:
+        """
+        The event as a server-sent event, encoded on first use
+        """
+        if self._sse is None:
+            self._sse = f"id: {self.cursor}\nevent: change\ndata: {self.payload}\n\n".encode()
+
+        return self._sse
+
+    @property
+    def text(self) -> str:
+        """
+        The event as a WebSocket message, its payload with resume_after (the cursor) added
+        """
+        if self._text is None:
+            self._text = f'{{"resume_after": "{self.cursor}", {self.payload[1:]}'
+
+        return self._text
+
+
+class Subscription:
+    """
+    The live events of one client, queued until it reads them. A client that falls queue_size events behind
+    is dropped (overflowed) rather than buffered without bound - it resumes from the log where it left off.
+
+    A deque and a future rather than an asyncio.Queue read through wait_for, which costs a task and a timer per read -
+    with thousands of subscribers, they were most of the cost of an event. The feed's heartbeat wakes idle readers.
+    """
+
+    def __init__(self, *, project_id: Optional[int], queue_size: int) -> None:
+        self.project_id = project_id
+        self.queue_size = queue_size
+        self.events: deque = deque()
+        self.overflowed = False
+        self.idle = True
+        self._waiter: Optional[asyncio.Future] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.overflowed and not self.events
+
+    def put(self, event: ChangeEvent) -> bool:
+        """
+        :return: False if the queue is full
+        """
+        if len(self.events) >= self.queue_size:
+            return False
+
+        self.events.append(event)
+        self.idle = False
+        wake(self._waiter)
+        return True
+
+    def heartbeat(self) -> None:
+        """
+        Wakes the reader if nothing came since the previous heartbeat - its get returns None
+        """
+        if self.idle:
+            wake(self._waiter)
+        self.idle = True
+
+    async def get(self) -> Optional[ChangeEvent]:
+        """
+        :return: The next event, or None on a heartbeat of the feed
+        """
+        if not self.events:
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+
+        return self.events.popleft() if self.events else None
+
+
+def wake(waiter: Optional[asyncio.Future]) -> None:
+    if waiter is not None and not waiter.done():
+        waiter.set_result(None)
+
+
+class ShardChanges:
+    """
+    The changes of one shard: the connection listening to its notifications, and how far its log went through
+    the feed - resume_seq is the seq below which every change of the shard did. Notifications come in commit order,
+    which isn't seq order: a hole in the seqs is a transaction still running, or rolled back - it's given up on
+    after gap_timeout seconds.
+
+    If the listening connection drops, it reconnects and publishes the changes logged in the meantime.
+    """
+
+    def __init__(
+            self,
+            index: int,
+            dsn: str,
+            *,
+            changes_repo: "ChangesRepository",
+            publish: Callable[[ChangeEvent], None],
+            page_size: int,
+            retention: float,
+            prune_interval: float,
+            gap_timeout: float,
+            reconnect_backoff: float,
+    ) -> None:
+        self.index = index
+        self.name = shard_name(index)
+        self.dsn = dsn
+        self.changes_repo = changes_repo
+        self.publish = publish
+        self.page_size = page_size
+        self.retention = retention
+        self.prune_interval = prune_interval
+        self.gap_timeout = gap_timeout
+        self.reconnect_backoff = reconnect_backoff
+
+        self.last_seq = 0
+        self.resume_seq = 0
+        self.late = 0
+        self.reconnects = 0
+        # Every event of the shard with a seq above it went through the feed, and is still among its recent ones
+        self.recent_floor = 0
+
+        # The events published above resume_seq, with the time they were, as a heap
+        self._ahead: List[Tuple[int, float]] = []
+        self._ahead_seqs: Set[int] = set()
+
+        self._connection: Optional[asyncpg.Connection] = None
+        self._connection_lost = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def connected(self) -> bool:
+        return self._connection is not None and not self._connection.is_closed()
+
+    async def start(self) -> None:
+        self.resume_seq = await self.changes_repo.get_settled_change_seq(gap_timeout=self.gap_timeout)
+        self.last_seq = self.recent_floor = self.resume_seq
+        await self._listen()
+        await self._catch_up()
+        self._tasks = [
+            asyncio.create_task(self._reconnect_forever()),
+            asyncio.create_task(self._prune_forever()),
+        ]
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._connection is not None:
+            await self._connection.close()
+
+    async def get_changes(
+            self,
+            *,
+            after: int,
+            since: Optional[datetime] = None,
+            project_id: Optional[int] = None,
+    ) -> List[ChangeEvent]:
+        """
+        :return: A page of the logged changes with a seq above after, see ChangesRepository.get_changes
+        """
+        events = await self.changes_repo.get_changes(
+            after=after, since=since, project_id=project_id, limit=self.page_size,
+        )
+        for event in events:
+            event.shard = self.index
+
+        return events
+
+    async def _listen(self) -> None:
+        self._connection = await asyncpg.connect(self.dsn)
+        self._connection.add_termination_listener(self._on_termination)
+        await self._connection.add_listener(CHANGES_CHANNEL, self._on_notification)
+
+    def _on_termination(self, connection: asyncpg.Connection) -> None:
+        # Connections given up on by _reconnect_forever aren't news
+        if connection is self._connection:
+            self._connection_lost.set()
+
+    def _abandon_connection(self) -> None:
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            connection.terminate()
+
+    async def _reconnect_forever(self) -> None:
+        while True:
+            await self._connection_lost.wait()
+            self._connection_lost.clear()
+            self.reconnects += 1
+            logger.warning(f"Change feed connection to {self.name} lost, reconnecting")
+            self._abandon_connection()
+
+            attempt = 0
+            while True:
+                try:
+                    await self._listen()
+                    # Listening again before reading the log, so that nothing falls in between -
+                    # events both notified and read are published once
+                    await self._catch_up()
+                    break
+                except Exception as e:
+                    self._abandon_connection()
+                    delay = min(self.reconnect_backoff * 2 ** attempt, 30.0)
+                    attempt += 1
+                    logger.warning(f"Change feed reconnection to {self.name} failed ({e}), retrying in {delay}s")
+                    await asyncio.sleep(delay)
+
+    async def _catch_up(self) -> None:
+        after = self.resume_seq
+        while True:
+            events = await self.get_changes(after=after)
+            for event in events:
+                self.publish(event)
+            if len(events) < self.page_size:
+                return
+            after = events[-1].seq
+
+    async def _prune_forever(self) -> None:
+        # Every worker prunes - the deletes are idempotent, and it saves electing one
+        while True:
+            await asyncio.sleep(self.prune_interval)
+            try:
+                await self.changes_repo.prune_changes(retention=self.retention)
+            except Exception as e:
+                logger.warning(f"Change log pruning on {self.name} failed ({e})")
+
+    def _on_notification(self, connection: asyncpg.Connection, pid: int, channel: str, payload: str) -> None:
+        self.publish(ChangeEvent.from_payload(payload, self.index))
+
+    def published_already(self, seq: int) -> bool:
+        """
+        Whether the event is one of those published above resume_seq - the others are among the feed's recent ones
+        """
+        return seq in self._ahead_seqs
+
+    def track(self, seq: int) -> None:
+        """
+        Records the publication of the change seq, moving resume_seq up if it can
+        """
+        self.last_seq = max(self.last_seq, seq)
+        if seq > self.resume_seq:
+            heapq.heappush(self._ahead, (seq, time.monotonic()))
+            self._ahead_seqs.add(seq)
+            self.settle()
+        else:
+            # Its transaction ran longer than gap_timeout, clients that resumed in the meantime missed it
+            self.late += 1
+            logger.warning(f"Change {seq} of {self.name} committed after its seq was given up on")
+
+    def settle(self) -> None:
+        """
+        Moves resume_seq up over the events published in seq order, and over the holes older than gap_timeout
+        """
+        now = time.monotonic()
+        while self._ahead:
+            seq, published_at = self._ahead[0]
+            if seq != self.resume_seq + 1 and now - published_at < self.gap_timeout:
+                return
+            heapq.heappop(self._ahead)
+            self._ahead_seqs.discard(seq)
+            self.resume_seq = seq
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "connected": self.connected,
+            "last_seq": self.last_seq,
+            "resume_seq": self.resume_seq,
+            "late": self.late,
+            "reconnects": self.reconnects,
+        }
+
+
+class ChangeFeed:
+    """
+    Listens to the change notifications of every shard, on one connection per shard and worker, and fans them out
+    to the subscriptions of the worker's clients in memory - each event is decoded and encoded once, whatever
+    the number of subscribers.
+
+    The most recent events are kept in memory too, so that clients reconnecting after a short break
+    (e.g. every client of a restarted worker) resume without reading the log.
+    """
+
+    def __init__(
+            self,
+            sources: Sequence[Tuple[str, "ChangesRepository"]],
+            *,
+            queue_size: int,
+            max_subscribers: int,
+            recent_size: int,
+            page_size: int,
+            retention: float,
+            prune_interval: float,
+            heartbeat: float,
+            reconnect_backoff: float,
+            gap_timeout: float,
+    ) -> None:
+        """
+        :param sources: The DSN and the change log of each shard, in shard order
+        """
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.page_size = page_size
+        self.retention = retention
+        self.heartbeat = heartbeat
+        self.shards = [
+            ShardChanges(
+                index, dsn,
+                changes_repo=changes_repo,
+                publish=self.publish,
+                page_size=page_size,
+                retention=retention,
+                prune_interval=prune_interval,
+                gap_timeout=gap_timeout,
+                reconnect_backoff=reconnect_backoff,
+            )
+            for index, (dsn, changes_repo) in enumerate(sources)
+        ]
+
+        # Keyed by the project subscribed to, None for the subscriptions to every project
+        self.subscriptions: Dict[Optional[int], Set[Subscription]] = defaultdict(set)
+        self.subscribers = 0
+        self.published = 0
+        self.overflows = 0
+
+        self._recent: deque = deque()
+        # (shard, seq) of the events in _recent
+        self._recent_seqs: Set[Tuple[int, int]] = set()
+        self._recent_size = recent_size
+
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def connected(self) -> bool:
+        return all(shard.connected for shard in self.shards)
+
+    @property
+    def cursor(self) -> str:
+        """
+        Where a client that got every event published so far resumes from
+        """
+        return format_change_cursor(shard.resume_seq for shard in self.shards)
+
+    async def start(self) -> None:
+        for shard in self.shards:
+            await shard.start()
+        self._tasks = [asyncio.create_task(self._heartbeat_forever())]
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for shard in self.shards:
+            await shard.close()
+
+    def parse_cursor(self, cursor: Optional[str]) -> Optional[ChangeCursor]:
+        """
+        :return: The seq of each shard - 0 for the shards added since the cursor was sent, which are read
+         from the start of their log
+        """
+        if cursor is None:
+            return None
+
+        seqs = tuple(int(seq) for seq in cursor.split(".")) if re.match(CHANGE_CURSOR_PATTERN, cursor) else ()
+        if not seqs or len(seqs) > len(self.shards):
+            raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="Invalid change cursor.")
+
+        return seqs + (0,) * (len(self.shards) - len(seqs))
+
+    async def _heartbeat_forever(self) -> None:
+        # One timer for all the subscriptions, rather than one per subscription and read
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            for shard in self.shards:
+                shard.settle()
+            for subscriptions in list(self.subscriptions.values()):
+                for subscription in list(subscriptions):
+                    subscription.heartbeat()
+
+    def publish(self, event: ChangeEvent) -> None:
+        shard = self.shards[event.shard]
+        if shard.published_already(event.seq) or not self._remember(event):
+            return
+
+        shard.track(event.seq)
+        event.cursor = self.cursor
+
+        self.published += 1
+        overflowed = []
+        for key in (None, event.project_id):
+            for subscription in self.subscriptions.get(key, ()):
+                if not subscription.put(event):
+                    overflowed.append(subscription)
+
+        for subscription in overflowed:
+            subscription.overflowed = True
+            self._unsubscribe(subscription)
+            self.overflows += 1
+
+    def _remember(self, event: ChangeEvent) -> bool:
+        """
+        Keeps the event among the recent ones, False if it already was
+        """
+        if (event.shard, event.seq) in self._recent_seqs:
+            return False
+
+        self._recent.append(event)
+        self._recent_seqs.add((event.shard, event.seq))
+        if len(self._recent) > self._recent_size:
+            forgotten = self._recent.popleft()
+            self._recent_seqs.discard((forgotten.shard, forgotten.seq))
+            shard = self.shards[forgotten.shard]
+            shard.recent_floor = max(shard.recent_floor, forgotten.seq)
+
+        return True
+
+    def remembers(self, *, after: ChangeCursor) -> bool:
+        """
+        Whether every event past after is among the recent ones
+        """
+        return self.connected and all(seq >= shard.recent_floor for shard, seq in zip(self.shards, after))
+
+    def recent(self, *, after: ChangeCursor, project_id: Optional[int] = None) -> Optional[List[ChangeEvent]]:
+        """
+        :return: The events past after, from memory - None if they may not all be there anymore
+        """
+        if not self.remembers(after=after):
+            return None
+
+        return [
+            event for event in self._recent
+            if event.seq > after[event.shard] and (project_id is None or event.project_id == project_id)
+        ]
+
+    def check_capacity(self) -> None:
+        if self.subscribers >= self.max_subscribers:
+            raise HTTPException(
+                status_code=HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many change feed subscribers on this worker, retry later.",
+                headers={"Retry-After": "5"},
+            )
+
+    @contextlib.contextmanager
+    def subscribe(self, *, project_id: Optional[int] = None) -> Iterator[Subscription]:
+        """
+        Subscribes to the events published from now on, of every project or of one, until the block exits
+        """
+        self.check_capacity()
+        subscription = Subscription(project_id=project_id, queue_size=self.queue_size)
+        self.subscriptions[project_id].add(subscription)
+        self.subscribers += 1
+        try:
+            yield subscription
+        finally:
+            if not subscription.overflowed:
+                self._unsubscribe(subscription)
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self.subscriptions[subscription.project_id]
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self.subscriptions[subscription.project_id]
+        self.subscribers -= 1
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "subscribers": self.subscribers,
+            "cursor": self.cursor,
+            "published": self.published,
+            "overflows": self.overflows,
+            "recent": len(self._recent),
+            "shards": [shard.stats() for shard in self.shards],
+        }
@@ -1,24 +1,95 @@
+import asyncio
 import os
+from datetime import datetime, timedelta, timezone
 from fastapi import FastAPI
 from databases import Database
-from app.core.config import DATABASE_URL
+from app.core.config import (
+    CACHE_BACKEND, CACHE_MAX_ENTRIES, CACHE_REDIS_URL, CACHE_TTL_SECONDS, CHANGE_FEED_ENABLED, CHANGE_FEED_GAP_TIMEOUT,
+    CHANGE_FEED_HEARTBEAT, CHANGE_FEED_MAX_SUBSCRIBERS, CHANGE_FEED_PAGE_SIZE, CHANGE_FEED_PRUNE_INTERVAL,
+    CHANGE_FEED_QUEUE_SIZE, CHANGE_FEED_RECENT_SIZE, CHANGE_FEED_RETENTION, DATABASE_REPLICA_URLS, DATABASE_SHARD_URLS,
+    DATABASE_URL,
+    DB_BACKEND, DB_COMMAND_TIMEOUT, DB_CONNECT_RETRIES, DB_CONNECT_RETRY_BACKOFF, DB_CONNECT_TIMEOUT,
+    DB_MAX_INACTIVE_CONNECTION_LIFETIME, DB_MAX_QUERIES_PER_CONNECTION, DB_POOL_MAX_SIZE, DB_POOL_MIN_SIZE,
+    DB_REPLICA_CHECK_INTERVAL, DB_REPLICA_MAX_LAG, DB_STATEMENT_CACHE_SIZE, IDEMPOTENCY_KEY_TTL,
+    IDEMPOTENCY_PRUNE_INTERVAL, JOB_LEASE, JOB_POLL_INTERVAL, JOB_RETENTION, JOB_RETRY_BACKOFF, JOB_RETRY_MAX_BACKOFF,
+    JOB_SHUTDOWN_TIMEOUT, JOB_WORKERS, PROJECT_ARCHIVE_COMPLETED_AFTER, PROJECT_ARCHIVE_CREATED_AFTER,
+    PROJECT_ARCHIVE_ENABLED, PROJECT_ARCHIVE_RETENTION, PROJECT_MAINTENANCE_BATCH_SIZE, PROJECT_MAINTENANCE_INTERVAL,
+    PROJECT_PURGE_AFTER, SHARD_PLACEMENT_REFRESH_INTERVAL, SHARD_VIRTUAL_NODES,
+)
+from app.db.asyncpg_backend import AsyncpgDatabase
+from app.db.cache import create_cache
+from app.db.changes import ChangeFeed
+from app.db.job_handlers import JOB_HANDLERS
+from app.db.jobs import JobRunner
+from app.db.pool import instrument_pool, warm_pool
+from app.db.replicas import Replica, ReplicaSet
+from app.db.repositories.changes import ChangesRepository
+from app.db.repositories.idempotency import IdempotencyRepository
+from app.db.repositories.jobs import JobsRepository
+from app.db.repositories.projects import ProjectsRepository
+from app.db.shards import Shard, ShardSet
 import logging
 
 logger = logging.getLogger(__name__)
 
+# DB_BACKEND -> the class of the databases, both take the options of asyncpg.create_pool
+DATABASE_BACKENDS = {"databases": Database, "asyncpg": AsyncpgDatabase}
 
-async def connect_to_db(app: FastAPI) -> None:
+
+def create_database(url: str, backend: str = DB_BACKEND) -> Database:
+    """
+    A databases.Database, or an AsyncpgDatabase, whose asyncpg pool is configured from app.core.config
+    """
+    if backend not in DATABASE_BACKENDS:
+        raise ValueError(f"Unknown DB_BACKEND {backend!r}, expected one of {', '.join(DATABASE_BACKENDS)}")
+
+    return DATABASE_BACKENDS[backend](
+        url,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        timeout=DB_CONNECT_TIMEOUT,
+        command_timeout=DB_COMMAND_TIMEOUT,
+        statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+        max_queries=DB_MAX_QUERIES_PER_CONNECTION,
+        max_inactive_connection_lifetime=DB_MAX_INACTIVE_CONNECTION_LIFETIME,
+    )
+
+
+async def connect_with_retries(database: Database) -> None:
+    """
+    Connects and warms the pool to its min size, retrying with exponential backoff.
+    Raises once the retries are exhausted - an app without a database must not start serving requests.
+    """
+    for attempt in range(1, DB_CONNECT_RETRIES + 1):
+        try:
+            await database.connect()
+            await warm_pool(database, DB_POOL_MIN_SIZE)
+            return
+        except Exception as e:
+            if database.is_connected:
+                await database.disconnect()
+            if attempt == DB_CONNECT_RETRIES:
+                logger.error("--- DB CONNECTION ERROR ---")
+                logger.error(e)
+                logger.error("--- DB CONNECTION ERROR ---")
+                raise
+
+            delay = DB_CONNECT_RETRY_BACKOFF * 2 ** (attempt - 1)
+            logger.warning(f"DB connection attempt {attempt}/{DB_CONNECT_RETRIES} failed ({e}), retrying in {delay}s")
+            await asyncio.sleep(delay)
+
+
+def database_url(url: str = DATABASE_URL) -> str:
     # if TESTING, Turn postgres into postgres_test
-    DB_URL = f"{DATABASE_URL}_test" if os.environ.get("TESTING") else DATABASE_URL
-    database = Database(DB_URL, min_size=2, max_size=10) # these can be configured in config as well
+    return f"{url}_test" if os.environ.get("TESTING") else str(url)
 
-    try:
-        await database.connect()
-        app.state._db = database
-    except Exception as e:
-        logger.warning("--- DB CONNECTION ERROR ---")
-        logger.warning(e)
-        logger.warning("--- DB CONNECTION ERROR ---")
+
+async def connect_to_db(app: FastAPI) -> None:
+    database = create_database(database_url())
+
+    await connect_with_retries(database)
+    app.state._db = database
+    app.state._db_pool_stats = instrument_pool(database)
 
 
 async def close_db_connection(app: FastAPI) -> None:
@@ -30,4 +101,221 @@ async def close_db_connection(app: FastAPI) -> None:
     except Exception as e:
         logger.warning("--- DB DISCONNECT ERROR ---")
         logger.warning(e)
-        logger.warning("--- DB DISCONNECT ERROR ---")
\ No newline at end of file
+        logger.warning("--- DB DISCONNECT ERROR ---")
+
+
+async def connect_to_replicas(app: FastAPI) -> None:
+    """
+    The read replicas of this worker, see app.db.replicas - unlike the primary, a replica that is down
+    doesn't stop the app from starting, reads go to the primary until it is back
+    """
+    app.state._replicas = None
+    if not DATABASE_REPLICA_URLS:
+        return
+
+    replicas = ReplicaSet(
+        [Replica(url, create_database(database_url(url))) for url in DATABASE_REPLICA_URLS],
+        max_lag=DB_REPLICA_MAX_LAG,
+        check_interval=DB_REPLICA_CHECK_INTERVAL,
+    )
+    await replicas.start()
+    app.state._replicas = replicas
+
+
+async def close_replicas(app: FastAPI) -> None:
+    try:
+        if app.state._replicas is not None:
+            await app.state._replicas.close()
+    except Exception as e:
+        logger.warning("--- REPLICAS DISCONNECT ERROR ---")
+        logger.warning(e)
+        logger.warning("--- REPLICAS DISCONNECT ERROR ---")
+
+
+async def connect_to_shards(app: FastAPI) -> None:
+    """
+    The database shards of this worker, see app.db.shards - the first one is the app's database. Every shard
+    holds workspaces, the app doesn't start without all of them.
+    """
+    shards = [Shard(0, DATABASE_URL, app.state._db)]
+    try:
+        for index, url in enumerate(DATABASE_SHARD_URLS, start=1):
+            database = create_database(database_url(url))
+            await connect_with_retries(database)
+            shards.append(Shard(index, url, database))
+    except Exception:
+        for shard in shards[1:]:
+            await shard.database.disconnect()
+        raise
+
+    shard_set = ShardSet(shards, virtual_nodes=SHARD_VIRTUAL_NODES, refresh_interval=SHARD_PLACEMENT_REFRESH_INTERVAL)
+    await shard_set.start()
+    app.state._shards = shard_set
+
+
+async def close_shards(app: FastAPI) -> None:
+    try:
+        await app.state._shards.close()
+    except Exception as e:
+        logger.warning("--- SHARDS DISCONNECT ERROR ---")
+        logger.warning(e)
+        logger.warning("--- SHARDS DISCONNECT ERROR ---")
+
+
+async def create_repository_cache(app: FastAPI) -> None:
+    """
+    The cache shared by all the repositories of this worker, see app.db.cache
+    """
+    app.state._cache = create_cache(
+        CACHE_BACKEND, ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, redis_url=CACHE_REDIS_URL,
+    )
+
+
+async def close_repository_cache(app: FastAPI) -> None:
+    try:
+        await app.state._cache.close()
+    except Exception as e:
+        logger.warning("--- CACHE CLOSE ERROR ---")
+        logger.warning(e)
+        logger.warning("--- CACHE CLOSE ERROR ---")
+
+
+async def start_change_feed(app: FastAPI) -> None:
+    """
+    The change feed of this worker, see app.db.changes - listens to every shard, on a connection of its own
+    per shard outside the pools
+    """
+    app.state._change_feed = None
+    if not CHANGE_FEED_ENABLED:
+        return
+
+    feed = ChangeFeed(
+        [(database_url(shard.url), ChangesRepository(shard.database)) for shard in app.state._shards.shards],
+        queue_size=CHANGE_FEED_QUEUE_SIZE,
+        max_subscribers=CHANGE_FEED_MAX_SUBSCRIBERS,
+        recent_size=CHANGE_FEED_RECENT_SIZE,
+        page_size=CHANGE_FEED_PAGE_SIZE,
+        retention=CHANGE_FEED_RETENTION,
+        prune_interval=CHANGE_FEED_PRUNE_INTERVAL,
+        heartbeat=CHANGE_FEED_HEARTBEAT,
+        gap_timeout=CHANGE_FEED_GAP_TIMEOUT,
+        reconnect_backoff=DB_CONNECT_RETRY_BACKOFF,
+    )
+    await feed.start()
+    app.state._change_feed = feed
+
+
+async def stop_change_feed(app: FastAPI) -> None:
+    try:
+        if app.state._change_feed is not None:
+            await app.state._change_feed.close()
+    except Exception as e:
+        logger.warning("--- CHANGE FEED CLOSE ERROR ---")
+        logger.warning(e)
+        logger.warning("--- CHANGE FEED CLOSE ERROR ---")
+
+
+async def prune_idempotency_keys_forever(idempotency_repo: IdempotencyRepository) -> None:
+    while True:
+        try:
+            await idempotency_repo.prune_keys(ttl=IDEMPOTENCY_KEY_TTL)
+        except Exception as e:
+            logger.warning(f"Pruning the idempotency keys failed ({e}), retrying in {IDEMPOTENCY_PRUNE_INTERVAL}s")
+        await asyncio.sleep(IDEMPOTENCY_PRUNE_INTERVAL)
+
+
+async def start_idempotency_pruner(app: FastAPI) -> None:
+    """
+    Deletes the expired Idempotency-Key responses on every shard - the reads skip them already, they only take space
+    """
+    app.state._idempotency_pruner = asyncio.gather(*(
+        prune_idempotency_keys_forever(IdempotencyRepository(shard.database, workspace=None))
+        for shard in app.state._shards.shards
+    ))
+
+
+async def stop_idempotency_pruner(app: FastAPI) -> None:
+    app.state._idempotency_pruner.cancel()
+    await asyncio.gather(app.state._idempotency_pruner, return_exceptions=True)
+
+
+async def maintain_projects(projects_repo: ProjectsRepository) -> None:
+    """
+    Purges the deleted projects, then archives the old ones and drops the expired archive partitions.
+    Every statement is a batch of its own - each one's locks are released before the next one starts.
+    """
+    while await projects_repo.purge_deleted_projects(
+            older_than=PROJECT_PURGE_AFTER, limit=PROJECT_MAINTENANCE_BATCH_SIZE,
+    ) == PROJECT_MAINTENANCE_BATCH_SIZE:
+        await asyncio.sleep(0)
+
+    if not PROJECT_ARCHIVE_ENABLED:
+        return
+
+    while await projects_repo.archive_projects(
+            completed_after=PROJECT_ARCHIVE_COMPLETED_AFTER,
+            created_after=PROJECT_ARCHIVE_CREATED_AFTER,
+            limit=PROJECT_MAINTENANCE_BATCH_SIZE,
+    ) == PROJECT_MAINTENANCE_BATCH_SIZE:
+        await asyncio.sleep(0)
+
+    if PROJECT_ARCHIVE_RETENTION:
+        before = datetime.now(timezone.utc) - timedelta(seconds=PROJECT_ARCHIVE_RETENTION)
+        for name in await projects_repo.drop_archive_partitions(before=before):
+            logger.info(f"Dropped the archive partition {name}")
+
+
+async def maintain_projects_forever(projects_repo: ProjectsRepository) -> None:
+    while True:
+        try:
+            await maintain_projects(projects_repo)
+        except Exception as e:
+            logger.warning(f"Project maintenance failed ({e}), retrying in {PROJECT_MAINTENANCE_INTERVAL}s")
+        await asyncio.sleep(PROJECT_MAINTENANCE_INTERVAL)
+
+
+async def start_project_maintenance(app: FastAPI) -> None:
+    """
+    Purges and archives projects in the background, see maintain_projects - every worker runs it on every shard,
+    they skip the rows another one is on
+    """
+    app.state._project_maintenance = asyncio.gather(*(
+        maintain_projects_forever(ProjectsRepository(shard.database, cache=app.state._cache, workspace=None))
+        for shard in app.state._shards.shards
+    ))
+
+
+async def stop_project_maintenance(app: FastAPI) -> None:
+    app.state._project_maintenance.cancel()
+    await asyncio.gather(app.state._project_maintenance, return_exceptions=True)
+
+
+async def start_job_runner(app: FastAPI) -> None:
+    """
+    The background jobs of this worker, see app.db.jobs
+    """
+    runner = JobRunner(
+        jobs_repo=JobsRepository(app.state._db),
+        database=app.state._db,
+        cache=app.state._cache,
+        handlers=JOB_HANDLERS,
+        workers=JOB_WORKERS,
+        poll_interval=JOB_POLL_INTERVAL,
+        lease=JOB_LEASE,
+        retry_backoff=JOB_RETRY_BACKOFF,
+        retry_max_backoff=JOB_RETRY_MAX_BACKOFF,
+        retention=JOB_RETENTION,
+        shutdown_timeout=JOB_SHUTDOWN_TIMEOUT,
+        shards=app.state._shards,
+    )
+    await runner.start()
+    app.state._job_runner = runner
+
+
+async def stop_job_runner(app: FastAPI) -> None:
+    try:
+        await app.state._job_runner.close()
+    except Exception as e:
+        logger.warning("--- JOB RUNNER CLOSE ERROR ---")
+        logger.warning(e)
+        logger.warning("--- JOB RUNNER CLOSE ERROR ---")
@@ -0,0 +1,87 @@
+from datetime import timedelta
+from typing import Dict, List
+
+from databases import Database
+
+from app.core.config import BULK_MAX_BATCH_SIZE, DEFAULT_WORKSPACE
+from app.db.jobs import Handler, JobContext
+from app.db.repositories.projects import ProjectsRepository
+from app.db.repositories.reports import ReportsRepository
+from app.models.job import JobKind
+from app.models.project import ProjectCreate
+
+# Batches of the counters recomputation - each one blocks the writes to the table it counts while it runs
+RECOMPUTE_PROJECTS_BATCH_SIZE = 1000
+RECOMPUTE_DAYS_BATCH_SIZE = 31
+
+
+async def import_projects(context: JobContext) -> dict:
+    """
+    Creates the projects of payload["new_projects"] (validated when queued, each with its index in the request,
+    and counted as the progress total), BULK_MAX_BATCH_SIZE per transaction - each one commits with the job's
+    progress, a retry resumes after the last batch committed. The result is shaped like a BulkResult, whose results
+    only list the rejected items.
+
+    The projects go to the shard of payload["workspace_id"]. On another shard than the jobs', the progress
+    is saved right after the batch commits - a retry after a crash in between imports that batch again.
+    """
+    items = context.job.payload["new_projects"]
+    workspace = context.job.payload.get("workspace_id", DEFAULT_WORKSPACE)
+    result = context.job.result or {"succeeded": 0, "failed": 0, "results": []}
+    database = context.shards.shard_for(workspace).database if context.shards else context.database
+    projects_repo = ProjectsRepository(database, cache=context.cache, workspace=workspace)
+
+    for start in range(context.job.progress.done, len(items), BULK_MAX_BATCH_SIZE):
+        batch = [ProjectCreate.model_validate(item["project"]) for item in items[start:start + BULK_MAX_BATCH_SIZE]]
+        # Retried later, on the workspace's new shard
+        if context.shards and context.shards.is_moving(workspace):
+            raise RuntimeError(f"The workspace {workspace} is being moved to another shard")
+
+        async with projects_repo.db.transaction():
+            created_projects = await projects_repo.bulk_create_projects(new_projects=batch)
+            result = {**result, "succeeded": result["succeeded"] + len(created_projects)}
+            if database is context.database:
+                await context.progress(start + len(batch), total=len(items), result=result)
+        if database is not context.database:
+            await context.progress(start + len(batch), total=len(items), result=result)
+
+    return result
+
+
+async def recompute_counts(context: JobContext) -> dict:
+    """
+    Recomputes the task counters of every project, then the due date counters of every day, in batches - on
+    every shard, one after the other. Progress counts the projects and the days done.
+    """
+    databases: List[Database] = (
+        [shard.database for shard in context.shards.shards] if context.shards else [context.database]
+    )
+    reports_repos = [ReportsRepository(database, cache=context.cache) for database in databases]
+    bounds = [await reports_repo.get_recompute_bounds() for reports_repo in reports_repos]
+    shard_days = [(last_day - first_day).days + 1 if first_day else 0 for _, first_day, last_day in bounds]
+    projects, days = sum(shard_projects for shard_projects, _, _ in bounds), sum(shard_days)
+    total, done = projects + days, 0
+    await context.progress(done, total=total)
+
+    for reports_repo, (_, first_day, last_day), days_count in zip(reports_repos, bounds, shard_days):
+        after = 0
+        while project_ids := await reports_repo.recompute_task_counts(
+                after=after, limit=RECOMPUTE_PROJECTS_BATCH_SIZE,
+        ):
+            after, done = project_ids[-1], done + len(project_ids)
+            await context.progress(done, total=total)
+
+        for offset in range(0, days_count, RECOMPUTE_DAYS_BATCH_SIZE):
+            start = first_day + timedelta(days=offset)
+            end = min(start + timedelta(days=RECOMPUTE_DAYS_BATCH_SIZE), last_day + timedelta(days=1))
+            await reports_repo.recompute_report_counts(start=start, end=end)
+            done += (end - start).days
+            await context.progress(done, total=total)
+
+    return {"projects": projects, "days": days}
+
+
+JOB_HANDLERS: Dict[str, Handler] = {
+    JobKind.import_projects.value: import_projects,
+    JobKind.recompute_counts.value: recompute_counts,
+}
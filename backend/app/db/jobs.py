@@ -0,0 +1,231 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional
+
+from databases import Database
+
+from app.db.cache import BaseCache
+from app.models.job import JobInDB, JobStatus
+
+if TYPE_CHECKING:
+    from app.db.repositories.jobs import JobsRepository
+    from app.db.shards import ShardSet
+
+logger = logging.getLogger(__name__)
+
+
+class JobLost(Exception):
+    """
+    The job's lease expired and it was requeued - the worker running it must stop, another one runs it anew
+    """
+
+
+class JobContext:
+    """
+    What a job's handler runs with - the job, with its payload and the progress saved by its earlier attempts,
+    and the handles the repositories it uses need. database is the jobs' own (the first shard), shards all of them.
+    """
+
+    def __init__(
+            self,
+            job: JobInDB,
+            *,
+            jobs_repo: "JobsRepository",
+            database: Database,
+            cache: BaseCache,
+            lease: float,
+            shards: Optional["ShardSet"] = None,
+    ) -> None:
+        self.job = job
+        self.jobs_repo = jobs_repo
+        self.database = database
+        self.cache = cache
+        self.lease = lease
+        self.shards = shards
+
+    async def progress(self, done: int, total: Optional[int] = None, result: Optional[dict] = None) -> None:
+        """
+        Saves the job's progress, and its partial result - in the transaction of the work it reports, if any,
+        so that a retry picks up exactly where this attempt committed.
+        Raises JobLost, rolling that transaction back, if the job isn't this worker's anymore.
+        """
+        if not await self.jobs_repo.update_progress(
+                job=self.job, done=done, total=total, result=result, lease=self.lease,
+        ):
+            raise JobLost(self.job.id)
+
+
+Handler = Callable[[JobContext], Awaitable[Optional[dict]]]
+
+
+class JobRunner:
+    """
+    Runs the jobs queued in the jobs table, up to workers at once in this worker process. Every process claims
+    its jobs with FOR UPDATE SKIP LOCKED, a job runs once at a time whatever the number of processes.
+
+    Idle workers poll the queue every poll_interval seconds, or start at once on wake() - called when a job
+    is queued by this process. A running job's lease is renewed every lease / 3 seconds, a job whose lease expired
+    (its process died) is requeued by the other processes. Failed jobs are retried after an exponential backoff,
+    up to their max_attempts. On close, running jobs get shutdown_timeout seconds to finish, then go back to the queue.
+    """
+
+    def __init__(
+            self,
+            *,
+            jobs_repo: "JobsRepository",
+            database: Database,
+            cache: BaseCache,
+            handlers: Dict[str, Handler],
+            workers: int,
+            poll_interval: float,
+            lease: float,
+            retry_backoff: float,
+            retry_max_backoff: float,
+            retention: float,
+            shutdown_timeout: float,
+            shards: Optional["ShardSet"] = None,
+    ) -> None:
+        self.jobs_repo = jobs_repo
+        self.database = database
+        self.cache = cache
+        self.shards = shards
+        self.handlers = handlers
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.retry_backoff = retry_backoff
+        self.retry_max_backoff = retry_max_backoff
+        self.retention = retention
+        self.shutdown_timeout = shutdown_timeout
+        self.running: Dict[int, JobInDB] = {}
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._reaper: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._reaper = asyncio.create_task(self._reap_forever())
+
+    async def close(self) -> None:
+        self._stopping = True
+        self._wakeup.set()
+
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=self.shutdown_timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def retry_delay(self, attempt: int) -> float:
+        return min(self.retry_backoff * 2 ** (attempt - 1), self.retry_max_backoff)
+
+    async def _work(self) -> None:
+        while not self._stopping:
+            try:
+                job = await self.jobs_repo.claim_job(lease=self.lease)
+            except Exception as e:
+                logger.warning(f"Claiming a job failed ({e}), retrying in {self.poll_interval}s")
+                job = None
+
+            if job is not None:
+                await self._run(job)
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self, job: JobInDB) -> None:
+        context = JobContext(
+            job,
+            jobs_repo=self.jobs_repo,
+            database=self.database,
+            cache=self.cache,
+            lease=self.lease,
+            shards=self.shards,
+        )
+        self.running[job.id] = job
+        renewer = asyncio.create_task(self._renew_lease(job))
+
+        try:
+            handler = self.handlers.get(job.kind.value)
+            if handler is None:
+                raise LookupError(f"No handler for the jobs of kind {job.kind.value}")
+
+            result = await handler(context)
+        except JobLost:
+            logger.warning(f"Job {job.id} was requeued while running, its attempt {job.attempts} stopped")
+        except asyncio.CancelledError:
+            # Shutting down - back to the queue, then let the cancellation through
+            await self._settle(self.jobs_repo.release_job(job=job))
+            raise
+        except Exception as e:
+            status = await self._settle(self.jobs_repo.fail_job(
+                job=job, error=str(e) or type(e).__name__, retry_delay=self.retry_delay(job.attempts),
+            ))
+            if status == JobStatus.failed:
+                self.failed += 1
+                logger.error(f"Job {job.id} ({job.kind.value}) failed for good at attempt {job.attempts}: {e}")
+            elif status == JobStatus.queued:
+                self.retried += 1
+                logger.warning(f"Job {job.id} ({job.kind.value}) failed at attempt {job.attempts}, to retry: {e}")
+        else:
+            if await self._settle(self.jobs_repo.complete_job(job=job, result=result)):
+                self.succeeded += 1
+            else:
+                logger.warning(f"Job {job.id} was requeued while running, the result of attempt {job.attempts} is lost")
+        finally:
+            renewer.cancel()
+            self.running.pop(job.id, None)
+
+    async def _settle(self, update: Awaitable[Any]) -> Any:
+        """
+        Records how the job ended - when the database can't be reached, the lease expires instead and the job is retried
+        """
+        try:
+            return await update
+        except Exception as e:
+            logger.warning(f"Saving the outcome of a job failed ({e}), it will be retried once its lease expires")
+
+    async def _renew_lease(self, job: JobInDB) -> None:
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                if not await self.jobs_repo.renew_lease(job=job, lease=self.lease):
+                    return
+            except Exception as e:
+                logger.warning(f"Renewing the lease of job {job.id} failed ({e})")
+
+    async def _reap_forever(self) -> None:
+        while True:
+            try:
+                requeued = await self.jobs_repo.requeue_expired_jobs()
+                if requeued:
+                    logger.warning(f"Requeued the jobs {requeued}, whose worker stopped responding")
+                    self.wake()
+                await self.jobs_repo.prune_jobs(retention=self.retention)
+            except Exception as e:
+                logger.warning(f"Requeuing the expired jobs failed ({e})")
+            await asyncio.sleep(self.lease / 3)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "running": len(self.running),
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
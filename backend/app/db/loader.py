@@ -0,0 +1,93 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+from weakref import WeakKeyDictionary
+
+from databases import Database
+
+from app.db.recorder import unwrap
+
+# Ref - https://github.com/graphql/dataloader#batching
+
+LoadMany = Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+
+
+class BatchLoader:
+    """
+    Coalesces the lookups of single keys made during one iteration of the event loop - e.g. the cache misses
+    of concurrent requests - into one load_many of all their keys, at most max_batch_size at once.
+    Keys load_many doesn't return resolve to None.
+    """
+
+    def __init__(self, load_many: LoadMany, *, max_batch_size: int) -> None:
+        self.load_many = load_many
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.keys = 0
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+
+    async def load(self, key: Hashable) -> Any:
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            if not self._pending:
+                # Runs once the lookups already scheduled in this iteration have been collected
+                loop.call_soon(self._dispatch)
+            future = self._pending[key] = loop.create_future()
+            if len(self._pending) >= self.max_batch_size:
+                self._dispatch()
+
+        # Shielded, so that a caller going away doesn't cancel the batch for everybody waiting on it
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        batch, self._pending = self._pending, {}
+        if batch:
+            asyncio.ensure_future(self._load(batch))
+
+    async def _load(self, batch: Dict[Hashable, asyncio.Future]) -> None:
+        self.batches += 1
+        self.keys += len(batch)
+        try:
+            values = await self.load_many(list(batch))
+        except asyncio.CancelledError:
+            for future in batch.values():
+                future.cancel()
+            raise
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(values.get(key))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "keys": self.keys,
+            "keys_per_batch": self.keys / self.batches if self.batches else 0.0,
+        }
+
+
+# One loader per event loop, database and kind of lookup - a batch runs on a single database, so that
+# the requests pinned to the primary (see app.db.replicas) are only ever batched with other primary reads
+_loaders: "WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, Database], BatchLoader]]" = WeakKeyDictionary()
+
+
+def get_batch_loader(
+        name: str, database: Database, load_many: Callable[[Database, List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+        *, max_batch_size: int,
+) -> BatchLoader:
+    """
+    :param load_many: Loads the values of a list of keys from database, keyed by key
+    """
+    loaders = _loaders.setdefault(asyncio.get_running_loop(), {})
+    key = (name, unwrap(database))
+
+    loader = loaders.get(key)
+    if loader is None:
+        loader = loaders[key] = BatchLoader(lambda keys: load_many(database, keys), max_batch_size=max_batch_size)
+
+    return loader
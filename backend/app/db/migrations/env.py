@@ -26,10 +26,12 @@ def run_migrations_online() -> None:
     """
     Run migrations in 'online' mode
     """
-    DB_URL = f"{DATABASE_URL}_test" if os.environ.get("TESTING") else str(DATABASE_URL)
+    # alembic -x url=... migrates another database than DATABASE_URL, e.g. a shard (python -m app shards init)
+    x_url = alembic.context.get_x_argument(as_dictionary=True).get("url")
+    DB_URL = x_url or (f"{DATABASE_URL}_test" if os.environ.get("TESTING") else str(DATABASE_URL))
 
     # Handle testing config for migrations
-    if os.environ.get("TESTING"):
+    if os.environ.get("TESTING") and not x_url:
         # Connect to primary db - postgres_test Specify the "AUTOCOMMIT" option for isolation_level to avoid manual
         # transaction management when creating databases.
         # Sqlalchemy always tries to run queries in a transaction,
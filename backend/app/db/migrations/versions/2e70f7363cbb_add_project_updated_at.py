@@ -0,0 +1,53 @@
+"""add_project_updated_at
+
+Revision ID: 2e70f7363cbb
+Revises: 60222ab3678d
+Create Date: 2026-10-18 19:32:07.164528
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = '2e70f7363cbb'
+down_revision = '60222ab3678d'
+branch_labels = None
+depends_on = None
+
+
+# clock_timestamp rather than now() (the start of the transaction), so that a long transaction
+# doesn't stamp its updates earlier than the ones committed while it ran
+SET_UPDATED_AT_FUNCTION = """
+    CREATE FUNCTION set_updated_at() RETURNS trigger AS $$
+    BEGIN
+        NEW.updated_at = clock_timestamp();
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+SET_UPDATED_AT_TRIGGER = """
+    CREATE TRIGGER set_projects_updated_at
+    BEFORE UPDATE ON projects
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+"""
+
+
+def upgrade() -> None:
+    # Existing rows get the time of the migration. now() is stable, so Postgres adds the column without
+    # rewriting the table, which a volatile default like clock_timestamp() would force.
+    op.add_column(
+        "projects",
+        sa.Column("updated_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+    op.execute(SET_UPDATED_AT_FUNCTION)
+    op.execute(SET_UPDATED_AT_TRIGGER)
+    # max(updated_at) of the whole table, for the ETag of unfiltered listings, is then a single index probe
+    op.create_index("ix_projects_updated_at", "projects", ["updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_projects_updated_at", table_name="projects")
+    op.execute("DROP TRIGGER set_projects_updated_at ON projects;")
+    op.execute("DROP FUNCTION set_updated_at();")
+    op.drop_column("projects", "updated_at")
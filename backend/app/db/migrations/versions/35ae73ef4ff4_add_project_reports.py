@@ -0,0 +1,135 @@
+"""add_project_reports
+
+Revision ID: 35ae73ef4ff4
+Revises: d306df102d86
+Create Date: 2026-10-18 21:47:23.904612
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = '35ae73ef4ff4'
+down_revision = 'd306df102d86'
+branch_labels = None
+depends_on = None
+
+
+# Stamps the time projects and tasks become done, for the throughput report - and clears it when they're reopened
+SET_COMPLETED_AT_FUNCTION = """
+    CREATE FUNCTION set_completed_at() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.status::text <> 'done' THEN
+            NEW.completed_at = NULL;
+        ELSIF TG_OP = 'INSERT' OR OLD.status::text <> 'done' THEN
+            NEW.completed_at = clock_timestamp();
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+# Projects done before completed_at existed count as completed at their last update. Tasks have no such
+# time, theirs stays unknown and out of the throughput. The backfill isn't an update of the projects,
+# neither their updated_at nor the change log are touched.
+BACKFILL_PROJECTS_COMPLETED_AT = """
+    UPDATE projects SET completed_at = updated_at WHERE status = 'done';
+"""
+
+DISABLE_BACKFILL_TRIGGERS = """
+    ALTER TABLE projects
+    DISABLE TRIGGER set_projects_updated_at, DISABLE TRIGGER projects_record_project_change;
+"""
+
+ENABLE_BACKFILL_TRIGGERS = """
+    ALTER TABLE projects
+    ENABLE TRIGGER set_projects_updated_at, ENABLE TRIGGER projects_record_project_change;
+"""
+
+# Keeps one counter row per (UTC due day, status) in step with the projects table, like project_task_counts.
+# Reports read a few rows per day from it, rather than every project.
+MAINTAIN_PROJECT_REPORT_COUNTS_FUNCTION = """
+    CREATE FUNCTION maintain_project_report_counts() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE project_report_counts
+            SET count = count - 1
+            WHERE due_day = (OLD.due_date AT TIME ZONE 'UTC')::date AND status = OLD.status::text;
+        END IF;
+
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO project_report_counts (due_day, status, count)
+            VALUES ((NEW.due_date AT TIME ZONE 'UTC')::date, NEW.status::text, 1)
+            ON CONFLICT (due_day, status) DO UPDATE SET count = project_report_counts.count + 1;
+        END IF;
+
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+MAINTAIN_PROJECT_REPORT_COUNTS_TRIGGER = """
+    CREATE TRIGGER projects_maintain_project_report_counts
+    AFTER INSERT OR DELETE OR UPDATE OF due_date, status ON projects
+    FOR EACH ROW EXECUTE FUNCTION maintain_project_report_counts();
+"""
+
+BACKFILL_PROJECT_REPORT_COUNTS = """
+    INSERT INTO project_report_counts (due_day, status, count)
+    SELECT (due_date AT TIME ZONE 'UTC')::date, status::text, count(*)
+    FROM projects
+    GROUP BY 1, 2;
+"""
+
+
+def upgrade() -> None:
+    for table in ("projects", "tasks"):
+        op.add_column(table, sa.Column("completed_at", sa.TIMESTAMP(timezone=True), nullable=True))
+    op.execute(DISABLE_BACKFILL_TRIGGERS)
+    op.execute(BACKFILL_PROJECTS_COMPLETED_AT)
+    op.execute(ENABLE_BACKFILL_TRIGGERS)
+    op.execute(SET_COMPLETED_AT_FUNCTION)
+    for table in ("projects", "tasks"):
+        op.execute(f"""
+            CREATE TRIGGER {table}_set_completed_at
+            BEFORE INSERT OR UPDATE OF status ON {table}
+            FOR EACH ROW EXECUTE FUNCTION set_completed_at();
+        """)
+        # Throughput - completions in a time range, an index only scan of the completed rows
+        op.create_index(
+            f"ix_{table}_completed_at", table, ["completed_at"], postgresql_where=sa.text("completed_at IS NOT NULL"),
+        )
+
+    # Status counts and due date histograms - an index only scan of a due date range, status included
+    op.create_index("ix_projects_due_date_status", "projects", ["due_date"], postgresql_include=["status"])
+    # Overdue projects, most overdue first - only the open ones are indexed, listed columns included
+    op.create_index(
+        "ix_projects_open_due_date_id",
+        "projects",
+        ["due_date", "id"],
+        postgresql_include=["title", "status"],
+        postgresql_where=sa.text("status <> 'done'"),
+    )
+
+    op.create_table(
+        "project_report_counts",
+        sa.Column("due_day", sa.Date, primary_key=True),
+        sa.Column("status", sa.Text, primary_key=True),
+        sa.Column("count", sa.BigInteger, nullable=False, server_default="0"),
+    )
+    op.execute(MAINTAIN_PROJECT_REPORT_COUNTS_FUNCTION)
+    op.execute(MAINTAIN_PROJECT_REPORT_COUNTS_TRIGGER)
+    op.execute(BACKFILL_PROJECT_REPORT_COUNTS)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER projects_maintain_project_report_counts ON projects;")
+    op.execute("DROP FUNCTION maintain_project_report_counts();")
+    op.drop_table("project_report_counts")
+    op.drop_index("ix_projects_open_due_date_id", table_name="projects")
+    op.drop_index("ix_projects_due_date_status", table_name="projects")
+    for table in ("projects", "tasks"):
+        op.drop_index(f"ix_{table}_completed_at", table_name=table)
+        op.execute(f"DROP TRIGGER {table}_set_completed_at ON {table};")
+        op.drop_column(table, "completed_at")
+    op.execute("DROP FUNCTION set_completed_at();")
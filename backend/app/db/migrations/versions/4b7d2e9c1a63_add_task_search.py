@@ -0,0 +1,44 @@
+"""add_task_search
+
+Revision ID: 4b7d2e9c1a63
+Revises: e3a91c5f7b20
+Create Date: 2026-10-19 09:12:37.804215
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic
+revision = '4b7d2e9c1a63'
+down_revision = 'e3a91c5f7b20'
+branch_labels = None
+depends_on = None
+
+
+# Same weighting and text search configuration as the projects' search_vector, see 60222ab3678d
+ADD_SEARCH_VECTOR = """
+    ALTER TABLE tasks
+    ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED;
+"""
+
+
+def upgrade() -> None:
+    # Adding a stored generated column rewrites the table - on a large table, run it in a maintenance window
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+    op.execute(ADD_SEARCH_VECTOR)
+    op.create_index("ix_tasks_search_vector", "tasks", ["search_vector"], postgresql_using="gin")
+    op.create_index(
+        "ix_tasks_title_trgm",
+        "tasks",
+        ["title"],
+        postgresql_using="gin",
+        postgresql_ops={"title": "gin_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tasks_title_trgm", table_name="tasks")
+    op.drop_index("ix_tasks_search_vector", table_name="tasks")
+    op.drop_column("tasks", "search_vector")
@@ -0,0 +1,47 @@
+"""add_project_search
+
+Revision ID: 60222ab3678d
+Revises: 7fc28758ee76
+Create Date: 2026-10-18 19:10:42.518347
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic
+revision = '60222ab3678d'
+down_revision = '7fc28758ee76'
+branch_labels = None
+depends_on = None
+
+
+# Titles weigh more than descriptions in the ranking. The text search configuration is spelled out,
+# to_tsvector is only immutable (and usable in a generated column) with an explicit one.
+ADD_SEARCH_VECTOR = """
+    ALTER TABLE projects
+    ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED;
+"""
+
+
+def upgrade() -> None:
+    # Adding a stored generated column rewrites the table - on a large table, run it in a maintenance window
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+    op.execute(ADD_SEARCH_VECTOR)
+    op.create_index("ix_projects_search_vector", "projects", ["search_vector"], postgresql_using="gin")
+    # Serves fuzzy matches of the search terms against titles (<% word similarity operator)
+    op.create_index(
+        "ix_projects_title_trgm",
+        "projects",
+        ["title"],
+        postgresql_using="gin",
+        postgresql_ops={"title": "gin_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_projects_title_trgm", table_name="projects")
+    op.drop_index("ix_projects_search_vector", table_name="projects")
+    op.drop_column("projects", "search_vector")
+    # pg_trgm is left installed, other schemas of the database may use it
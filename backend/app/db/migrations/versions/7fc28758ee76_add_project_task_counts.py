@@ -0,0 +1,69 @@
+"""add_project_task_counts
+
+Revision ID: 7fc28758ee76
+Revises: ab34b33b06f5
+Create Date: 2026-10-18 12:40:18.930215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = '7fc28758ee76'
+down_revision = 'ab34b33b06f5'
+branch_labels = None
+depends_on = None
+
+
+# Keeps one counter row per (project, status) in step with the tasks table.
+# An update that leaves project_id and status unchanged decrements then increments the same row.
+MAINTAIN_PROJECT_TASK_COUNTS_FUNCTION = """
+    CREATE FUNCTION maintain_project_task_counts() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE project_task_counts
+            SET count = count - 1
+            WHERE project_id = OLD.project_id AND status = OLD.status;
+        END IF;
+
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO project_task_counts (project_id, status, count)
+            VALUES (NEW.project_id, NEW.status, 1)
+            ON CONFLICT (project_id, status) DO UPDATE SET count = project_task_counts.count + 1;
+        END IF;
+
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+MAINTAIN_PROJECT_TASK_COUNTS_TRIGGER = """
+    CREATE TRIGGER tasks_maintain_project_task_counts
+    AFTER INSERT OR DELETE OR UPDATE OF project_id, status ON tasks
+    FOR EACH ROW EXECUTE FUNCTION maintain_project_task_counts();
+"""
+
+BACKFILL_PROJECT_TASK_COUNTS = """
+    INSERT INTO project_task_counts (project_id, status, count)
+    SELECT project_id, status, count(*)
+    FROM tasks
+    GROUP BY project_id, status;
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "project_task_counts",
+        sa.Column("project_id", sa.Integer, sa.ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("status", sa.Text, primary_key=True),
+        sa.Column("count", sa.BigInteger, nullable=False, server_default="0"),
+    )
+    op.execute(MAINTAIN_PROJECT_TASK_COUNTS_FUNCTION)
+    op.execute(MAINTAIN_PROJECT_TASK_COUNTS_TRIGGER)
+    op.execute(BACKFILL_PROJECT_TASK_COUNTS)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER tasks_maintain_project_task_counts ON tasks;")
+    op.execute("DROP FUNCTION maintain_project_task_counts();")
+    op.drop_table("project_task_counts")
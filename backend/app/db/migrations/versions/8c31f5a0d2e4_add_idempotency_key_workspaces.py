@@ -0,0 +1,33 @@
+"""add_idempotency_key_workspaces
+
+Revision ID: 8c31f5a0d2e4
+Revises: 4b7d2e9c1a63
+Create Date: 2026-10-19 14:26:03.117482
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = '8c31f5a0d2e4'
+down_revision = '4b7d2e9c1a63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Keys are stored on their workspace's shard, and moved with it (app.db.rebalance). The existing ones belong
+    # to the workspace their route ends with, see app.api.routes.projects.create_new_project.
+    op.add_column(
+        "idempotency_keys", sa.Column("workspace_id", sa.Text, nullable=False, server_default="default"),
+    )
+    op.execute("UPDATE idempotency_keys SET workspace_id = regexp_replace(route, '^.*:', '') WHERE route LIKE '%:%';")
+    # The moves copy a workspace's keys in batches keyed by (route, key)
+    op.create_index(
+        "ix_idempotency_keys_workspace_id_route_key", "idempotency_keys", ["workspace_id", "route", "key"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_idempotency_keys_workspace_id_route_key", table_name="idempotency_keys")
+    op.drop_column("idempotency_keys", "workspace_id")
@@ -0,0 +1,46 @@
+"""link_tasks_to_projects
+
+Revision ID: ab34b33b06f5
+Revises: f1b833fdc474
+Create Date: 2026-10-18 11:24:51.602877
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'ab34b33b06f5'
+down_revision = 'f1b833fdc474'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Tasks were only ever served from a mock, so the table is empty and the new columns can be NOT NULL
+    op.add_column(
+        "tasks",
+        sa.Column("project_id", sa.Integer, sa.ForeignKey("projects.id", ondelete="CASCADE"), nullable=False),
+    )
+    op.add_column("tasks", sa.Column("description", sa.Text, nullable=True))
+    op.add_column(
+        "tasks",
+        sa.Column("created_date", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+    op.add_column("tasks", sa.Column("due_date", sa.TIMESTAMP(timezone=True), nullable=False))
+
+    # Covers the project's task listing - (project_id, status) equality, (due_date, id) keyset order
+    # and the remaining listed columns as INCLUDE, so listing is an index only scan
+    op.create_index(
+        "ix_tasks_project_id_status_due_date_id",
+        "tasks",
+        ["project_id", "status", "due_date", "id"],
+        postgresql_include=["title", "created_date"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tasks_project_id_status_due_date_id", table_name="tasks")
+    op.drop_column("tasks", "due_date")
+    op.drop_column("tasks", "created_date")
+    op.drop_column("tasks", "description")
+    op.drop_column("tasks", "project_id")
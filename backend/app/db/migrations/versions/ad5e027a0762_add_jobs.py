@@ -0,0 +1,56 @@
+"""add_jobs
+
+Revision ID: ad5e027a0762
+Revises: b646719c4e1f
+Create Date: 2026-10-18 23:12:40.561938
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic
+revision = 'ad5e027a0762'
+down_revision = 'b646719c4e1f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.BigInteger, primary_key=True),
+        sa.Column("kind", sa.Text, nullable=False),
+        sa.Column("payload", postgresql.JSONB, nullable=False, server_default=sa.text("'{}'::jsonb")),
+        sa.Column("status", sa.Text, nullable=False, server_default="queued"),
+        sa.Column("attempts", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("max_attempts", sa.Integer, nullable=False),
+        sa.Column("progress_done", sa.BigInteger, nullable=False, server_default="0"),
+        sa.Column("progress_total", sa.BigInteger, nullable=True),
+        sa.Column("result", postgresql.JSONB, nullable=True),
+        sa.Column("error", sa.Text, nullable=True),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("run_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("started_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("locked_until", sa.TIMESTAMP(timezone=True), nullable=True),
+    )
+    # Claiming - the queued jobs in the order they are due. Small whatever the history, finished jobs aren't in it.
+    op.create_index(
+        "ix_jobs_queued_run_at_id", "jobs", ["run_at", "id"], postgresql_where=sa.text("status = 'queued'"),
+    )
+    # Requeuing the jobs whose lease expired
+    op.create_index(
+        "ix_jobs_running_locked_until", "jobs", ["locked_until"], postgresql_where=sa.text("status = 'running'"),
+    )
+    # Pruning the finished jobs
+    op.create_index(
+        "ix_jobs_finished_at", "jobs", ["finished_at"], postgresql_where=sa.text("finished_at IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_jobs_finished_at", table_name="jobs")
+    op.drop_index("ix_jobs_running_locked_until", table_name="jobs")
+    op.drop_index("ix_jobs_queued_run_at_id", table_name="jobs")
+    op.drop_table("jobs")
@@ -0,0 +1,273 @@
+"""add_project_soft_delete_and_archive
+
+Revision ID: b646719c4e1f
+Revises: 35ae73ef4ff4
+Create Date: 2026-10-18 22:31:08.117394
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic
+revision = 'b646719c4e1f'
+down_revision = '35ae73ef4ff4'
+branch_labels = None
+depends_on = None
+
+
+# The indexes the API reads projects through, each with its earlier predicate. They become partial on
+# deleted_at IS NULL, the queries repeat it - deleted projects, waiting for their purge, are out of them.
+# Rebuilding them locks projects against writes, run this migration in a maintenance window on a large table.
+LIVE_PROJECT_INDEXES = {
+    "ix_projects_due_date_id": dict(columns=["due_date", "id"]),
+    "ix_projects_created_date_id": dict(columns=["created_date", "id"]),
+    "ix_projects_status_id": dict(columns=["status", "id"]),
+    "ix_projects_status_due_date_id": dict(columns=["status", "due_date", "id"]),
+    "ix_projects_updated_at": dict(columns=["updated_at"]),
+    "ix_projects_search_vector": dict(columns=["search_vector"], postgresql_using="gin"),
+    "ix_projects_title_trgm": dict(
+        columns=["title"], postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"},
+    ),
+    "ix_projects_due_date_status": dict(columns=["due_date"], postgresql_include=["status"]),
+    "ix_projects_open_due_date_id": dict(
+        columns=["due_date", "id"], postgresql_include=["title", "status"], where="status <> 'done'",
+    ),
+}
+
+# A soft delete (deleted_at set) is logged as the project's delete, its tasks go with it. Then the project
+# is out of the feed - the hard delete of its purge, and the task deletes it cascades to, are not logged.
+# The task deletes of a project deleted by the same statement (archived) aren't logged either.
+RECORD_PROJECT_CHANGE_FUNCTION = """
+    CREATE OR REPLACE FUNCTION record_project_change() RETURNS trigger AS $$
+    DECLARE
+        changed record;
+        change project_changes;
+        change_op text := lower(TG_OP);
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            changed := OLD;
+        ELSE
+            changed := NEW;
+        END IF;
+
+        IF TG_TABLE_NAME = 'projects' THEN
+            IF TG_OP = 'DELETE' THEN
+                IF OLD.deleted_at IS NOT NULL THEN
+                    RETURN NULL;
+                END IF;
+            ELSIF TG_OP = 'UPDATE' THEN
+                IF OLD.deleted_at IS NOT NULL AND NEW.deleted_at IS NOT NULL THEN
+                    RETURN NULL;
+                ELSIF NEW.deleted_at IS NOT NULL THEN
+                    change_op := 'delete';
+                ELSIF OLD.deleted_at IS NOT NULL THEN
+                    change_op := 'insert';
+                END IF;
+            END IF;
+
+            INSERT INTO project_changes (entity, op, project_id, version)
+            VALUES ('project', change_op, changed.id, changed.version)
+            RETURNING * INTO change;
+        ELSE
+            IF TG_OP = 'DELETE' THEN
+                IF NOT EXISTS (SELECT 1 FROM projects WHERE id = OLD.project_id AND deleted_at IS NULL) THEN
+                    RETURN NULL;
+                END IF;
+            END IF;
+
+            INSERT INTO project_changes (entity, op, project_id, task_id)
+            VALUES ('task', change_op, changed.project_id, changed.id)
+            RETURNING * INTO change;
+        END IF;
+
+        PERFORM pg_notify('project_changes', project_change_payload(change));
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+PREVIOUS_RECORD_PROJECT_CHANGE_FUNCTION = """
+    CREATE OR REPLACE FUNCTION record_project_change() RETURNS trigger AS $$
+    DECLARE
+        changed record;
+        change project_changes;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            changed := OLD;
+        ELSE
+            changed := NEW;
+        END IF;
+
+        IF TG_TABLE_NAME = 'projects' THEN
+            INSERT INTO project_changes (entity, op, project_id, version)
+            VALUES ('project', lower(TG_OP), changed.id, changed.version)
+            RETURNING * INTO change;
+        ELSE
+            INSERT INTO project_changes (entity, op, project_id, task_id)
+            VALUES ('task', lower(TG_OP), changed.project_id, changed.id)
+            RETURNING * INTO change;
+        END IF;
+
+        PERFORM pg_notify('project_changes', project_change_payload(change));
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+# Deleted projects are out of the counters, as they are out of the reports read from the table
+MAINTAIN_PROJECT_REPORT_COUNTS_FUNCTION = """
+    CREATE OR REPLACE FUNCTION maintain_project_report_counts() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            IF OLD.deleted_at IS NULL THEN
+                UPDATE project_report_counts
+                SET count = count - 1
+                WHERE due_day = (OLD.due_date AT TIME ZONE 'UTC')::date AND status = OLD.status::text;
+            END IF;
+        END IF;
+
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            IF NEW.deleted_at IS NULL THEN
+                INSERT INTO project_report_counts (due_day, status, count)
+                VALUES ((NEW.due_date AT TIME ZONE 'UTC')::date, NEW.status::text, 1)
+                ON CONFLICT (due_day, status) DO UPDATE SET count = project_report_counts.count + 1;
+            END IF;
+        END IF;
+
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+PREVIOUS_MAINTAIN_PROJECT_REPORT_COUNTS_FUNCTION = """
+    CREATE OR REPLACE FUNCTION maintain_project_report_counts() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE project_report_counts
+            SET count = count - 1
+            WHERE due_day = (OLD.due_date AT TIME ZONE 'UTC')::date AND status = OLD.status::text;
+        END IF;
+
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO project_report_counts (due_day, status, count)
+            VALUES ((NEW.due_date AT TIME ZONE 'UTC')::date, NEW.status::text, 1)
+            ON CONFLICT (due_day, status) DO UPDATE SET count = project_report_counts.count + 1;
+        END IF;
+
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+MAINTAIN_PROJECT_REPORT_COUNTS_TRIGGER = """
+    CREATE TRIGGER projects_maintain_project_report_counts
+    AFTER INSERT OR DELETE OR UPDATE OF due_date, status{columns} ON projects
+    FOR EACH ROW EXECUTE FUNCTION maintain_project_report_counts();
+"""
+
+# The archive's partition of the (UTC) month of archived, created the first time a project is archived that month.
+# Named <parent>_yYYYYmMM, which is what app.db.repositories.projects reads the month of a partition from.
+CREATE_ARCHIVE_PARTITION_FUNCTION = """
+    CREATE FUNCTION create_archive_partition(parent text, archived timestamptz) RETURNS void AS $$
+    DECLARE
+        month_start timestamp := date_trunc('month', archived AT TIME ZONE 'UTC');
+        partition_name text := parent || to_char(month_start, '"_y"YYYY"m"MM');
+    BEGIN
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                parent,
+                month_start AT TIME ZONE 'UTC',
+                (month_start + interval '1 month') AT TIME ZONE 'UTC'
+            );
+        END IF;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+
+def live_project_index(name: str, *, where: str = None, **kwargs) -> None:
+    where = f"{where} AND deleted_at IS NULL" if where else "deleted_at IS NULL"
+    op.create_index(name, "projects", postgresql_where=sa.text(where), **kwargs)
+
+
+def project_index(name: str, *, where: str = None, **kwargs) -> None:
+    op.create_index(name, "projects", postgresql_where=sa.text(where) if where else None, **kwargs)
+
+
+def upgrade() -> None:
+    op.add_column("projects", sa.Column("deleted_at", sa.TIMESTAMP(timezone=True), nullable=True))
+    # The purge - deleted projects, oldest deletion first
+    op.create_index(
+        "ix_projects_deleted_at", "projects", ["deleted_at"], postgresql_where=sa.text("deleted_at IS NOT NULL"),
+    )
+    for name, index in LIVE_PROJECT_INDEXES.items():
+        op.drop_index(name, table_name="projects")
+        live_project_index(name, **index)
+
+    op.execute(RECORD_PROJECT_CHANGE_FUNCTION)
+    op.execute(MAINTAIN_PROJECT_REPORT_COUNTS_FUNCTION)
+    op.execute("DROP TRIGGER projects_maintain_project_report_counts ON projects;")
+    op.execute(MAINTAIN_PROJECT_REPORT_COUNTS_TRIGGER.format(columns=", deleted_at"))
+
+    # Archived projects and tasks, moved out of the hot tables by the maintenance job (app.db.db_tasks).
+    # No foreign keys, and partitioned by month of archival - a month of them is dropped at once, with its partition.
+    op.create_table(
+        "projects_archive",
+        sa.Column("id", sa.Integer, nullable=False),
+        sa.Column("title", sa.Text, nullable=False),
+        sa.Column("description", sa.Text, nullable=True),
+        sa.Column("created_date", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("due_date", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column(
+            "status", postgresql.ENUM(name="projectstatus", create_type=False), nullable=False,
+        ),
+        sa.Column("version", sa.Integer, nullable=False),
+        sa.Column("updated_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("completed_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("archived_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("id", "archived_at"),
+        postgresql_partition_by="RANGE (archived_at)",
+    )
+    op.create_table(
+        "tasks_archive",
+        sa.Column("id", sa.Integer, nullable=False),
+        sa.Column("project_id", sa.Integer, nullable=False),
+        sa.Column("title", sa.Text, nullable=False),
+        sa.Column("description", sa.Text, nullable=True),
+        sa.Column("created_date", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("due_date", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("status", sa.Text, nullable=False),
+        sa.Column("completed_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("archived_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("id", "archived_at"),
+        postgresql_partition_by="RANGE (archived_at)",
+    )
+    op.create_index("ix_tasks_archive_project_id", "tasks_archive", ["project_id"])
+    for table in ("projects_archive", "tasks_archive"):
+        # Throughput keeps counting the completions of archived projects and tasks
+        op.create_index(
+            f"ix_{table}_completed_at", table, ["completed_at"], postgresql_where=sa.text("completed_at IS NOT NULL"),
+        )
+    op.execute(CREATE_ARCHIVE_PARTITION_FUNCTION)
+
+
+def downgrade() -> None:
+    # Archived and deleted projects are lost - the deleted ones are purged first, out of the counters and the log
+    op.execute("DELETE FROM projects WHERE deleted_at IS NOT NULL;")
+    op.execute("DROP FUNCTION create_archive_partition(text, timestamptz);")
+    op.drop_table("tasks_archive")
+    op.drop_table("projects_archive")
+
+    op.execute("DROP TRIGGER projects_maintain_project_report_counts ON projects;")
+    op.execute(PREVIOUS_MAINTAIN_PROJECT_REPORT_COUNTS_FUNCTION)
+    op.execute(MAINTAIN_PROJECT_REPORT_COUNTS_TRIGGER.format(columns=""))
+    op.execute(PREVIOUS_RECORD_PROJECT_CHANGE_FUNCTION)
+
+    for name, index in LIVE_PROJECT_INDEXES.items():
+        op.drop_index(name, table_name="projects")
+        project_index(name, **index)
+    op.drop_index("ix_projects_deleted_at", table_name="projects")
+    op.drop_column("projects", "deleted_at")
@@ -0,0 +1,33 @@
+"""add_project_pagination_indexes
+
+Revision ID: c5678adbb84c
+Revises: 01724f0d1680
+Create Date: 2026-10-18 09:12:03.418112
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic
+revision = 'c5678adbb84c'
+down_revision = '01724f0d1680'
+branch_labels = None
+depends_on = None
+
+
+# Every keyset ordering ends in id, so that (sort key, id) is unique and pages never overlap
+PAGINATION_INDEXES = {
+    "ix_projects_due_date_id": ["due_date", "id"],
+    "ix_projects_created_date_id": ["created_date", "id"],
+    "ix_projects_status_id": ["status", "id"],
+    "ix_projects_status_due_date_id": ["status", "due_date", "id"],
+}
+
+
+def upgrade() -> None:
+    for name, columns in PAGINATION_INDEXES.items():
+        op.create_index(name, "projects", columns)
+
+
+def downgrade() -> None:
+    for name in PAGINATION_INDEXES:
+        op.drop_index(name, table_name="projects")
@@ -0,0 +1,36 @@
+"""add_idempotency_keys
+
+Revision ID: d306df102d86
+Revises: eb506bd68278
+Create Date: 2026-10-18 21:12:40.518236
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'd306df102d86'
+down_revision = 'eb506bd68278'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # One row per key, written once by the transaction that executed the request, along with what it wrote.
+    # The fingerprint is a sha256 digest of the request, the response is kept as sent.
+    op.create_table(
+        "idempotency_keys",
+        sa.Column("route", sa.Text, primary_key=True),
+        sa.Column("key", sa.Text, primary_key=True),
+        sa.Column("fingerprint", sa.LargeBinary, nullable=False),
+        sa.Column("status_code", sa.SmallInteger, nullable=False),
+        sa.Column("body", sa.LargeBinary, nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+    # Pruning past the TTL
+    op.create_index("ix_idempotency_keys_created_at", "idempotency_keys", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_idempotency_keys_created_at", table_name="idempotency_keys")
+    op.drop_table("idempotency_keys")
@@ -0,0 +1,88 @@
+"""add_workspaces
+
+Revision ID: e3a91c5f7b20
+Revises: ad5e027a0762
+Create Date: 2026-10-18 23:48:12.305611
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'e3a91c5f7b20'
+down_revision = 'ad5e027a0762'
+branch_labels = None
+depends_on = None
+
+
+WORKSPACE_TABLES = ("projects", "tasks", "projects_archive", "tasks_archive")
+
+# A completed_at given on insert is kept - the rows a workspace move copies to another shard keep theirs.
+# The API never sets it, its inserts are stamped as before.
+SET_COMPLETED_AT_FUNCTION = """
+    CREATE OR REPLACE FUNCTION set_completed_at() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.status::text <> 'done' THEN
+            NEW.completed_at = NULL;
+        ELSIF TG_OP = 'INSERT' THEN
+            NEW.completed_at = coalesce(NEW.completed_at, clock_timestamp());
+        ELSIF OLD.status::text <> 'done' THEN
+            NEW.completed_at = clock_timestamp();
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+PREVIOUS_SET_COMPLETED_AT_FUNCTION = """
+    CREATE OR REPLACE FUNCTION set_completed_at() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.status::text <> 'done' THEN
+            NEW.completed_at = NULL;
+        ELSIF TG_OP = 'INSERT' OR OLD.status::text <> 'done' THEN
+            NEW.completed_at = clock_timestamp();
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    # Existing rows belong to the default workspace. A constant default, so Postgres adds the columns without
+    # rewriting the tables - the indexes below do lock projects and tasks against writes while they build.
+    for table in WORKSPACE_TABLES:
+        op.add_column(table, sa.Column("workspace_id", sa.Text, nullable=False, server_default="default"))
+
+    # Listings of a workspace by id and by due date. The (workspace_id, id) index also serves the moves between
+    # shards, deleted projects included, and the list of the workspaces of a shard (a loose index scan).
+    op.create_index("ix_projects_workspace_id_id", "projects", ["workspace_id", "id"])
+    op.create_index(
+        "ix_projects_workspace_id_due_date_id",
+        "projects",
+        ["workspace_id", "due_date", "id"],
+        postgresql_where=sa.text("deleted_at IS NULL"),
+    )
+    op.create_index("ix_tasks_workspace_id_id", "tasks", ["workspace_id", "id"])
+
+    # Workspaces pinned to a shard other than the one hashing picks for them, while they're moved - read from
+    # the first shard, see app.db.shards
+    op.create_table(
+        "workspace_placements",
+        sa.Column("workspace_id", sa.Text, primary_key=True),
+        sa.Column("shard", sa.Text, nullable=False),
+        sa.Column("moving", sa.Boolean, nullable=False, server_default=sa.false()),
+        sa.Column("updated_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+
+    op.execute(SET_COMPLETED_AT_FUNCTION)
+
+
+def downgrade() -> None:
+    op.execute(PREVIOUS_SET_COMPLETED_AT_FUNCTION)
+    op.drop_table("workspace_placements")
+    op.drop_index("ix_tasks_workspace_id_id", table_name="tasks")
+    op.drop_index("ix_projects_workspace_id_due_date_id", table_name="projects")
+    op.drop_index("ix_projects_workspace_id_id", table_name="projects")
+    for table in WORKSPACE_TABLES:
+        op.drop_column(table, "workspace_id")
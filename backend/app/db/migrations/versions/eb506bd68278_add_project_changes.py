@@ -0,0 +1,101 @@
+"""add_project_changes
+
+Revision ID: eb506bd68278
+Revises: 2e70f7363cbb
+Create Date: 2026-10-18 20:05:51.730164
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'eb506bd68278'
+down_revision = '2e70f7363cbb'
+branch_labels = None
+depends_on = None
+
+
+# The one encoding of a change, shared by the notifications and by the reads of the log (app.db.changes),
+# so that a client resuming from the log gets byte for byte the events it would have got live
+PROJECT_CHANGE_PAYLOAD_FUNCTION = """
+    CREATE FUNCTION project_change_payload(change project_changes) RETURNS text AS $$
+        SELECT jsonb_strip_nulls(jsonb_build_object(
+            'seq', change.seq,
+            'entity', change.entity,
+            'op', change.op,
+            'project_id', change.project_id,
+            'task_id', change.task_id,
+            'version', change.version,
+            'changed_at', change.changed_at
+        ))::text;
+    $$ LANGUAGE sql STABLE;
+"""
+
+# Logs every row change of projects and tasks, and notifies the listeners of app.db.changes on commit.
+# Notifications of rolled back transactions are never delivered, neither are their log rows ever visible.
+RECORD_PROJECT_CHANGE_FUNCTION = """
+    CREATE FUNCTION record_project_change() RETURNS trigger AS $$
+    DECLARE
+        changed record;
+        change project_changes;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            changed := OLD;
+        ELSE
+            changed := NEW;
+        END IF;
+
+        IF TG_TABLE_NAME = 'projects' THEN
+            INSERT INTO project_changes (entity, op, project_id, version)
+            VALUES ('project', lower(TG_OP), changed.id, changed.version)
+            RETURNING * INTO change;
+        ELSE
+            INSERT INTO project_changes (entity, op, project_id, task_id)
+            VALUES ('task', lower(TG_OP), changed.project_id, changed.id)
+            RETURNING * INTO change;
+        END IF;
+
+        PERFORM pg_notify('project_changes', project_change_payload(change));
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    # No foreign keys - the changes of a deleted project outlive it
+    op.create_table(
+        "project_changes",
+        sa.Column("seq", sa.BigInteger, primary_key=True),
+        sa.Column("entity", sa.Text, nullable=False),
+        sa.Column("op", sa.Text, nullable=False),
+        sa.Column("project_id", sa.Integer, nullable=False),
+        sa.Column("task_id", sa.Integer, nullable=True),
+        sa.Column("version", sa.Integer, nullable=True),
+        sa.Column(
+            "changed_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text("clock_timestamp()"),
+        ),
+    )
+    # Resuming from a timestamp, and pruning past the retention
+    op.create_index("ix_project_changes_changed_at", "project_changes", ["changed_at"])
+    # Resuming the changes of one project
+    op.create_index("ix_project_changes_project_id_seq", "project_changes", ["project_id", "seq"])
+
+    op.execute(PROJECT_CHANGE_PAYLOAD_FUNCTION)
+    op.execute(RECORD_PROJECT_CHANGE_FUNCTION)
+    for table in ("projects", "tasks"):
+        op.execute(f"""
+            CREATE TRIGGER {table}_record_project_change
+            AFTER INSERT OR UPDATE OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION record_project_change();
+        """)
+
+
+def downgrade() -> None:
+    for table in ("projects", "tasks"):
+        op.execute(f"DROP TRIGGER {table}_record_project_change ON {table};")
+    op.execute("DROP FUNCTION record_project_change();")
+    op.execute("DROP FUNCTION project_change_payload(project_changes);")
+    op.drop_index("ix_project_changes_project_id_seq", table_name="project_changes")
+    op.drop_index("ix_project_changes_changed_at", table_name="project_changes")
+    op.drop_table("project_changes")
@@ -0,0 +1,24 @@
+"""add_project_version
+
+Revision ID: f1b833fdc474
+Revises: c5678adbb84c
+Create Date: 2026-10-18 10:02:47.119364
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'f1b833fdc474'
+down_revision = 'c5678adbb84c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Bumped by every update, used for optimistic concurrency through ETag/If-Match
+    op.add_column("projects", sa.Column("version", sa.Integer, nullable=False, server_default="1"))
+
+
+def downgrade() -> None:
+    op.drop_column("projects", "version")
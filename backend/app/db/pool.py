@@ -0,0 +1,103 @@
+import asyncio
+import time
+from typing import Any, Dict
+
+from databases import Database
+
+from app.db.asyncpg_backend import AsyncpgDatabase
+
+
+class PoolStats:
+    """
+    Checkout counters of a connection pool, the wait is the time a query spends waiting for a free connection
+    """
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_checkout(self, wait: float) -> None:
+        self.checkouts += 1
+        self.wait_seconds_total += wait
+        self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+
+class InstrumentedPool:
+    """
+    Wraps the asyncpg pool held by a databases.Database or an AsyncpgDatabase, timing every connection checkout.
+    Everything but acquire is forwarded to the wrapped pool.
+    """
+    def __init__(self, pool: Any, stats: PoolStats) -> None:
+        self._pool = pool
+        self.stats = stats
+
+    async def acquire(self, *, timeout: float = None) -> Any:
+        started = time.perf_counter()
+        try:
+            connection = await self._pool.acquire(timeout=timeout)
+        except asyncio.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+
+        self.stats.record_checkout(time.perf_counter() - started)
+
+        return connection
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pool, name)
+
+
+def instrument_pool(database: Database) -> PoolStats:
+    """
+    Installs an InstrumentedPool in a connected databases.Database (postgres backend) or AsyncpgDatabase,
+    returning its stats
+    """
+    stats = PoolStats()
+    holder = pool_holder(database)
+    holder._pool = InstrumentedPool(holder._pool, stats)
+
+    return stats
+
+
+def pool_holder(database: Database) -> Any:
+    """
+    What holds the asyncpg pool of database, in its _pool
+    """
+    return database if isinstance(database, AsyncpgDatabase) else database._backend
+
+
+def get_raw_pool(database: Database) -> Any:
+    pool = pool_holder(database)._pool
+
+    return pool._pool if isinstance(pool, InstrumentedPool) else pool
+
+
+async def warm_pool(database: Database, size: int) -> None:
+    """
+    Opens and checks size connections at once, so that the first requests don't pay for connecting
+    """
+    pool = get_raw_pool(database)
+    connections = await asyncio.gather(*(pool.acquire() for _ in range(size)))
+    try:
+        await asyncio.gather(*(connection.fetchval("SELECT 1") for connection in connections))
+    finally:
+        await asyncio.gather(*(pool.release(connection) for connection in connections))
+
+
+def pool_stats(database: Database, stats: PoolStats) -> Dict[str, Any]:
+    pool = get_raw_pool(database)
+    size, idle = pool.get_size(), pool.get_idle_size()
+
+    return {
+        "min_size": pool.get_min_size(),
+        "max_size": pool.get_max_size(),
+        "size": size,
+        "idle": idle,
+        "in_use": size - idle,
+        "checkouts": stats.checkouts,
+        "timeouts": stats.timeouts,
+        "wait_seconds_total": stats.wait_seconds_total,
+        "wait_seconds_max": stats.wait_seconds_max,
+        "wait_seconds_avg": stats.wait_seconds_total / stats.checkouts if stats.checkouts else 0.0,
+    }
@@ -0,0 +1,245 @@
+"""
+    python -m app shards init
+    python -m app shards pin [--dry-run]
+    python -m app shards rebalance [--dry-run] [--batch-size N] [--wait SECONDS]
+
+Workspaces spread over the shards (DATABASE_URL, then DATABASE_SHARD_URLS) by consistent hashing, see app.db.shards.
+Adding a shard, with the new DATABASE_SHARD_URLS in the environment of these commands:
+
+    init        migrates every shard, and has each one hand out its own range of ids
+    pin         pins the workspaces the new ring would send elsewhere to the shard holding them - deploy the app
+                with the new DATABASE_SHARD_URLS right after, nothing moves yet
+    rebalance   moves each pinned workspace to its shard on the ring, online: its writes are refused (503) while
+                its rows are copied, its reads keep going to the shard it leaves until the copy is done
+"""
+import argparse
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List
+
+import alembic.command
+from alembic.config import Config
+from databases.interfaces import Record
+
+from app.core.config import (
+    DATABASE_SHARD_URLS, DATABASE_URL, SHARD_ID_SPACE, SHARD_PLACEMENT_REFRESH_INTERVAL, SHARD_VIRTUAL_NODES,
+)
+from app.db.db_tasks import create_database, database_url
+from app.db.repositories.workspaces import WorkspacesRepository
+from app.db.shards import Shard, ShardSet
+
+logger = logging.getLogger(__name__)
+
+# Projects and tasks copied, or deleted, per statement
+REBALANCE_BATCH_SIZE = 1000
+
+# Ids are integer columns, every shard's range must fit below this
+MAX_ID = 2 ** 31 - 1
+
+# Change seqs are bigint, each shard hands out its own range of this many
+CHANGE_SEQ_SPACE = 2 ** 48
+
+
+def shard_urls() -> List[str]:
+    return [DATABASE_URL, *DATABASE_SHARD_URLS]
+
+
+def migrate(url: str) -> None:
+    config = Config("alembic.ini")
+    config.cmd_opts = argparse.Namespace(x=[f"url={url}"])
+    alembic.command.upgrade(config, "head")
+
+
+async def connect_shards() -> ShardSet:
+    shards = [Shard(index, url, create_database(database_url(url))) for index, url in enumerate(shard_urls())]
+    for shard in shards:
+        await shard.database.connect()
+
+    shard_set = ShardSet(shards, virtual_nodes=SHARD_VIRTUAL_NODES, refresh_interval=SHARD_PLACEMENT_REFRESH_INTERVAL)
+    await shard_set.refresh()
+
+    return shard_set
+
+
+async def disconnect_shards(shards: ShardSet) -> None:
+    await shards.close()
+    await shards.directory.database.disconnect()
+
+
+async def find_workspaces(shards: ShardSet) -> Dict[str, List[str]]:
+    """
+    :return: The shards holding rows of each workspace, by workspace
+    """
+    found: Dict[str, List[str]] = {}
+    for shard in shards.shards:
+        for workspace in await WorkspacesRepository(shard.database).get_workspace_ids():
+            found.setdefault(workspace, []).append(shard.name)
+
+    return found
+
+
+def init() -> None:
+    urls = shard_urls()
+    if len(urls) * SHARD_ID_SPACE > MAX_ID:
+        raise SystemExit(f"{len(urls)} shards of SHARD_ID_SPACE {SHARD_ID_SPACE} ids don't fit in integer ids")
+
+    for url in urls:
+        logger.info(f"Migrating {url}")
+        migrate(database_url(url))
+
+    asyncio.run(set_id_ranges())
+
+
+async def set_id_ranges() -> None:
+    shards = await connect_shards()
+    try:
+        for shard in shards.shards[1:]:
+            await WorkspacesRepository(shard.database).set_id_range(start=shard.index * SHARD_ID_SPACE)
+            logger.info(f"{shard.name} hands out the ids from {shard.index * SHARD_ID_SPACE}")
+            await WorkspacesRepository(shard.database).set_change_seq_range(start=shard.index * CHANGE_SEQ_SPACE)
+            logger.info(f"{shard.name} hands out the change seqs from {shard.index * CHANGE_SEQ_SPACE}")
+    finally:
+        await disconnect_shards(shards)
+
+
+async def pin(*, dry_run: bool) -> None:
+    shards = await connect_shards()
+    directory = WorkspacesRepository(shards.directory.database)
+    try:
+        for workspace, holders in sorted((await find_workspaces(shards)).items()):
+            if workspace in shards.placements or shards.ring.shard_for(workspace) == holders[0]:
+                continue
+            if len(holders) > 1:
+                logger.warning(f"Workspace {workspace} has rows on {', '.join(holders)}, pinning it to {holders[0]}")
+
+            logger.info(f"Pinning workspace {workspace} to {holders[0]}")
+            if not dry_run:
+                await directory.place_workspace(workspace_id=workspace, shard=holders[0])
+    finally:
+        await disconnect_shards(shards)
+
+
+async def rebalance(*, dry_run: bool, batch_size: int, wait: float) -> None:
+    """
+    Moves every workspace to its shard on the ring. A move that was interrupted is resumed - the workspace stays
+    pinned, and read only, until then.
+    """
+    shards = await connect_shards()
+    try:
+        found = await find_workspaces(shards)
+        for workspace in sorted(set(found) | set(shards.placements)):
+            target = shards.ring.shard_for(workspace)
+            placement = shards.placements.get(workspace)
+            holders = found.get(workspace, [])
+
+            if placement is not None and placement.shard == target and not placement.moving:
+                # Stopped once the workspace was copied and placed on its target, the other copies are stale
+                for name in holders:
+                    if name != target:
+                        await delete_workspace(shards, workspace, name, dry_run=dry_run, batch_size=batch_size)
+                if not dry_run:
+                    await WorkspacesRepository(shards.directory.database).unplace_workspace(workspace_id=workspace)
+            elif placement is not None:
+                await move_workspace(
+                    shards, workspace, placement.shard, target, dry_run=dry_run, batch_size=batch_size, wait=wait,
+                )
+            else:
+                # Rows the app can't see, written before the workspace was pinned - merged into its shard
+                for name in holders:
+                    if name != target:
+                        logger.warning(f"Workspace {workspace} has rows on {name}, not pinned there")
+                        await move_workspace(
+                            shards, workspace, name, target, dry_run=dry_run, batch_size=batch_size, wait=wait,
+                        )
+    finally:
+        await disconnect_shards(shards)
+
+
+async def move_workspace(
+        shards: ShardSet, workspace: str, source: str, target: str, *, dry_run: bool, batch_size: int, wait: float,
+) -> None:
+    """
+    Pinned to source and moving, the workspace's writes are refused once every worker reloaded its placement
+    (wait seconds) - its rows are then copied to target, projects first, in batches keyed by id. Copies of rows
+    left on target by an interrupted move are skipped. Then pinned to target, and once every worker reads from
+    there, deleted from source and unpinned.
+    """
+    logger.info(f"Moving workspace {workspace} from {source} to {target}")
+    if dry_run:
+        return
+
+    directory = WorkspacesRepository(shards.directory.database)
+    source_repo = WorkspacesRepository(shards.by_name[source].database)
+    target_repo = WorkspacesRepository(shards.by_name[target].database)
+
+    await directory.place_workspace(workspace_id=workspace, shard=source, moving=True)
+    await asyncio.sleep(wait)
+
+    projects = await copy_batches(
+        source_repo.get_projects, lambda rows: target_repo.copy_projects(projects=rows),
+        workspace=workspace, batch_size=batch_size,
+    )
+    tasks = await copy_batches(
+        source_repo.get_tasks, lambda rows: target_repo.copy_tasks(tasks=rows),
+        workspace=workspace, batch_size=batch_size,
+    )
+    keys = await copy_idempotency_keys(source_repo, target_repo, workspace=workspace, batch_size=batch_size)
+    logger.info(f"Copied {projects} projects, {tasks} tasks and {keys} idempotency keys of workspace {workspace}")
+
+    await directory.place_workspace(workspace_id=workspace, shard=target)
+    await asyncio.sleep(wait)
+
+    await delete_workspace(shards, workspace, source, dry_run=dry_run, batch_size=batch_size)
+    await directory.unplace_workspace(workspace_id=workspace)
+
+
+async def copy_batches(
+        get_rows: Callable[..., Awaitable[List[Record]]],
+        copy_rows: Callable[[List[Record]], Awaitable[None]],
+        *,
+        workspace: str,
+        batch_size: int,
+) -> int:
+    """
+    :return: The number of rows copied
+    """
+    after_id, copied = 0, 0
+    while rows := await get_rows(workspace_id=workspace, after_id=after_id, limit=batch_size):
+        await copy_rows(rows)
+        after_id, copied = rows[-1]["id"], copied + len(rows)
+
+    return copied
+
+
+async def copy_idempotency_keys(
+        source_repo: WorkspacesRepository, target_repo: WorkspacesRepository, *, workspace: str, batch_size: int,
+) -> int:
+    """
+    Like copy_batches, keyed by (route, key) - the keys left on source expire there
+    :return: The number of keys copied
+    """
+    after, copied = ("", ""), 0
+    while keys := await source_repo.get_idempotency_keys(workspace_id=workspace, after=after, limit=batch_size):
+        await target_repo.copy_idempotency_keys(keys=keys)
+        after, copied = (keys[-1]["route"], keys[-1]["key"]), copied + len(keys)
+
+    return copied
+
+
+async def delete_workspace(shards: ShardSet, workspace: str, name: str, *, dry_run: bool, batch_size: int) -> None:
+    logger.info(f"Deleting workspace {workspace} from {name}")
+    if dry_run:
+        return
+
+    repo = WorkspacesRepository(shards.by_name[name].database)
+    while await repo.delete_workspace(workspace_id=workspace, limit=batch_size) == batch_size:
+        await asyncio.sleep(0)
+
+
+def run(args: argparse.Namespace) -> None:
+    if args.action == "init":
+        init()
+    elif args.action == "pin":
+        asyncio.run(pin(dry_run=args.dry_run))
+    elif args.action == "rebalance":
+        asyncio.run(rebalance(dry_run=args.dry_run, batch_size=args.batch_size, wait=args.wait))
@@ -0,0 +1,109 @@
+import functools
+import re
+import time
+from typing import Any, AsyncIterator, List, Optional
+
+from databases import Database
+from databases.interfaces import Record
+
+from app.core.metrics import QUERY_DURATION, QUERY_ROWS
+from app.core.timings import current_timings
+
+TABLE_PATTERN = re.compile(r"\b(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM|FROM)\s+(\w+)", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=1024)
+def query_label(query: str) -> str:
+    """
+    Low cardinality name of a statement for the metrics - its kind and first table, e.g. "select projects"
+    """
+    kind = query.split(None, 1)[0].lower() if query.strip() else "empty"
+    table = TABLE_PATTERN.search(query)
+
+    return f"{kind} {table.group(1)}" if table else kind
+
+
+def record_query(query: str, duration: float, rows: Optional[int]) -> None:
+    label = query_label(query)
+    QUERY_DURATION.observe(duration, label)
+    if rows is not None:
+        QUERY_ROWS.observe(rows, label)
+
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add_query(duration)
+
+
+class QueryRecorder:
+    """
+    Wraps the repositories' Database to record the latency and row count of every statement.
+    Anything else (transaction, connection, ...) is forwarded to the wrapped Database untouched.
+    """
+
+    def __init__(self, db: Database) -> None:
+        self._db = db
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._db, name)
+
+    async def fetch_all(self, query: str, values: Optional[dict] = None) -> List[Record]:
+        started = time.perf_counter()
+        records = await self._db.fetch_all(query=query, values=values)
+        record_query(query, time.perf_counter() - started, len(records))
+
+        return records
+
+    async def fetch_one(self, query: str, values: Optional[dict] = None) -> Optional[Record]:
+        started = time.perf_counter()
+        record = await self._db.fetch_one(query=query, values=values)
+        record_query(query, time.perf_counter() - started, int(record is not None))
+
+        return record
+
+    async def fetch_val(self, query: str, values: Optional[dict] = None, column: Any = 0) -> Any:
+        started = time.perf_counter()
+        value = await self._db.fetch_val(query=query, values=values, column=column)
+        record_query(query, time.perf_counter() - started, int(value is not None))
+
+        return value
+
+    async def execute(self, query: str, values: Optional[dict] = None) -> Any:
+        started = time.perf_counter()
+        result = await self._db.execute(query=query, values=values)
+        record_query(query, time.perf_counter() - started, None)
+
+        return result
+
+    async def execute_many(self, query: str, values: List[dict]) -> None:
+        started = time.perf_counter()
+        await self._db.execute_many(query=query, values=values)
+        record_query(query, time.perf_counter() - started, None)
+
+    async def iterate(self, query: str, values: Optional[dict] = None) -> AsyncIterator[Record]:
+        """
+        Only the time spent waiting for rows is recorded, not the time the consumer spends on each row
+        """
+        duration, rows = 0.0, 0
+        iterator = self._db.iterate(query=query, values=values).__aiter__()
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    record = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    duration += time.perf_counter() - started
+
+                rows += 1
+                yield record
+        finally:
+            await iterator.aclose()
+            record_query(query, duration, rows)
+
+
+def unwrap(database: Database) -> Database:
+    """
+    The Database a QueryRecorder records the statements of - database itself if it isn't one
+    """
+    return database._db if isinstance(database, QueryRecorder) else database
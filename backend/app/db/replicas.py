@@ -0,0 +1,155 @@
+import asyncio
+import itertools
+import logging
+from typing import Any, Dict, List, Optional
+
+from databases import Database, DatabaseURL
+
+from app.core.config import INSTRUMENTATION_ENABLED
+from app.db.recorder import QueryRecorder
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica's replay is behind the primary. A streaming replica that replayed everything it received
+# is up to date, however old its last replayed transaction - the primary may just have been idle since.
+# One that isn't streaming is as late as its last replayed transaction, or infinitely if it never replayed any.
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+            AND EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN 0
+        ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp())::float8, 'Infinity')
+    END AS lag;
+"""
+
+
+class Replica:
+    """
+    A read replica's pool, and its health as of the last check
+    """
+
+    def __init__(self, url: str, database: Database) -> None:
+        self.url = url
+        self.database = database
+        self.lag: Optional[float] = None
+        self.healthy = False
+        self.error: Optional[str] = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": DatabaseURL(self.url).obscure_password,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "error": self.error,
+        }
+
+
+class ReplicaSet:
+    """
+    The read replicas of a worker. Every check_interval seconds, each replica's replay lag is measured,
+    and those more than max_lag seconds behind (or unreachable) are left out of the reads until they catch up.
+    A replica that couldn't connect at startup is retried at each check, it doesn't stop the app from starting.
+    """
+
+    def __init__(self, replicas: List[Replica], *, max_lag: float, check_interval: float) -> None:
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._next = itertools.count()
+        self._checker: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        await self.check()
+        self._checker = asyncio.create_task(self._check_forever())
+
+    async def close(self) -> None:
+        if self._checker is not None:
+            self._checker.cancel()
+            await asyncio.gather(self._checker, return_exceptions=True)
+        for replica in self.replicas:
+            if replica.database.is_connected:
+                await replica.database.disconnect()
+
+    def choose(self) -> Optional[Database]:
+        """
+        :return: The next healthy replica, round robin - None if none is
+        """
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+
+        return healthy[next(self._next) % len(healthy)].database
+
+    async def check(self) -> None:
+        await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+
+    async def _check_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check()
+
+    async def _check(self, replica: Replica) -> None:
+        try:
+            if not replica.database.is_connected:
+                await replica.database.connect()
+            replica.lag = float(await asyncio.wait_for(
+                replica.database.fetch_val(REPLICA_LAG_QUERY), timeout=self.check_interval,
+            ))
+            replica.error = None
+        except Exception as e:
+            replica.lag, replica.error = None, str(e) or type(e).__name__
+
+        healthy = replica.lag is not None and replica.lag <= self.max_lag
+        if healthy != replica.healthy:
+            state = "back in" if healthy else f"out of ({replica.error or f'{replica.lag:.1f}s behind'})"
+            logger.warning(f"Replica {replica.stats()['url']} {state} the reads")
+        replica.healthy = healthy
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [replica.stats() for replica in self.replicas]
+
+
+class DatabaseRouter:
+    """
+    Picks the database of each statement, for the repositories of one request (or of one background job).
+    Writes go to the primary, reads to a healthy replica - or to the primary when there is none, and,
+    with read_your_writes, once the primary was used, so that the rest of the request sees what it wrote.
+
+    Replicas lag (up to the ReplicaSet's max_lag), a read following another request's write may not see it yet.
+    The reads cached by id go to fresh_reader, as a stale row would stay cached for the whole cache TTL.
+    """
+
+    def __init__(
+            self, primary: Database, replicas: Optional[ReplicaSet] = None, *, read_your_writes: bool = True,
+    ) -> None:
+        self.primary = primary
+        self.replicas = replicas
+        self.read_your_writes = read_your_writes
+        self.pinned = False
+        self._recorders: Dict[int, QueryRecorder] = {}
+
+    def writer(self) -> Database:
+        self.pinned = self.read_your_writes
+        return self._instrumented(self.primary)
+
+    def reader(self) -> Database:
+        replica = None if self.pinned or self.replicas is None else self.replicas.choose()
+
+        return self._instrumented(replica or self.primary)
+
+    def fresh_reader(self) -> Database:
+        """
+        The primary, without pinning the rest of the request to it
+        """
+        return self._instrumented(self.primary)
+
+    def _instrumented(self, database: Database) -> Database:
+        # With INSTRUMENTATION_ENABLED, every statement's latency and row count are recorded
+        if not INSTRUMENTATION_ENABLED:
+            return database
+
+        recorder = self._recorders.get(id(database))
+        if recorder is None:
+            recorder = self._recorders[id(database)] = QueryRecorder(database)
+
+        return recorder
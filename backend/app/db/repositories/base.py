@@ -1,9 +1,63 @@
+from typing import Optional, Union
+
 from databases import Database
+from fastapi import HTTPException
+from starlette.status import HTTP_400_BAD_REQUEST
+
+from app.core.config import DEFAULT_WORKSPACE
+from app.db.cache import BaseCache, NullCache
+from app.db.replicas import DatabaseRouter
 
 
 class BaseRepository:
     """
-    A reference to the database connection
+    Handles to the databases, and to the cache shared by the repositories.
+    db is the primary, for writes and for the reads that must see them - using it pins the rest of the request
+    to the primary. read_db is a read replica when there is one in sync, see app.db.replicas. fresh_db is the
+    primary, without pinning anything - for the reads kept in the cache.
+    With INSTRUMENTATION_ENABLED, both record the latency and row count of every statement.
+
+    The rows of sharded repositories belong to a workspace, and live on its shard (see app.db.shards) - they only
+    ever read and write those of self.workspace. None reads those of every workspace of the shard, and can't write.
     """
-    def __init__(self, db: Database) -> None:
-        self.db = db
\ No newline at end of file
+    sharded = False
+
+    def __init__(
+            self,
+            db: Union[Database, DatabaseRouter],
+            cache: Optional[BaseCache] = None,
+            *,
+            workspace: Optional[str] = DEFAULT_WORKSPACE,
+    ) -> None:
+        self.router = db if isinstance(db, DatabaseRouter) else DatabaseRouter(db)
+        self.cache = cache or NullCache()
+        self.workspace = workspace
+
+    @property
+    def db(self) -> Database:
+        return self.router.writer()
+
+    @property
+    def read_db(self) -> Database:
+        return self.router.reader()
+
+    @property
+    def fresh_db(self) -> Database:
+        return self.router.fresh_reader()
+
+    @property
+    def workspace_id(self) -> str:
+        """
+        The one workspace of the request, for the statements that can't span several
+        """
+        if self.workspace is None:
+            raise workspace_required()
+
+        return self.workspace
+
+
+def workspace_required() -> HTTPException:
+    return HTTPException(
+        status_code=HTTP_400_BAD_REQUEST,
+        detail="This request needs a single workspace.",
+    )
@@ -0,0 +1,82 @@
+from datetime import datetime
+from typing import List, Optional
+
+from app.db.changes import ChangeEvent
+from app.db.repositories.base import BaseRepository
+
+# Walks the primary key in seq order. {where} is only ever filled from CHANGE_FILTER_CONDITIONS.
+GET_CHANGES_QUERY = """
+    SELECT seq, project_id, project_change_payload(c) AS payload
+    FROM project_changes AS c
+    WHERE seq > :after
+    {where}
+    ORDER BY seq
+    LIMIT :limit;
+"""
+
+CHANGE_FILTER_CONDITIONS = {
+    "since": "AND changed_at >= :since",
+    "project_id": "AND project_id = :project_id",
+}
+
+# after may be the seq of a rolled back change, never logged - the log reaches back to it as long as it holds
+# a change at or below it (pruning deletes the oldest first)
+CHANGES_REACH_BACK_QUERY = """
+    SELECT EXISTS (SELECT 1 FROM project_changes WHERE seq <= :seq);
+"""
+
+# The changes logged more than gap_timeout ago have either committed or been rolled back by now,
+# see ShardChanges.resume_seq
+GET_SETTLED_CHANGE_SEQ_QUERY = """
+    SELECT coalesce(max(seq), 0)
+    FROM project_changes
+    WHERE changed_at < clock_timestamp() - make_interval(secs => :gap_timeout);
+"""
+
+PRUNE_CHANGES_QUERY = """
+    DELETE FROM project_changes
+    WHERE changed_at < now() - make_interval(secs => :retention);
+"""
+
+
+class ChangesRepository(BaseRepository):
+    """
+    The project_changes log, written by the record_project_change trigger on projects and tasks.
+    Read from the primary - a lagging replica would miss the changes whose notifications a stream already got.
+    """
+
+    async def get_changes(
+            self,
+            *,
+            after: int = 0,
+            since: Optional[datetime] = None,
+            project_id: Optional[int] = None,
+            limit: int,
+    ) -> List[ChangeEvent]:
+        """
+        :return: Up to limit changes with a seq above after, oldest first - optionally only those from since on,
+         or those of one project
+        """
+        filters = {name: value for name, value in (("since", since), ("project_id", project_id)) if value is not None}
+        conditions = [CHANGE_FILTER_CONDITIONS[name] for name in filters]
+        records = await self.db.fetch_all(
+            query=GET_CHANGES_QUERY.format(where="\n    ".join(conditions)),
+            values={"after": after, "limit": limit, **filters},
+        )
+
+        return [ChangeEvent(record["seq"], record["project_id"], record["payload"]) for record in records]
+
+    async def changes_reach_back(self, *, seq: int) -> bool:
+        return await self.db.fetch_val(query=CHANGES_REACH_BACK_QUERY, values={"seq": seq})
+
+    async def get_settled_change_seq(self, *, gap_timeout: float) -> int:
+        """
+        :return: A seq below which no change is still in flight, short of transactions longer than gap_timeout
+        """
+        return await self.db.fetch_val(query=GET_SETTLED_CHANGE_SEQ_QUERY, values={"gap_timeout": gap_timeout})
+
+    async def prune_changes(self, *, retention: float) -> None:
+        """
+        Deletes the changes older than retention seconds
+        """
+        await self.db.execute(query=PRUNE_CHANGES_QUERY, values={"retention": retention})
@@ -0,0 +1,90 @@
+from typing import Awaitable, Callable, Optional, Tuple
+
+from app.db.repositories.base import BaseRepository
+
+# Serializes the requests sent with the same key, across workers, until the transaction holding it ends.
+# Keys colliding on the hash are only serialized needlessly.
+LOCK_IDEMPOTENCY_KEY_QUERY = """
+    SELECT pg_advisory_xact_lock(hashtextextended(CAST(:route AS text) || ':' || CAST(:key AS text), 0));
+"""
+
+GET_IDEMPOTENT_RESPONSE_QUERY = """
+    SELECT fingerprint, status_code, body
+    FROM idempotency_keys
+    WHERE route = :route AND key = :key AND created_at > now() - make_interval(secs => :ttl);
+"""
+
+# Only conflicts with an expired row, which the key is then reused over
+SAVE_IDEMPOTENT_RESPONSE_QUERY = """
+    INSERT INTO idempotency_keys (route, key, workspace_id, fingerprint, status_code, body)
+    VALUES (:route, :key, :workspace_id, :fingerprint, :status_code, :body)
+    ON CONFLICT (route, key) DO UPDATE
+    SET workspace_id = EXCLUDED.workspace_id, fingerprint = EXCLUDED.fingerprint, status_code = EXCLUDED.status_code,
+        body = EXCLUDED.body, created_at = EXCLUDED.created_at;
+"""
+
+PRUNE_IDEMPOTENCY_KEYS_QUERY = """
+    DELETE FROM idempotency_keys
+    WHERE created_at < now() - make_interval(secs => :ttl);
+"""
+
+# (fingerprint, status code, body) of a response
+StoredResponse = Tuple[bytes, int, bytes]
+
+
+class IdempotencyRepository(BaseRepository):
+    """
+    The responses of the requests sent with an Idempotency-Key, kept ttl seconds - on the shard of the workspace
+    they were sent to, where the requests write, and moved with it
+    """
+    sharded = True
+
+    async def execute_once(
+            self,
+            *,
+            route: str,
+            key: str,
+            fingerprint: bytes,
+            ttl: float,
+            execute: Callable[[], Awaitable[Tuple[int, bytes]]],
+    ) -> Tuple[StoredResponse, bool]:
+        """
+        Runs execute, unless a request with this key already did - its response is then returned.
+        execute runs in the transaction saving its response: it is either done and saved, or not done at all,
+        a request failing with an exception leaves nothing behind, and its retries execute anew. Its writes must
+        go through this repository's database, the workspace's shard - a repository of the same request's does.
+
+        The writes of execute are committed after their cache invalidation - a read in between may cache
+        their previous state, for the cache TTL.
+
+        :return: The response, and whether it is the one of an earlier request
+        """
+        async with self.db.transaction():
+            await self.db.execute(query=LOCK_IDEMPOTENCY_KEY_QUERY, values={"route": route, "key": key})
+
+            stored = await self._get_response(route=route, key=key, ttl=ttl)
+            if stored is not None:
+                return stored, True
+
+            status_code, body = await execute()
+            await self.db.execute(
+                query=SAVE_IDEMPOTENT_RESPONSE_QUERY,
+                values={
+                    "route": route, "key": key, "workspace_id": self.workspace_id, "fingerprint": fingerprint,
+                    "status_code": status_code, "body": body,
+                },
+            )
+
+        return (fingerprint, status_code, body), False
+
+    async def _get_response(self, *, route: str, key: str, ttl: float) -> Optional[StoredResponse]:
+        record = await self.db.fetch_one(
+            query=GET_IDEMPOTENT_RESPONSE_QUERY, values={"route": route, "key": key, "ttl": ttl},
+        )
+        if record is None:
+            return None
+
+        return bytes(record["fingerprint"]), record["status_code"], bytes(record["body"])
+
+    async def prune_keys(self, *, ttl: float) -> None:
+        await self.db.execute(query=PRUNE_IDEMPOTENCY_KEYS_QUERY, values={"ttl": ttl})
@@ -0,0 +1,301 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from databases.interfaces import Record
+from fastapi import HTTPException
+from starlette.status import HTTP_400_BAD_REQUEST
+
+from app.core.config import DEFAULT_PAGE_SIZE
+from app.db.repositories.base import BaseRepository
+from app.db.repositories.pagination import decode_cursor, encode_cursor
+from app.models.job import JobInDB, JobKind, JobPublic, JobStatus
+
+CREATE_JOB_QUERY = """
+    INSERT INTO jobs (kind, payload, result, max_attempts, progress_total)
+    VALUES (:kind, CAST(:payload AS jsonb), CAST(:result AS jsonb), :max_attempts, :total)
+    RETURNING id, kind, status, payload, attempts, max_attempts, progress_done, progress_total, result, error,
+              created_at, run_at, started_at, finished_at;
+"""
+
+# Off the partial ix_jobs_queued_run_at_id, which only holds the queued jobs
+GET_QUEUED_JOB_QUERY = """
+    SELECT id, kind, status, attempts, max_attempts, progress_done, progress_total, result, error,
+           created_at, run_at, started_at, finished_at
+    FROM jobs
+    WHERE status = 'queued' AND kind = :kind
+    ORDER BY run_at, id
+    LIMIT 1;
+"""
+
+GET_JOB_BY_ID_QUERY = """
+    SELECT id, kind, status, attempts, max_attempts, progress_done, progress_total, result, error,
+           created_at, run_at, started_at, finished_at
+    FROM jobs
+    WHERE id = :id;
+"""
+
+# Most recent first, down the primary key. {where} is only ever filled from the fragments below.
+GET_ALL_JOBS_QUERY = """
+    SELECT id, kind, status, attempts, max_attempts, progress_done, progress_total, result, error,
+           created_at, run_at, started_at, finished_at
+    FROM jobs
+    {where}
+    ORDER BY id DESC
+    LIMIT :limit;
+"""
+
+JOB_STATUS_CONDITION = "status = :status"
+
+JOB_CURSOR_CONDITION = "id < :cursor_id"
+
+JOB_CURSOR_SORT = "-id"
+
+# The queued job due first, off the partial ix_jobs_queued_run_at_id - the ones other workers are claiming
+# are skipped rather than waited for, every worker gets a different job in a single statement.
+# The job is leased for :lease seconds, renewed by its worker while it runs.
+CLAIM_JOB_QUERY = """
+    UPDATE jobs
+    SET status = 'running',
+        attempts = attempts + 1,
+        started_at = now(),
+        locked_until = now() + make_interval(secs => :lease)
+    WHERE id = (
+        SELECT id
+        FROM jobs
+        WHERE status = 'queued' AND run_at <= now()
+        ORDER BY run_at, id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, kind, status, payload, attempts, max_attempts, progress_done, progress_total, result, error,
+              created_at, run_at, started_at, finished_at;
+"""
+
+# Every write of a running job's worker only applies while the job is still its own: still running,
+# at the attempt it claimed - once its lease expired and the job was requeued, they match nothing.
+OWNED_JOB_CONDITION = "id = :id AND attempts = :attempt AND status = 'running'"
+
+RENEW_JOB_LEASE_QUERY = f"""
+    UPDATE jobs
+    SET locked_until = now() + make_interval(secs => :lease)
+    WHERE {OWNED_JOB_CONDITION}
+    RETURNING id;
+"""
+
+UPDATE_JOB_PROGRESS_QUERY = f"""
+    UPDATE jobs
+    SET progress_done = :done,
+        progress_total = :total,
+        result = CAST(:result AS jsonb),
+        locked_until = now() + make_interval(secs => :lease)
+    WHERE {OWNED_JOB_CONDITION}
+    RETURNING id;
+"""
+
+COMPLETE_JOB_QUERY = f"""
+    UPDATE jobs
+    SET status = 'succeeded',
+        result = CAST(:result AS jsonb),
+        error = NULL,
+        locked_until = NULL,
+        finished_at = now()
+    WHERE {OWNED_JOB_CONDITION}
+    RETURNING id;
+"""
+
+# Back to the queue in :retry_delay seconds, or failed for good at its last attempt
+FAIL_JOB_QUERY = f"""
+    UPDATE jobs
+    SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+        run_at = now() + make_interval(secs => :retry_delay),
+        error = :error,
+        locked_until = NULL,
+        finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE now() END
+    WHERE {OWNED_JOB_CONDITION}
+    RETURNING status;
+"""
+
+# Interrupted by a shutdown - not an attempt of the job's, it runs again as soon as a worker is free
+RELEASE_JOB_QUERY = f"""
+    UPDATE jobs
+    SET status = 'queued',
+        attempts = attempts - 1,
+        locked_until = NULL
+    WHERE {OWNED_JOB_CONDITION}
+    RETURNING id;
+"""
+
+# The jobs whose worker stopped renewing their lease (it died, or lost the database) - that was an attempt
+REQUEUE_EXPIRED_JOBS_QUERY = """
+    UPDATE jobs
+    SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+        run_at = now(),
+        error = 'The worker running the job stopped responding.',
+        locked_until = NULL,
+        finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE now() END
+    WHERE status = 'running' AND locked_until < now()
+    RETURNING id;
+"""
+
+PRUNE_JOBS_QUERY = """
+    DELETE FROM jobs
+    WHERE finished_at < now() - make_interval(secs => :retention);
+"""
+
+
+class JobsRepository(BaseRepository):
+    """
+    The jobs table, queue of the background jobs run by app.db.jobs.
+    Read from the primary - a job polled right after it was queued must be found.
+    """
+
+    async def create_job(
+            self,
+            *,
+            kind: JobKind,
+            payload: Dict[str, Any],
+            result: Optional[dict] = None,
+            total: Optional[int] = None,
+            max_attempts: int,
+            coalesce: bool = False,
+    ) -> JobInDB:
+        """
+        :param result: The initial (partial) result of the job, that its handler builds on
+        :param total: The units of work of the job, when known before it runs - its progress reads 0 out of total
+        :param coalesce: Returns the job of that kind still queued, if there is one, rather than queueing another -
+         for the jobs that do the same whoever asks, and that don't need to run twice in a row
+        """
+        if coalesce:
+            job = await self.db.fetch_one(query=GET_QUEUED_JOB_QUERY, values={"kind": kind.value})
+            if job:
+                return self._to_job(job)
+
+        job = await self.db.fetch_one(
+            query=CREATE_JOB_QUERY,
+            values={
+                "kind": kind.value, "payload": json.dumps(payload), "result": self._json(result),
+                "max_attempts": max_attempts, "total": total,
+            },
+        )
+
+        return self._to_job(job)
+
+    async def get_job_by_id(self, *, id: int) -> Optional[JobPublic]:
+        job = await self.db.fetch_one(query=GET_JOB_BY_ID_QUERY, values={"id": id})
+
+        if not job:
+            return None
+
+        return self._to_job(job)
+
+    async def get_all_jobs(
+            self,
+            *,
+            status: Optional[JobStatus] = None,
+            limit: int = DEFAULT_PAGE_SIZE,
+            cursor: Optional[str] = None,
+    ) -> Tuple[List[JobPublic], Optional[str]]:
+        """
+        Keyset pagination down the ids, most recent first.
+        Returns the page and the cursor of the next one (None on the last page).
+        """
+        conditions, values = [], {"limit": limit + 1}
+
+        if status is not None:
+            conditions.append(JOB_STATUS_CONDITION)
+            values["status"] = status.value
+
+        if cursor:
+            values["cursor_id"] = self._decode_job_cursor(cursor)
+            conditions.append(JOB_CURSOR_CONDITION)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        job_records = await self.db.fetch_all(query=GET_ALL_JOBS_QUERY.format(where=where), values=values)
+
+        jobs = [self._to_job(record) for record in job_records[:limit]]
+        next_cursor = None
+        if len(job_records) > limit:
+            next_cursor = encode_cursor(JOB_CURSOR_SORT, jobs[-1].id)
+
+        return jobs, next_cursor
+
+    async def claim_job(self, *, lease: float) -> Optional[JobInDB]:
+        """
+        :return: The next job due, now running and leased to the caller for lease seconds - None if there is none
+        """
+        job = await self.db.fetch_one(query=CLAIM_JOB_QUERY, values={"lease": lease})
+
+        if not job:
+            return None
+
+        return self._to_job(job)
+
+    async def renew_lease(self, *, job: JobInDB, lease: float) -> bool:
+        """
+        :return: Whether the job is still the caller's
+        """
+        return await self._update_owned(RENEW_JOB_LEASE_QUERY, job, lease=lease) is not None
+
+    async def update_progress(
+            self, *, job: JobInDB, done: int, total: Optional[int], result: Optional[dict], lease: float,
+    ) -> bool:
+        """
+        Saves the progress of a running job, and renews its lease
+        :return: Whether the job is still the caller's
+        """
+        updated = await self._update_owned(
+            UPDATE_JOB_PROGRESS_QUERY, job, done=done, total=total, result=self._json(result), lease=lease,
+        )
+
+        return updated is not None
+
+    async def complete_job(self, *, job: JobInDB, result: Optional[dict]) -> bool:
+        return await self._update_owned(COMPLETE_JOB_QUERY, job, result=self._json(result)) is not None
+
+    async def fail_job(self, *, job: JobInDB, error: str, retry_delay: float) -> Optional[JobStatus]:
+        """
+        :return: queued when the job will be retried, failed at its last attempt - None if it wasn't the caller's
+        """
+        status = await self._update_owned(FAIL_JOB_QUERY, job, error=error, retry_delay=retry_delay)
+
+        return None if status is None else JobStatus(status)
+
+    async def release_job(self, *, job: JobInDB) -> bool:
+        return await self._update_owned(RELEASE_JOB_QUERY, job) is not None
+
+    async def requeue_expired_jobs(self) -> List[int]:
+        job_records = await self.db.fetch_all(query=REQUEUE_EXPIRED_JOBS_QUERY)
+
+        return [record["id"] for record in job_records]
+
+    async def prune_jobs(self, *, retention: float) -> None:
+        await self.db.execute(query=PRUNE_JOBS_QUERY, values={"retention": retention})
+
+    async def _update_owned(self, query: str, job: JobInDB, **values) -> Any:
+        return await self.db.fetch_val(query=query, values={"id": job.id, "attempt": job.attempts, **values})
+
+    @staticmethod
+    def _to_job(record: Record) -> JobInDB:
+        job = dict(record._mapping)
+        for column in ("payload", "result"):
+            if isinstance(job.get(column), str):
+                job[column] = json.loads(job[column])
+
+        job["progress"] = {"done": job.pop("progress_done"), "total": job.pop("progress_total")}
+
+        return JobInDB.model_validate(job)
+
+    @staticmethod
+    def _json(value: Optional[dict]) -> Optional[str]:
+        return None if value is None else json.dumps(value)
+
+    @staticmethod
+    def _decode_job_cursor(cursor: str) -> int:
+        try:
+            id, = decode_cursor(cursor, sort=JOB_CURSOR_SORT)
+            return int(id)
+        except (TypeError, ValueError):
+            raise HTTPException(
+                status_code=HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor.",
+            )
@@ -0,0 +1,74 @@
+import base64
+import binascii
+import json
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from starlette.status import HTTP_400_BAD_REQUEST
+
+# Searches are keyset paginated on (rank, id), most relevant first - their cursors also hold q
+SEARCH_CURSOR_SORT = "search"
+
+SEARCH_CURSOR_CONDITION = "(rank < :cursor_rank OR (rank = :cursor_rank AND id > :cursor_id))"
+
+
+def encode_cursor(sort: str, *keys: Any) -> str:
+    """
+    Encode the sort key of the last row on a page into an opaque, URL safe token.
+    Clients hand the token back unchanged to fetch the next page.
+    """
+    payload = json.dumps(
+        {"s": sort, "k": [key.isoformat() if isinstance(key, datetime) else key for key in keys]},
+        separators=(",", ":"),
+    )
+
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *, sort: str) -> List[Any]:
+    """
+    Decode a token produced by encode_cursor, returning the raw keys.
+    A cursor issued for a different sort order is rejected, as its keys can't be compared.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if payload["s"] != sort:
+            raise ValueError("cursor was issued for a different sort order")
+
+        return list(payload["k"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor.",
+        )
+
+
+def search_tsquery(q: str) -> Optional[str]:
+    """
+    The to_tsquery of a search, where every word of q matches as a prefix - None when q has no word.
+    Only word characters reach to_tsquery, so the query can't be malformed whatever the user typed.
+    """
+    words = re.findall(r"\w+", q)
+
+    return " & ".join(f"{word}:*" for word in words) or None
+
+
+def decode_search_cursor(cursor: str, *, q: str) -> Dict[str, Any]:
+    """
+    The SEARCH_CURSOR_CONDITION values of a cursor of the search of q
+    """
+    keys = decode_cursor(cursor, sort=SEARCH_CURSOR_SORT)
+
+    try:
+        cursor_q, rank, id = keys
+        # A cursor only continues the search it came from
+        if cursor_q != q:
+            raise ValueError(cursor_q)
+        return {"cursor_rank": float(rank), "cursor_id": int(id)}
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor.",
+        )
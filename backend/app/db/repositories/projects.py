@@ -1,111 +1,717 @@
-from typing import List
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
+from asyncpg.exceptions import DataError, IntegrityConstraintViolationError
+from databases import Database
+from databases.interfaces import Record
 from fastapi import HTTPException
-from starlette.status import HTTP_400_BAD_REQUEST
+from pydantic import TypeAdapter
+from starlette.status import HTTP_400_BAD_REQUEST, HTTP_412_PRECONDITION_FAILED
 
+from app.core.config import BULK_MAX_BATCH_SIZE, DEFAULT_PAGE_SIZE
+from app.db.loader import get_batch_loader
 from app.db.repositories.base import BaseRepository
-from app.models.project import ProjectCreate, ProjectUpdate, ProjectInDB
+from app.db.repositories.pagination import (
+    SEARCH_CURSOR_CONDITION, SEARCH_CURSOR_SORT, decode_cursor, decode_search_cursor, encode_cursor, search_tsquery,
+)
+from app.models.core import CoreModel
+from app.models.project import (
+    ProjectBulkUpdate, ProjectCreate, ProjectFilter, ProjectSearchResult, ProjectSortField, ProjectUpdate, ProjectInDB,
+)
+
+logger = logging.getLogger(__name__)
 
 CREATE_PROJECT_QUERY = """
-    INSERT INTO projects (title, description, created_date, due_date, status)
-    VALUES (:title, :description, :created_date, :due_date, :status)
-    RETURNING id, title, description, created_date, due_date, status;
+    INSERT INTO projects (workspace_id, title, description, created_date, due_date, status)
+    VALUES (
+        :workspace_id, :title, :description, COALESCE(CAST(:created_date AS timestamptz), now()), :due_date, :status
+    )
+    RETURNING id, workspace_id, title, description, created_date, due_date, status, version, updated_at;
 """
 
-GET_PROJECT_BY_ID_QUERY = """
-    SELECT id, title, description, created_date, due_date, status
+# Deleted projects (deleted_at set) wait for their purge out of every read and write of the API,
+# whose queries all repeat deleted_at IS NULL - the predicate of the projects' partial indexes.
+# Lookups by id are batched across concurrent requests, whatever their workspace, see get_project_by_id
+GET_PROJECTS_BY_IDS_QUERY = """
+    SELECT id, workspace_id, title, description, created_date, due_date, status, version, updated_at
     FROM projects
-    WHERE id = :id;
+    WHERE id = ANY(:ids) AND deleted_at IS NULL;
 """
 
+# {where} and {order_by} are only ever filled from the fragments below, never from user input
 GET_ALL_PROJECTS_QUERY = """
-    SELECT id, title, description, created_date, due_date, status
-    FROM projects;
+    SELECT id, workspace_id, title, description, created_date, due_date, status, version, updated_at
+    FROM projects
+    {where}
+    ORDER BY {order_by}
+    LIMIT :limit;
+"""
+
+GET_PROJECTS_LIST_STATE_QUERY = """
+    SELECT max(updated_at) AS last_modified, count(*) AS count
+    FROM projects
+    {where};
+"""
+
+EXPORT_PROJECTS_QUERY = """
+    SELECT id, workspace_id, title, description, created_date, due_date, status, version, updated_at
+    FROM projects
+    {where}
+    ORDER BY id;
+"""
+
+# Matches on the search_vector GIN index (every term, as a prefix) or fuzzily on the title trigram index.
+# The page is ranked and cut first, so only its rows pay for ts_headline. {where} only ever holds
+# WORKSPACE_CONDITION, PROJECT_FILTER_CONDITIONS and SEARCH_CURSOR_CONDITION.
+SEARCH_PROJECTS_QUERY = """
+    SELECT id, title, description, created_date, due_date, status, version, updated_at, rank,
+           ts_headline('english', title, query, 'StartSel=<mark>, StopSel=</mark>, HighlightAll=true')
+               AS title_highlight,
+           ts_headline('english', description, query, 'StartSel=<mark>, StopSel=</mark>, MaxFragments=2')
+               AS description_highlight
+    FROM (
+        SELECT id, title, description, created_date, due_date, status, version, updated_at, query, rank
+        FROM projects,
+             to_tsquery('english', :tsquery) AS query,
+             LATERAL (
+                 SELECT CAST(ts_rank_cd(search_vector, query) + word_similarity(:q, title) AS double precision) AS rank
+             ) AS ranked
+        WHERE (search_vector @@ query OR :q <% title)
+        {where}
+        ORDER BY rank DESC, id
+        LIMIT :limit
+    ) AS page
+    ORDER BY rank DESC, id;
 """
 
+LIVE_PROJECT_CONDITION = "deleted_at IS NULL"
+
+WORKSPACE_CONDITION = "workspace_id = :workspace_id"
+
+PROJECT_FILTER_CONDITIONS = {
+    "ids": "id = ANY(:ids)",
+    "status": "status = ANY(:status)",
+    "due_date_from": "due_date >= :due_date_from",
+    "due_date_to": "due_date < :due_date_to",
+    "created_date_from": "created_date >= :created_date_from",
+    "created_date_to": "created_date < :created_date_to",
+}
+
+# Keyset conditions, each matching an index in the projects table
+PROJECT_CURSOR_CONDITIONS = {
+    ProjectSortField.id: "id > :cursor_id",
+    ProjectSortField.due_date: "(due_date, id) > (:cursor_due_date, :cursor_id)",
+}
+
+PROJECT_ORDER_BY = {
+    ProjectSortField.id: "id",
+    ProjectSortField.due_date: "due_date, id",
+}
+
+# {assignments} only ever holds "column = :column" for columns in UPDATABLE_PROJECT_COLUMNS
 UPDATE_PROJECT_BY_ID_QUERY = """
-    UPDATE projects  
-    SET title        = :title,  
-        description  = :description,  
-        due_date     = :due_date,  
-        status       = :status  
-    WHERE id = :id 
-    RETURNING id, title, description, created_date, due_date, status;  
+    UPDATE projects
+    SET {assignments},
+        version = version + 1
+    WHERE id = :id AND workspace_id = :workspace_id AND deleted_at IS NULL
+    {version_condition}
+    RETURNING id, workspace_id, title, description, created_date, due_date, status, version, updated_at;
+"""
+
+UPDATABLE_PROJECT_COLUMNS = ("title", "description", "created_date", "due_date", "status")
+
+GET_PROJECT_VERSION_BY_ID_QUERY = """
+    SELECT version
+    FROM projects
+    WHERE id = :id AND workspace_id = :workspace_id AND deleted_at IS NULL;
 """
 
+# A soft delete - the row stays, out of the API, until purge_deleted_projects
 DELETE_PROJECT_BY_ID_QUERY = """
-    DELETE FROM projects 
-    WHERE id = :id 
+    UPDATE projects
+    SET deleted_at = now(),
+        version = version + 1
+    WHERE id = :id AND workspace_id = :workspace_id AND deleted_at IS NULL
     RETURNING id;
 """
 
 
+# Bulk statements take one array per column and unnest them into rows, so a whole batch is a single
+# statement (and therefore a single transaction) with a fixed SQL text whatever the batch size.
+BULK_CREATE_PROJECTS_QUERY = """
+    INSERT INTO projects (workspace_id, title, description, created_date, due_date, status)
+    SELECT CAST(:workspace_id AS text), title, description, COALESCE(created_date, now()), due_date, status
+    FROM unnest(
+        CAST(:title AS text[]),
+        CAST(:description AS text[]),
+        CAST(:created_date AS timestamptz[]),
+        CAST(:due_date AS timestamptz[]),
+        CAST(:status AS projectstatus[])
+    ) WITH ORDINALITY AS new_project(title, description, created_date, due_date, status, batch_index)
+    ORDER BY batch_index
+    RETURNING id, workspace_id, title, description, created_date, due_date, status, version, updated_at;
+"""
+
+BULK_UPDATE_PROJECTS_QUERY = """
+    UPDATE projects
+    SET title       = COALESCE(changes.title, projects.title),
+        description = COALESCE(changes.description, projects.description),
+        due_date    = COALESCE(changes.due_date, projects.due_date),
+        status      = COALESCE(changes.status, projects.status),
+        version     = projects.version + 1
+    FROM unnest(
+        CAST(:id AS integer[]),
+        CAST(:title AS text[]),
+        CAST(:description AS text[]),
+        CAST(:due_date AS timestamptz[]),
+        CAST(:status AS projectstatus[])
+    ) AS changes(id, title, description, due_date, status)
+    WHERE projects.id = changes.id AND projects.workspace_id = :workspace_id AND projects.deleted_at IS NULL
+    RETURNING projects.id;
+"""
+
+BULK_DELETE_PROJECTS_QUERY = """
+    UPDATE projects
+    SET deleted_at = now(),
+        version = version + 1
+    WHERE id = ANY(:ids) AND workspace_id = :workspace_id AND deleted_at IS NULL
+    RETURNING id;
+"""
+
+# The maintenance job's statements (app.db.db_tasks) - each one a batch of at most :limit projects, oldest first,
+# skipping the rows locked by requests rather than waiting for them, so that no lock is held long.
+# Deleting a project deletes its tasks (ON DELETE CASCADE).
+PURGE_DELETED_PROJECTS_QUERY = """
+    DELETE FROM projects
+    WHERE id IN (
+        SELECT id
+        FROM projects
+        WHERE deleted_at < now() - make_interval(secs => :older_than)
+        ORDER BY deleted_at
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id;
+"""
+
+# One archiver at a time, across workers - the others skip their turn
+LOCK_PROJECT_ARCHIVE_QUERY = """
+    SELECT pg_try_advisory_xact_lock(hashtextextended('projects_archive', 0));
+"""
+
+CREATE_ARCHIVE_PARTITIONS_QUERY = """
+    SELECT create_archive_partition('projects_archive', now()), create_archive_partition('tasks_archive', now());
+"""
+
+# Moves the projects, and their tasks, to the archive partitions of this month. Both deletes are in the one
+# statement: the cascade of the projects' finds their tasks gone already. {where} only ever holds
+# ARCHIVE_PROJECT_CONDITIONS joined by OR.
+ARCHIVE_PROJECTS_QUERY = """
+    WITH archived AS (
+        SELECT id
+        FROM projects
+        WHERE deleted_at IS NULL AND ({where})
+        ORDER BY id
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    ), archived_tasks AS (
+        DELETE FROM tasks
+        WHERE project_id IN (SELECT id FROM archived)
+        RETURNING id, workspace_id, project_id, title, description, created_date, due_date, status, completed_at
+    ), archived_projects AS (
+        DELETE FROM projects
+        WHERE id IN (SELECT id FROM archived)
+        RETURNING id, workspace_id, title, description, created_date, due_date, status, version, updated_at,
+                  completed_at
+    ), inserted_tasks AS (
+        INSERT INTO tasks_archive (
+            id, workspace_id, project_id, title, description, created_date, due_date, status, completed_at
+        )
+        SELECT id, workspace_id, project_id, title, description, created_date, due_date, status, completed_at
+        FROM archived_tasks
+    )
+    INSERT INTO projects_archive (
+        id, workspace_id, title, description, created_date, due_date, status, version, updated_at, completed_at
+    )
+    SELECT id, workspace_id, title, description, created_date, due_date, status, version, updated_at, completed_at
+    FROM archived_projects
+    RETURNING id, workspace_id;
+"""
+
+ARCHIVE_PROJECT_CONDITIONS = {
+    "completed_after": "(status = 'done' AND completed_at < now() - make_interval(secs => :completed_after))",
+    "created_after": "created_date < now() - make_interval(secs => :created_after)",
+}
+
+GET_ARCHIVE_PARTITIONS_QUERY = """
+    SELECT inhrelid::regclass::text AS name
+    FROM pg_inherits
+    WHERE inhparent IN ('projects_archive'::regclass, 'tasks_archive'::regclass);
+"""
+
+# Waits that long at most for the archive's lock, rather than queueing the reads of the archive behind the drop
+SET_DROP_LOCK_TIMEOUT_QUERY = """
+    SET LOCAL lock_timeout = '1s';
+"""
+
+# {name} is only ever a partition name matched by ARCHIVE_PARTITION_NAME, read from pg_inherits
+DROP_ARCHIVE_PARTITION_QUERY = """
+    DROP TABLE IF EXISTS {name};
+"""
+
+# Partitions are named by create_archive_partition, after their month
+ARCHIVE_PARTITION_NAME = re.compile(r"^(?:projects|tasks)_archive_y(\d{4})m(\d{2})$")
+
+# Validates a whole page of rows in one call into pydantic-core, instead of one model __init__ per row
+PROJECT_LIST_ADAPTER = TypeAdapter(List[ProjectInDB])
+
+SEARCH_RESULT_LIST_ADAPTER = TypeAdapter(List[ProjectSearchResult])
+
+
+def project_cache_key(workspace: Optional[str], id: int) -> str:
+    """
+    Lookups by id are cached per workspace - a workspace only sees its own projects, the miss of one can't hide
+    a project from another. None, every workspace, has its own entries too.
+    """
+    return f"projects:{workspace or '*'}:{id}"
+
+
 class ProjectsRepository(BaseRepository):
     """"
     All database actions associated with the Project resource
+    Reads go through self.cache, every write invalidates the projects it touched and all the cached listings
     """
+    sharded = True
 
     async def create_project(self, *, new_project: ProjectCreate) -> ProjectInDB:
-        query_values = new_project.model_dump()
+        query_values = {**new_project.model_dump(), "workspace_id": self.workspace_id}
         project = await self.db.fetch_one(query=CREATE_PROJECT_QUERY, values=query_values)
+        await self._invalidate()
 
-        return ProjectInDB(**project)
+        return self._to_project(project)
 
     async def get_project_by_id(self, *, id: int) -> ProjectInDB:
-        project = await self.db.fetch_one(query=GET_PROJECT_BY_ID_QUERY, values={"id": id})
+        return await self.cache.get_or_load(
+            project_cache_key(self.workspace, id), lambda: self._fetch_project_by_id(id=id),
+        )
+
+    async def get_projects_by_ids(self, *, ids: List[int]) -> Dict[int, ProjectInDB]:
+        """
+        Each id goes through the cache, the misses are fetched together in one query
+        :return: The projects found, by id
+        """
+        projects = await asyncio.gather(*(self.get_project_by_id(id=id) for id in ids))
 
-        if not project:
+        return {project.id: project for project in projects if project}
+
+    async def _fetch_project_by_id(self, *, id: int) -> ProjectInDB:
+        """
+        Cache misses of all the requests of this worker, made during the same iteration of the event loop,
+        are batched into a single GET_PROJECTS_BY_IDS_QUERY - N concurrent lookups cost one round trip.
+        Read from the primary, a replica's stale row would be cached past the write's invalidation.
+        """
+        loader = get_batch_loader(
+            "projects", self.fresh_db, self._fetch_projects_by_ids, max_batch_size=BULK_MAX_BATCH_SIZE,
+        )
+        project = await loader.load(id)
+
+        # Ids are unique across workspaces and shards, so the batches are shared by all of them -
+        # the workspace is checked once the project is found
+        if project is not None and self.workspace is not None and project.workspace_id != self.workspace:
             return None
 
-        return ProjectInDB(**project)
+        return project
+
+    @classmethod
+    async def _fetch_projects_by_ids(cls, db: Database, ids: List[int]) -> Dict[int, ProjectInDB]:
+        project_records = await db.fetch_all(query=GET_PROJECTS_BY_IDS_QUERY, values={"ids": ids})
 
-    async def get_all_projects(self) -> List[ProjectInDB]:
-        project_records = await self.db.fetch_all(
-            query=GET_ALL_PROJECTS_QUERY,
+        return {project.id: project for project in cls._to_projects(project_records)}
+
+    async def get_all_projects(
+            self,
+            *,
+            filters: Optional[ProjectFilter] = None,
+            sort: ProjectSortField = ProjectSortField.id,
+            limit: int = DEFAULT_PAGE_SIZE,
+            cursor: Optional[str] = None,
+    ) -> Tuple[List[ProjectInDB], Optional[str]]:
+        """
+        Keyset pagination - every page is an index range scan starting right after the cursor,
+        so the cost of a page doesn't depend on how deep it is.
+        Returns the page and the cursor of the next one (None on the last page).
+        """
+        key = await self._listing_key("list", filters, sort.value, limit, cursor)
+
+        return await self.cache.get_or_load(
+            key, lambda: self._fetch_all_projects(filters=filters, sort=sort, limit=limit, cursor=cursor),
+        )
+
+    async def get_projects_list_state(
+            self, *, filters: Optional[ProjectFilter] = None,
+    ) -> Tuple[Optional[datetime], int]:
+        """
+        The latest updated_at and the number of the projects matching the filters - any write to them changes
+        one or the other, so together they identify a version of the listing (see the listing's ETag)
+        """
+        key = await self._listing_key("list-state", filters)
+
+        return await self.cache.get_or_load(key, lambda: self._fetch_projects_list_state(filters=filters))
+
+    async def _fetch_projects_list_state(self, *, filters: Optional[ProjectFilter]) -> Tuple[Optional[datetime], int]:
+        conditions, values = self._filter_conditions(filters)
+        state = await self.read_db.fetch_one(
+            query=GET_PROJECTS_LIST_STATE_QUERY.format(where=self._where(conditions)), values=values,
+        )
+
+        return state["last_modified"], state["count"]
+
+    async def _listing_key(self, kind: str, filters: Optional[ProjectFilter], *params) -> str:
+        # Listings can't be invalidated one by one, writes bump the generation instead
+        generation = await self.cache.get_generation("projects")
+        params = json.dumps(
+            [self.workspace, (filters or ProjectFilter()).model_dump(mode="json"), *params], sort_keys=True,
         )
 
-        return [ProjectInDB(**project) for project in project_records]
+        return f"projects:{kind}:{generation}:{hashlib.sha1(params.encode()).hexdigest()}"
+
+    async def _fetch_all_projects(
+            self, *, filters: Optional[ProjectFilter], sort: ProjectSortField, limit: int, cursor: Optional[str],
+    ) -> Tuple[List[ProjectInDB], Optional[str]]:
+        conditions, values = self._filter_conditions(filters)
+
+        if cursor:
+            values.update(self._decode_project_cursor(cursor, sort=sort))
+            conditions.append(PROJECT_CURSOR_CONDITIONS[sort])
+
+        # Fetch one extra row to know whether there is a next page
+        values["limit"] = limit + 1
+        query = GET_ALL_PROJECTS_QUERY.format(where=self._where(conditions), order_by=PROJECT_ORDER_BY[sort])
+        project_records = await self.read_db.fetch_all(query=query, values=values)
+
+        projects = self._to_projects(project_records[:limit])
+        next_cursor = None
+        if len(project_records) > limit:
+            next_cursor = self._encode_project_cursor(projects[-1], sort=sort)
+
+        return projects, next_cursor
+
+    async def iterate_projects(self, *, filters: Optional[ProjectFilter] = None) -> AsyncIterator[ProjectInDB]:
+        """
+        Streams every matching project through a server side cursor, one row at a time,
+        so memory stays flat no matter how many rows match.
+        """
+        conditions, values = self._filter_conditions(filters)
+        query = EXPORT_PROJECTS_QUERY.format(where=self._where(conditions))
+
+        async for project in self.read_db.iterate(query=query, values=values):
+            yield self._to_project(project)
+
+    async def search_projects(
+            self,
+            *,
+            q: str,
+            filters: Optional[ProjectFilter] = None,
+            limit: int = DEFAULT_PAGE_SIZE,
+            cursor: Optional[str] = None,
+    ) -> Tuple[List[ProjectSearchResult], Optional[str]]:
+        """
+        Full-text search over titles and descriptions, where every word of q matches as a prefix,
+        plus fuzzy matching of q against titles. Pages are keyset on (rank, id), most relevant first.
+        Returns the page and the cursor of the next one (None on the last page).
+        """
+        tsquery = search_tsquery(q)
+        if tsquery is None:
+            return [], None
+
+        conditions, values = self._filter_conditions(filters)
+        values.update(q=q, tsquery=tsquery, limit=limit + 1)
+
+        if cursor:
+            values.update(decode_search_cursor(cursor, q=q))
+            conditions.append(SEARCH_CURSOR_CONDITION)
+
+        query = SEARCH_PROJECTS_QUERY.format(where="\n        ".join(f"AND {condition}" for condition in conditions))
+        result_records = await self.read_db.fetch_all(query=query, values=values)
+
+        results = SEARCH_RESULT_LIST_ADAPTER.validate_python(
+            [dict(record._mapping) for record in result_records[:limit]],
+        )
+        next_cursor = None
+        if len(result_records) > limit:
+            next_cursor = encode_cursor(SEARCH_CURSOR_SORT, q, results[-1].rank, results[-1].id)
+
+        return results, next_cursor
+
+    async def bulk_create_projects(self, *, new_projects: List[ProjectCreate]) -> List[ProjectInDB]:
+        """
+        Inserts the whole batch with one statement, returning the created projects in input order
+        """
+        if not new_projects:
+            return []
+
+        try:
+            project_records = await self.db.fetch_all(
+                query=BULK_CREATE_PROJECTS_QUERY,
+                values={
+                    **self._columns(new_projects, ("title", "description", "created_date", "due_date", "status")),
+                    "workspace_id": self.workspace_id,
+                },
+            )
+        except (DataError, IntegrityConstraintViolationError) as e:
+            logger.info(f"Bulk create of {len(new_projects)} projects rejected: {e}")
+            raise HTTPException(
+                status_code=HTTP_400_BAD_REQUEST,
+                detail="Invalid project params.",
+            )
+
+        await self._invalidate()
+
+        # ids come from the sequence in the order rows are inserted, which is the order of the batch
+        return sorted(self._to_projects(project_records), key=lambda project: project.id)
+
+    async def bulk_update_projects(self, *, project_updates: List[ProjectBulkUpdate]) -> List[int]:
+        """
+        Applies the whole batch with one UPDATE ... FROM statement, returning the ids that were found
+        """
+        if not project_updates:
+            return []
+
+        try:
+            updated_ids = await self.db.fetch_all(
+                query=BULK_UPDATE_PROJECTS_QUERY,
+                values={
+                    **self._columns(project_updates, ("id", "title", "description", "due_date", "status")),
+                    "workspace_id": self.workspace_id,
+                },
+            )
+        except (DataError, IntegrityConstraintViolationError) as e:
+            logger.info(f"Bulk update of {len(project_updates)} projects rejected: {e}")
+            raise HTTPException(
+                status_code=HTTP_400_BAD_REQUEST,
+                detail="Invalid update params.",
+            )
+
+        updated_ids = [record["id"] for record in updated_ids]
+        await self._invalidate(*updated_ids)
+
+        return updated_ids
+
+    async def bulk_delete_projects(self, *, ids: List[int]) -> List[int]:
+        """
+        Deletes the whole batch with one statement, returning the ids that were found
+        """
+        if not ids:
+            return []
+
+        deleted_ids = await self.db.fetch_all(
+            query=BULK_DELETE_PROJECTS_QUERY, values={"ids": ids, "workspace_id": self.workspace_id},
+        )
+        deleted_ids = [record["id"] for record in deleted_ids]
+        await self._invalidate(*deleted_ids)
+
+        return deleted_ids
+
+    async def _invalidate(self, *ids: int, workspaces: Optional[List[str]] = None) -> None:
+        """
+        :param workspaces: The workspace of each project, when it isn't self.workspace
+        """
+        workspaces = workspaces or [self.workspace] * len(ids)
+        await self.cache.delete(*(
+            key for id, workspace in zip(ids, workspaces)
+            for key in (project_cache_key(workspace, id), project_cache_key(None, id))
+        ))
+        await self.cache.bump_generation("projects")
+
+    @staticmethod
+    def _to_project(record: Record) -> ProjectInDB:
+        return ProjectInDB.model_validate(dict(record._mapping))
+
+    @staticmethod
+    def _to_projects(records: List[Record]) -> List[ProjectInDB]:
+        return PROJECT_LIST_ADAPTER.validate_python([dict(record._mapping) for record in records])
+
+    @staticmethod
+    def _version_conflict() -> HTTPException:
+        return HTTPException(
+            status_code=HTTP_412_PRECONDITION_FAILED,
+            detail="The project was modified since it was read.",
+        )
+
+    @staticmethod
+    def _columns(items: List[CoreModel], columns: Tuple[str, ...]) -> dict:
+        """
+        Pivots a batch of models into one list per column, the shape unnest() expects
+        """
+        return {column: [getattr(item, column) for item in items] for column in columns}
+
+    def _filter_conditions(self, filters: Optional[ProjectFilter]) -> Tuple[List[str], dict]:
+        values = (filters or ProjectFilter()).model_dump(exclude_none=True)
+        conditions = [LIVE_PROJECT_CONDITION, *(PROJECT_FILTER_CONDITIONS[name] for name in values)]
+
+        if self.workspace is not None:
+            conditions.insert(0, WORKSPACE_CONDITION)
+            values["workspace_id"] = self.workspace
+
+        return conditions, values
+
+    @staticmethod
+    def _where(conditions: List[str]) -> str:
+        return f"WHERE {' AND '.join(conditions)}"
+
+    @staticmethod
+    def _encode_project_cursor(project: ProjectInDB, *, sort: ProjectSortField) -> str:
+        if sort == ProjectSortField.due_date:
+            return encode_cursor(sort.value, project.due_date, project.id)
+
+        return encode_cursor(sort.value, project.id)
+
+    @staticmethod
+    def _decode_project_cursor(cursor: str, *, sort: ProjectSortField) -> dict:
+        keys = decode_cursor(cursor, sort=sort.value)
+
+        try:
+            if sort == ProjectSortField.due_date:
+                due_date, id = keys
+                return {"cursor_due_date": datetime.fromisoformat(due_date), "cursor_id": int(id)}
+
+            id, = keys
+            return {"cursor_id": int(id)}
+        except (TypeError, ValueError):
+            raise HTTPException(
+                status_code=HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor.",
+            )
 
     async def update_project(
-            self, *, id: int, project_update: ProjectUpdate,
+            self, *, id: int, project_update: ProjectUpdate, version: Optional[int] = None,
     ) -> ProjectInDB:
-        project = await self.get_project_by_id(id=id)
+        """
+        A single UPDATE that only sets the fields sent by the client, so concurrent updates of
+        different fields don't overwrite each other. Every update bumps the version of the project.
+        :param version: When given, the update only applies if the project is still at that version (If-Match)
+        """
+        if "status" in project_update.model_fields_set and project_update.status is None:
+            raise HTTPException(
+                status_code=HTTP_400_BAD_REQUEST,
+                detail="Invalid project status. Cannot be None.",
+            )
 
-        if not project:
-            return None
+        values = project_update.model_dump(
+            include=set(UPDATABLE_PROJECT_COLUMNS), exclude_unset=True, exclude_none=True,
+        )
+        if not values:
+            project = await self.get_project_by_id(id=id)
+            if project and version is not None and project.version != version:
+                raise self._version_conflict()
+
+            return project
 
-        project_update_params = project.copy(
-            update=project_update.model_dump(exclude_unset=True, exclude_none=True),
+        query = UPDATE_PROJECT_BY_ID_QUERY.format(
+            assignments=", ".join(f"{column} = :{column}" for column in values),
+            version_condition="AND version = :version" if version is not None else "",
         )
-        
-        if project_update_params.status is None:
-            raise HTTPException(  
-                status_code=HTTP_400_BAD_REQUEST,  
-                detail="Invalid project status. Cannot be None.",
-            )  
+        values.update(id=id, workspace_id=self.workspace_id)
+        if version is not None:
+            values["version"] = version
 
         try:
-            updated_project = await self.db.fetch_one(
-                query=UPDATE_PROJECT_BY_ID_QUERY,
-                values=project_update_params.model_dump(),
-            )
-            return ProjectInDB(**updated_project)
-        except Exception as e:
-            print(e)
+            updated_project = await self.db.fetch_one(query=query, values=values)
+        except (DataError, IntegrityConstraintViolationError) as e:
+            logger.info(f"Update of project {id} rejected: {e}")
             raise HTTPException(
                 status_code=HTTP_400_BAD_REQUEST,
                 detail="Invalid update params.",
             )
 
-    async def delete_project_by_id(self, *, id: int) -> int:
-        project = await self.get_project_by_id(id=id)
+        if updated_project:
+            await self._invalidate(id)
+            return self._to_project(updated_project)
 
-        if not project:
-            return None
+        # Nothing matched - only now is it worth telling a missing project from a stale version
+        if version is not None and await self.db.fetch_val(
+                query=GET_PROJECT_VERSION_BY_ID_QUERY, values={"id": id, "workspace_id": self.workspace_id},
+        ):
+            raise self._version_conflict()
+
+        return None
+
+    async def purge_deleted_projects(self, *, older_than: float, limit: int) -> int:
+        """
+        Deletes for good up to limit projects deleted more than older_than seconds ago, and their tasks
+        :return: The number of projects purged, less than limit once there are no more to purge
+        """
+        purged_ids = await self.db.fetch_all(
+            query=PURGE_DELETED_PROJECTS_QUERY, values={"older_than": older_than, "limit": limit},
+        )
+
+        return len(purged_ids)
+
+    async def archive_projects(self, *, completed_after: float, created_after: float, limit: int) -> int:
+        """
+        Moves up to limit projects, with their tasks, to projects_archive and tasks_archive - out of the API.
+        The projects archived are the ones done for more than completed_after seconds,
+        and those created more than created_after seconds ago, 0 disables either.
+        :return: The number of projects archived, less than limit once there are no more to archive
+        """
+        values = {
+            name: after for name, after in (("completed_after", completed_after), ("created_after", created_after))
+            if after
+        }
+        if not values:
+            return 0
+
+        query = ARCHIVE_PROJECTS_QUERY.format(where=" OR ".join(ARCHIVE_PROJECT_CONDITIONS[name] for name in values))
+        async with self.db.transaction():
+            if not await self.db.fetch_val(query=LOCK_PROJECT_ARCHIVE_QUERY):
+                return 0
+
+            await self.db.execute(query=CREATE_ARCHIVE_PARTITIONS_QUERY)
+            archived = await self.db.fetch_all(query=query, values={**values, "limit": limit})
 
+        if archived:
+            await self._invalidate(
+                *(record["id"] for record in archived), workspaces=[record["workspace_id"] for record in archived],
+            )
+
+        return len(archived)
+
+    async def drop_archive_partitions(self, *, before: datetime) -> List[str]:
+        """
+        Drops the archive's partitions of the months that ended before before, with the projects and tasks in them
+        :return: The names of the partitions dropped
+        """
+        partition_records = await self.db.fetch_all(query=GET_ARCHIVE_PARTITIONS_QUERY)
+
+        dropped = []
+        for record in partition_records:
+            match = ARCHIVE_PARTITION_NAME.match(record["name"])
+            if match is None:
+                continue
+
+            year, month = int(match[1]), int(match[2])
+            month_end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+            if month_end > before:
+                continue
+
+            async with self.db.transaction():
+                await self.db.execute(query=SET_DROP_LOCK_TIMEOUT_QUERY)
+                await self.db.execute(query=DROP_ARCHIVE_PARTITION_QUERY.format(name=record["name"]))
+            dropped.append(record["name"])
+
+        return dropped
+
+    async def delete_project_by_id(self, *, id: int) -> int:
         deleted_id = await self.db.execute(
             query=DELETE_PROJECT_BY_ID_QUERY,
-            values={"id": id},
+            values={"id": id, "workspace_id": self.workspace_id},
         )
+        if deleted_id:
+            await self._invalidate(id)
 
         return deleted_id
\ No newline at end of file
@@ -0,0 +1,311 @@
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.status import HTTP_400_BAD_REQUEST
+
+from app.core.config import DEFAULT_PAGE_SIZE, REPORTS_SOURCE
+from app.db.repositories.base import BaseRepository
+from app.db.repositories.pagination import decode_cursor, encode_cursor
+from app.models.report import (
+    DueDateBucket, OverdueProject, OverdueReport, ProjectStatusCounts, ReportBucket, StatusReport, ThroughputBucket,
+)
+from app.models.task import TaskStats
+
+# Reports are about the projects of the API - deleted ones, and their tasks, are left out until their purge.
+# Index only scans of the partial (status, id) index and of the (project_id, status, ...) one, joined to the
+# live projects - one round trip for both tables.
+GET_STATUS_COUNTS_QUERY = """
+    SELECT 'projects' AS entity, status::text AS status, count(*) AS count
+    FROM projects
+    WHERE deleted_at IS NULL
+    GROUP BY status
+    UNION ALL
+    SELECT 'tasks', tasks.status, count(*)
+    FROM tasks
+    JOIN projects ON projects.id = tasks.project_id AND projects.deleted_at IS NULL
+    GROUP BY tasks.status;
+"""
+
+# Same shape, read from the counters maintained by the maintain_project_report_counts
+# and maintain_project_task_counts triggers - a few rows per due day and per project
+GET_STATUS_COUNTS_FROM_SUMMARY_QUERY = """
+    SELECT 'projects' AS entity, status, sum(count)::bigint AS count
+    FROM project_report_counts
+    GROUP BY status
+    UNION ALL
+    SELECT 'tasks', project_task_counts.status, sum(count)::bigint
+    FROM project_task_counts
+    JOIN projects ON projects.id = project_task_counts.project_id AND projects.deleted_at IS NULL
+    GROUP BY project_task_counts.status;
+"""
+
+# Both walk the partial ix_projects_open_due_date_id, whose predicate the conditions repeat.
+# {where} is only ever filled from OVERDUE_CURSOR_CONDITION.
+COUNT_OVERDUE_PROJECTS_QUERY = """
+    SELECT count(*)
+    FROM projects
+    WHERE status <> 'done' AND deleted_at IS NULL AND due_date < now();
+"""
+
+GET_OVERDUE_PROJECTS_QUERY = """
+    SELECT id, title, status, due_date
+    FROM projects
+    WHERE status <> 'done' AND deleted_at IS NULL AND due_date < now()
+    {where}
+    ORDER BY due_date, id
+    LIMIT :limit;
+"""
+
+OVERDUE_CURSOR_CONDITION = "AND (due_date, id) > (:cursor_due_date, :cursor_id)"
+
+OVERDUE_CURSOR_SORT = "overdue"
+
+# An index only range scan of ix_projects_due_date_status, bucketed and counted by status in one pass
+GET_DUE_DATE_HISTOGRAM_QUERY = """
+    SELECT
+        (date_trunc(:bucket, due_date, 'UTC') AT TIME ZONE 'UTC')::date AS start,
+        count(*) FILTER (WHERE status = 'not_started') AS not_started,
+        count(*) FILTER (WHERE status = 'in_progress') AS in_progress,
+        count(*) FILTER (WHERE status = 'done') AS done,
+        count(*) AS total
+    FROM projects
+    WHERE due_date >= :start AND due_date < :end AND deleted_at IS NULL
+    GROUP BY 1;
+"""
+
+# Same shape, from the per day counters
+GET_DUE_DATE_HISTOGRAM_FROM_SUMMARY_QUERY = """
+    SELECT
+        date_trunc(:bucket, due_day::timestamp)::date AS start,
+        coalesce(sum(count) FILTER (WHERE status = 'not_started'), 0)::bigint AS not_started,
+        coalesce(sum(count) FILTER (WHERE status = 'in_progress'), 0)::bigint AS in_progress,
+        coalesce(sum(count) FILTER (WHERE status = 'done'), 0)::bigint AS done,
+        sum(count)::bigint AS total
+    FROM project_report_counts
+    WHERE due_day >= :start AND due_day < :end
+    GROUP BY 1;
+"""
+
+# Index only range scans of the partial ix_projects_completed_at and ix_tasks_completed_at, and of their
+# counterparts in the archive. Completions are history: those of deleted and archived projects still count.
+GET_THROUGHPUT_QUERY = """
+    SELECT start, sum(projects)::bigint AS projects, sum(tasks)::bigint AS tasks
+    FROM (
+        SELECT (date_trunc(:bucket, completed_at, 'UTC') AT TIME ZONE 'UTC')::date AS start,
+               count(*) AS projects, 0 AS tasks
+        FROM projects
+        WHERE completed_at >= :start AND completed_at < :end
+        GROUP BY 1
+        UNION ALL
+        SELECT (date_trunc(:bucket, completed_at, 'UTC') AT TIME ZONE 'UTC')::date, 0, count(*)
+        FROM tasks
+        WHERE completed_at >= :start AND completed_at < :end
+        GROUP BY 1
+        UNION ALL
+        SELECT (date_trunc(:bucket, completed_at, 'UTC') AT TIME ZONE 'UTC')::date, count(*), 0
+        FROM projects_archive
+        WHERE completed_at >= :start AND completed_at < :end
+        GROUP BY 1
+        UNION ALL
+        SELECT (date_trunc(:bucket, completed_at, 'UTC') AT TIME ZONE 'UTC')::date, 0, count(*)
+        FROM tasks_archive
+        WHERE completed_at >= :start AND completed_at < :end
+        GROUP BY 1
+    ) AS completions
+    GROUP BY start;
+"""
+
+BUCKET_DAYS = {ReportBucket.day: 1, ReportBucket.week: 7}
+
+# Recomputing the counters the summary reads come from (project_task_counts and project_report_counts), from
+# the tables - in case they drifted. One batch at a time, each one in a transaction that blocks the writes
+# to the table it counts, so that none is missed, for as long as the batch takes only.
+GET_RECOMPUTE_BOUNDS_QUERY = """
+    SELECT
+        (SELECT count(*) FROM projects) AS projects,
+        least(
+            (SELECT min(due_day) FROM project_report_counts),
+            (SELECT (min(due_date) AT TIME ZONE 'UTC')::date FROM projects WHERE deleted_at IS NULL)
+        ) AS first_day,
+        greatest(
+            (SELECT max(due_day) FROM project_report_counts),
+            (SELECT (max(due_date) AT TIME ZONE 'UTC')::date FROM projects WHERE deleted_at IS NULL)
+        ) AS last_day;
+"""
+
+LOCK_TASKS_QUERY = """
+    LOCK TABLE tasks IN SHARE MODE;
+"""
+
+GET_PROJECT_IDS_BATCH_QUERY = """
+    SELECT id
+    FROM projects
+    WHERE id > :after
+    ORDER BY id
+    LIMIT :limit;
+"""
+
+DELETE_TASK_COUNTS_QUERY = """
+    DELETE FROM project_task_counts
+    WHERE project_id = ANY(:project_ids);
+"""
+
+RECOMPUTE_TASK_COUNTS_QUERY = """
+    INSERT INTO project_task_counts (project_id, status, count)
+    SELECT project_id, status, count(*)
+    FROM tasks
+    WHERE project_id = ANY(:project_ids)
+    GROUP BY project_id, status;
+"""
+
+LOCK_PROJECTS_QUERY = """
+    LOCK TABLE projects IN SHARE MODE;
+"""
+
+DELETE_REPORT_COUNTS_QUERY = """
+    DELETE FROM project_report_counts
+    WHERE due_day >= :start AND due_day < :end;
+"""
+
+RECOMPUTE_REPORT_COUNTS_QUERY = """
+    INSERT INTO project_report_counts (due_day, status, count)
+    SELECT (due_date AT TIME ZONE 'UTC')::date, status::text, count(*)
+    FROM projects
+    WHERE due_date >= :start_at AND due_date < :end_at AND deleted_at IS NULL
+    GROUP BY 1, 2;
+"""
+
+
+class ReportsRepository(BaseRepository):
+    """
+    Aggregates over projects and tasks, computed by Postgres so that only the results travel.
+    With REPORTS_SOURCE=summary, status counts and due date histograms are read from the counters
+    maintained by triggers, rather than from the tables - their cost then depends on the days, not on the rows.
+    """
+
+    async def get_status_counts(self) -> StatusReport:
+        query = GET_STATUS_COUNTS_FROM_SUMMARY_QUERY if REPORTS_SOURCE == "summary" else GET_STATUS_COUNTS_QUERY
+        count_records = await self.read_db.fetch_all(query=query)
+
+        counts: Dict[str, Dict[str, int]] = {"projects": {}, "tasks": {}}
+        for record in count_records:
+            counts[record["entity"]][record["status"]] = record["count"]
+
+        return StatusReport(
+            projects=ProjectStatusCounts(**counts["projects"], total=sum(counts["projects"].values())),
+            tasks=TaskStats(**counts["tasks"], total=sum(counts["tasks"].values())),
+        )
+
+    async def get_overdue_projects(
+            self, *, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+    ) -> OverdueReport:
+        values, conditions = {"limit": limit + 1}, []
+        if cursor:
+            values.update(self._decode_overdue_cursor(cursor))
+            conditions.append(OVERDUE_CURSOR_CONDITION)
+
+        total = await self.read_db.fetch_val(query=COUNT_OVERDUE_PROJECTS_QUERY)
+        project_records = await self.read_db.fetch_all(
+            query=GET_OVERDUE_PROJECTS_QUERY.format(where="\n    ".join(conditions)), values=values,
+        )
+
+        projects = [OverdueProject(**dict(record._mapping)) for record in project_records[:limit]]
+        next_cursor = None
+        if len(project_records) > limit:
+            next_cursor = encode_cursor(OVERDUE_CURSOR_SORT, projects[-1].due_date, projects[-1].id)
+
+        return OverdueReport(total=total, items=projects, next_cursor=next_cursor)
+
+    async def get_due_date_histogram(self, *, bucket: ReportBucket, start: date, buckets: int) -> List[DueDateBucket]:
+        """
+        The projects due in each of the buckets from the one holding start on, empty buckets included
+        """
+        starts, end = self._bucket_starts(bucket=bucket, start=start, buckets=buckets)
+
+        if REPORTS_SOURCE == "summary":
+            query, values = GET_DUE_DATE_HISTOGRAM_FROM_SUMMARY_QUERY, {"start": starts[0], "end": end}
+        else:
+            query, values = GET_DUE_DATE_HISTOGRAM_QUERY, {"start": self._utc(starts[0]), "end": self._utc(end)}
+        bucket_records = await self.read_db.fetch_all(query=query, values={**values, "bucket": bucket.value})
+
+        found = {record["start"]: DueDateBucket(**dict(record._mapping)) for record in bucket_records}
+        return [found.get(bucket_start) or DueDateBucket(start=bucket_start) for bucket_start in starts]
+
+    async def get_throughput(self, *, bucket: ReportBucket, start: date, buckets: int) -> List[ThroughputBucket]:
+        """
+        The projects and tasks completed in each of the buckets from the one holding start on, empty buckets included
+        """
+        starts, end = self._bucket_starts(bucket=bucket, start=start, buckets=buckets)
+
+        bucket_records = await self.read_db.fetch_all(
+            query=GET_THROUGHPUT_QUERY,
+            values={"bucket": bucket.value, "start": self._utc(starts[0]), "end": self._utc(end)},
+        )
+
+        found = {record["start"]: ThroughputBucket(**dict(record._mapping)) for record in bucket_records}
+        return [found.get(bucket_start) or ThroughputBucket(start=bucket_start) for bucket_start in starts]
+
+    async def get_recompute_bounds(self) -> Tuple[int, Optional[date], Optional[date]]:
+        """
+        :return: The number of projects, and the first and last due day of the projects and of the counters
+        """
+        bounds = await self.db.fetch_one(query=GET_RECOMPUTE_BOUNDS_QUERY)
+
+        return bounds["projects"], bounds["first_day"], bounds["last_day"]
+
+    async def recompute_task_counts(self, *, after: int, limit: int) -> List[int]:
+        """
+        Recomputes the task counters of the limit projects following the one with id after
+        :return: The ids of these projects, fewer than limit at the end
+        """
+        async with self.db.transaction():
+            await self.db.execute(query=LOCK_TASKS_QUERY)
+            project_ids = [
+                record["id"] for record in
+                await self.db.fetch_all(query=GET_PROJECT_IDS_BATCH_QUERY, values={"after": after, "limit": limit})
+            ]
+            await self.db.execute(query=DELETE_TASK_COUNTS_QUERY, values={"project_ids": project_ids})
+            await self.db.execute(query=RECOMPUTE_TASK_COUNTS_QUERY, values={"project_ids": project_ids})
+
+        return project_ids
+
+    async def recompute_report_counts(self, *, start: date, end: date) -> None:
+        """
+        Recomputes the due date counters of the days from start to end (excluded)
+        """
+        async with self.db.transaction():
+            await self.db.execute(query=LOCK_PROJECTS_QUERY)
+            await self.db.execute(query=DELETE_REPORT_COUNTS_QUERY, values={"start": start, "end": end})
+            await self.db.execute(
+                query=RECOMPUTE_REPORT_COUNTS_QUERY, values={"start_at": self._utc(start), "end_at": self._utc(end)},
+            )
+
+    @staticmethod
+    def _bucket_starts(*, bucket: ReportBucket, start: date, buckets: int) -> Tuple[List[date], date]:
+        """
+        The first day of each bucket, the first one aligned the way date_trunc does, and the day after the last one
+        """
+        step = timedelta(days=BUCKET_DAYS[bucket])
+        if bucket == ReportBucket.week:
+            start -= timedelta(days=start.weekday())
+
+        starts = [start + step * i for i in range(buckets)]
+        return starts, starts[-1] + step
+
+    @staticmethod
+    def _utc(day: date) -> datetime:
+        return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+    @staticmethod
+    def _decode_overdue_cursor(cursor: str) -> dict:
+        keys = decode_cursor(cursor, sort=OVERDUE_CURSOR_SORT)
+
+        try:
+            due_date, id = keys
+            return {"cursor_due_date": datetime.fromisoformat(due_date), "cursor_id": int(id)}
+        except (TypeError, ValueError):
+            raise HTTPException(
+                status_code=HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor.",
+            )
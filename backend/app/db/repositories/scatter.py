@@ -0,0 +1,249 @@
+import asyncio
+import heapq
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple, Type, TypeVar
+
+from app.core.config import DEFAULT_PAGE_SIZE
+from app.db.cache import BaseCache
+from app.db.replicas import DatabaseRouter
+from app.db.repositories.pagination import SEARCH_CURSOR_SORT, encode_cursor
+from app.db.repositories.projects import ProjectsRepository
+from app.db.repositories.reports import OVERDUE_CURSOR_SORT, ReportsRepository
+from app.db.repositories.tasks import TasksRepository
+from app.models.core import CoreModel, IDModelMixin
+from app.models.project import ProjectFilter, ProjectInDB, ProjectSearchResult, ProjectSortField
+from app.models.report import (
+    DueDateBucket, OverdueReport, ProjectStatusCounts, ReportBucket, StatusReport, ThroughputBucket,
+)
+from app.models.task import TaskSearchResult, TaskStats
+
+# The sort key of each listing's order, the one its keyset cursor holds
+PROJECT_SORT_KEYS = {
+    ProjectSortField.id: lambda project: (project.id,),
+    ProjectSortField.due_date: lambda project: (project.due_date, project.id),
+}
+
+Row = TypeVar("Row", bound=IDModelMixin)
+
+Counts = TypeVar("Counts", bound=CoreModel)
+
+
+def without_copies(rows: Iterable[Row]) -> Iterator[Row]:
+    """
+    The merged rows, once each - a workspace being moved has its rows on two shards until the move is done,
+    identical as its writes wait, so they are merged next to each other
+    """
+    last_id = None
+    for row in rows:
+        if row.id != last_id:
+            yield row
+        last_id = row.id
+
+
+def summed(model_type: Type[Counts], shard_counts: List[Counts], **keys: Any) -> Counts:
+    """
+    The counts of the shards added up, field by field - but for keys, the same on every shard
+    """
+    return model_type(**keys, **{
+        field: sum(getattr(counts, field) for counts in shard_counts)
+        for field in model_type.model_fields if field not in keys
+    })
+
+
+def merge_search_pages(
+        pages: List[Tuple[List[Row], Optional[str]]], *, q: str, limit: int,
+) -> Tuple[List[Row], Optional[str]]:
+    """
+    The first limit results of the shards' pages of the same search, most relevant first
+    """
+    results = list(without_copies(
+        heapq.merge(*(page for page, _ in pages), key=lambda result: (-result.rank, result.id)),
+    ))
+    next_cursor = None
+    if len(results) > limit or any(shard_cursor for _, shard_cursor in pages):
+        results = results[:limit]
+        next_cursor = encode_cursor(SEARCH_CURSOR_SORT, q, results[-1].rank, results[-1].id)
+
+    return results, next_cursor
+
+
+class ScatterProjectsRepository(ProjectsRepository):
+    """
+    The projects of every workspace, read from every shard at once - each shard runs the query it would run for
+    one workspace, minus the workspace condition, and the results are merged in the listing's order. A page of
+    limit takes the first limit of the shards' pages of limit, its cursor is the same keyset cursor, valid on every
+    shard. Read only: the writes need a single workspace.
+    """
+
+    def __init__(self, routers: List[DatabaseRouter], cache: Optional[BaseCache] = None) -> None:
+        super().__init__(routers[0], cache=cache, workspace=None)
+        self.shard_repos = [ProjectsRepository(router, cache=cache, workspace=None) for router in routers]
+
+    async def _fetch_project_by_id(self, *, id: int) -> ProjectInDB:
+        # Found on one shard - on two while its workspace is moved, as the copy of the same row
+        projects = await asyncio.gather(*(repo._fetch_project_by_id(id=id) for repo in self.shard_repos))
+
+        return next((project for project in projects if project is not None), None)
+
+    async def _fetch_all_projects(
+            self, *, filters: Optional[ProjectFilter], sort: ProjectSortField, limit: int, cursor: Optional[str],
+    ) -> Tuple[List[ProjectInDB], Optional[str]]:
+        pages = await asyncio.gather(*(
+            repo._fetch_all_projects(filters=filters, sort=sort, limit=limit, cursor=cursor)
+            for repo in self.shard_repos
+        ))
+
+        projects = list(without_copies(heapq.merge(*(page for page, _ in pages), key=PROJECT_SORT_KEYS[sort])))
+        next_cursor = None
+        if len(projects) > limit or any(shard_cursor for _, shard_cursor in pages):
+            projects = projects[:limit]
+            next_cursor = self._encode_project_cursor(projects[-1], sort=sort)
+
+        return projects, next_cursor
+
+    async def _fetch_projects_list_state(self, *, filters: Optional[ProjectFilter]) -> Tuple[Optional[datetime], int]:
+        states = await asyncio.gather(*(repo._fetch_projects_list_state(filters=filters) for repo in self.shard_repos))
+        last_modified = [shard_last_modified for shard_last_modified, _ in states if shard_last_modified is not None]
+
+        return max(last_modified, default=None), sum(count for _, count in states)
+
+    async def iterate_projects(self, *, filters: Optional[ProjectFilter] = None) -> AsyncIterator[ProjectInDB]:
+        """
+        Streams the shards' exports merged by id, see without_copies - one row of each shard in memory at a time
+        """
+        iterators = [repo.iterate_projects(filters=filters) for repo in self.shard_repos]
+        heap: List[Tuple[int, int, ProjectInDB]] = []
+        last_id = None
+
+        try:
+            for index, iterator in enumerate(iterators):
+                project = await anext(iterator, None)
+                if project is not None:
+                    heap.append((project.id, index, project))
+            heapq.heapify(heap)
+
+            while heap:
+                _, index, project = heapq.heappop(heap)
+                if project.id != last_id:
+                    yield project
+                last_id = project.id
+
+                project = await anext(iterators[index], None)
+                if project is not None:
+                    heapq.heappush(heap, (project.id, index, project))
+        finally:
+            for iterator in iterators:
+                await iterator.aclose()
+
+    async def search_projects(
+            self,
+            *,
+            q: str,
+            filters: Optional[ProjectFilter] = None,
+            limit: int = DEFAULT_PAGE_SIZE,
+            cursor: Optional[str] = None,
+    ) -> Tuple[List[ProjectSearchResult], Optional[str]]:
+        pages = await asyncio.gather(*(
+            repo.search_projects(q=q, filters=filters, limit=limit, cursor=cursor) for repo in self.shard_repos
+        ))
+
+        return merge_search_pages(pages, q=q, limit=limit)
+
+
+class ScatterTasksRepository(TasksRepository):
+    """
+    The task stats of projects of any workspace, summed over every shard, and the search of their tasks -
+    the rest of the tasks' reads and writes need a single workspace
+    """
+
+    def __init__(self, routers: List[DatabaseRouter], cache: Optional[BaseCache] = None) -> None:
+        super().__init__(routers[0], cache=cache, workspace=None)
+        self.shard_repos = [TasksRepository(router, cache=cache, workspace=None) for router in routers]
+
+    async def get_task_stats(self, *, project_ids: List[int]) -> Dict[int, TaskStats]:
+        shard_stats = await asyncio.gather(*(repo.get_task_stats(project_ids=project_ids) for repo in self.shard_repos))
+
+        # A project's tasks are all on its shard, the other shards count none
+        return {
+            project_id: summed(TaskStats, [stats[project_id] for stats in shard_stats]) for project_id in project_ids
+        }
+
+    async def search_tasks(
+            self,
+            *,
+            q: str,
+            project_id: Optional[int] = None,
+            limit: int = DEFAULT_PAGE_SIZE,
+            cursor: Optional[str] = None,
+    ) -> Tuple[List[TaskSearchResult], Optional[str]]:
+        pages = await asyncio.gather(*(
+            repo.search_tasks(q=q, project_id=project_id, limit=limit, cursor=cursor) for repo in self.shard_repos
+        ))
+
+        return merge_search_pages(pages, q=q, limit=limit)
+
+
+class ScatterReportsRepository(ReportsRepository):
+    """
+    The reports over every shard - each shard aggregates its own projects and tasks, and the aggregates are added up
+    bucket by bucket. The overdue projects are merged most overdue first, like the listings. A workspace being moved
+    counts twice until its move is done. The counters are recomputed shard by shard, see app.db.job_handlers.
+    """
+
+    def __init__(self, routers: List[DatabaseRouter], cache: Optional[BaseCache] = None) -> None:
+        super().__init__(routers[0], cache=cache)
+        self.shard_repos = [ReportsRepository(router, cache=cache) for router in routers]
+
+    async def get_status_counts(self) -> StatusReport:
+        reports = await asyncio.gather(*(repo.get_status_counts() for repo in self.shard_repos))
+
+        return StatusReport(
+            projects=summed(ProjectStatusCounts, [report.projects for report in reports]),
+            tasks=summed(TaskStats, [report.tasks for report in reports]),
+        )
+
+    async def get_overdue_projects(
+            self, *, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+    ) -> OverdueReport:
+        reports = await asyncio.gather(*(
+            repo.get_overdue_projects(limit=limit, cursor=cursor) for repo in self.shard_repos
+        ))
+
+        projects = list(without_copies(heapq.merge(
+            *(report.items for report in reports), key=lambda project: (project.due_date, project.id),
+        )))
+        next_cursor = None
+        if len(projects) > limit or any(report.next_cursor for report in reports):
+            projects = projects[:limit]
+            next_cursor = encode_cursor(OVERDUE_CURSOR_SORT, projects[-1].due_date, projects[-1].id)
+
+        return OverdueReport(total=sum(report.total for report in reports), items=projects, next_cursor=next_cursor)
+
+    async def get_due_date_histogram(self, *, bucket: ReportBucket, start: date, buckets: int) -> List[DueDateBucket]:
+        histograms = await asyncio.gather(*(
+            repo.get_due_date_histogram(bucket=bucket, start=start, buckets=buckets) for repo in self.shard_repos
+        ))
+
+        # Every shard has the same buckets, empty ones included
+        return [
+            summed(DueDateBucket, list(shard_buckets), start=shard_buckets[0].start)
+            for shard_buckets in zip(*histograms)
+        ]
+
+    async def get_throughput(self, *, bucket: ReportBucket, start: date, buckets: int) -> List[ThroughputBucket]:
+        throughputs = await asyncio.gather(*(
+            repo.get_throughput(bucket=bucket, start=start, buckets=buckets) for repo in self.shard_repos
+        ))
+
+        return [
+            summed(ThroughputBucket, list(shard_buckets), start=shard_buckets[0].start)
+            for shard_buckets in zip(*throughputs)
+        ]
+
+
+# The repository reading every workspace, for each sharded repository - and for the reports, which always do
+SCATTER_REPOSITORIES = {
+    ProjectsRepository: ScatterProjectsRepository,
+    TasksRepository: ScatterTasksRepository,
+    ReportsRepository: ScatterReportsRepository,
+}
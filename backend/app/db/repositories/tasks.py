@@ -0,0 +1,297 @@
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from asyncpg.exceptions import DataError, ForeignKeyViolationError, IntegrityConstraintViolationError
+from fastapi import HTTPException
+from starlette.status import HTTP_400_BAD_REQUEST
+
+from app.core.config import DEFAULT_PAGE_SIZE, TASK_STATS_SOURCE
+from app.db.repositories.base import BaseRepository
+from app.db.repositories.pagination import (
+    SEARCH_CURSOR_CONDITION, SEARCH_CURSOR_SORT, decode_cursor, decode_search_cursor, encode_cursor, search_tsquery,
+)
+from app.models.task import (
+    TaskCreate, TaskInDB, TaskSearchResult, TaskStats, TaskStatus, TaskSummary, TaskUpdate,
+)
+
+logger = logging.getLogger(__name__)
+
+# The tasks of a deleted project are out of the API with it, until its purge deletes them.
+# Inserts nothing when the project is deleted, or doesn't exist in the workspace - tasks are in their project's.
+CREATE_TASK_QUERY = """
+    INSERT INTO tasks (workspace_id, project_id, title, description, due_date, status)
+    SELECT CAST(:workspace_id AS text), CAST(:project_id AS integer), CAST(:title AS text),
+           CAST(:description AS text), CAST(:due_date AS timestamptz), CAST(:status AS text)
+    WHERE EXISTS (
+        SELECT 1 FROM projects WHERE id = :project_id AND workspace_id = :workspace_id AND deleted_at IS NULL
+    )
+    RETURNING id, project_id, title, description, created_date, due_date, status;
+"""
+
+GET_TASK_BY_ID_QUERY = """
+    SELECT id, project_id, title, description, created_date, due_date, status
+    FROM tasks
+    WHERE id = :id AND workspace_id = :workspace_id
+    AND EXISTS (SELECT 1 FROM projects WHERE projects.id = tasks.project_id AND projects.deleted_at IS NULL);
+"""
+
+# Only selects columns held by ix_tasks_project_id_status_due_date_id, and walks it in order,
+# so a page is an index only range scan. {where} is only ever filled from the fragments below.
+GET_PROJECT_TASKS_QUERY = """
+    SELECT id, project_id, title, status, due_date, created_date
+    FROM tasks
+    WHERE project_id = :project_id
+    AND EXISTS (
+        SELECT 1 FROM projects WHERE id = :project_id AND workspace_id = :workspace_id AND deleted_at IS NULL
+    )
+    {where}
+    ORDER BY status, due_date, id
+    LIMIT :limit;
+"""
+
+# Same matching and ranking as SEARCH_PROJECTS_QUERY, over the tasks of the live projects. {where} only ever
+# holds TASK_SEARCH_CONDITIONS and SEARCH_CURSOR_CONDITION.
+SEARCH_TASKS_QUERY = """
+    SELECT id, project_id, title, description, created_date, due_date, status, rank,
+           ts_headline('english', title, query, 'StartSel=<mark>, StopSel=</mark>, HighlightAll=true')
+               AS title_highlight,
+           ts_headline('english', description, query, 'StartSel=<mark>, StopSel=</mark>, MaxFragments=2')
+               AS description_highlight
+    FROM (
+        SELECT id, project_id, title, description, created_date, due_date, status, query, rank
+        FROM tasks,
+             to_tsquery('english', :tsquery) AS query,
+             LATERAL (
+                 SELECT CAST(ts_rank_cd(search_vector, query) + word_similarity(:q, title) AS double precision) AS rank
+             ) AS ranked
+        WHERE (search_vector @@ query OR :q <% title)
+        AND EXISTS (SELECT 1 FROM projects WHERE projects.id = tasks.project_id AND projects.deleted_at IS NULL)
+        {where}
+        ORDER BY rank DESC, id
+        LIMIT :limit
+    ) AS page
+    ORDER BY rank DESC, id;
+"""
+
+TASK_SEARCH_CONDITIONS = {
+    "workspace_id": "tasks.workspace_id = :workspace_id",
+    "project_id": "tasks.project_id = :project_id",
+}
+
+TASK_STATUS_CONDITION = "AND status = :status"
+
+TASK_CURSOR_CONDITION = "AND (status, due_date, id) > (:cursor_status, :cursor_due_date, :cursor_id)"
+
+TASK_CURSOR_SORT = "status,due_date,id"
+
+# {assignments} only ever holds "column = :column" for columns in UPDATABLE_TASK_COLUMNS
+UPDATE_TASK_BY_ID_QUERY = """
+    UPDATE tasks
+    SET {assignments}
+    WHERE id = :id AND workspace_id = :workspace_id
+    AND EXISTS (SELECT 1 FROM projects WHERE projects.id = tasks.project_id AND projects.deleted_at IS NULL)
+    RETURNING id, project_id, title, description, created_date, due_date, status;
+"""
+
+UPDATABLE_TASK_COLUMNS = ("title", "description", "due_date", "status")
+
+# One query for a whole page of projects, answered from the (project_id, status, ...) index. The projects
+# are those of the request's workspace already, their ids are all it takes.
+GET_TASK_STATS_QUERY = """
+    SELECT project_id, status, count(*) AS count
+    FROM tasks
+    WHERE project_id = ANY(:project_ids)
+    GROUP BY project_id, status;
+"""
+
+# Same shape, read from the counters maintained by the maintain_project_task_counts trigger
+GET_TASK_STATS_FROM_COUNTERS_QUERY = """
+    SELECT project_id, status, count
+    FROM project_task_counts
+    WHERE project_id = ANY(:project_ids);
+"""
+
+DELETE_TASK_BY_ID_QUERY = """
+    DELETE FROM tasks
+    WHERE id = :id AND workspace_id = :workspace_id
+    AND EXISTS (SELECT 1 FROM projects WHERE projects.id = tasks.project_id AND projects.deleted_at IS NULL)
+    RETURNING id;
+"""
+
+
+class TasksRepository(BaseRepository):
+    """"
+    All database actions associated with the Task resource
+    """
+    sharded = True
+
+    async def create_task(self, *, new_task: TaskCreate) -> TaskInDB:
+        try:
+            task = await self.db.fetch_one(
+                query=CREATE_TASK_QUERY, values={**new_task.model_dump(), "workspace_id": self.workspace_id},
+            )
+        except ForeignKeyViolationError:
+            # The project was purged in the meantime
+            task = None
+
+        if not task:
+            raise HTTPException(
+                status_code=HTTP_400_BAD_REQUEST,
+                detail="No project found with that project_id.",
+            )
+
+        return TaskInDB(**task)
+
+    async def get_task_by_id(self, *, id: int) -> TaskInDB:
+        task = await self.read_db.fetch_one(
+            query=GET_TASK_BY_ID_QUERY, values={"id": id, "workspace_id": self.workspace_id},
+        )
+
+        if not task:
+            return None
+
+        return TaskInDB(**task)
+
+    async def get_project_tasks(
+            self,
+            *,
+            project_id: int,
+            status: Optional[TaskStatus] = None,
+            limit: int = DEFAULT_PAGE_SIZE,
+            cursor: Optional[str] = None,
+    ) -> Tuple[List[TaskSummary], Optional[str]]:
+        """
+        Keyset pagination over (status, due_date, id) within the project.
+        Returns the page and the cursor of the next one (None on the last page).
+        """
+        conditions, values = [], {"project_id": project_id, "workspace_id": self.workspace_id, "limit": limit + 1}
+
+        if status is not None:
+            conditions.append(TASK_STATUS_CONDITION)
+            values["status"] = status
+
+        if cursor:
+            values.update(self._decode_task_cursor(cursor))
+            conditions.append(TASK_CURSOR_CONDITION)
+
+        task_records = await self.read_db.fetch_all(
+            query=GET_PROJECT_TASKS_QUERY.format(where="\n    ".join(conditions)), values=values,
+        )
+
+        tasks = [TaskSummary(**task) for task in task_records[:limit]]
+        next_cursor = None
+        if len(task_records) > limit:
+            last = tasks[-1]
+            next_cursor = encode_cursor(TASK_CURSOR_SORT, last.status.value, last.due_date, last.id)
+
+        return tasks, next_cursor
+
+    async def search_tasks(
+            self,
+            *,
+            q: str,
+            project_id: Optional[int] = None,
+            limit: int = DEFAULT_PAGE_SIZE,
+            cursor: Optional[str] = None,
+    ) -> Tuple[List[TaskSearchResult], Optional[str]]:
+        """
+        Full-text search over titles and descriptions, where every word of q matches as a prefix,
+        plus fuzzy matching of q against titles - of one project's tasks with project_id.
+        Pages are keyset on (rank, id), most relevant first.
+        Returns the page and the cursor of the next one (None on the last page).
+        """
+        tsquery = search_tsquery(q)
+        if tsquery is None:
+            return [], None
+
+        values = {"q": q, "tsquery": tsquery, "limit": limit + 1}
+        if self.workspace is not None:
+            values["workspace_id"] = self.workspace
+        if project_id is not None:
+            values["project_id"] = project_id
+        conditions = [TASK_SEARCH_CONDITIONS[name] for name in values if name in TASK_SEARCH_CONDITIONS]
+
+        if cursor:
+            values.update(decode_search_cursor(cursor, q=q))
+            conditions.append(SEARCH_CURSOR_CONDITION)
+
+        query = SEARCH_TASKS_QUERY.format(where="\n        ".join(f"AND {condition}" for condition in conditions))
+        result_records = await self.read_db.fetch_all(query=query, values=values)
+
+        results = [TaskSearchResult(**record) for record in result_records[:limit]]
+        next_cursor = None
+        if len(result_records) > limit:
+            next_cursor = encode_cursor(SEARCH_CURSOR_SORT, q, results[-1].rank, results[-1].id)
+
+        return results, next_cursor
+
+    async def update_task(self, *, id: int, task_update: TaskUpdate) -> TaskInDB:
+        """
+        A single UPDATE that only sets the fields sent by the client
+        """
+        if "status" in task_update.model_fields_set and task_update.status is None:
+            raise HTTPException(
+                status_code=HTTP_400_BAD_REQUEST,
+                detail="Invalid task status. Cannot be None.",
+            )
+
+        values = task_update.model_dump(include=set(UPDATABLE_TASK_COLUMNS), exclude_unset=True, exclude_none=True)
+        if not values:
+            return await self.get_task_by_id(id=id)
+
+        query = UPDATE_TASK_BY_ID_QUERY.format(assignments=", ".join(f"{column} = :{column}" for column in values))
+        values.update(id=id, workspace_id=self.workspace_id)
+
+        try:
+            updated_task = await self.db.fetch_one(query=query, values=values)
+        except (DataError, IntegrityConstraintViolationError) as e:
+            logger.info(f"Update of task {id} rejected: {e}")
+            raise HTTPException(
+                status_code=HTTP_400_BAD_REQUEST,
+                detail="Invalid update params.",
+            )
+
+        if not updated_task:
+            return None
+
+        return TaskInDB(**updated_task)
+
+    async def delete_task_by_id(self, *, id: int) -> int:
+        return await self.db.execute(
+            query=DELETE_TASK_BY_ID_QUERY, values={"id": id, "workspace_id": self.workspace_id},
+        )
+
+    async def get_task_stats(self, *, project_ids: List[int]) -> Dict[int, TaskStats]:
+        """
+        Task counts per status of each project, with a single query whatever the number of projects
+        """
+        if not project_ids:
+            return {}
+
+        query = GET_TASK_STATS_FROM_COUNTERS_QUERY if TASK_STATS_SOURCE == "counters" else GET_TASK_STATS_QUERY
+        count_records = await self.read_db.fetch_all(query=query, values={"project_ids": project_ids})
+
+        counts = {project_id: {} for project_id in project_ids}
+        for record in count_records:
+            counts[record["project_id"]][record["status"]] = record["count"]
+
+        return {
+            project_id: TaskStats(**project_counts, total=sum(project_counts.values()))
+            for project_id, project_counts in counts.items()
+        }
+
+    @staticmethod
+    def _decode_task_cursor(cursor: str) -> dict:
+        try:
+            status, due_date, id = decode_cursor(cursor, sort=TASK_CURSOR_SORT)
+            return {
+                "cursor_status": TaskStatus(status),
+                "cursor_due_date": datetime.fromisoformat(due_date),
+                "cursor_id": int(id),
+            }
+        except (TypeError, ValueError):
+            raise HTTPException(
+                status_code=HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor.",
+            )
@@ -0,0 +1,266 @@
+from typing import Any, Dict, List, Tuple
+
+from databases.interfaces import Record
+
+from app.db.repositories.base import BaseRepository
+from app.models.workspace import WorkspacePlacement
+
+# The placements live on the first shard only, see app.db.shards
+GET_WORKSPACE_PLACEMENTS_QUERY = """
+    SELECT workspace_id, shard, moving, updated_at
+    FROM workspace_placements;
+"""
+
+PLACE_WORKSPACE_QUERY = """
+    INSERT INTO workspace_placements (workspace_id, shard, moving)
+    VALUES (:workspace_id, :shard, :moving)
+    ON CONFLICT (workspace_id) DO UPDATE
+    SET shard = EXCLUDED.shard,
+        moving = EXCLUDED.moving,
+        updated_at = now()
+    RETURNING workspace_id, shard, moving, updated_at;
+"""
+
+UNPLACE_WORKSPACE_QUERY = """
+    DELETE FROM workspace_placements
+    WHERE workspace_id = :workspace_id;
+"""
+
+# The distinct workspaces of a shard, as a loose index scan of ix_projects_workspace_id_id - one index probe
+# per workspace, rather than a scan of every project. Tasks always share their project's workspace.
+GET_WORKSPACE_IDS_QUERY = """
+    WITH RECURSIVE workspaces AS (
+        (SELECT workspace_id FROM projects ORDER BY workspace_id LIMIT 1)
+        UNION ALL
+        SELECT (
+            SELECT workspace_id FROM projects
+            WHERE workspace_id > workspaces.workspace_id
+            ORDER BY workspace_id
+            LIMIT 1
+        )
+        FROM workspaces
+        WHERE workspaces.workspace_id IS NOT NULL
+    )
+    SELECT workspace_id
+    FROM workspaces
+    WHERE workspace_id IS NOT NULL;
+"""
+
+# The moves copy every column but the generated search_vector, deleted projects included. Batches are keyset
+# on id, off the (workspace_id, id) indexes.
+GET_WORKSPACE_PROJECTS_QUERY = """
+    SELECT id, workspace_id, title, description, created_date, due_date, status, version, updated_at,
+           completed_at, deleted_at
+    FROM projects
+    WHERE workspace_id = :workspace_id AND id > :after_id
+    ORDER BY id
+    LIMIT :limit;
+"""
+
+GET_WORKSPACE_TASKS_QUERY = """
+    SELECT id, workspace_id, project_id, title, description, created_date, due_date, status, completed_at
+    FROM tasks
+    WHERE workspace_id = :workspace_id AND id > :after_id
+    ORDER BY id
+    LIMIT :limit;
+"""
+
+# Rows keep their ids (each shard hands out its own range, see set_id_range), rows already copied by an
+# interrupted move are skipped. The triggers keep updated_at and completed_at as given on insert.
+COPY_PROJECTS_QUERY = """
+    INSERT INTO projects (
+        id, workspace_id, title, description, created_date, due_date, status, version, updated_at,
+        completed_at, deleted_at
+    )
+    SELECT *
+    FROM unnest(
+        CAST(:id AS integer[]),
+        CAST(:workspace_id AS text[]),
+        CAST(:title AS text[]),
+        CAST(:description AS text[]),
+        CAST(:created_date AS timestamptz[]),
+        CAST(:due_date AS timestamptz[]),
+        CAST(:status AS projectstatus[]),
+        CAST(:version AS integer[]),
+        CAST(:updated_at AS timestamptz[]),
+        CAST(:completed_at AS timestamptz[]),
+        CAST(:deleted_at AS timestamptz[])
+    )
+    ON CONFLICT (id) DO NOTHING;
+"""
+
+COPY_TASKS_QUERY = """
+    INSERT INTO tasks (id, workspace_id, project_id, title, description, created_date, due_date, status, completed_at)
+    SELECT *
+    FROM unnest(
+        CAST(:id AS integer[]),
+        CAST(:workspace_id AS text[]),
+        CAST(:project_id AS integer[]),
+        CAST(:title AS text[]),
+        CAST(:description AS text[]),
+        CAST(:created_date AS timestamptz[]),
+        CAST(:due_date AS timestamptz[]),
+        CAST(:status AS text[]),
+        CAST(:completed_at AS timestamptz[])
+    )
+    ON CONFLICT (id) DO NOTHING;
+"""
+
+# The Idempotency-Key responses move with the workspace, expired ones included (pruned on the target too).
+# Batches are keyset on (route, key), off ix_idempotency_keys_workspace_id_route_key.
+GET_WORKSPACE_IDEMPOTENCY_KEYS_QUERY = """
+    SELECT route, key, workspace_id, fingerprint, status_code, body, created_at
+    FROM idempotency_keys
+    WHERE workspace_id = :workspace_id AND (route, key) > (:after_route, :after_key)
+    ORDER BY route, key
+    LIMIT :limit;
+"""
+
+# No key of the workspace can be on target already, its writes are refused while it moves
+COPY_IDEMPOTENCY_KEYS_QUERY = """
+    INSERT INTO idempotency_keys (route, key, workspace_id, fingerprint, status_code, body, created_at)
+    SELECT *
+    FROM unnest(
+        CAST(:route AS text[]),
+        CAST(:key AS text[]),
+        CAST(:workspace_id AS text[]),
+        CAST(:fingerprint AS bytea[]),
+        CAST(:status_code AS smallint[]),
+        CAST(:body AS bytea[]),
+        CAST(:created_at AS timestamptz[])
+    )
+    ON CONFLICT (route, key) DO NOTHING;
+"""
+
+# A batch of the workspace's projects, deleted for good - their tasks go with them (ON DELETE CASCADE)
+DELETE_WORKSPACE_PROJECTS_QUERY = """
+    DELETE FROM projects
+    WHERE id IN (
+        SELECT id
+        FROM projects
+        WHERE workspace_id = :workspace_id
+        ORDER BY id
+        LIMIT :limit
+    )
+    RETURNING id;
+"""
+
+# Moves a sequence up to the start of the shard's id range - never back, it may be past it already
+SET_ID_RANGE_QUERY = """
+    SELECT setval(
+        pg_get_serial_sequence(:table, :column),
+        greatest(:start, coalesce(pg_sequence_last_value(pg_get_serial_sequence(:table, :column)::regclass), 0)),
+        coalesce(pg_sequence_last_value(pg_get_serial_sequence(:table, :column)::regclass), 0) >= :start
+    );
+"""
+
+PROJECT_COLUMNS = (
+    "id", "workspace_id", "title", "description", "created_date", "due_date", "status", "version", "updated_at",
+    "completed_at", "deleted_at",
+)
+
+TASK_COLUMNS = (
+    "id", "workspace_id", "project_id", "title", "description", "created_date", "due_date", "status", "completed_at",
+)
+
+IDEMPOTENCY_KEY_COLUMNS = ("route", "key", "workspace_id", "fingerprint", "status_code", "body", "created_at")
+
+
+class WorkspacesRepository(BaseRepository):
+    """
+    The placements of the workspaces (on the first shard), and the moves of their rows between shards
+    (projects, tasks and Idempotency-Key responses) -
+    see app.db.rebalance. Not cached, every call reads the database.
+    """
+
+    async def get_placements(self) -> Dict[str, WorkspacePlacement]:
+        placement_records = await self.db.fetch_all(query=GET_WORKSPACE_PLACEMENTS_QUERY)
+
+        return {
+            record["workspace_id"]: WorkspacePlacement(**record._mapping) for record in placement_records
+        }
+
+    async def place_workspace(self, *, workspace_id: str, shard: str, moving: bool = False) -> WorkspacePlacement:
+        placement = await self.db.fetch_one(
+            query=PLACE_WORKSPACE_QUERY, values={"workspace_id": workspace_id, "shard": shard, "moving": moving},
+        )
+
+        return WorkspacePlacement(**placement._mapping)
+
+    async def unplace_workspace(self, *, workspace_id: str) -> None:
+        await self.db.execute(query=UNPLACE_WORKSPACE_QUERY, values={"workspace_id": workspace_id})
+
+    async def get_workspace_ids(self) -> List[str]:
+        workspace_records = await self.db.fetch_all(query=GET_WORKSPACE_IDS_QUERY)
+
+        return [record["workspace_id"] for record in workspace_records]
+
+    async def get_projects(self, *, workspace_id: str, after_id: int = 0, limit: int) -> List[Record]:
+        return await self.db.fetch_all(
+            query=GET_WORKSPACE_PROJECTS_QUERY,
+            values={"workspace_id": workspace_id, "after_id": after_id, "limit": limit},
+        )
+
+    async def get_tasks(self, *, workspace_id: str, after_id: int = 0, limit: int) -> List[Record]:
+        return await self.db.fetch_all(
+            query=GET_WORKSPACE_TASKS_QUERY,
+            values={"workspace_id": workspace_id, "after_id": after_id, "limit": limit},
+        )
+
+    async def get_idempotency_keys(
+            self, *, workspace_id: str, after: Tuple[str, str] = ("", ""), limit: int,
+    ) -> List[Record]:
+        """
+        :param after: The (route, key) of the last key of the previous batch
+        """
+        return await self.db.fetch_all(
+            query=GET_WORKSPACE_IDEMPOTENCY_KEYS_QUERY,
+            values={"workspace_id": workspace_id, "after_route": after[0], "after_key": after[1], "limit": limit},
+        )
+
+    async def copy_projects(self, *, projects: List[Record]) -> None:
+        if projects:
+            await self.db.execute(query=COPY_PROJECTS_QUERY, values=self._columns(projects, PROJECT_COLUMNS))
+
+    async def copy_tasks(self, *, tasks: List[Record]) -> None:
+        if tasks:
+            await self.db.execute(query=COPY_TASKS_QUERY, values=self._columns(tasks, TASK_COLUMNS))
+
+    async def copy_idempotency_keys(self, *, keys: List[Record]) -> None:
+        if keys:
+            await self.db.execute(
+                query=COPY_IDEMPOTENCY_KEYS_QUERY, values=self._columns(keys, IDEMPOTENCY_KEY_COLUMNS),
+            )
+
+    async def delete_workspace(self, *, workspace_id: str, limit: int) -> int:
+        """
+        Deletes up to limit projects of the workspace, with their tasks
+        :return: The number of projects deleted, less than limit once the workspace is gone from the shard
+        """
+        deleted_ids = await self.db.fetch_all(
+            query=DELETE_WORKSPACE_PROJECTS_QUERY, values={"workspace_id": workspace_id, "limit": limit},
+        )
+
+        return len(deleted_ids)
+
+    async def set_id_range(self, *, start: int) -> None:
+        """
+        Makes the projects and tasks inserted on this shard take their ids from start on
+        """
+        for table in ("projects", "tasks"):
+            await self.db.execute(query=SET_ID_RANGE_QUERY, values={"table": table, "column": "id", "start": start})
+
+    async def set_change_seq_range(self, *, start: int) -> None:
+        """
+        Makes the changes logged on this shard take their seqs from start on, see app.db.changes
+        """
+        await self.db.execute(
+            query=SET_ID_RANGE_QUERY, values={"table": "project_changes", "column": "seq", "start": start},
+        )
+
+    @staticmethod
+    def _columns(records: List[Record], columns: tuple) -> Dict[str, List[Any]]:
+        """
+        Pivots a batch of rows into one list per column, the shape unnest() expects
+        """
+        return {column: [record[column] for record in records] for column in columns}
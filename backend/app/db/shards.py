@@ -0,0 +1,128 @@
+import asyncio
+import bisect
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+from databases import Database, DatabaseURL
+
+from app.db.repositories.workspaces import WorkspacesRepository
+from app.models.workspace import WorkspacePlacement
+
+logger = logging.getLogger(__name__)
+
+
+def ring_hash(key: str) -> int:
+    # Stable across processes and Python versions, unlike hash()
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+def shard_name(index: int) -> str:
+    return f"shard{index}"
+
+
+class HashRing:
+    """
+    Consistent hashing of the workspaces over the shards: each shard owns virtual_nodes points of the ring,
+    a workspace goes to the owner of the first point at or after its hash. Adding a shard only moves the
+    workspaces that land on its points, about 1 / (shards + 1) of them, all of them to the new shard.
+    """
+
+    def __init__(self, shards: List[str], *, virtual_nodes: int) -> None:
+        points = sorted(
+            (ring_hash(f"{shard}#{node}"), shard) for shard in shards for node in range(virtual_nodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def shard_for(self, key: str) -> str:
+        index = bisect.bisect_left(self._hashes, ring_hash(key))
+
+        return self._shards[index % len(self._shards)]
+
+
+class Shard:
+    """
+    A database holding the projects and tasks of some workspaces - the first one, DATABASE_URL, also holds
+    everything that isn't sharded
+    """
+
+    def __init__(self, index: int, url: str, database: Database) -> None:
+        self.index = index
+        self.name = shard_name(index)
+        self.url = url
+        self.database = database
+
+
+class ShardSet:
+    """
+    The shards of a worker, and which one holds each workspace: the one the hash ring picks, unless the
+    workspace is pinned elsewhere in workspace_placements (on the first shard, reloaded every refresh_interval
+    seconds) - see app.db.rebalance. A placement that can't be reloaded keeps its last known state.
+    """
+
+    def __init__(self, shards: List[Shard], *, virtual_nodes: int, refresh_interval: float) -> None:
+        self.shards = shards
+        self.by_name = {shard.name: shard for shard in shards}
+        self.ring = HashRing([shard.name for shard in shards], virtual_nodes=virtual_nodes)
+        self.refresh_interval = refresh_interval
+        self.placements: Dict[str, WorkspacePlacement] = {}
+        self._refresher: Optional[asyncio.Task] = None
+
+    @property
+    def directory(self) -> Shard:
+        return self.shards[0]
+
+    def shard_for(self, workspace: str) -> Shard:
+        placement = self.placements.get(workspace)
+        if placement is not None and placement.shard in self.by_name:
+            return self.by_name[placement.shard]
+
+        return self.by_name[self.ring.shard_for(workspace)]
+
+    def is_moving(self, workspace: str) -> bool:
+        placement = self.placements.get(workspace)
+
+        return placement is not None and placement.moving
+
+    async def start(self) -> None:
+        # A single shard has nowhere to move workspaces to
+        if len(self.shards) > 1:
+            await self.refresh()
+            self._refresher = asyncio.create_task(self._refresh_forever())
+
+    async def close(self) -> None:
+        """
+        Disconnects the shards but the first one, which is the app's database
+        """
+        if self._refresher is not None:
+            self._refresher.cancel()
+            await asyncio.gather(self._refresher, return_exceptions=True)
+        for shard in self.shards[1:]:
+            if shard.database.is_connected:
+                await shard.database.disconnect()
+
+    async def refresh(self) -> None:
+        try:
+            self.placements = await WorkspacesRepository(self.directory.database).get_placements()
+        except Exception as e:
+            logger.warning(f"Reloading the workspace placements failed ({e}), keeping the last ones")
+
+    async def _refresh_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": shard.name,
+                "url": DatabaseURL(shard.url).obscure_password,
+                "connected": shard.database.is_connected,
+                "workspaces": sum(placement.shard == shard.name for placement in self.placements.values()),
+                "moving": sum(
+                    placement.shard == shard.name and placement.moving for placement in self.placements.values()
+                ),
+            }
+            for shard in self.shards
+        ]
@@ -1,3 +1,5 @@
+from typing import List, Optional
+
 from pydantic import BaseModel
 
 
@@ -10,3 +12,32 @@ class CoreModel(BaseModel):
 
 class IDModelMixin(BaseModel):
     id: int
+
+
+class BulkItemResult(CoreModel):
+    """
+    Outcome of one item of a bulk request, index is the item's position in the request
+    """
+    index: int
+    id: Optional[int] = None
+    ok: bool
+    detail: Optional[str] = None
+
+
+class BulkResult(CoreModel):
+    """
+    Per item outcome of a bulk request - one failing item doesn't fail the others
+    """
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
+
+    @classmethod
+    def from_results(cls, results: List[BulkItemResult]) -> "BulkResult":
+        succeeded = sum(result.ok for result in results)
+
+        return cls(
+            succeeded=succeeded,
+            failed=len(results) - succeeded,
+            results=sorted(results, key=lambda result: result.index),
+        )
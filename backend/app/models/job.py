@@ -0,0 +1,58 @@
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+from app.models.core import CoreModel, IDModelMixin
+
+
+class JobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
+
+class JobKind(str, Enum):
+    import_projects = "projects:import"
+    recompute_counts = "reports:recompute-counts"
+
+
+class JobProgress(CoreModel):
+    """
+    Progress - units of work done out of total, whose unit depends on the kind of job (None while unknown)
+    """
+    done: int = 0
+    total: Optional[int] = None
+
+
+class JobPublic(IDModelMixin, CoreModel):
+    """
+    Public - a background job, as polled by the client that queued it.
+    A failed attempt goes back to the queue until max_attempts, error holds the last attempt's failure.
+    """
+    kind: JobKind
+    status: JobStatus
+    attempts: int
+    max_attempts: int
+    progress: JobProgress
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    run_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class JobInDB(JobPublic):
+    """
+    InDB - with the job's input, read by the worker running it
+    """
+    payload: Dict[str, Any] = {}
+
+
+class JobPage(CoreModel):
+    """
+    Page - one page of jobs, most recent first, next_cursor is None on the last page
+    """
+    items: List[JobPublic]
+    next_cursor: Optional[str] = None
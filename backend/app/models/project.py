@@ -1,14 +1,40 @@
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
 from datetime import datetime
 
+from pydantic import Field
+
 from app.models.core import IDModelMixin, CoreModel
+from app.models.task import TaskStats
 
 
 class ProjectStatus(str, Enum):
+    """
+    The values are the labels of the projectstatus type - sa.Enum named them after the members, see 01724f0d1680
+    """
     not_started = "not_started"
     in_progress = "in_progress"
-    done = "full_clean"
+    done = "done"
+
+
+class ProjectSortField(str, Enum):
+    """
+    Orderings supported by keyset pagination - each one is backed by an index ending in id
+    """
+    id = "id"
+    due_date = "due_date"
+
+
+class ProjectInclude(str, Enum):
+    """
+    Optional data embedded in project responses on request
+    """
+    task_stats = "task_stats"
+
+
+class ProjectExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
 
 
 class ProjectBase(CoreModel):
@@ -42,19 +68,83 @@ class ProjectUpdate(ProjectBase):
     status: Optional[ProjectStatus] = 'not_started'
 
 
-class ProjectInDB(IDModelMixin, ProjectBase):
+class ProjectBulkUpdate(CoreModel):
+    """
+    BulkUpdate - one item of a bulk PATCH request, the id selects the project and fields left out keep their value
+    """
+    id: int
+    title: Optional[str] = None
+    description: Optional[str] = None
+    due_date: Optional[datetime] = None
+    status: Optional[ProjectStatus] = None
+
+
+class ProjectPublic(IDModelMixin, ProjectBase):
+    """
+    Public - attributes present on public facing resources being returned from GET, POST, and PUT requests
+    task_stats is only filled when requested with include=task_stats
+    """
+    task_stats: Optional[TaskStats] = None
+
+
+class ProjectInDB(ProjectPublic):
     """
     InDB - attributes present on any resource coming out of the database
+    It serializes to exactly the public shape, so routes can send it without validating it again as ProjectPublic.
+    version is bumped on every update and updated_at set by a trigger, they are exposed through
+    the ETag and Last-Modified headers rather than the body. workspace_id is the request's, never sent back.
     """
     title: str
     description: str
     created_date: datetime
     due_date: datetime
     status: ProjectStatus
+    version: int = Field(1, exclude=True)
+    updated_at: Optional[datetime] = Field(None, exclude=True)
+    workspace_id: Optional[str] = Field(None, exclude=True)
 
 
-class ProjectPublic(IDModelMixin, ProjectBase):
+class ProjectFilter(CoreModel):
     """
-    Public - attributes present on public facing resources being returned from GET, POST, and PUT requests
+    Filter - server side filters applied when listing projects. Date ranges are [from, to)
+    """
+    ids: Optional[List[int]] = None
+    status: Optional[List[ProjectStatus]] = None
+    due_date_from: Optional[datetime] = None
+    due_date_to: Optional[datetime] = None
+    created_date_from: Optional[datetime] = None
+    created_date_to: Optional[datetime] = None
+
+
+class ProjectPage(CoreModel):
+    """
+    Page - one page of projects, next_cursor is None on the last page
+    """
+    items: List[ProjectPublic]
+    next_cursor: Optional[str] = None
+
+
+class ProjectBatch(CoreModel):
+    """
+    Batch - the projects of a batch-get, in the order of their ids in the request, and the ids not found
+    """
+    items: List[ProjectPublic]
+    missing: List[int]
+
+
+class ProjectSearchResult(ProjectInDB):
+    """
+    SearchResult - a project matching a search, its relevance and its title and description with the matches
+    wrapped in <mark></mark>. The highlighted text is not HTML escaped.
+    """
+    rank: float
+    title_highlight: str
+    description_highlight: Optional[str] = None
+
+
+class ProjectSearchPage(CoreModel):
+    """
+    SearchPage - one page of search results, most relevant first, next_cursor is None on the last page
     """
-    pass
\ No newline at end of file
+    items: List[ProjectSearchResult]
+    next_cursor: Optional[str] = None
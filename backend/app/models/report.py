@@ -0,0 +1,72 @@
+from datetime import date, datetime
+from enum import Enum
+from typing import List, Optional
+
+from app.models.core import IDModelMixin, CoreModel
+from app.models.project import ProjectStatus
+from app.models.task import TaskStats
+
+
+class ReportBucket(str, Enum):
+    """
+    Width of the time buckets of a report - weeks start on Monday, both are in UTC
+    """
+    day = "day"
+    week = "week"
+
+
+class ProjectStatusCounts(CoreModel):
+    """
+    Number of projects in each status
+    """
+    not_started: int = 0
+    in_progress: int = 0
+    done: int = 0
+    total: int = 0
+
+
+class StatusReport(CoreModel):
+    projects: ProjectStatusCounts
+    tasks: TaskStats
+
+
+class OverdueProject(IDModelMixin, CoreModel):
+    title: str
+    status: ProjectStatus
+    due_date: datetime
+
+
+class OverdueReport(CoreModel):
+    """
+    The projects past their due date and not done, most overdue first - total counts all of them,
+    next_cursor is None on the last page
+    """
+    total: int
+    items: List[OverdueProject]
+    next_cursor: Optional[str] = None
+
+
+class DueDateBucket(ProjectStatusCounts):
+    """
+    The projects due within the bucket starting on start, by status
+    """
+    start: date
+
+
+class DueDateHistogram(CoreModel):
+    bucket: ReportBucket
+    items: List[DueDateBucket]
+
+
+class ThroughputBucket(CoreModel):
+    """
+    The projects and tasks completed within the bucket starting on start
+    """
+    start: date
+    projects: int = 0
+    tasks: int = 0
+
+
+class ThroughputReport(CoreModel):
+    bucket: ReportBucket
+    items: List[ThroughputBucket]
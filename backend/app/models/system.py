@@ -0,0 +1,127 @@
+from typing import List, Optional
+
+from app.models.core import CoreModel
+
+
+class CacheStats(CoreModel):
+    """
+    Counters of the repository cache since the worker started, evictions are only reported by bounded backends
+    """
+    backend: str
+    hits: int
+    misses: int
+    coalesced: int
+    hit_ratio: float
+    size: Optional[int] = None
+    max_entries: Optional[int] = None
+    evictions: Optional[int] = None
+    expirations: Optional[int] = None
+
+
+class PoolStats(CoreModel):
+    """
+    Connection pool of this worker - in_use close to max_size with a growing wait means the pool is too small
+    """
+    min_size: int
+    max_size: int
+    size: int
+    idle: int
+    in_use: int
+    checkouts: int
+    timeouts: int
+    wait_seconds_total: float
+    wait_seconds_max: float
+    wait_seconds_avg: float
+
+
+class ChangeFeedShardStats(CoreModel):
+    """
+    Change log of one shard, as followed by this worker - late counts the changes committed after their seq was
+    given up on (CHANGE_FEED_GAP_TIMEOUT)
+    """
+    name: str
+    connected: bool
+    last_seq: int
+    resume_seq: int
+    late: int
+    reconnects: int
+
+
+class ChangeFeedStats(CoreModel):
+    """
+    Change feed of this worker - overflows count the subscribers dropped for falling too far behind,
+    cursor is where a client that got every change published resumes from
+    """
+    connected: bool
+    subscribers: int
+    cursor: str
+    published: int
+    overflows: int
+    recent: int
+    shards: List[ChangeFeedShardStats]
+
+
+class ReplicaStats(CoreModel):
+    """
+    A read replica of this worker, as of its last check - unhealthy ones (lagging or unreachable) get no reads
+    """
+    url: str
+    healthy: bool
+    lag_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+
+class JobRunnerStats(CoreModel):
+    """
+    Background jobs of this worker since it started - retried counts the failed attempts to be run again
+    """
+    workers: int
+    running: int
+    succeeded: int
+    failed: int
+    retried: int
+
+
+class AdmissionLimiterStats(CoreModel):
+    """
+    Reads or writes of this worker - rejected found the queue full, timed_out waited too long for a slot
+    """
+    limit: int
+    queue_size: int
+    active: int
+    waiting: int
+    admitted: int
+    queued: int
+    rejected: int
+    timed_out: int
+
+
+class RateLimitStats(CoreModel):
+    """
+    Per client rate limit of this worker - limited counts the requests answered 429
+    """
+    rate: float
+    burst: int
+    clients: int
+    limited: int
+
+
+class AdmissionStats(CoreModel):
+    """
+    Admission control of this worker, rate_limit is None when disabled
+    """
+    enabled: bool
+    reads: Optional[AdmissionLimiterStats] = None
+    writes: Optional[AdmissionLimiterStats] = None
+    rate_limit: Optional[RateLimitStats] = None
+
+
+class ShardStats(CoreModel):
+    """
+    A database shard of this worker - workspaces counts those pinned to it, moving the ones being moved off it
+    """
+    name: str
+    url: str
+    connected: bool
+    workspaces: int
+    moving: int
@@ -0,0 +1,103 @@
+from typing import List, Optional
+from enum import Enum
+from datetime import datetime
+
+from app.models.core import IDModelMixin, CoreModel
+
+
+class TaskStatus(str, Enum):
+    not_started = "not_started"
+    in_progress = "in_progress"
+    done = "done"
+
+
+class TaskBase(CoreModel):
+    """
+    Base - all shared attributes of a Task resource
+    """
+    title: Optional[str] = None
+    description: Optional[str] = None
+    due_date: Optional[datetime] = None
+    status: Optional[TaskStatus] = TaskStatus.not_started
+
+
+class TaskCreate(TaskBase):
+    """
+    Create - attributes required to create a new resource - used at POST requests
+    """
+    project_id: int
+    title: str
+    due_date: datetime
+
+
+class TaskUpdate(TaskBase):
+    """
+    Update - attributes that can be updated - used at PUT requests, fields left out keep their value
+    """
+    status: Optional[TaskStatus] = None
+
+
+class TaskInDB(IDModelMixin, TaskBase):
+    """
+    InDB - attributes present on any resource coming out of the database
+    """
+    project_id: int
+    title: str
+    created_date: datetime
+    due_date: datetime
+    status: TaskStatus
+
+
+class TaskPublic(IDModelMixin, TaskBase):
+    """
+    Public - attributes present on public facing resources being returned from GET, POST, and PUT requests
+    """
+    project_id: int
+    created_date: datetime
+
+
+class TaskSummary(IDModelMixin, CoreModel):
+    """
+    Summary - the columns covered by the tasks listing index, so listing a project's tasks never reads the table
+    """
+    project_id: int
+    title: str
+    status: TaskStatus
+    due_date: datetime
+    created_date: datetime
+
+
+class TaskStats(CoreModel):
+    """
+    Stats - number of tasks of a project in each status
+    """
+    not_started: int = 0
+    in_progress: int = 0
+    done: int = 0
+    total: int = 0
+
+
+class TaskSearchResult(TaskInDB):
+    """
+    SearchResult - a task matching a search, its relevance and its title and description with the matches
+    wrapped in <mark></mark>. The highlighted text is not HTML escaped.
+    """
+    rank: float
+    title_highlight: str
+    description_highlight: Optional[str] = None
+
+
+class TaskSearchPage(CoreModel):
+    """
+    SearchPage - one page of search results, most relevant first, next_cursor is None on the last page
+    """
+    items: List[TaskSearchResult]
+    next_cursor: Optional[str] = None
+
+
+class TaskPage(CoreModel):
+    """
+    Page - one page of a project's tasks, next_cursor is None on the last page
+    """
+    items: List[TaskSummary]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,14 @@
+from datetime import datetime
+
+from app.models.core import CoreModel
+
+
+class WorkspacePlacement(CoreModel):
+    """
+    A workspace pinned to a shard, rather than the one the hash ring picks for it.
+    While moving, its rows are being copied off that shard and its writes are refused.
+    """
+    workspace_id: str
+    shard: str
+    moving: bool
+    updated_at: datetime
@@ -0,0 +1,128 @@
+"""
+The repositories on each DB_BACKEND - databases and asyncpg - running identical workloads against a freshly migrated
+and seeded testing database ({POSTGRES_DB}_test, recreated like the test suite does). Both backends get the same
+pool options, the cache is left out so that every call reaches Postgres.
+
+Each workload is warmed up, then timed under concurrency on one backend and the other in turn, so that both
+run against the same state of the database and its caches.
+
+    python -m benchmarks.backends [--projects 1000] [--requests 2000] [--concurrency 10]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from databases import Database
+
+from app.models.project import ProjectCreate
+from benchmarks.load import percentile
+from benchmarks.seed import migrate_benchmark_database, seed_database
+
+BACKENDS = ("databases", "asyncpg")
+
+BATCH_SIZE = 50
+
+# An export reads every project, it runs this many times fewer than the other workloads
+EXPORT_RUNS_DIVISOR = 20
+
+Workload = Callable[[Any, int], Awaitable[Any]]
+
+
+def workloads(project_ids: List[int]) -> List[Tuple[str, Workload]]:
+    """
+    (name, workload) pairs - a workload runs one call of a ProjectsRepository, the i-th of the run
+    """
+    async def export(repo: Any, i: int) -> int:
+        return len([project async for project in repo.iterate_projects()])
+
+    def new_project(i: int) -> ProjectCreate:
+        now = datetime.now(timezone.utc)
+        return ProjectCreate(
+            title=f"backend benchmark {i}",
+            description="backend benchmark project",
+            created_date=now,
+            due_date=now + timedelta(days=30),
+            status="not_started",
+        )
+
+    return [
+        ("get by id", lambda repo, i: repo.get_project_by_id(id=project_ids[i % len(project_ids)])),
+        (f"get {BATCH_SIZE} by ids", lambda repo, i: repo.get_projects_by_ids(
+            ids=[project_ids[(i * BATCH_SIZE + j) % len(project_ids)] for j in range(BATCH_SIZE)],
+        )),
+        ("page of 20", lambda repo, i: repo.get_all_projects(limit=20)),
+        ("page of 100", lambda repo, i: repo.get_all_projects(limit=100)),
+        ("export", export),
+        ("create", lambda repo, i: repo.create_project(new_project=new_project(i))),
+    ]
+
+
+async def run_workload(repo: Any, workload: Workload, *, requests: int, concurrency: int) -> Dict[str, float]:
+    durations: List[float] = []
+    counter = iter(range(requests))
+
+    async def worker() -> None:
+        for i in counter:
+            started = time.perf_counter()
+            await workload(repo, i)
+            durations.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    durations.sort()
+    return {
+        "p50_ms": percentile(durations, 50) * 1000,
+        "p95_ms": percentile(durations, 95) * 1000,
+        "mean_ms": statistics.mean(durations) * 1000,
+        "ops": len(durations) / elapsed,
+    }
+
+
+async def run(args: argparse.Namespace) -> None:
+    migrate_benchmark_database()
+
+    # Imported once TESTING is set, so that they connect to the benchmark database
+    from app.db.db_tasks import create_database, database_url
+    from app.db.repositories.projects import ProjectsRepository
+
+    databases: Dict[str, Database] = {backend: create_database(database_url(), backend) for backend in BACKENDS}
+    for database in databases.values():
+        await database.connect()
+
+    try:
+        seed = await seed_database(
+            databases["databases"], projects=args.projects, tasks_per_project=0, disposable=0,
+        )
+        repos = {backend: ProjectsRepository(database) for backend, database in databases.items()}
+
+        print(f"{'workload':>16} {'backend':>10} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'ops/s':>9}")
+        for name, workload in workloads(seed.project_ids):
+            divisor = EXPORT_RUNS_DIVISOR if name == "export" else 1
+            warmup, requests = max(1, args.warmup // divisor), max(1, args.requests // divisor)
+            for backend in BACKENDS:
+                await run_workload(repos[backend], workload, requests=warmup, concurrency=args.concurrency)
+            for backend in BACKENDS:
+                result = await run_workload(
+                    repos[backend], workload, requests=requests, concurrency=args.concurrency,
+                )
+                print(
+                    f"{name:>16} {backend:>10} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+                    f"{result['mean_ms']:>8.2f} {result['ops']:>9.0f}"
+                )
+    finally:
+        for database in databases.values():
+            await database.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--projects", type=int, default=1000, help="Projects seeded before the run.")
+    parser.add_argument("--requests", type=int, default=2000, help="Timed calls per workload and backend.")
+    parser.add_argument("--concurrency", type=int, default=10, help="Calls in flight at once.")
+    parser.add_argument("--warmup", type=int, default=100, help="Untimed calls per workload and backend.")
+    asyncio.run(run(parser.parse_args()))
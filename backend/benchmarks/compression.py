@@ -0,0 +1,107 @@
+"""
+CPU cost vs. bytes saved of each response encoding and level, on project listing pages and NDJSON exports
+built like the API sends them. Streamed bodies are compressed chunk by chunk and flushed after each one,
+as CompressionMiddleware does, which costs some of the ratio.
+
+Break-even is the link speed above which compressing costs more time than sending the bytes it saves -
+on slower links (most WANs), compression wins. br and zstd are skipped unless brotli and zstandard are installed.
+
+    python -m benchmarks.compression [--repeat 20]
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from app.api.middleware.compression import available_encodings, COMPRESSORS
+from app.api.responses import ModelResponse
+from app.models.project import ProjectInDB
+
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 11), "zstd": (1, 3, 10)}
+
+PAGE_SIZES = (20, 100, 1000)
+
+EXPORT_SIZE = 10_000
+
+WORDS = (
+    "migrate the billing service to the new cluster, review the onboarding flow, fix flaky tests in the payments "
+    "pipeline, redesign the dashboard, audit permissions, ship the mobile release, update the API documentation"
+).split()
+
+
+def make_projects(count: int, *, seed: int = 0) -> List[ProjectInDB]:
+    """
+    Projects with varied titles, descriptions and dates - repeated identical rows would compress unrealistically well
+    """
+    rng = random.Random(seed)
+    now = datetime(2026, 10, 18, 12, 0, 0)
+
+    return [
+        ProjectInDB(
+            id=i,
+            title=" ".join(rng.sample(WORDS, 4)).capitalize(),
+            description=" ".join(rng.choices(WORDS, k=rng.randint(5, 40))).capitalize() + ".",
+            created_date=now - timedelta(days=rng.randint(0, 700), seconds=rng.randint(0, 86_400)),
+            due_date=now + timedelta(days=rng.randint(-30, 365), seconds=rng.randint(0, 86_400)),
+            status=rng.choice(("not_started", "in_progress")),
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def payloads() -> List[Tuple[str, List[bytes]]]:
+    """
+    :return: (name, chunks) of each body - a single chunk for the pages
+    """
+    bodies = [
+        (f"page of {size}", [ModelResponse({"items": make_projects(size), "next_cursor": None}).body])
+        for size in PAGE_SIZES
+    ]
+    export = [project.model_dump_json().encode() + b"\n" for project in make_projects(EXPORT_SIZE)]
+    # The export is streamed one row at a time, in chunks of a few kB once through the server's buffers
+    chunks = [b"".join(export[start:start + 20]) for start in range(0, len(export), 20)]
+    bodies.append((f"export of {EXPORT_SIZE}", chunks))
+
+    return bodies
+
+
+def compress(encoding: str, level: int, chunks: List[bytes]) -> int:
+    compressor = COMPRESSORS[encoding](level)
+    size = 0
+    for index, chunk in enumerate(chunks):
+        size += len(compressor.compress(chunk))
+        size += len(compressor.flush() if index < len(chunks) - 1 else compressor.finish())
+
+    return size
+
+
+def main(repeat: int) -> None:
+    encodings = available_encodings(LEVELS)
+    print(f"{'payload':>16} {'encoding':>9} {'bytes':>11} {'ratio':>6} {'ms':>8} {'MB/s':>8} {'break-even':>13}")
+
+    for name, chunks in payloads():
+        size = sum(map(len, chunks))
+        print(f"{name:>16} {'identity':>9} {size:>11,}")
+
+        for encoding in encodings:
+            for level in LEVELS[encoding]:
+                durations = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    compressed = compress(encoding, level, chunks)
+                    durations.append(time.perf_counter() - started)
+
+                duration = statistics.median(durations)
+                saved_bits = (size - compressed) * 8
+                print(
+                    f"{'':>16} {f'{encoding}-{level}':>9} {compressed:>11,} {size / compressed:>5.1f}x "
+                    f"{duration * 1000:>8.2f} {size / duration / 1e6:>8.1f} {saved_bits / duration / 1e6:>8.0f} Mbit/s"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="Runs of each payload and level, the median is kept.")
+    main(parser.parse_args().repeat)
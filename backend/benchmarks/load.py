@@ -0,0 +1,258 @@
+"""
+Load benchmark of every API route, run in process against the ASGI app and a freshly migrated and seeded
+testing database ({POSTGRES_DB}_test, recreated like the test suite does).
+
+Each scenario is warmed up, then timed under concurrency, then run again one request at a time under
+tracemalloc to measure allocations - tracemalloc slows everything down, so it never runs during the timed pass.
+
+    python -m benchmarks.load run --output results.json
+    python -m benchmarks.load run --baseline baseline.json --max-regression 10
+    python -m benchmarks.load compare results.json baseline.json --max-regression 10
+
+compare, and run with --baseline, exit with status 1 when a scenario regressed by more than --max-regression percent.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import httpx
+from asgi_lifespan import LifespanManager
+from fastapi import FastAPI
+
+from benchmarks.scenarios import SCENARIOS, RequestContext, Scenario, uncovered_routes
+from benchmarks.seed import migrate_benchmark_database, seed_database
+
+# Metric -> whether a higher value is better. The latency metrics are in milliseconds, the allocation ones in KiB.
+METRICS = {
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "rps": True,
+    "alloc_peak_kib": False,
+}
+
+# Latency changes smaller than this are noise whatever their percentage, e.g. 0.2ms -> 0.3ms
+MIN_LATENCY_DELTA_MS = 1.0
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """
+    Nearest rank percentile
+    """
+    index = max(0, min(len(sorted_values) - 1, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def send(client: httpx.AsyncClient, app: FastAPI, scenario: Scenario, context: RequestContext, i: int) -> bool:
+    res = await client.request(
+        scenario.method,
+        app.url_path_for(scenario.route, **scenario.path_params(context, i)),
+        **scenario.build(context, i),
+    )
+    return res.status_code == scenario.expected_status
+
+
+async def run_scenario(
+        client: httpx.AsyncClient,
+        app: FastAPI,
+        scenario: Scenario,
+        context: RequestContext,
+        *,
+        warmup: int,
+        requests: int,
+        alloc_requests: int,
+        concurrency: int,
+) -> dict:
+    for i in range(warmup):
+        await send(client, app, scenario, context, i)
+
+    # Timed pass - the workers share the iterator, so each request index is sent once
+    latencies, errors = [], 0
+    timed = iter(range(warmup, warmup + requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in timed:
+            started = time.perf_counter()
+            ok = await send(client, app, scenario, context, i)
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    # Allocation pass - peak of the memory allocated while serving one request, on top of what was already held
+    peaks = []
+    tracemalloc.start()
+    try:
+        for i in range(warmup + requests, warmup + requests + alloc_requests):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            errors += not await send(client, app, scenario, context, i)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append((peak - before) / 1024)
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "mean_ms": statistics.fmean(latencies),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "alloc_peak_kib": statistics.median(peaks) if peaks else None,
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    migrate_benchmark_database()
+
+    # Imported once TESTING is set, so that the app connects to the benchmark database
+    from app.api.server import get_application
+
+    app = get_application()
+    scenarios = [scenario for scenario in SCENARIOS if not args.only or scenario.name in args.only]
+    for route in uncovered_routes(app, SCENARIOS):
+        print(f"warning: no scenario for {route}", file=sys.stderr)
+
+    requests_per_scenario = args.warmup + args.requests + args.alloc_requests
+    results = {}
+    async with LifespanManager(app):
+        seed = await seed_database(
+            app.state._db,
+            projects=args.projects,
+            tasks_per_project=args.tasks_per_project,
+            disposable=requests_per_scenario * (1 + args.bulk_size),
+        )
+        context = RequestContext(seed=seed, bulk_size=args.bulk_size, requests_per_scenario=requests_per_scenario)
+
+        async with httpx.AsyncClient(app=app, base_url="http://benchmark", timeout=None) as client:
+            for scenario in scenarios:
+                results[scenario.name] = await run_scenario(
+                    client,
+                    app,
+                    scenario,
+                    context,
+                    warmup=args.warmup,
+                    requests=args.requests,
+                    alloc_requests=args.alloc_requests,
+                    concurrency=args.concurrency,
+                )
+                print_result(scenario.name, results[scenario.name])
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "projects": args.projects,
+            "tasks_per_project": args.tasks_per_project,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "bulk_size": args.bulk_size,
+        },
+        "results": results,
+    }
+
+
+def print_result(name: str, result: dict) -> None:
+    alloc = f"{result['alloc_peak_kib']:9.1f}" if result["alloc_peak_kib"] is not None else f"{'-':>9}"
+    print(
+        f"{name:<48} {result['rps']:8.1f} rps  p50 {result['p50_ms']:7.2f}  p95 {result['p95_ms']:7.2f}"
+        f"  p99 {result['p99_ms']:7.2f} ms  alloc {alloc} KiB  errors {result['errors']}"
+    )
+
+
+def compare(current: dict, baseline: dict, *, max_regression: float) -> List[str]:
+    """
+    :return: A description of each metric that regressed by more than max_regression percent, and of new errors
+    """
+    regressions = []
+    for name, base in baseline["results"].items():
+        result = current["results"].get(name)
+        if result is None:
+            continue
+
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{name}: {result['errors']} errors, {base['errors']} in the baseline")
+
+        for metric, higher_is_better in METRICS.items():
+            before, after = base.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            if metric.endswith("_ms") and after - before < MIN_LATENCY_DELTA_MS:
+                continue
+
+            change = (after - before) / before * 100
+            if (-change if higher_is_better else change) > max_regression:
+                regressions.append(f"{name}: {metric} {before:.2f} -> {after:.2f} ({change:+.1f}%)")
+
+    return regressions
+
+
+def report_regressions(current: dict, baseline: dict, max_regression: float) -> int:
+    regressions = compare(current, baseline, max_regression=max_regression)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if not regressions:
+        print(f"No regression above {max_regression}% against the baseline")
+
+    return 1 if regressions else 0
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Seed the benchmark database and benchmark every scenario.")
+    run_parser.add_argument("--projects", type=int, default=1000, help="Projects seeded before the run.")
+    run_parser.add_argument("--tasks-per-project", type=int, default=10, help="Tasks seeded in each project.")
+    run_parser.add_argument("--requests", type=int, default=500, help="Timed requests per scenario.")
+    run_parser.add_argument("--concurrency", type=int, default=10, help="Requests in flight at once.")
+    run_parser.add_argument("--warmup", type=int, default=20, help="Untimed requests per scenario.")
+    run_parser.add_argument("--alloc-requests", type=int, default=20, help="Requests traced for allocations.")
+    run_parser.add_argument("--bulk-size", type=int, default=50, help="Items per bulk request.")
+    run_parser.add_argument("--only", nargs="*", help="Only run the scenarios with these names.")
+    run_parser.add_argument("--output", help="Write the results to this JSON file.")
+    run_parser.add_argument("--baseline", help="Compare the results with this JSON file.")
+    run_parser.add_argument("--max-regression", type=float, default=10.0, help="Allowed regression, in percent.")
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files.")
+    compare_parser.add_argument("current", help="Results to check.")
+    compare_parser.add_argument("baseline", help="Results to compare against.")
+    compare_parser.add_argument("--max-regression", type=float, default=10.0, help="Allowed regression, in percent.")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        return report_regressions(load(args.current), load(args.baseline), args.max_regression)
+
+    if args.projects < 1 or args.requests < 1 or args.concurrency < 1:
+        parser.error("--projects, --requests and --concurrency must be at least 1")
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    return report_regressions(results, load(args.baseline), args.max_regression) if args.baseline else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+
+from benchmarks.seed import Seed
+
+# Idempotency keys outlive the seed, each run uses keys of its own
+RUN_ID = uuid.uuid4().hex
+
+
+@dataclass
+class RequestContext:
+    """
+    What a scenario builds its i-th request from. i is unique across the warm up, timed and allocation passes,
+    so that each delete can take its own disposable row.
+    """
+    seed: Seed
+    bulk_size: int
+    requests_per_scenario: int
+
+    def project_id(self, i: int) -> int:
+        return self.seed.project_ids[i % len(self.seed.project_ids)]
+
+    def task_id(self, i: int) -> int:
+        return self.seed.task_ids[i % len(self.seed.task_ids)]
+
+    def job_id(self, i: int) -> int:
+        return self.seed.job_ids[i % len(self.seed.job_ids)]
+
+    def disposable_project_id(self, i: int) -> int:
+        return self.seed.disposable_project_ids[i]
+
+    def disposable_project_batch(self, i: int) -> List[int]:
+        # The projects after the ones taken by single deletes
+        start = self.requests_per_scenario + i * self.bulk_size
+        return self.seed.disposable_project_ids[start:start + self.bulk_size]
+
+    def project_batch(self, i: int) -> List[int]:
+        return [self.project_id(i * self.bulk_size + offset) for offset in range(self.bulk_size)]
+
+
+@dataclass
+class Scenario:
+    """
+    One benchmarked request shape. route is the route name, name tells apart scenarios of the same route.
+    """
+    name: str
+    route: str
+    method: str
+    build: Callable[[RequestContext, int], dict]
+    path_params: Callable[[RequestContext, int], dict] = lambda context, i: {}
+    expected_status: int = 200
+
+
+def new_project(i: int) -> dict:
+    return {
+        "title": f"benchmark created project {i}",
+        "description": "benchmark created project description",
+        "due_date": "2030-01-01T00:00:00+00:00",
+        "status": "in_progress",
+    }
+
+
+def new_task(context: RequestContext, i: int) -> dict:
+    return {
+        "project_id": context.project_id(i),
+        "title": f"benchmark created task {i}",
+        "due_date": "2030-01-01T00:00:00+00:00",
+    }
+
+
+def recent_changes_start() -> str:
+    return (datetime.now(timezone.utc) - timedelta(minutes=10)).isoformat()
+
+
+SCENARIOS = [
+    Scenario(
+        name="projects:get-all-projects",
+        route="projects:get-all-projects",
+        method="GET",
+        build=lambda context, i: {"params": {"limit": 50}},
+    ),
+    Scenario(
+        name="projects:get-all-projects (all workspaces)",
+        route="projects:get-all-projects",
+        method="GET",
+        build=lambda context, i: {"params": {"limit": 50}, "headers": {"X-Workspace-ID": "*"}},
+    ),
+    Scenario(
+        name="projects:get-all-projects?include=task_stats",
+        route="projects:get-all-projects",
+        method="GET",
+        build=lambda context, i: {"params": {"limit": 50, "include": "task_stats"}},
+    ),
+    Scenario(
+        name="projects:get-all-projects?ids",
+        route="projects:get-all-projects",
+        method="GET",
+        build=lambda context, i: {
+            "params": {"limit": 50, "ids": ",".join(map(str, context.project_batch(i)[:50]))},
+        },
+    ),
+    Scenario(
+        name="projects:batch-get-projects",
+        route="projects:batch-get-projects",
+        method="POST",
+        build=lambda context, i: {"json": {"ids": context.project_batch(i)}},
+    ),
+    Scenario(
+        name="projects:search-projects",
+        route="projects:search-projects",
+        method="GET",
+        build=lambda context, i: {"params": {"q": f"benchmark project {i % 100}", "limit": 20}},
+    ),
+    Scenario(
+        name="projects:export-projects",
+        route="projects:export-projects",
+        method="GET",
+        build=lambda context, i: {"params": {"format": "ndjson", "created_date_from": "2001-01-01T00:00:00+00:00"}},
+    ),
+    Scenario(
+        # Catching up on the changes of a project without following, the live stream never ends
+        name="projects:stream-changes?follow=false",
+        route="projects:stream-changes",
+        method="GET",
+        build=lambda context, i: {
+            "params": {"project_id": context.project_id(i), "since": recent_changes_start(), "follow": "false"},
+        },
+    ),
+    Scenario(
+        name="projects:bulk-create-projects",
+        route="projects:bulk-create-projects",
+        method="POST",
+        build=lambda context, i: {
+            "json": {"new_projects": [new_project(i * context.bulk_size + j) for j in range(context.bulk_size)]},
+        },
+    ),
+    Scenario(
+        name="projects:import-projects",
+        route="projects:import-projects",
+        method="POST",
+        build=lambda context, i: {
+            "json": {"new_projects": [new_project(i * context.bulk_size + j) for j in range(context.bulk_size)]},
+        },
+        expected_status=202,
+    ),
+    Scenario(
+        name="projects:bulk-update-projects",
+        route="projects:bulk-update-projects",
+        method="PATCH",
+        build=lambda context, i: {
+            "json": {"project_updates": [
+                {"id": id, "title": f"benchmark updated project {i}"} for id in context.project_batch(i)
+            ]},
+        },
+    ),
+    Scenario(
+        name="projects:bulk-delete-projects",
+        route="projects:bulk-delete-projects",
+        method="DELETE",
+        build=lambda context, i: {"json": {"ids": context.disposable_project_batch(i)}},
+    ),
+    Scenario(
+        name="projects:create-project",
+        route="projects:create-project",
+        method="POST",
+        build=lambda context, i: {"json": {"new_project": new_project(i)}},
+        expected_status=201,
+    ),
+    # Every request under a key of its own, then the retries of a single one, answered from the stored response
+    Scenario(
+        name="projects:create-project+idempotency-key",
+        route="projects:create-project",
+        method="POST",
+        build=lambda context, i: {
+            "json": {"new_project": new_project(i)}, "headers": {"Idempotency-Key": f"{RUN_ID}-{i}"},
+        },
+        expected_status=201,
+    ),
+    Scenario(
+        name="projects:create-project+idempotency-key-replay",
+        route="projects:create-project",
+        method="POST",
+        build=lambda context, i: {
+            "json": {"new_project": new_project(0)}, "headers": {"Idempotency-Key": f"{RUN_ID}-replay"},
+        },
+        expected_status=201,
+    ),
+    Scenario(
+        name="projects:get-project-by-id",
+        route="projects:get-project-by-id",
+        method="GET",
+        build=lambda context, i: {},
+        path_params=lambda context, i: {"id": context.project_id(i)},
+    ),
+    Scenario(
+        name="projects:get-project-by-id?include=task_stats",
+        route="projects:get-project-by-id",
+        method="GET",
+        build=lambda context, i: {"params": {"include": "task_stats"}},
+        path_params=lambda context, i: {"id": context.project_id(i)},
+    ),
+    Scenario(
+        name="projects:update-project-by-id",
+        route="projects:update-project-by-id",
+        method="PUT",
+        build=lambda context, i: {
+            "json": {"project_update": {"title": f"benchmark updated project {i}", "created_date": None}},
+        },
+        path_params=lambda context, i: {"id": context.project_id(i)},
+    ),
+    Scenario(
+        name="projects:delete-project-by-id",
+        route="projects:delete-project-by-id",
+        method="DELETE",
+        build=lambda context, i: {},
+        path_params=lambda context, i: {"id": context.disposable_project_id(i)},
+    ),
+    Scenario(
+        name="tasks:get-all-tasks",
+        route="tasks:get-all-tasks",
+        method="GET",
+        build=lambda context, i: {"params": {"project_id": context.project_id(i), "limit": 50}},
+    ),
+    Scenario(
+        name="tasks:search-tasks",
+        route="tasks:search-tasks",
+        method="GET",
+        build=lambda context, i: {"params": {"q": f"benchmark task {i % 100}", "limit": 20}},
+    ),
+    Scenario(
+        name="tasks:create-task",
+        route="tasks:create-task",
+        method="POST",
+        build=lambda context, i: {"json": {"new_task": new_task(context, i)}},
+        expected_status=201,
+    ),
+    Scenario(
+        name="tasks:get-task-by-id",
+        route="tasks:get-task-by-id",
+        method="GET",
+        build=lambda context, i: {},
+        path_params=lambda context, i: {"id": context.task_id(i)},
+    ),
+    Scenario(
+        name="tasks:update-task-by-id",
+        route="tasks:update-task-by-id",
+        method="PUT",
+        build=lambda context, i: {"json": {"task_update": {"title": f"benchmark updated task {i}"}}},
+        path_params=lambda context, i: {"id": context.task_id(i)},
+    ),
+    Scenario(
+        name="tasks:delete-task-by-id",
+        route="tasks:delete-task-by-id",
+        method="DELETE",
+        build=lambda context, i: {},
+        path_params=lambda context, i: {"id": context.seed.disposable_task_ids[i]},
+    ),
+    Scenario(
+        name="reports:get-status-report",
+        route="reports:get-status-report",
+        method="GET",
+        build=lambda context, i: {},
+    ),
+    Scenario(
+        name="reports:get-overdue-projects",
+        route="reports:get-overdue-projects",
+        method="GET",
+        build=lambda context, i: {},
+    ),
+    Scenario(
+        name="reports:get-due-date-histogram?bucket=day&buckets=90",
+        route="reports:get-due-date-histogram",
+        method="GET",
+        build=lambda context, i: {"params": {"bucket": "day", "buckets": 90}},
+    ),
+    Scenario(
+        name="reports:get-throughput",
+        route="reports:get-throughput",
+        method="GET",
+        build=lambda context, i: {},
+    ),
+    Scenario(
+        name="reports:recompute-counts",
+        route="reports:recompute-counts",
+        method="POST",
+        build=lambda context, i: {},
+        expected_status=202,
+    ),
+    Scenario(
+        name="jobs:get-all-jobs",
+        route="jobs:get-all-jobs",
+        method="GET",
+        build=lambda context, i: {"params": {"limit": 50}},
+    ),
+    Scenario(
+        name="jobs:get-job-by-id",
+        route="jobs:get-job-by-id",
+        method="GET",
+        build=lambda context, i: {},
+        path_params=lambda context, i: {"id": context.job_id(i)},
+    ),
+    Scenario(
+        name="system:get-cache-stats",
+        route="system:get-cache-stats",
+        method="GET",
+        build=lambda context, i: {},
+    ),
+    Scenario(
+        name="system:get-pool-stats",
+        route="system:get-pool-stats",
+        method="GET",
+        build=lambda context, i: {},
+    ),
+    Scenario(
+        name="system:get-change-feed-stats",
+        route="system:get-change-feed-stats",
+        method="GET",
+        build=lambda context, i: {},
+    ),
+    Scenario(
+        name="system:get-replica-stats",
+        route="system:get-replica-stats",
+        method="GET",
+        build=lambda context, i: {},
+    ),
+    Scenario(
+        name="system:get-shard-stats",
+        route="system:get-shard-stats",
+        method="GET",
+        build=lambda context, i: {},
+    ),
+    Scenario(
+        name="system:get-admission-stats",
+        route="system:get-admission-stats",
+        method="GET",
+        build=lambda context, i: {},
+    ),
+    Scenario(
+        name="system:get-job-stats",
+        route="system:get-job-stats",
+        method="GET",
+        build=lambda context, i: {},
+    ),
+    Scenario(
+        name="metrics:get-metrics",
+        route="metrics:get-metrics",
+        method="GET",
+        build=lambda context, i: {},
+    ),
+]
+
+
+def uncovered_routes(app: FastAPI, scenarios: List[Scenario]) -> List[str]:
+    """
+    Names of the API routes no scenario exercises - a new route should come with its scenario
+    """
+    covered = {(scenario.route, scenario.method) for scenario in scenarios}
+    routes = {(route.name, method) for route in app.routes if isinstance(route, APIRoute) for method in route.methods}
+
+    return sorted(f"{method} {name}" for name, method in routes - covered)
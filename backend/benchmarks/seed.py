@@ -0,0 +1,90 @@
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List
+
+import alembic
+from alembic.config import Config
+from databases import Database
+
+SEED_PROJECTS_QUERY = """
+    INSERT INTO projects (title, description, created_date, due_date, status)
+    SELECT 'benchmark project ' || g, 'benchmark project description',
+           CAST(:created_at AS timestamptz) - g * interval '1 minute', now() + g * interval '1 hour',
+           CAST((ARRAY['not_started', 'in_progress'])[1 + g % 2] AS projectstatus)
+    FROM generate_series(1, :count) AS g
+    RETURNING id;
+"""
+
+SEED_TASKS_QUERY = """
+    INSERT INTO tasks (project_id, title, description, due_date, status)
+    SELECT p, 'benchmark task ' || g, 'benchmark task description', now() + g * interval '1 hour',
+           (ARRAY['not_started', 'in_progress', 'done'])[1 + g % 3]
+    FROM unnest(CAST(:project_ids AS integer[])) AS p, generate_series(1, :per_project) AS g
+    RETURNING id;
+"""
+
+# Finished jobs, for the job status reads
+SEED_JOBS_QUERY = """
+    INSERT INTO jobs (
+        kind, status, attempts, max_attempts, progress_done, progress_total, result, started_at, finished_at
+    )
+    SELECT 'reports:recompute-counts', 'succeeded', 1, 5, g, g, '{}'::jsonb, now(), now()
+    FROM generate_series(1, :count) AS g
+    RETURNING id;
+"""
+
+SEED_JOBS = 100
+
+DISPOSABLE_CREATED_AT = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+@dataclass
+class Seed:
+    """
+    Rows the scenarios run against. The disposable ones are only there to be deleted, one per delete request,
+    so that deletes never hit a missing row and never remove the rows the other scenarios read.
+    """
+    project_ids: List[int]
+    task_ids: List[int]
+    disposable_project_ids: List[int]
+    disposable_task_ids: List[int]
+    job_ids: List[int]
+
+
+def migrate_benchmark_database() -> None:
+    """
+    Recreates the testing database ({POSTGRES_DB}_test) from the migrations, like the test suite does.
+    The app must be created after this, with TESTING set, so that it connects to that database.
+    """
+    os.environ["TESTING"] = "1"
+    alembic.command.upgrade(Config("alembic.ini"), "head")
+
+
+async def seed_database(db: Database, *, projects: int, tasks_per_project: int, disposable: int) -> Seed:
+    project_ids = await _insert(db, SEED_PROJECTS_QUERY, count=projects, created_at=datetime.now(timezone.utc))
+    task_ids = await _insert(db, SEED_TASKS_QUERY, project_ids=project_ids, per_project=tasks_per_project)
+
+    # Deleting a disposable project cascades to its tasks, so the disposable tasks belong to the last regular project
+    # They are created in DISPOSABLE_CREATED_AT, so that exports can leave them out with a created_date filter
+    disposable_project_ids = await _insert(db, SEED_PROJECTS_QUERY, count=disposable, created_at=DISPOSABLE_CREATED_AT)
+    disposable_task_ids = await _insert(db, SEED_TASKS_QUERY, project_ids=project_ids[-1:], per_project=disposable)
+    job_ids = await _insert(db, SEED_JOBS_QUERY, count=SEED_JOBS)
+
+    # Planner statistics for the freshly loaded tables, as autovacuum would eventually gather them
+    await db.execute("ANALYZE projects;")
+    await db.execute("ANALYZE tasks;")
+    await db.execute("ANALYZE project_changes;")
+    await db.execute("ANALYZE project_report_counts;")
+
+    return Seed(
+        project_ids=project_ids,
+        task_ids=task_ids,
+        disposable_project_ids=disposable_project_ids,
+        disposable_task_ids=disposable_task_ids,
+        job_ids=job_ids,
+    )
+
+
+async def _insert(db: Database, query: str, **values) -> List[int]:
+    return [record["id"] for record in await db.fetch_all(query=query, values=values)]
@@ -9,7 +9,9 @@ from httpx import AsyncClient
 from databases import Database
 
 from app.models.project import ProjectCreate, ProjectInDB
+from app.models.task import TaskCreate, TaskInDB
 from app.db.repositories.projects import ProjectsRepository
+from app.db.repositories.tasks import TasksRepository
 
 
 import alembic
@@ -73,4 +75,18 @@ async def test_project(db: Database) -> ProjectInDB:
         status='not_started',
     )
 
-    return await project_repo.create_project(new_project=new_project)
\ No newline at end of file
+    return await project_repo.create_project(new_project=new_project)
+
+
+@pytest.fixture
+async def test_task(db: Database, test_project: ProjectInDB) -> TaskInDB:
+    task_repo = TasksRepository(db)
+    new_task = TaskCreate(
+        project_id=test_project.id,
+        title='fake task',
+        description='fake task description',
+        due_date='2023-11-15T14:08:06.365',
+        status='not_started',
+    )
+
+    return await task_repo.create_task(new_task=new_task)
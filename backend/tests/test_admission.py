@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from httpx import AsyncClient
+from fastapi import APIRouter, FastAPI, HTTPException
+
+from starlette.status import HTTP_200_OK, HTTP_429_TOO_MANY_REQUESTS, HTTP_503_SERVICE_UNAVAILABLE
+
+from app.api.admission import AdmissionController, ConcurrencyLimiter, RateLimiter, RouteKind, route_kind
+from app.api.routing import TimedRoute
+
+# Decorate all tests with @pytest.mark.asyncio
+pytestmark = pytest.mark.asyncio
+
+
+def admission_app(admission: AdmissionController, release: asyncio.Event) -> FastAPI:
+    app = FastAPI()
+    router = APIRouter(route_class=TimedRoute)
+
+    @router.get("/slow", name="test:slow")
+    async def slow() -> dict:
+        await release.wait()
+        return {}
+
+    @router.get("/fast", name="test:fast")
+    async def fast() -> dict:
+        return {}
+
+    app.include_router(router)
+    app.state._admission = admission
+
+    return app
+
+
+class TestConcurrencyLimiter:
+    async def test_cheap_reads_get_free_slots_first(self) -> None:
+        limiter = ConcurrencyLimiter(limit=1, queue_size=10, timeout=5)
+        await limiter.acquire()
+
+        order = []
+
+        async def wait(name: str, priority: int) -> None:
+            await limiter.acquire(priority)
+            order.append(name)
+            limiter.release()
+
+        listing = asyncio.create_task(wait("listing", 1))
+        await asyncio.sleep(0)
+        lookup = asyncio.create_task(wait("lookup", 0))
+        await asyncio.sleep(0)
+
+        limiter.release()
+        await asyncio.gather(listing, lookup)
+
+        assert order == ["lookup", "listing"]
+        assert limiter.active == 0
+
+    async def test_full_queue_and_long_wait_are_rejected(self) -> None:
+        limiter = ConcurrencyLimiter(limit=1, queue_size=1, timeout=0.05)
+        await limiter.acquire()
+        queued = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as rejected:
+            await limiter.acquire()
+        assert rejected.value.status_code == HTTP_503_SERVICE_UNAVAILABLE
+        assert rejected.value.headers["Retry-After"] == "1"
+
+        with pytest.raises(HTTPException):
+            await queued
+
+        assert (limiter.rejected, limiter.timed_out, limiter.waiting) == (1, 1, 0)
+
+    async def test_routes_are_classified(self) -> None:
+        cheap_reads = ["projects:get-project-by-id"]
+
+        assert route_kind("projects:get-project-by-id", {"GET"}, cheap_reads=cheap_reads) == RouteKind.cheap_read
+        assert route_kind("projects:get-all-projects", {"GET"}, cheap_reads=cheap_reads) == RouteKind.read
+        assert route_kind("projects:create-project", {"POST"}, cheap_reads=cheap_reads) == RouteKind.write
+
+
+class TestAdmission:
+    async def test_overloaded_route_answers_503_at_once(self) -> None:
+        release = asyncio.Event()
+        admission = AdmissionController(
+            reads=ConcurrencyLimiter(limit=1, queue_size=0, timeout=5),
+            writes=ConcurrencyLimiter(limit=1, queue_size=0, timeout=5),
+        )
+        app = admission_app(admission, release)
+
+        async with AsyncClient(app=app, base_url="http://testserver") as client:
+            slow = asyncio.create_task(client.get("/slow"))
+            await asyncio.sleep(0.05)
+
+            res = await client.get("/fast")
+            assert res.status_code == HTTP_503_SERVICE_UNAVAILABLE
+            assert "retry-after" in res.headers
+
+            release.set()
+            assert (await slow).status_code == HTTP_200_OK
+            assert (await client.get("/fast")).status_code == HTTP_200_OK
+
+    async def test_client_over_its_rate_gets_429(self) -> None:
+        release = asyncio.Event()
+        admission = AdmissionController(
+            reads=ConcurrencyLimiter(limit=10, queue_size=10, timeout=5),
+            writes=ConcurrencyLimiter(limit=10, queue_size=10, timeout=5),
+            rate_limiter=RateLimiter(rate=0.5, burst=2, client_header="X-API-Key"),
+        )
+        app = admission_app(admission, release)
+
+        async with AsyncClient(app=app, base_url="http://testserver") as client:
+            statuses = [(await client.get("/fast", headers={"X-API-Key": "a"})).status_code for _ in range(3)]
+            assert statuses == [HTTP_200_OK, HTTP_200_OK, HTTP_429_TOO_MANY_REQUESTS]
+
+            res = await client.get("/fast", headers={"X-API-Key": "a"})
+            assert 1 <= int(res.headers["retry-after"]) <= 2
+
+            # Another client has its own bucket
+            assert (await client.get("/fast", headers={"X-API-Key": "b"})).status_code == HTTP_200_OK
@@ -0,0 +1,66 @@
+import pytest
+
+from app.db.asyncpg_backend import AsyncpgDatabase, compile_query
+from app.db.db_tasks import create_database, database_url
+from app.db.repositories.projects import ProjectsRepository
+from app.models.project import ProjectCreate, ProjectInDB
+
+# Decorate all tests with @pytest.mark.asyncio
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+async def asyncpg_db(apply_migrations: None) -> AsyncpgDatabase:
+    database = create_database(database_url(), "asyncpg")
+    await database.connect()
+    yield database
+    await database.disconnect()
+
+
+def new_project(title: str) -> ProjectCreate:
+    return ProjectCreate(
+        title=title,
+        description='asyncpg backend project',
+        created_date='2023-09-04T14:08:06.365',
+        due_date='2023-11-30T14:08:06.365',
+        status='not_started',
+    )
+
+
+class TestCompileQuery:
+    async def test_named_parameters_become_positional(self) -> None:
+        query, names = compile_query("SELECT '{}'::jsonb, '12:00', CAST(:b AS int) WHERE id = :a OR parent = :b")
+
+        assert query == "SELECT '{}'::jsonb, '12:00', CAST($1 AS int) WHERE id = $2 OR parent = $1"
+        assert names == ("b", "a")
+
+    async def test_unknown_backend_is_rejected(self) -> None:
+        with pytest.raises(ValueError):
+            create_database(database_url(), "sqlite")
+
+
+class TestAsyncpgDatabase:
+    async def test_repository_runs_on_asyncpg(self, asyncpg_db: AsyncpgDatabase) -> None:
+        projects_repo = ProjectsRepository(asyncpg_db)
+
+        created = await projects_repo.create_project(new_project=new_project('asyncpg project'))
+        assert isinstance(created, ProjectInDB)
+
+        assert await projects_repo.get_project_by_id(id=created.id) == created
+        assert created.id in await projects_repo.get_projects_by_ids(ids=[created.id, -1])
+        assert created in [project async for project in projects_repo.iterate_projects()]
+
+    async def test_transaction_is_rolled_back_on_error(self, asyncpg_db: AsyncpgDatabase) -> None:
+        projects_repo = ProjectsRepository(asyncpg_db)
+
+        with pytest.raises(RuntimeError):
+            async with asyncpg_db.transaction():
+                created = await projects_repo.create_project(new_project=new_project('rolled back project'))
+                # Nested, a savepoint of the same connection
+                async with asyncpg_db.transaction():
+                    assert await asyncpg_db.fetch_val(
+                        "SELECT count(*) FROM projects WHERE id = :id", {"id": created.id},
+                    ) == 1
+                raise RuntimeError()
+
+        assert await asyncpg_db.fetch_one("SELECT id FROM projects WHERE id = :id", {"id": created.id}) is None
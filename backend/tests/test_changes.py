@@ -0,0 +1,205 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import pytest
+from httpx import AsyncClient
+from fastapi import FastAPI, HTTPException
+from starlette.status import HTTP_200_OK, HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND, HTTP_410_GONE
+from starlette.testclient import TestClient
+
+from app.core.config import CHANGE_FEED_RETENTION
+from app.db.changes import ChangeEvent, ChangeFeed
+from app.db.rebalance import CHANGE_SEQ_SPACE
+from app.models.project import ProjectInDB
+
+# No module wide asyncio mark, the WebSocket test is sync (TestClient) - asyncio_mode = auto runs the async ones
+
+
+def parse_events(body: str) -> List[dict]:
+    """
+    The data of the "change" server-sent events of a response body
+    """
+    return [json.loads(line[len('data: '):]) for line in body.splitlines() if line.startswith('data: ')]
+
+
+async def last_cursor(app: FastAPI, client: AsyncClient) -> str:
+    """
+    A cursor past every change published so far
+    """
+    stats = (await client.get(app.url_path_for('system:get-change-feed-stats'))).json()
+    return '.'.join(str(shard['last_seq']) for shard in stats['shards'])
+
+
+def change_feed(*, gap_timeout: float, shards: int = 1) -> ChangeFeed:
+    """
+    A feed that isn't started, to publish events to by hand
+    """
+    return ChangeFeed(
+        [('', None)] * shards, queue_size=10, max_subscribers=10, recent_size=10, page_size=10, retention=60.0,
+        prune_interval=60.0, heartbeat=60.0, reconnect_backoff=1.0, gap_timeout=gap_timeout,
+    )
+
+
+def change_event(seq: int, shard: int = 0) -> ChangeEvent:
+    payload = json.dumps({'seq': seq, 'entity': 'project', 'op': 'update', 'project_id': 1})
+    return ChangeEvent(seq, 1, payload, shard)
+
+
+class TestResumeSeq:
+    def test_resume_seq_stays_below_changes_in_flight(self) -> None:
+        feed = change_feed(gap_timeout=60.0)
+        published = {seq: change_event(seq) for seq in (1, 3, 4, 2)}
+        for event in published.values():
+            feed.publish(event)
+
+        # 2 committed last, a client resuming after 3 or 4 would have missed it
+        assert [published[seq].cursor for seq in (1, 3, 4, 2)] == ['1', '1', '1', '4']
+        assert (feed.shards[0].resume_seq, feed.shards[0].last_seq) == (4, 4)
+        assert published[3].sse.startswith(b'id: 1\n')
+        assert json.loads(published[2].text) == {**json.loads(published[2].payload), 'resume_after': '4'}
+
+    def test_holes_are_given_up_on_after_the_gap_timeout(self) -> None:
+        feed = change_feed(gap_timeout=0.0)
+        for seq in (1, 3):
+            feed.publish(change_event(seq))
+        assert feed.shards[0].resume_seq == 3
+
+        # Its transaction outlived the timeout, it's still sent live
+        late = change_event(2)
+        feed.publish(late)
+        assert (late.cursor, feed.shards[0].late, feed.published) == ('3', 1, 3)
+
+    def test_changes_read_again_are_published_once(self) -> None:
+        feed = change_feed(gap_timeout=60.0)
+        with feed.subscribe() as subscription:
+            for seq in (1, 3, 3, 1):
+                feed.publish(change_event(seq))
+            assert [event.seq for event in subscription.events] == [1, 3]
+
+    def test_cursor_holds_a_seq_per_shard(self) -> None:
+        feed = change_feed(gap_timeout=60.0, shards=2)
+        # As read from its log on start, the second shard's seqs start at CHANGE_SEQ_SPACE
+        feed.shards[1].resume_seq = CHANGE_SEQ_SPACE
+        feed.publish(change_event(1))
+        second_shard = change_event(CHANGE_SEQ_SPACE + 1, shard=1)
+        feed.publish(second_shard)
+
+        assert second_shard.cursor == feed.cursor == f'1.{CHANGE_SEQ_SPACE + 1}'
+        assert [shard['resume_seq'] for shard in feed.stats()['shards']] == [1, CHANGE_SEQ_SPACE + 1]
+
+    def test_cursor_of_too_many_shards_is_refused(self) -> None:
+        feed = change_feed(gap_timeout=60.0, shards=2)
+        assert feed.parse_cursor('5') == (5, 0)
+        with pytest.raises(HTTPException) as refused:
+            feed.parse_cursor('1.2.3')
+        assert refused.value.status_code == HTTP_400_BAD_REQUEST
+
+
+class TestChangesRoutes:
+    async def test_routes_exist(self, app: FastAPI, client: AsyncClient) -> None:
+        res = await client.get(app.url_path_for('projects:stream-changes'), params={'follow': False})
+        assert res.status_code != HTTP_404_NOT_FOUND
+        res = await client.get(app.url_path_for('system:get-change-feed-stats'))
+        assert res.status_code != HTTP_404_NOT_FOUND
+
+
+class TestStreamChanges:
+    async def test_catch_up_returns_logged_changes_in_order(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB
+    ) -> None:
+        after = await last_cursor(app, client)
+        await client.put(
+            app.url_path_for('projects:update-project-by-id', id=test_project.id),
+            json={'project_update': {'title': 'changed', 'created_date': None}},
+        )
+        await client.post(
+            app.url_path_for('tasks:create-task'),
+            json={'new_task': {'project_id': test_project.id, 'title': 'new task', 'due_date': '2030-01-01T00:00:00'}},
+        )
+        await client.delete(app.url_path_for('projects:delete-project-by-id', id=test_project.id))
+
+        res = await client.get(
+            app.url_path_for('projects:stream-changes'),
+            params={'after': after, 'project_id': test_project.id, 'follow': False},
+        )
+        assert res.status_code == HTTP_200_OK
+        assert res.headers['content-type'].startswith('text/event-stream')
+        changes = [(change['entity'], change['op']) for change in parse_events(res.text)]
+        # A project's delete stands for its tasks'
+        assert changes == [('project', 'update'), ('task', 'insert'), ('project', 'delete')]
+
+        seqs = [change['seq'] for change in parse_events(res.text)]
+        assert seqs == sorted(seqs)
+        assert all(seq > int(after) for seq in seqs)
+
+    async def test_last_event_id_takes_precedence_over_after(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB
+    ) -> None:
+        after = await last_cursor(app, client)
+        for title in ('first', 'second'):
+            await client.put(
+                app.url_path_for('projects:update-project-by-id', id=test_project.id),
+                json={'project_update': {'title': title, 'created_date': None}},
+            )
+        first, second = [
+            change['seq'] for change in parse_events((await client.get(
+                app.url_path_for('projects:stream-changes'),
+                params={'after': after, 'project_id': test_project.id, 'follow': False},
+            )).text)
+        ]
+
+        res = await client.get(
+            app.url_path_for('projects:stream-changes'),
+            params={'after': after, 'project_id': test_project.id, 'follow': False},
+            headers={'Last-Event-ID': str(first)},
+        )
+        assert [change['seq'] for change in parse_events(res.text)] == [second]
+
+    async def test_since_older_than_retention_is_gone(self, app: FastAPI, client: AsyncClient) -> None:
+        since = datetime.now(timezone.utc) - timedelta(seconds=CHANGE_FEED_RETENTION + 60)
+        res = await client.get(
+            app.url_path_for('projects:stream-changes'), params={'since': since.isoformat(), 'follow': False},
+        )
+        assert res.status_code == HTTP_410_GONE
+
+    async def test_live_changes_are_fanned_out_to_subscribers(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB
+    ) -> None:
+        feed = app.state._change_feed
+        with feed.subscribe() as everything, feed.subscribe(project_id=test_project.id) as one_project:
+            await client.put(
+                app.url_path_for('projects:update-project-by-id', id=test_project.id),
+                json={'project_update': {'title': 'live', 'created_date': None}},
+            )
+
+            for subscription in (everything, one_project):
+                event = await asyncio.wait_for(subscription.get(), timeout=5)
+                change = json.loads(event.payload)
+                assert (change['project_id'], change['op']) == (test_project.id, 'update')
+
+        assert feed.subscribers == 0
+
+
+class TestStreamChangesWebSocket:
+    def test_websocket_receives_changes(self, app: FastAPI) -> None:
+        with TestClient(app) as client:
+            stats = client.get(app.url_path_for('system:get-change-feed-stats')).json()
+            after = '.'.join(str(shard['last_seq']) for shard in stats['shards'])
+            url = app.url_path_for('projects:stream-changes-ws')
+            with client.websocket_connect(f'{url}?after={after}') as websocket:
+                res = client.post(
+                    app.url_path_for('projects:create-project'),
+                    json={'new_project': {
+                        'title': 'over websocket', 'description': 'Created while a websocket follows the changes',
+                        'due_date': '2030-01-01T00:00:00', 'status': 'not_started',
+                    }},
+                )
+                # Heartbeats may come first
+                change = json.loads(websocket.receive_text())
+                while 'entity' not in change:
+                    change = json.loads(websocket.receive_text())
+                assert (change['entity'], change['op']) == ('project', 'insert')
+                assert change['project_id'] == res.json()['id']
+                assert change['resume_after'].count('.') == after.count('.')
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import zlib
+
+import pytest
+
+from httpx import AsyncClient
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from app.api.etags import if_match_version, is_not_modified, not_modified, resource_etag
+from app.api.middleware.compression import CompressionMiddleware, parse_accept_encoding
+
+# Decorate all tests with @pytest.mark.asyncio
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def compressed_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/large")
+    async def large() -> dict:
+        return {"items": [{"id": i, "title": f"Project {i}", "status": "in_progress"} for i in range(200)]}
+
+    @app.get("/versioned")
+    async def versioned(request: Request) -> Response:
+        etag = resource_etag(1, 2)
+        if is_not_modified(request, etag=etag):
+            return not_modified({"ETag": etag})
+
+        return JSONResponse({"id": 1, "description": "x" * 2048}, headers={"ETag": etag})
+
+    @app.get("/small")
+    async def small() -> dict:
+        return {"id": 1}
+
+    @app.get("/stream")
+    async def stream() -> StreamingResponse:
+        async def lines():
+            for i in range(100):
+                yield (json.dumps({"id": i, "title": f"Project {i}"}) + "\n").encode()
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.get("/events")
+    async def events() -> StreamingResponse:
+        async def lines():
+            yield b"data: " + b"x" * 4096 + b"\n\n"
+
+        return StreamingResponse(lines(), media_type="text/event-stream")
+
+    app.add_middleware(CompressionMiddleware, encodings=["gzip"], levels={"gzip": 6}, minimum_size=1024)
+
+    return app
+
+
+@pytest.fixture
+async def compressed_client(compressed_app: FastAPI) -> AsyncClient:
+    async with AsyncClient(app=compressed_app, base_url="http://testserver") as client:
+        yield client
+
+
+class TestCompression:
+    async def test_large_body_is_compressed(self, compressed_client: AsyncClient) -> None:
+        res = await compressed_client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+        assert res.headers["content-encoding"] == "gzip"
+        assert res.headers["vary"] == "Accept-Encoding"
+        assert int(res.headers["content-length"]) < len(res.content)
+        assert len(res.json()["items"]) == 200
+
+    async def test_small_body_and_refused_encoding_are_sent_as_is(self, compressed_client: AsyncClient) -> None:
+        res = await compressed_client.get("/small", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in res.headers
+
+        res = await compressed_client.get("/large", headers={"Accept-Encoding": "gzip;q=0, identity"})
+        assert "content-encoding" not in res.headers
+
+    async def test_stream_is_compressed_chunk_by_chunk(self, compressed_app: FastAPI) -> None:
+        # Straight through ASGI, the test client would join the chunks
+        messages = []
+
+        async def receive() -> dict:
+            # The client never disconnects
+            await asyncio.Event().wait()
+
+        async def send(message: dict) -> None:
+            messages.append(message)
+
+        scope = {
+            "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http", "path": "/stream",
+            "raw_path": b"/stream", "root_path": "", "query_string": b"", "server": ("testserver", 80),
+            "headers": [(b"accept-encoding", b"gzip")],
+        }
+        await compressed_app(scope, receive, send)
+
+        start, *bodies = messages
+        headers = dict(start["headers"])
+        assert headers[b"content-encoding"] == b"gzip"
+        assert b"content-length" not in headers
+
+        # Every chunk decompresses to whole lines as soon as it arrives, nothing is held back for the next one
+        assert len(bodies) > 1
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        decompressed = [decompressor.decompress(body["body"]) for body in bodies]
+        assert all(lines.endswith(b"\n") for lines in decompressed[:-1])
+        assert len(b"".join(decompressed).splitlines()) == 100
+
+    async def test_event_stream_is_not_compressed(self, compressed_client: AsyncClient) -> None:
+        res = await compressed_client.get("/events", headers={"Accept-Encoding": "gzip"})
+
+        assert "content-encoding" not in res.headers
+
+    async def test_compressed_body_has_its_own_etag(self, compressed_client: AsyncClient) -> None:
+        res = await compressed_client.get("/versioned", headers={"Accept-Encoding": "identity"})
+        assert res.headers["etag"] == '"1-2"'
+
+        res = await compressed_client.get("/versioned", headers={"Accept-Encoding": "gzip"})
+        assert res.headers["content-encoding"] == "gzip"
+        etag = res.headers["etag"]
+        assert etag == '"1-2-gzip"'
+
+        # Still the version of the resource, to revalidate and to update
+        res = await compressed_client.get("/versioned", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        assert res.status_code == 304
+        assert res.headers["etag"] == etag
+        assert if_match_version(etag, id=1) == 2
+
+    async def test_accept_encoding_is_parsed(self) -> None:
+        assert parse_accept_encoding("br;q=0.5, GZIP, *;q=0") == {"br": 0.5, "gzip": 1.0, "*": 0.0}
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from httpx import AsyncClient
+from fastapi import FastAPI
+from databases import Database
+
+from starlette.status import HTTP_200_OK, HTTP_202_ACCEPTED, HTTP_404_NOT_FOUND
+
+from app.db.jobs import JobContext, JobRunner
+from app.db.repositories.jobs import JobsRepository
+from app.models.job import JobKind, JobStatus
+
+# Decorate all tests with @pytest.mark.asyncio
+pytestmark = pytest.mark.asyncio
+
+
+async def wait_for_job(client: AsyncClient, location: str, timeout: float = 10.0) -> dict:
+    for _ in range(int(timeout / 0.1)):
+        res = await client.get(location)
+        assert res.status_code == HTTP_200_OK
+        if res.json()['status'] in (JobStatus.succeeded.value, JobStatus.failed.value):
+            return res.json()
+        await asyncio.sleep(0.1)
+
+    raise AssertionError(f"The job at {location} didn't finish in {timeout}s")
+
+
+class TestJobsRoutes:
+    async def test_routes_exist(self, app: FastAPI, client: AsyncClient) -> None:
+        res = await client.get(app.url_path_for('jobs:get-all-jobs'))
+        assert res.status_code == HTTP_200_OK
+
+        res = await client.get(app.url_path_for('jobs:get-job-by-id', id=2 ** 62))
+        assert res.status_code == HTTP_404_NOT_FOUND
+
+
+class TestImportProjects:
+    async def test_import_is_run_in_the_background(self, app: FastAPI, client: AsyncClient) -> None:
+        new_project = {
+            'title': 'imported project',
+            'description': 'Imported in the background',
+            'created_date': '2023-09-04T14:08:06.365',
+            'due_date': '2023-11-30T14:08:06.365',
+            'status': 'not_started',
+        }
+        res = await client.post(
+            app.url_path_for('projects:import-projects'),
+            json={'new_projects': [new_project, {'title': 'no dates'}, new_project]},
+        )
+        assert res.status_code == HTTP_202_ACCEPTED
+        assert res.json()['status'] == JobStatus.queued.value
+        assert res.json()['progress'] == {'done': 0, 'total': 2}
+        assert 'payload' not in res.json()
+
+        job = await wait_for_job(client, res.headers['location'])
+        assert job['status'] == JobStatus.succeeded.value
+        assert job['progress'] == {'done': 2, 'total': 2}
+        assert (job['result']['succeeded'], job['result']['failed']) == (2, 1)
+        assert job['result']['results'][0]['index'] == 1
+
+
+class TestRecomputeCounts:
+    async def test_queued_recompute_is_coalesced(self, app: FastAPI, client: AsyncClient, db: Database) -> None:
+        # Nothing claims the first job in between
+        await app.state._job_runner.close()
+        jobs_repo = JobsRepository(db)
+        first = await jobs_repo.create_job(kind=JobKind.recompute_counts, payload={}, max_attempts=1, coalesce=True)
+        second = await jobs_repo.create_job(kind=JobKind.recompute_counts, payload={}, max_attempts=1, coalesce=True)
+
+        assert first.id == second.id
+
+
+class TestJobRunner:
+    async def test_failed_job_is_retried(self, app: FastAPI, client: AsyncClient, db: Database) -> None:
+        attempts = []
+
+        async def flaky(context: JobContext) -> dict:
+            attempts.append(context.job.attempts)
+            if len(attempts) == 1:
+                raise RuntimeError("first attempt")
+            return {"attempts": len(attempts)}
+
+        # Only this runner claims the job
+        await app.state._job_runner.close()
+        jobs_repo = JobsRepository(db)
+        job = await jobs_repo.create_job(kind=JobKind.import_projects, payload={}, max_attempts=3)
+        runner = JobRunner(
+            jobs_repo=jobs_repo, database=db, cache=app.state._cache, handlers={JobKind.import_projects.value: flaky},
+            workers=1, poll_interval=0.05, lease=10, retry_backoff=0, retry_max_backoff=0, retention=3600,
+            shutdown_timeout=1,
+        )
+        await runner.start()
+        for _ in range(100):
+            finished = await jobs_repo.get_job_by_id(id=job.id)
+            if finished.status in (JobStatus.succeeded, JobStatus.failed):
+                break
+            await asyncio.sleep(0.05)
+        await runner.close()
+
+        assert finished.status == JobStatus.succeeded
+        assert finished.result == {"attempts": 2}
+        assert finished.attempts == 2
+        assert runner.retried == 1
@@ -1,3 +1,6 @@
+import asyncio
+import json
+import resource
 from typing import List
 
 import pytest
@@ -5,9 +8,17 @@ import pytest
 from httpx import AsyncClient
 from fastapi import FastAPI
 
-from starlette.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_404_NOT_FOUND, HTTP_422_UNPROCESSABLE_ENTITY
+from databases import Database
+from starlette.status import (
+    HTTP_200_OK, HTTP_201_CREATED, HTTP_304_NOT_MODIFIED, HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND, HTTP_412_PRECONDITION_FAILED,
+    HTTP_413_REQUEST_ENTITY_TOO_LARGE, HTTP_422_UNPROCESSABLE_ENTITY,
+)
 
-from app.models.project import ProjectCreate, ProjectInDB
+from app.models.project import ProjectCreate, ProjectInDB, ProjectPublic
+from app.models.task import TaskInDB
+from app.core.config import BULK_MAX_BATCH_SIZE
+from app.db.loader import get_batch_loader
+from app.db.repositories.projects import ProjectsRepository
 
 # Decorate all tests with @pytest.mark.asyncio
 pytestmark = pytest.mark.asyncio
@@ -53,7 +64,10 @@ class TestCreateProject:
         # created_project = ProjectCreate(**res.json())
         # assert created_project == new_project
         created_project = res.json()
-        assert created_project['id'] == 1
+        # Other modules share the database, the id is whatever the sequence gave
+        res = await client.get(app.url_path_for('projects:get-project-by-id', id=created_project['id']))
+        assert res.status_code == HTTP_200_OK
+        assert res.json() == created_project
 
         @pytest.mark.parametrize(
             'invalid_payload, status_code',
@@ -74,23 +88,76 @@ class TestCreateProject:
             assert res.status_code == status_code
 
 
+class TestIdempotentCreateProject:
+    async def test_retry_gets_the_first_response_back(
+            self, app: FastAPI, client: AsyncClient, new_project: ProjectCreate
+    ) -> None:
+        url = app.url_path_for('projects:create-project')
+        payload = {'new_project': new_project.model_dump(mode='json')}
+        headers = {'Idempotency-Key': 'create-once'}
+
+        first = await client.post(url, json=payload, headers=headers)
+        assert first.status_code == HTTP_201_CREATED
+        assert 'idempotent-replayed' not in first.headers
+
+        retry = await client.post(url, json=payload, headers=headers)
+        assert retry.status_code == HTTP_201_CREATED
+        assert retry.headers['idempotent-replayed'] == 'true'
+        assert retry.json() == first.json()
+
+    async def test_concurrent_requests_create_a_single_project(
+            self, app: FastAPI, client: AsyncClient, new_project: ProjectCreate
+    ) -> None:
+        url = app.url_path_for('projects:create-project')
+        payload = {'new_project': new_project.model_dump(mode='json')}
+        responses = await asyncio.gather(*(
+            client.post(url, json=payload, headers={'Idempotency-Key': 'create-concurrently'}) for _ in range(5)
+        ))
+
+        assert {res.status_code for res in responses} == {HTTP_201_CREATED}
+        assert len({res.json()['id'] for res in responses}) == 1
+        assert sum('idempotent-replayed' in res.headers for res in responses) == 4
+
+    async def test_key_reused_for_another_project_is_refused(
+            self, app: FastAPI, client: AsyncClient, new_project: ProjectCreate
+    ) -> None:
+        url = app.url_path_for('projects:create-project')
+        headers = {'Idempotency-Key': 'create-reused'}
+        await client.post(url, json={'new_project': new_project.model_dump(mode='json')}, headers=headers)
+
+        other_project = new_project.model_copy(update={'title': 'Another project'})
+        res = await client.post(url, json={'new_project': other_project.model_dump(mode='json')}, headers=headers)
+        assert res.status_code == HTTP_422_UNPROCESSABLE_ENTITY
+
+
 class TestGetProject:
-    async def test_get_project_by_id(self, app: FastAPI, client: AsyncClient) -> None:
-        res = await client.get(app.url_path_for('projects:get-project-by-id', id=1))
+    async def test_get_project_by_id(self, app: FastAPI, client: AsyncClient, new_project: ProjectCreate) -> None:
+        created = await client.post(
+            app.url_path_for('projects:create-project'), json={'new_project': new_project.model_dump(mode='json')}
+        )
+        res = await client.get(app.url_path_for('projects:get-project-by-id', id=created.json()['id']))
         assert res.status_code == HTTP_200_OK
         project = ProjectInDB(**res.json())
-        assert project.id == 1
+        assert project.id == created.json()['id']
 
     async def test_get_project_by_id_with_fixture(self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB) -> None:
         res = await client.get(app.url_path_for('projects:get-project-by-id', id=test_project.id))
         assert res.status_code == HTTP_200_OK
         project = ProjectInDB(**res.json())
-        assert project == test_project
+        # The body has no version nor updated_at, compare what it does hold
+        assert project.model_dump() == test_project.model_dump()
+
+    async def test_body_has_the_public_fields_only(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB
+    ) -> None:
+        res = await client.get(app.url_path_for('projects:get-project-by-id', id=test_project.id))
+        assert res.status_code == HTTP_200_OK
+        assert set(res.json()) == set(ProjectPublic.model_fields)
 
     @pytest.mark.parametrize(
         'id, status_code',
         (
-                (500, 404),
+                (99999999, 404),
                 (-1, 404),
                 (None, 422),
         ),
@@ -104,12 +171,242 @@ class TestGetProject:
     async def test_get_all_projects_returns_valid_response(  
         self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB  
     ) -> None:  
-        res = await client.get(app.url_path_for('projects:get-all-projects'))  
-        assert res.status_code == HTTP_200_OK  
-        assert isinstance(res.json(), list)  
-        assert len(res.json()) > 0  
-        projects = [ProjectInDB(**l) for l in res.json()]  
-        assert test_project in projects
+        res = await client.get(app.url_path_for('projects:get-all-projects'), params={'limit': 500})
+        assert res.status_code == HTTP_200_OK
+        assert isinstance(res.json()['items'], list)
+        assert len(res.json()['items']) > 0
+        projects = [ProjectInDB(**l).model_dump() for l in res.json()['items']]
+        assert test_project.model_dump() in projects
+
+
+@pytest.fixture
+async def paginated_projects(db: Database) -> List[ProjectInDB]:
+    """
+    Five projects created in 2031, so that listing tests can isolate them with a created_date filter.
+    Due dates run backwards, so ordering by due_date differs from ordering by id.
+    """
+    project_repo = ProjectsRepository(db)
+    projects = []
+    for i in range(5):
+        projects.append(await project_repo.create_project(new_project=ProjectCreate(
+            title=f'paginated project {i}',
+            description='paginated project description',
+            created_date=f'2031-01-0{i + 1}T10:00:00+00:00',
+            due_date=f'2031-12-0{5 - i}T10:00:00+00:00',
+            status='in_progress' if i % 2 else 'not_started',
+        )))
+
+    yield projects
+
+    for project in projects:
+        await project_repo.delete_project_by_id(id=project.id)
+
+
+class TestListProjects:
+    async def _get_all_pages(self, app: FastAPI, client: AsyncClient, params: dict) -> List[List[ProjectInDB]]:
+        pages, cursor = [], None
+        while True:
+            res = await client.get(
+                app.url_path_for('projects:get-all-projects'),
+                params={**params, **({'cursor': cursor} if cursor else {})},
+            )
+            assert res.status_code == HTTP_200_OK
+            pages.append([ProjectInDB(**p) for p in res.json()['items']])
+            cursor = res.json()['next_cursor']
+            if cursor is None:
+                return pages
+
+    @pytest.mark.parametrize('sort', ('id', 'due_date'))
+    async def test_pages_return_every_project_once_in_order(
+            self, app: FastAPI, client: AsyncClient, paginated_projects: List[ProjectInDB], sort: str
+    ) -> None:
+        pages = await self._get_all_pages(
+            app, client, {'sort': sort, 'limit': 2, 'created_date_from': '2031-01-01T00:00:00+00:00'},
+        )
+        assert [len(page) for page in pages] == [2, 2, 1]
+
+        listed = [project for page in pages for project in page]
+        expected = sorted(paginated_projects, key=lambda p: (getattr(p, sort), p.id))
+        assert [p.id for p in listed] == [p.id for p in expected]
+
+    async def test_filters_by_status_and_date_ranges(
+            self, app: FastAPI, client: AsyncClient, paginated_projects: List[ProjectInDB]
+    ) -> None:
+        res = await client.get(
+            app.url_path_for('projects:get-all-projects'),
+            params={
+                'status': 'in_progress',
+                'created_date_from': '2031-01-01T00:00:00+00:00',
+                'due_date_to': '2031-12-04T00:00:00+00:00',
+            },
+        )
+        assert res.status_code == HTTP_200_OK
+        ids = [p['id'] for p in res.json()['items']]
+        # in_progress projects are i = 1 (due 2031-12-04) and i = 3 (due 2031-12-02)
+        assert ids == [paginated_projects[3].id]
+
+    @pytest.mark.parametrize(
+        'params, status_code',
+        (
+                ({'cursor': 'not-a-cursor'}, HTTP_400_BAD_REQUEST),
+                ({'limit': 0}, HTTP_422_UNPROCESSABLE_ENTITY),
+                ({'sort': 'title'}, HTTP_422_UNPROCESSABLE_ENTITY),
+        ),
+    )
+    async def test_invalid_list_params_raise_error(
+            self, app: FastAPI, client: AsyncClient, params: dict, status_code: int
+    ) -> None:
+        res = await client.get(app.url_path_for('projects:get-all-projects'), params=params)
+        assert res.status_code == status_code
+
+    async def test_cursor_from_other_sort_is_rejected(
+            self, app: FastAPI, client: AsyncClient, paginated_projects: List[ProjectInDB]
+    ) -> None:
+        res = await client.get(app.url_path_for('projects:get-all-projects'), params={'limit': 1, 'sort': 'id'})
+        cursor = res.json()['next_cursor']
+
+        res = await client.get(
+            app.url_path_for('projects:get-all-projects'), params={'sort': 'due_date', 'cursor': cursor},
+        )
+        assert res.status_code == HTTP_400_BAD_REQUEST
+
+
+EXPORT_SEED_SIZE = 100_000
+
+SEED_EXPORT_PROJECTS_QUERY = """
+    INSERT INTO projects (title, description, created_date, due_date, status)
+    SELECT 'export project ' || g, 'export project description',
+           '2032-01-01T00:00:00+00:00'::timestamptz, now() + g * interval '1 minute', 'not_started'
+    FROM generate_series(1, :count) AS g;
+"""
+
+DELETE_EXPORT_PROJECTS_QUERY = """
+    DELETE FROM projects WHERE created_date >= '2032-01-01T00:00:00+00:00';
+"""
+
+
+@pytest.fixture
+async def export_projects(db: Database) -> None:
+    """
+    Seeds EXPORT_SEED_SIZE projects created in 2032, so that the export can select exactly those
+    """
+    await db.execute(query=SEED_EXPORT_PROJECTS_QUERY, values={'count': EXPORT_SEED_SIZE})
+    yield
+    await db.execute(query=DELETE_EXPORT_PROJECTS_QUERY)
+
+
+async def stream_from_app(app: FastAPI, path: str, query_string: bytes) -> dict:
+    """
+    Drives the ASGI app directly and only counts what it sends - httpx's ASGI transport
+    buffers the whole body, which would hide whether the server streams or not.
+    """
+    received = {'status': None, 'headers': {}, 'bytes': 0, 'lines': 0, 'first_line': b''}
+    disconnected = asyncio.Event()
+    request_sent = False
+
+    async def receive() -> dict:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message: dict) -> None:
+        if message['type'] == 'http.response.start':
+            received['status'] = message['status']
+            received['headers'] = {k.decode(): v.decode() for k, v in message['headers']}
+        elif message['type'] == 'http.response.body':
+            body = message.get('body', b'')
+            if not received['first_line']:
+                received['first_line'] = body.split(b'\n', 1)[0]
+            received['bytes'] += len(body)
+            received['lines'] += body.count(b'\n')
+
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': query_string,
+        'headers': [(b'host', b'testserver')], 'server': ('testserver', 80), 'client': ('127.0.0.1', 50000),
+    }
+    await app(scope, receive, send)
+    disconnected.set()
+
+    return received
+
+
+class TestExportProjects:
+    @pytest.mark.parametrize(
+        'format, content_type, expected_lines',
+        (
+                ('ndjson', 'application/x-ndjson', EXPORT_SEED_SIZE),
+                ('csv', 'text/csv', EXPORT_SEED_SIZE + 1),  # header row
+        ),
+    )
+    async def test_export_streams_all_rows_with_bounded_memory(
+            self,
+            app: FastAPI,
+            client: AsyncClient,
+            export_projects: None,
+            format: str,
+            content_type: str,
+            expected_lines: int,
+    ) -> None:
+        # ru_maxrss is the peak RSS of the whole process in KiB. Materialising 100k projects as models
+        # plus their JSON body costs hundreds of MiB, a streamed export should barely move the peak.
+        peak_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        res = await stream_from_app(
+            app,
+            app.url_path_for('projects:export-projects'),
+            f'format={format}&created_date_from=2032-01-01T00:00:00%2B00:00'.encode(),
+        )
+
+        peak_growth_mib = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - peak_before) / 1024
+        assert res['status'] == HTTP_200_OK
+        assert res['headers']['content-type'].startswith(content_type)
+        assert res['lines'] == expected_lines
+        assert peak_growth_mib < 64
+        if format == 'ndjson':
+            assert json.loads(res['first_line'])['title'] == 'export project 1'
+
+
+class TestProjectTaskStats:
+    @pytest.mark.parametrize('task_stats_source', ('aggregate', 'counters'))
+    async def test_include_task_stats_counts_tasks_per_status(
+            self,
+            app: FastAPI,
+            client: AsyncClient,
+            test_task: TaskInDB,
+            task_stats_source: str,
+            monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr('app.db.repositories.tasks.TASK_STATS_SOURCE', task_stats_source)
+        await client.post(
+            app.url_path_for('tasks:create-task'),
+            json={'new_task': {
+                'project_id': test_task.project_id, 'title': 'second task',
+                'due_date': '2023-11-30T10:05:06.944969', 'status': 'done',
+            }},
+        )
+
+        res = await client.get(
+            app.url_path_for('projects:get-project-by-id', id=test_task.project_id), params={'include': 'task_stats'},
+        )
+        assert res.status_code == HTTP_200_OK
+        assert res.json()['task_stats'] == {'not_started': 1, 'in_progress': 0, 'done': 1, 'total': 2}
+
+        res = await client.get(
+            app.url_path_for('projects:get-all-projects'), params={'include': 'task_stats', 'limit': 500},
+        )
+        listed = {p['id']: p['task_stats'] for p in res.json()['items']}
+        assert listed[test_task.project_id]['total'] == 2
+        assert all(stats is not None for stats in listed.values())
+
+    async def test_task_stats_are_omitted_unless_included(
+            self, app: FastAPI, client: AsyncClient, test_task: TaskInDB
+    ) -> None:
+        res = await client.get(app.url_path_for('projects:get-project-by-id', id=test_task.project_id))
+        assert res.json()['task_stats'] is None
 
 
 class TestUpdateProject:
@@ -170,7 +467,7 @@ class TestUpdateProject:
         (
                 (-1, {'title': 'test'}, 422),
                 (0, {'title': 'test2'}, 422),
-                (500, {'title': 'test3'}, 404),
+                (99999999, {'title': 'test3'}, 404),
                 (1, None, 422),
                 (1, {'status': 'invalid project type'}, 422),
                 (1, {'status': None}, 400),
@@ -193,6 +490,167 @@ class TestUpdateProject:
         assert res.status_code == status_code
 
 
+class TestConditionalUpdateProject:
+    async def test_update_with_current_etag_succeeds_and_changes_etag(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB
+    ) -> None:
+        res = await client.get(app.url_path_for('projects:get-project-by-id', id=test_project.id))
+        etag = res.headers['etag']
+
+        res = await client.put(
+            app.url_path_for('projects:update-project-by-id', id=test_project.id),
+            json={'project_update': {'title': 'conditionally updated', 'created_date': None}},
+            headers={'If-Match': etag},
+        )
+        assert res.status_code == HTTP_200_OK
+        assert res.json()['title'] == 'conditionally updated'
+        assert res.headers['etag'] != etag
+
+    async def test_update_with_stale_etag_fails(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB
+    ) -> None:
+        res = await client.get(app.url_path_for('projects:get-project-by-id', id=test_project.id))
+        stale_etag = res.headers['etag']
+        await client.put(
+            app.url_path_for('projects:update-project-by-id', id=test_project.id),
+            json={'project_update': {'title': 'first writer', 'created_date': None}},
+        )
+
+        res = await client.put(
+            app.url_path_for('projects:update-project-by-id', id=test_project.id),
+            json={'project_update': {'description': 'second writer', 'created_date': None}},
+            headers={'If-Match': stale_etag},
+        )
+        assert res.status_code == HTTP_412_PRECONDITION_FAILED
+
+        res = await client.get(app.url_path_for('projects:get-project-by-id', id=test_project.id))
+        assert res.json()['title'] == 'first writer'
+        assert res.json()['description'] == test_project.description
+
+    @pytest.mark.parametrize('if_match', ('W/"1-1"', '"someone-else"', '"99999-1"'))
+    async def test_update_with_foreign_etag_fails(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB, if_match: str
+    ) -> None:
+        res = await client.put(
+            app.url_path_for('projects:update-project-by-id', id=test_project.id),
+            json={'project_update': {'title': 'never applied', 'created_date': None}},
+            headers={'If-Match': if_match},
+        )
+        assert res.status_code == HTTP_412_PRECONDITION_FAILED
+
+
+class TestConditionalGetProject:
+    async def test_repeated_get_with_etag_is_not_modified(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB
+    ) -> None:
+        url = app.url_path_for('projects:get-project-by-id', id=test_project.id)
+        res = await client.get(url)
+        assert res.status_code == HTTP_200_OK
+        assert 'last-modified' in res.headers
+        assert 'cache-control' in res.headers
+
+        res = await client.get(url, headers={'If-None-Match': res.headers['etag']})
+        assert res.status_code == HTTP_304_NOT_MODIFIED
+        assert res.content == b''
+        assert 'etag' in res.headers
+
+    async def test_get_with_last_modified_is_not_modified(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB
+    ) -> None:
+        url = app.url_path_for('projects:get-project-by-id', id=test_project.id)
+        res = await client.get(url)
+
+        res = await client.get(url, headers={'If-Modified-Since': res.headers['last-modified']})
+        assert res.status_code == HTTP_304_NOT_MODIFIED
+
+    async def test_update_makes_old_etag_stale(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB
+    ) -> None:
+        url = app.url_path_for('projects:get-project-by-id', id=test_project.id)
+        etag = (await client.get(url)).headers['etag']
+        await client.put(
+            app.url_path_for('projects:update-project-by-id', id=test_project.id),
+            json={'project_update': {'title': 'modified', 'created_date': None}},
+        )
+
+        res = await client.get(url, headers={'If-None-Match': etag})
+        assert res.status_code == HTTP_200_OK
+        assert res.json()['title'] == 'modified'
+        assert res.headers['etag'] != etag
+
+    async def test_new_task_makes_task_stats_etag_stale(
+            self, app: FastAPI, client: AsyncClient, test_task: TaskInDB
+    ) -> None:
+        url = app.url_path_for('projects:get-project-by-id', id=test_task.project_id)
+        params = {'include': 'task_stats'}
+        etag = (await client.get(url, params=params)).headers['etag']
+        assert (await client.get(url, params=params, headers={'If-None-Match': etag})).status_code == \
+            HTTP_304_NOT_MODIFIED
+
+        await client.post(
+            app.url_path_for('tasks:create-task'),
+            json={'new_task': {
+                'project_id': test_task.project_id, 'title': 'another task',
+                'due_date': '2023-11-30T10:05:06.944969', 'status': 'done',
+            }},
+        )
+        res = await client.get(url, params=params, headers={'If-None-Match': etag})
+        assert res.status_code == HTTP_200_OK
+        assert res.json()['task_stats']['total'] == 2
+
+    async def test_listing_is_not_modified_until_projects_change(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB, new_project: ProjectCreate
+    ) -> None:
+        url = app.url_path_for('projects:get-all-projects')
+        etag = (await client.get(url, params={'limit': 10})).headers['etag']
+        res = await client.get(url, params={'limit': 10}, headers={'If-None-Match': etag})
+        assert res.status_code == HTTP_304_NOT_MODIFIED
+        # Another page or size of the same listing is another representation
+        res = await client.get(url, params={'limit': 11}, headers={'If-None-Match': etag})
+        assert res.status_code == HTTP_200_OK
+
+        await client.post(
+            app.url_path_for('projects:create-project'), json={'new_project': new_project.model_dump(mode='json')},
+        )
+        res = await client.get(url, params={'limit': 10}, headers={'If-None-Match': etag})
+        assert res.status_code == HTTP_200_OK
+        etag = res.headers['etag']
+
+        await client.delete(app.url_path_for('projects:delete-project-by-id', id=test_project.id))
+        res = await client.get(url, params={'limit': 10}, headers={'If-None-Match': etag})
+        assert res.status_code == HTTP_200_OK
+
+
+class TestProjectsCache:
+    async def test_repeated_reads_hit_the_cache(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB
+    ) -> None:
+        for _ in range(3):
+            res = await client.get(app.url_path_for('projects:get-project-by-id', id=test_project.id))
+            assert res.status_code == HTTP_200_OK
+
+        stats = (await client.get(app.url_path_for('system:get-cache-stats'))).json()
+        assert stats['misses'] >= 1
+        assert stats['hits'] >= 2
+
+    async def test_writes_invalidate_cached_reads(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB
+    ) -> None:
+        await client.get(app.url_path_for('projects:get-project-by-id', id=test_project.id))
+        await client.get(app.url_path_for('projects:get-all-projects'), params={'limit': 500})
+
+        await client.put(
+            app.url_path_for('projects:update-project-by-id', id=test_project.id),
+            json={'project_update': {'title': 'title after update', 'created_date': None}},
+        )
+
+        res = await client.get(app.url_path_for('projects:get-project-by-id', id=test_project.id))
+        assert res.json()['title'] == 'title after update'
+        res = await client.get(app.url_path_for('projects:get-all-projects'), params={'limit': 500})
+        listed = {p['id']: p['title'] for p in res.json()['items']}
+        assert listed[test_project.id] == 'title after update'
+
+
 class TestDeleteProject:
     async def test_can_delete_project_successfully(
             self,
@@ -220,7 +678,7 @@ class TestDeleteProject:
     @pytest.mark.parametrize(
         "id, status_code",
         (
-                (500, 404),
+                (99999999, 404),
                 (0, 422),
                 (-1, 422),
                 (None, 422),
@@ -237,4 +695,250 @@ class TestDeleteProject:
         res = await client.delete(
             app.url_path_for("projects:delete-project-by-id", id=id),
         )
-        assert res.status_code == status_code
\ No newline at end of file
+        assert res.status_code == status_code
+
+    async def test_deleted_project_is_out_of_the_api_with_its_tasks(
+            self, app: FastAPI, client: AsyncClient, test_task: TaskInDB,
+    ) -> None:
+        project_id = test_task.project_id
+        res = await client.delete(app.url_path_for('projects:delete-project-by-id', id=project_id))
+        assert res.status_code == HTTP_200_OK
+
+        res = await client.get(app.url_path_for('projects:get-all-projects'), params={'limit': 500})
+        assert project_id not in [project['id'] for project in res.json()['items']]
+        res = await client.delete(app.url_path_for('projects:delete-project-by-id', id=project_id))
+        assert res.status_code == HTTP_404_NOT_FOUND
+        res = await client.get(app.url_path_for('tasks:get-task-by-id', id=test_task.id))
+        assert res.status_code == HTTP_404_NOT_FOUND
+        res = await client.post(
+            app.url_path_for('tasks:create-task'),
+            json={'new_task': {'project_id': project_id, 'title': 'late task', 'due_date': '2030-01-01T00:00:00'}},
+        )
+        assert res.status_code == HTTP_400_BAD_REQUEST
+
+    async def test_purge_deletes_the_deleted_projects_for_good(
+            self, app: FastAPI, client: AsyncClient, db: Database, test_task: TaskInDB,
+    ) -> None:
+        await client.delete(app.url_path_for('projects:delete-project-by-id', id=test_task.project_id))
+        projects_repo = ProjectsRepository(db)
+
+        while await projects_repo.purge_deleted_projects(older_than=0, limit=1000) == 1000:
+            pass
+
+        assert await db.fetch_val('SELECT count(*) FROM projects WHERE id = :id', {'id': test_task.project_id}) == 0
+        assert await db.fetch_val('SELECT count(*) FROM tasks WHERE id = :id', {'id': test_task.id}) == 0
+
+
+class TestArchiveProjects:
+    async def test_done_projects_move_to_the_archive(
+            self, app: FastAPI, client: AsyncClient, db: Database, test_task: TaskInDB,
+    ) -> None:
+        project_id = test_task.project_id
+        res = await client.put(
+            app.url_path_for('projects:update-project-by-id', id=project_id),
+            json={'project_update': {'status': 'done'}},
+        )
+        assert res.status_code == HTTP_200_OK
+        assert res.json()['status'] == 'done'
+        projects_repo = ProjectsRepository(db)
+        while await projects_repo.archive_projects(completed_after=1e-6, created_after=0, limit=1000) == 1000:
+            pass
+
+        res = await client.get(app.url_path_for('projects:get-project-by-id', id=project_id))
+        assert res.status_code == HTTP_404_NOT_FOUND
+        archived = await db.fetch_val('SELECT count(*) FROM projects_archive WHERE id = :id', {'id': project_id})
+        assert archived == 1
+        archived = await db.fetch_val('SELECT count(*) FROM tasks_archive WHERE id = :id', {'id': test_task.id})
+        assert archived == 1
+
+    async def test_projects_not_done_stay(
+            self, app: FastAPI, client: AsyncClient, db: Database, test_project: ProjectInDB,
+    ) -> None:
+        projects_repo = ProjectsRepository(db)
+        while await projects_repo.archive_projects(completed_after=1e-6, created_after=0, limit=1000) == 1000:
+            pass
+
+        res = await client.get(app.url_path_for('projects:get-project-by-id', id=test_project.id))
+        assert res.status_code == HTTP_200_OK
+
+
+class TestBulkProjects:
+    async def test_bulk_create_reports_invalid_items(self, app: FastAPI, client: AsyncClient) -> None:
+        valid_project = {
+            'title': 'bulk project', 'description': 'bulk project description',
+            'created_date': None, 'due_date': '2023-11-30T10:05:06.944969',
+        }
+        res = await client.post(
+            app.url_path_for('projects:bulk-create-projects'),
+            json={'new_projects': [valid_project, {'title': 'missing fields'}, {**valid_project, 'status': 'in_progress'}]},
+        )
+        assert res.status_code == HTTP_200_OK
+        result = res.json()
+        assert (result['succeeded'], result['failed']) == (2, 1)
+        assert [r['ok'] for r in result['results']] == [True, False, True]
+        assert result['results'][0]['id'] < result['results'][2]['id']
+
+        res = await client.get(app.url_path_for('projects:get-project-by-id', id=result['results'][2]['id']))
+        assert res.json()['status'] == 'in_progress'
+
+    async def test_bulk_update_reports_missing_and_duplicate_ids(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB
+    ) -> None:
+        res = await client.patch(
+            app.url_path_for('projects:bulk-update-projects'),
+            json={'project_updates': [
+                {'id': test_project.id, 'title': 'bulk updated title'},
+                {'id': 50000, 'title': 'no such project'},
+                {'id': test_project.id, 'title': 'duplicate'},
+                {'title': 'no id'},
+            ]},
+        )
+        assert res.status_code == HTTP_200_OK
+        assert [r['ok'] for r in res.json()['results']] == [True, False, False, False]
+
+        res = await client.get(app.url_path_for('projects:get-project-by-id', id=test_project.id))
+        updated_project = ProjectInDB(**res.json())
+        assert updated_project.title == 'bulk updated title'
+        assert updated_project.description == test_project.description
+
+    async def test_bulk_delete_reports_missing_ids(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB
+    ) -> None:
+        res = await client.request(
+            'DELETE', app.url_path_for('projects:bulk-delete-projects'), json={'ids': [test_project.id, 50000]},
+        )
+        assert res.status_code == HTTP_200_OK
+        assert [(r['id'], r['ok']) for r in res.json()['results']] == [(test_project.id, True), (50000, False)]
+
+        res = await client.get(app.url_path_for('projects:get-project-by-id', id=test_project.id))
+        assert res.status_code == HTTP_404_NOT_FOUND
+
+    async def test_batch_larger_than_max_is_rejected(self, app: FastAPI, client: AsyncClient) -> None:
+        res = await client.request(
+            'DELETE',
+            app.url_path_for('projects:bulk-delete-projects'),
+            json={'ids': list(range(1, BULK_MAX_BATCH_SIZE + 2))},
+        )
+        assert res.status_code == HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+class TestBatchGetProjects:
+    async def test_batch_get_returns_projects_in_order_and_missing_ids(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB, new_project: ProjectCreate
+    ) -> None:
+        other = await ProjectsRepository(app.state._db).create_project(new_project=new_project)
+
+        res = await client.post(
+            app.url_path_for('projects:batch-get-projects'), json={'ids': [other.id, 50000, test_project.id, other.id]},
+        )
+        assert res.status_code == HTTP_200_OK
+        assert [project['id'] for project in res.json()['items']] == [other.id, test_project.id]
+        assert res.json()['missing'] == [50000]
+
+    async def test_list_filters_by_ids(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB, new_project: ProjectCreate
+    ) -> None:
+        other = await ProjectsRepository(app.state._db).create_project(new_project=new_project)
+
+        res = await client.get(
+            app.url_path_for('projects:get-all-projects'), params={'ids': f'{test_project.id},{other.id},50000'},
+        )
+        assert res.status_code == HTTP_200_OK
+        assert [project['id'] for project in res.json()['items']] == sorted([test_project.id, other.id])
+
+        res = await client.get(app.url_path_for('projects:get-all-projects'), params={'ids': '1,two'})
+        assert res.status_code == HTTP_400_BAD_REQUEST
+
+    async def test_concurrent_lookups_are_one_query(
+            self, app: FastAPI, client: AsyncClient, db: Database, test_project: ProjectInDB, new_project: ProjectCreate
+    ) -> None:
+        projects_repo = ProjectsRepository(db)
+        other = await projects_repo.create_project(new_project=new_project)
+        loader = get_batch_loader(
+            'projects', projects_repo.read_db, ProjectsRepository._fetch_projects_by_ids,
+            max_batch_size=BULK_MAX_BATCH_SIZE,
+        )
+        batches = loader.batches
+
+        projects = await asyncio.gather(*(
+            projects_repo.get_project_by_id(id=id) for id in (test_project.id, other.id, 50000)
+        ))
+        assert [project.id if project else None for project in projects] == [test_project.id, other.id, None]
+        assert loader.batches == batches + 1
+
+
+@pytest.fixture
+async def searchable_projects(db: Database) -> List[ProjectInDB]:
+    """
+    Projects sharing made-up words, so that searches for them only match these projects
+    """
+    project_repo = ProjectsRepository(db)
+    projects = []
+    for title, description in (
+            ('Quokkaplan mobile app', 'Ship the quokkaplan app to the stores'),
+            ('Warehouse migration', 'Move the quokkaplan inventory to the new warehouse'),
+            ('Zebracorn website', 'Landing pages'),
+    ):
+        projects.append(await project_repo.create_project(new_project=ProjectCreate(
+            title=title, description=description, created_date='2033-01-01T09:00:00+00:00',
+            due_date='2033-01-01T10:00:00+00:00',
+        )))
+
+    yield projects
+
+    for project in projects:
+        await project_repo.delete_project_by_id(id=project.id)
+
+
+class TestSearchProjects:
+    async def test_matches_are_ranked_title_first_and_highlighted(
+            self, app: FastAPI, client: AsyncClient, searchable_projects: List[ProjectInDB]
+    ) -> None:
+        res = await client.get(app.url_path_for('projects:search-projects'), params={'q': 'quokkaplan'})
+        assert res.status_code == HTTP_200_OK
+
+        results = res.json()['items']
+        assert [r['id'] for r in results] == [searchable_projects[0].id, searchable_projects[1].id]
+        assert results[0]['rank'] > results[1]['rank']
+        assert '<mark>Quokkaplan</mark>' in results[0]['title_highlight']
+        assert '<mark>quokkaplan</mark>' in results[1]['description_highlight']
+        assert 'version' not in results[0]
+
+    @pytest.mark.parametrize('q', ('quokka', 'QUOKKAPL mobi', 'zebrcorn website'))
+    async def test_prefixes_and_typos_match(
+            self, app: FastAPI, client: AsyncClient, searchable_projects: List[ProjectInDB], q: str
+    ) -> None:
+        res = await client.get(app.url_path_for('projects:search-projects'), params={'q': q})
+        assert res.status_code == HTTP_200_OK
+        assert len(res.json()['items']) > 0
+
+    async def test_pages_cover_every_match_once(
+            self, app: FastAPI, client: AsyncClient, searchable_projects: List[ProjectInDB]
+    ) -> None:
+        ids, cursor = [], None
+        while True:
+            res = await client.get(
+                app.url_path_for('projects:search-projects'),
+                params={'q': 'quokkaplan', 'limit': 1, **({'cursor': cursor} if cursor else {})},
+            )
+            assert res.status_code == HTTP_200_OK
+            ids += [r['id'] for r in res.json()['items']]
+            cursor = res.json()['next_cursor']
+            if cursor is None:
+                break
+
+        assert ids == [searchable_projects[0].id, searchable_projects[1].id]
+
+    async def test_cursor_of_another_search_is_rejected(
+            self, app: FastAPI, client: AsyncClient, searchable_projects: List[ProjectInDB]
+    ) -> None:
+        res = await client.get(app.url_path_for('projects:search-projects'), params={'q': 'quokkaplan', 'limit': 1})
+        res = await client.get(
+            app.url_path_for('projects:search-projects'), params={'q': 'zebracorn', 'cursor': res.json()['next_cursor']},
+        )
+        assert res.status_code == HTTP_400_BAD_REQUEST
+
+    @pytest.mark.parametrize('params', ({}, {'q': ''}, {'q': 'x' * 201}))
+    async def test_invalid_q_returns_error(self, app: FastAPI, client: AsyncClient, params: dict) -> None:
+        res = await client.get(app.url_path_for('projects:search-projects'), params=params)
+        assert res.status_code == HTTP_422_UNPROCESSABLE_ENTITY
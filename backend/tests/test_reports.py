@@ -0,0 +1,117 @@
+from typing import List
+
+import pytest
+
+from httpx import AsyncClient
+from fastapi import FastAPI
+
+from starlette.status import HTTP_200_OK
+
+from app.models.project import ProjectInDB
+from app.models.task import TaskInDB
+
+# Decorate all tests with @pytest.mark.asyncio
+pytestmark = pytest.mark.asyncio
+
+
+async def overdue_project_ids(app: FastAPI, client: AsyncClient) -> List[int]:
+    ids, params = [], {'limit': 100}
+    while True:
+        res = await client.get(app.url_path_for('reports:get-overdue-projects'), params=params)
+        assert res.status_code == HTTP_200_OK
+        ids += [project['id'] for project in res.json()['items']]
+        if res.json()['next_cursor'] is None:
+            assert len(ids) == res.json()['total']
+            return ids
+        params['cursor'] = res.json()['next_cursor']
+
+
+async def mark_project_done(app: FastAPI, client: AsyncClient, project_id: int) -> None:
+    res = await client.put(
+        app.url_path_for('projects:update-project-by-id', id=project_id), json={'project_update': {'status': 'done'}},
+    )
+    assert res.status_code == HTTP_200_OK
+    assert res.json()['status'] == 'done'
+
+class TestStatusReport:
+    async def test_counts_add_up(self, app: FastAPI, client: AsyncClient, test_task: TaskInDB) -> None:
+        res = await client.get(app.url_path_for('reports:get-status-report'))
+        assert res.status_code == HTTP_200_OK
+
+        for counts in res.json().values():
+            assert counts['total'] == counts['not_started'] + counts['in_progress'] + counts['done']
+        assert res.json()['projects']['not_started'] >= 1
+        assert res.json()['tasks']['not_started'] >= 1
+
+    @pytest.mark.parametrize('reports_source', ('aggregate', 'summary'))
+    async def test_done_project_is_counted_as_done(
+            self,
+            app: FastAPI,
+            client: AsyncClient,
+            test_project: ProjectInDB,
+            reports_source: str,
+            monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr('app.db.repositories.reports.REPORTS_SOURCE', reports_source)
+        url = app.url_path_for('reports:get-status-report')
+        before = (await client.get(url)).json()['projects']
+
+        await mark_project_done(app, client, test_project.id)
+
+        after = (await client.get(url)).json()['projects']
+        assert (after['done'], after['not_started']) == (before['done'] + 1, before['not_started'] - 1)
+
+
+class TestOverdueProjects:
+    async def test_past_due_project_is_overdue(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB
+    ) -> None:
+        assert test_project.id in await overdue_project_ids(app, client)
+
+    async def test_done_project_is_not_overdue(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB
+    ) -> None:
+        await mark_project_done(app, client, test_project.id)
+
+        assert test_project.id not in await overdue_project_ids(app, client)
+
+
+class TestDueDateHistogram:
+    async def test_project_is_counted_in_its_week(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB
+    ) -> None:
+        res = await client.get(
+            app.url_path_for('reports:get-due-date-histogram'),
+            params={'bucket': 'week', 'start': '2023-11-30', 'buckets': 2},
+        )
+        assert res.status_code == HTTP_200_OK
+
+        first, second = res.json()['items']
+        assert (first['start'], second['start']) == ('2023-11-27', '2023-12-04')
+        assert first['not_started'] >= 1
+
+
+class TestThroughput:
+    async def test_completed_task_is_counted_today(
+            self, app: FastAPI, client: AsyncClient, test_task: TaskInDB
+    ) -> None:
+        url = app.url_path_for('reports:get-throughput')
+        before = (await client.get(url, params={'bucket': 'day', 'buckets': 1})).json()['items'][0]['tasks']
+
+        await client.put(
+            app.url_path_for('tasks:update-task-by-id', id=test_task.id), json={'task_update': {'status': 'done'}},
+        )
+
+        after = (await client.get(url, params={'bucket': 'day', 'buckets': 1})).json()['items'][0]['tasks']
+        assert after == before + 1
+
+    async def test_completed_project_is_counted_today(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB
+    ) -> None:
+        url = app.url_path_for('reports:get-throughput')
+        before = (await client.get(url, params={'bucket': 'day', 'buckets': 1})).json()['items'][0]['projects']
+
+        await mark_project_done(app, client, test_project.id)
+
+        after = (await client.get(url, params={'bucket': 'day', 'buckets': 1})).json()['items'][0]['projects']
+        assert after == before + 1
@@ -0,0 +1,32 @@
+import pytest
+
+from app.core.serve import available_cpus, pool_sizes
+
+
+class TestPoolSizes:
+    def test_pools_share_max_connections(self) -> None:
+        assert pool_sizes(workers=4, max_connections=90, min_size=2, max_size=50, listeners=1) == (2, 21)
+
+    def test_configured_pool_size_is_kept_when_it_fits(self) -> None:
+        assert pool_sizes(workers=2, max_connections=90, min_size=2, max_size=10, listeners=1) == (2, 10)
+
+    def test_min_size_never_exceeds_max_size(self) -> None:
+        assert pool_sizes(workers=8, max_connections=20, min_size=5, max_size=10, listeners=0) == (2, 2)
+
+    def test_too_many_workers_refuse_to_start(self) -> None:
+        with pytest.raises(SystemExit):
+            pool_sizes(workers=16, max_connections=20, min_size=2, max_size=10, listeners=1)
+
+
+class TestAvailableCpus:
+    def test_cgroup_quota_caps_the_cpus(self, tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+        cpu_max = tmp_path / 'cpu.max'
+        cpu_max.write_text('50000 100000\n')
+        monkeypatch.setattr('app.core.serve.CGROUP_CPU_MAX', str(cpu_max))
+        assert available_cpus() == 1
+
+    def test_no_quota_leaves_the_affinity(self, tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+        cpu_max = tmp_path / 'cpu.max'
+        cpu_max.write_text('max 100000\n')
+        monkeypatch.setattr('app.core.serve.CGROUP_CPU_MAX', str(cpu_max))
+        assert available_cpus() >= 1
@@ -0,0 +1,63 @@
+import pytest
+
+from httpx import AsyncClient
+from fastapi import FastAPI
+
+from starlette.status import HTTP_200_OK
+
+from app.core.config import DB_POOL_MIN_SIZE
+from app.models.project import ProjectInDB
+
+# Decorate all tests with @pytest.mark.asyncio
+pytestmark = pytest.mark.asyncio
+
+
+class TestPoolStats:
+    async def test_pool_is_warm_before_the_first_request(self, app: FastAPI, client: AsyncClient) -> None:
+        res = await client.get(app.url_path_for('system:get-pool-stats'))
+        assert res.status_code == HTTP_200_OK
+        assert res.json()['size'] >= DB_POOL_MIN_SIZE
+
+    async def test_checkouts_are_counted(self, app: FastAPI, client: AsyncClient) -> None:
+        await client.get(app.url_path_for('projects:get-all-projects'))
+
+        stats = (await client.get(app.url_path_for('system:get-pool-stats'))).json()
+        assert stats['checkouts'] >= 1
+        assert stats['wait_seconds_max'] >= stats['wait_seconds_avg'] >= 0
+
+
+class TestReplicaStats:
+    async def test_no_replicas_configured(self, app: FastAPI, client: AsyncClient) -> None:
+        res = await client.get(app.url_path_for('system:get-replica-stats'))
+        assert res.status_code == HTTP_200_OK
+        assert res.json() == []
+
+
+class TestAdmissionStats:
+    async def test_admitted_requests_are_counted(self, app: FastAPI, client: AsyncClient) -> None:
+        await client.get(app.url_path_for('projects:get-all-projects'))
+
+        res = await client.get(app.url_path_for('system:get-admission-stats'))
+        assert res.status_code == HTTP_200_OK
+        assert res.json()['enabled']
+        assert res.json()['reads']['admitted'] >= 1
+        assert res.json()['reads']['active'] == 1
+
+
+class TestInstrumentation:
+    async def test_responses_carry_server_timing(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB
+    ) -> None:
+        res = await client.get(app.url_path_for('projects:get-project-by-id', id=test_project.id))
+        assert res.status_code == HTTP_200_OK
+
+        phases = {metric.split(';')[0].strip() for metric in res.headers['server-timing'].split(',')}
+        assert phases == {'queue', 'dependencies', 'app', 'db', 'serialization', 'total'}
+
+    async def test_metrics_hold_route_and_query_histograms(self, app: FastAPI, client: AsyncClient) -> None:
+        await client.get(app.url_path_for('projects:get-all-projects'))
+
+        res = await client.get(app.url_path_for('metrics:get-metrics'))
+        assert res.status_code == HTTP_200_OK
+        assert 'http_request_duration_seconds_count{route="projects:get-all-projects",method="GET",status="200"}' in res.text
+        assert 'db_query_duration_seconds_count{query="select projects"}' in res.text
@@ -0,0 +1,252 @@
+from typing import List
+
+import pytest
+
+from httpx import AsyncClient
+from fastapi import FastAPI
+from databases import Database
+
+from starlette.status import (
+    HTTP_200_OK, HTTP_201_CREATED, HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND, HTTP_422_UNPROCESSABLE_ENTITY,
+)
+
+from app.models.project import ProjectInDB
+from app.models.task import TaskCreate, TaskInDB
+from app.db.repositories.projects import ProjectsRepository
+from app.db.repositories.tasks import TasksRepository
+
+# Decorate all tests with @pytest.mark.asyncio
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+async def project_tasks(db: Database, test_project: ProjectInDB) -> List[TaskInDB]:
+    """
+    Six tasks of a fresh project, two per status, with due dates out of id order
+    """
+    task_repo = TasksRepository(db)
+    tasks = []
+    for i, status in enumerate(['in_progress', 'done', 'not_started'] * 2):
+        tasks.append(await task_repo.create_task(new_task=TaskCreate(
+            project_id=test_project.id,
+            title=f'task {i}',
+            due_date=f'2023-12-0{6 - i}T10:00:00+00:00',
+            status=status,
+        )))
+
+    return tasks
+
+
+class TestTasksRoutes:
+    async def test_routes_exist(self, app: FastAPI, client: AsyncClient) -> None:
+        res = await client.post(app.url_path_for('tasks:create-task'), json={})
+        assert res.status_code != HTTP_404_NOT_FOUND
+
+    async def test_invalid_input_raises_error(self, app: FastAPI, client: AsyncClient) -> None:
+        res = await client.post(app.url_path_for('tasks:create-task'), json={})
+        assert res.status_code == HTTP_422_UNPROCESSABLE_ENTITY
+
+
+class TestCreateTask:
+    async def test_valid_input_creates_task(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB
+    ) -> None:
+        task = {'project_id': test_project.id, 'title': 'Write tests', 'due_date': '2023-11-30T10:05:06.944969'}
+        res = await client.post(app.url_path_for('tasks:create-task'), json={'new_task': task})
+        assert res.status_code == HTTP_201_CREATED
+
+        created_task = res.json()
+        assert created_task['project_id'] == test_project.id
+        assert created_task['status'] == 'not_started'
+
+    async def test_task_of_missing_project_raises_error(self, app: FastAPI, client: AsyncClient) -> None:
+        task = {'project_id': 50000, 'title': 'Orphan', 'due_date': '2023-11-30T10:05:06.944969'}
+        res = await client.post(app.url_path_for('tasks:create-task'), json={'new_task': task})
+        assert res.status_code == HTTP_400_BAD_REQUEST
+
+
+class TestGetTask:
+    async def test_get_task_by_id(self, app: FastAPI, client: AsyncClient, test_task: TaskInDB) -> None:
+        res = await client.get(app.url_path_for('tasks:get-task-by-id', id=test_task.id))
+        assert res.status_code == HTTP_200_OK
+        assert TaskInDB(**res.json()) == test_task
+
+    @pytest.mark.parametrize('id, status_code', ((50000, 404), (-1, 404), (None, 422)))
+    async def test_wrong_id_returns_error(
+            self, app: FastAPI, client: AsyncClient, id: int, status_code: int
+    ) -> None:
+        res = await client.get(app.url_path_for('tasks:get-task-by-id', id=id))
+        assert res.status_code == status_code
+
+
+class TestListTasks:
+    async def test_pages_list_project_tasks_by_status_then_due_date(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB, project_tasks: List[TaskInDB]
+    ) -> None:
+        listed, cursor = [], None
+        while True:
+            res = await client.get(
+                app.url_path_for('tasks:get-all-tasks'),
+                params={'project_id': test_project.id, 'limit': 4, **({'cursor': cursor} if cursor else {})},
+            )
+            assert res.status_code == HTTP_200_OK
+            listed += res.json()['items']
+            cursor = res.json()['next_cursor']
+            if cursor is None:
+                break
+
+        expected = sorted(project_tasks, key=lambda t: (t.status.value, t.due_date, t.id))
+        assert [t['id'] for t in listed] == [t.id for t in expected]
+
+    async def test_filters_by_status(
+            self, app: FastAPI, client: AsyncClient, test_project: ProjectInDB, project_tasks: List[TaskInDB]
+    ) -> None:
+        res = await client.get(
+            app.url_path_for('tasks:get-all-tasks'), params={'project_id': test_project.id, 'status': 'done'},
+        )
+        assert res.status_code == HTTP_200_OK
+        assert {t['id'] for t in res.json()['items']} == {t.id for t in project_tasks if t.status == 'done'}
+
+    async def test_project_id_is_required(self, app: FastAPI, client: AsyncClient) -> None:
+        res = await client.get(app.url_path_for('tasks:get-all-tasks'))
+        assert res.status_code == HTTP_422_UNPROCESSABLE_ENTITY
+
+
+class TestUpdateTask:
+    @pytest.mark.parametrize(
+        'attrs_to_change, values',
+        (
+                (['title'], ['new fake task']),
+                (['description'], ['new fake task description']),
+                (['status'], ['done']),
+                (['title', 'status'], ['extra new fake task', 'in_progress']),
+        ),
+    )
+    async def test_update_task_with_valid_input(
+            self,
+            app: FastAPI,
+            client: AsyncClient,
+            test_task: TaskInDB,
+            attrs_to_change: List[str],
+            values: List[str],
+    ) -> None:
+        task_update = {'task_update': dict(zip(attrs_to_change, values))}
+
+        res = await client.put(app.url_path_for('tasks:update-task-by-id', id=test_task.id), json=task_update)
+        assert res.status_code == HTTP_200_OK
+        updated_task = TaskInDB(**res.json())
+        for attr, value in updated_task.model_dump().items():
+            if attr in attrs_to_change:
+                assert value == values[attrs_to_change.index(attr)]
+            else:
+                assert getattr(test_task, attr) == value
+
+    @pytest.mark.parametrize(
+        'id, payload, status_code',
+        (
+                (-1, {'title': 'test'}, 422),
+                (50000, {'title': 'test'}, 404),
+                (1, None, 422),
+                (1, {'status': 'invalid task status'}, 422),
+        ),
+    )
+    async def test_update_task_with_invalid_input_throws_error(
+            self, app: FastAPI, client: AsyncClient, id: int, payload: dict, status_code: int
+    ) -> None:
+        res = await client.put(app.url_path_for('tasks:update-task-by-id', id=id), json={'task_update': payload})
+        assert res.status_code == status_code
+
+
+class TestDeleteTask:
+    async def test_can_delete_task_successfully(
+            self, app: FastAPI, client: AsyncClient, test_task: TaskInDB
+    ) -> None:
+        res = await client.delete(app.url_path_for('tasks:delete-task-by-id', id=test_task.id))
+        assert res.status_code == HTTP_200_OK
+
+        res = await client.get(app.url_path_for('tasks:get-task-by-id', id=test_task.id))
+        assert res.status_code == HTTP_404_NOT_FOUND
+
+    async def test_deleting_project_deletes_its_tasks(
+            self, app: FastAPI, client: AsyncClient, test_task: TaskInDB
+    ) -> None:
+        res = await client.delete(app.url_path_for('projects:delete-project-by-id', id=test_task.project_id))
+        assert res.status_code == HTTP_200_OK
+
+        res = await client.get(app.url_path_for('tasks:get-task-by-id', id=test_task.id))
+        assert res.status_code == HTTP_404_NOT_FOUND
+
+
+@pytest.fixture
+async def searchable_tasks(db: Database, test_project: ProjectInDB) -> List[TaskInDB]:
+    """
+    Tasks sharing made-up words, so that searches for them only match these tasks
+    """
+    task_repo = TasksRepository(db)
+    tasks = []
+    for title, description in (
+            ('Draft the flibbertask brief', 'Outline for the flibbertask launch'),
+            ('Book the venue', 'Somewhere big enough for the flibbertask party'),
+            ('Order the snorkelbadge stickers', None),
+    ):
+        tasks.append(await task_repo.create_task(new_task=TaskCreate(
+            project_id=test_project.id, title=title, description=description, due_date='2033-01-01T10:00:00+00:00',
+        )))
+
+    yield tasks
+
+    # Out of the searches with their deleted project
+    await ProjectsRepository(db).delete_project_by_id(id=test_project.id)
+
+
+class TestSearchTasks:
+    async def test_matches_are_ranked_title_first_and_highlighted(
+            self, app: FastAPI, client: AsyncClient, searchable_tasks: List[TaskInDB]
+    ) -> None:
+        res = await client.get(app.url_path_for('tasks:search-tasks'), params={'q': 'flibbertask'})
+        assert res.status_code == HTTP_200_OK
+
+        results = res.json()['items']
+        assert [r['id'] for r in results] == [searchable_tasks[0].id, searchable_tasks[1].id]
+        assert results[0]['rank'] > results[1]['rank']
+        assert '<mark>flibbertask</mark>' in results[0]['title_highlight']
+        assert '<mark>flibbertask</mark>' in results[1]['description_highlight']
+
+    @pytest.mark.parametrize('q', ('snorkel', 'SNORKELBADG stick', 'snorkelbage stickers'))
+    async def test_prefixes_and_typos_match(
+            self, app: FastAPI, client: AsyncClient, searchable_tasks: List[TaskInDB], q: str
+    ) -> None:
+        res = await client.get(app.url_path_for('tasks:search-tasks'), params={'q': q})
+        assert res.status_code == HTTP_200_OK
+        assert searchable_tasks[2].id in [r['id'] for r in res.json()['items']]
+
+    async def test_pages_cover_every_match_once(
+            self, app: FastAPI, client: AsyncClient, searchable_tasks: List[TaskInDB]
+    ) -> None:
+        ids, cursor = [], None
+        while True:
+            res = await client.get(
+                app.url_path_for('tasks:search-tasks'),
+                params={'q': 'flibbertask', 'limit': 1, **({'cursor': cursor} if cursor else {})},
+            )
+            assert res.status_code == HTTP_200_OK
+            ids += [r['id'] for r in res.json()['items']]
+            cursor = res.json()['next_cursor']
+            if cursor is None:
+                break
+
+        assert ids == [searchable_tasks[0].id, searchable_tasks[1].id]
+
+    async def test_search_within_another_project_finds_nothing(
+            self, app: FastAPI, client: AsyncClient, searchable_tasks: List[TaskInDB]
+    ) -> None:
+        res = await client.get(
+            app.url_path_for('tasks:search-tasks'), params={'q': 'flibbertask', 'project_id': 99999999},
+        )
+        assert res.status_code == HTTP_200_OK
+        assert res.json()['items'] == []
+
+    @pytest.mark.parametrize('params', ({}, {'q': ''}, {'q': 'x' * 201}))
+    async def test_invalid_q_returns_error(self, app: FastAPI, client: AsyncClient, params: dict) -> None:
+        res = await client.get(app.url_path_for('tasks:search-tasks'), params=params)
+        assert res.status_code == HTTP_422_UNPROCESSABLE_ENTITY